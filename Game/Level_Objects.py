@@ -2,6 +2,8 @@
     This holds the pygame.rect objects to be used during levels
 """
 from button import button
+from moving_platform import MovingPlatform, LinearPath, CirclePath
+from entities import EntityStore, EntitySpec, HAZARD, COLLECTIBLE, ENEMY
 import sys
 import pygame
 
@@ -76,6 +78,26 @@ level_6_objects = [  # hole at 340-440
 level_6_start_pos = [80, 620]
 level_6_goal_pos = [600, 160]
 
+# *********** Level 7 *************
+level_7_objects = [
+    pygame.Rect(0, 620, 200, 180),  # start ledge
+    pygame.Rect(600, 620, 200, 180),  # ledge past the gap
+    pygame.Rect(40, 200, 180, 25),  # goal platform
+]
+level_7_platforms = [
+    MovingPlatform((120, 20), LinearPath([(210, 620), (470, 620)], 2)),  # ferry over the gap
+    MovingPlatform((100, 20), LinearPath([(690, 560), (690, 320)], 1.5)),  # elevator
+    MovingPlatform((100, 20), CirclePath((430, 260), 90, 300)),  # orbit to the goal
+]
+level_7_entities = EntityStore.from_specs([
+    EntitySpec(HAZARD, pygame.Rect(0, 600, 30, 20)),  # spikes behind the start
+    EntitySpec(COLLECTIBLE, pygame.Rect(390, 560, 20, 20)),  # coin over the gap
+    EntitySpec(COLLECTIBLE, pygame.Rect(720, 400, 20, 20)),  # coin by the elevator
+    EntitySpec(ENEMY, pygame.Rect(40, 170, 30, 30), speed=1, span=40),  # goal guard
+])
+level_7_start_pos = [80, 580]
+level_7_goal_pos = [100, 120]
+
 # FIX ME :: contains all the objects in all levels
 
 
@@ -88,6 +110,8 @@ level_select_rects = [  # contains the rects of the level slect buttons
     pygame.Rect(321, 401, 160, 160),  # level 5
     pygame.Rect(561, 401, 160, 160),  # level 6
 
+    pygame.Rect(81, 621, 160, 160),  # level 7
+
     pygame.Rect(681, 42, 80, 80)  # exit button
 ]
 
@@ -100,5 +124,7 @@ level_select_buttons = [
     button(level_select_rects[4], "5", BLACK, GRAY, 36),
     button(level_select_rects[5], "6", BLACK, GRAY, 36),
 
-    button(level_select_rects[6], "X", BLACK, RED, 36)
+    button(level_select_rects[6], "7", BLACK, GRAY, 36),
+
+    button(level_select_rects[7], "X", BLACK, RED, 36)
 ]
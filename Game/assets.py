@@ -0,0 +1,271 @@
+"""assets.py
+
+Images, fonts and glyph atlases for the game, loaded before a frame needs them. Images
+are declared at startup and a background thread reads and decodes them, converts them to
+the display's pixel format with convert or convert_alpha once the display exists, and
+caches them by path and size. A frame asking for an asset gets the cached surface; only
+an asset that was never declared or was evicted is loaded on the caller's thread, and is
+counted as a miss so it shows up.
+
+The cache holds at most budget bytes of pixels. When it is over, the least recently
+used surfaces are evicted, scaled copies are made again from the original without
+touching the disk while it is cached.
+"""
+
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+import pygame
+
+from text import GlyphAtlas
+
+# bytes of pixels the image cache keeps
+ASSET_BUDGET: int = 64 * 1024 * 1024
+IMAGE_SUFFIXES: tuple[str, ...] = (".png", ".jpg", ".jpeg", ".bmp")
+# pictures of the levels, preloaded by the game
+LEVEL_DRAWINGS: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Level_drawings")
+
+# path and size an image is scaled to, None for its own size
+AssetKey = tuple[str, tuple[int, int] | None]
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    """Memory of a surface's pixels
+
+    Args:
+        surface (pygame.Surface): the surface
+
+    Returns:
+        int: bytes of pixel data, rows include their padding
+    """
+    return surface.get_pitch() * surface.get_height()
+
+
+def convert(surface: pygame.Surface) -> pygame.Surface:
+    """Converts a surface to the display's pixel format so blits need no conversion
+
+    Args:
+        surface (pygame.Surface): freshly decoded surface
+
+    Returns:
+        pygame.Surface: the converted surface, keeping per pixel alpha if it has it
+    """
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+class AssetManager:
+    """Cache of converted images and fonts with a background preloader
+    """
+
+    def __init__(self, budget: int = ASSET_BUDGET) -> None:
+        """Initializes an empty cache, nothing is loaded before start
+
+        Args:
+            budget (int): bytes of pixels the image cache keeps
+        """
+        if budget < 1:
+            raise ValueError("budget must be at least 1 byte")
+        self.budget: int = budget
+        self.used: int = 0  # bytes of pixels cached
+        self.hits: int = 0
+        self.misses: int = 0  # loads on the caller's thread
+        self.evictions: int = 0
+        self._images: OrderedDict[AssetKey, pygame.Surface] = OrderedDict()  # oldest first
+        self._unconverted: set[AssetKey] = set()  # loaded before the display existed
+        self._fonts: dict[tuple[str | None, int], pygame.font.Font] = {}
+        self._atlases: dict[tuple[str | None, int, tuple[int, int, int]], GlyphAtlas] = {}
+        self._declared: dict[AssetKey, None] = {}  # ordered set
+        self._lock: threading.Lock = threading.Lock()
+        self._loaded: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def declare(self, path: str, size: tuple[int, int] | None = None) -> None:
+        """Adds an image to the ones start preloads, declaring it again does nothing
+
+        Args:
+            path (str): image file
+            size (tuple[int, int] | None): size it is drawn at, None for its own size
+        """
+        self._declared[path, size] = None
+
+    def declare_directory(self, directory: str) -> list[str]:
+        """Declares every image in a directory
+
+        Args:
+            directory (str): searched without subdirectories
+
+        Returns:
+            list[str]: paths declared, sorted
+        """
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                       if name.lower().endswith(IMAGE_SUFFIXES))
+        for path in paths:
+            self.declare(path)
+        return paths
+
+    def start(self) -> None:
+        """Starts loading the declared images on a background thread, images that are
+        cached already are skipped
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loaded.clear()
+        self._thread = threading.Thread(target=self._preload, name="assets", daemon=True)
+        self._thread.start()
+
+    def _preload(self) -> None:
+        try:
+            for path, size in list(self._declared):
+                with self._lock:
+                    cached = (path, size) in self._images
+                if not cached:
+                    self._store((path, size), *self._load(path, size))
+        finally:
+            self._loaded.set()
+
+    @property
+    def ready(self) -> bool:
+        """Getter for whether the preloader is done
+
+        Returns:
+            bool: True once every declared image was loaded or start was never called
+        """
+        return self._thread is None or self._loaded.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Waits for the preloader, for loading screens and tests
+
+        Args:
+            timeout (float | None): seconds to wait at most, None for no limit
+
+        Returns:
+            bool: True if the preloader is done
+        """
+        return self._thread is None or self._loaded.wait(timeout)
+
+    def image(self, path: str, size: tuple[int, int] | None = None) -> pygame.Surface:
+        """Getter for an image, cached after the first load
+
+        Args:
+            path (str): image file
+            size (tuple[int, int] | None): size to scale it to, None for its own size
+
+        Returns:
+            pygame.Surface: the converted image, shared, do not draw on it
+        """
+        key = (path, size)
+        with self._lock:
+            surface = self._images.get(key)
+            if surface is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                if key not in self._unconverted or pygame.display.get_surface() is None:
+                    return surface
+        if surface is None:
+            self.misses += 1
+            surface, converted = self._load(path, size)
+        else:  # preloaded before the display existed, converted on first use after
+            surface, converted = convert(surface), True
+        self._store(key, surface, converted)
+        return surface
+
+    def _load(self, path: str, size: tuple[int, int] | None) -> tuple[pygame.Surface, bool]:
+        """Reads, decodes, scales and converts an image, scaled ones from the cached
+        original, returns the surface and whether it was converted
+        """
+        if size is None:
+            surface = pygame.image.load(path)
+            if pygame.display.get_surface() is None:
+                return surface, False
+            return convert(surface), True
+        with self._lock:
+            original = self._images.get((path, None))
+            converted = (path, None) not in self._unconverted
+        if original is None:
+            original, converted = self._load(path, None)
+            self._store((path, None), original, converted)
+        if original.get_bitsize() >= 24:
+            return pygame.transform.smoothscale(original, size), converted
+        return pygame.transform.scale(original, size), converted
+
+    def _store(self, key: AssetKey, surface: pygame.Surface, converted: bool) -> None:
+        """Caches a surface and evicts the least recently used ones over the budget
+        """
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self.used -= surface_bytes(old)
+            self._images[key] = surface
+            self.used += surface_bytes(surface)
+            if converted:
+                self._unconverted.discard(key)
+            else:
+                self._unconverted.add(key)
+            while self.used > self.budget and len(self._images) > 1:
+                evicted, old = self._images.popitem(last=False)
+                self._unconverted.discard(evicted)
+                self.used -= surface_bytes(old)
+                self.evictions += 1
+
+    def cached(self, path: str, size: tuple[int, int] | None = None) -> bool:
+        """Checks if an image is in the cache
+
+        Args:
+            path (str): image file
+            size (tuple[int, int] | None): size it was asked for
+
+        Returns:
+            bool: True if image returns it without loading
+        """
+        with self._lock:
+            return (path, size) in self._images
+
+    def font(self, size: int, path: str | None = None) -> pygame.font.Font:
+        """Getter for a font, every size is loaded once and shared
+
+        Args:
+            size (int): height in pixels
+            path (str | None): font file, None for pygame's default font
+
+        Returns:
+            pygame.font.Font: the font
+        """
+        key = (path, size)
+        font = self._fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self._fonts[key] = pygame.font.Font(path, size)
+        return font
+
+    def atlas(self, size: int, color: tuple[int, int, int],
+              path: str | None = None) -> GlyphAtlas:
+        """Getter for a glyph atlas, every font, size and color is rasterized once
+
+        Args:
+            size (int): height in pixels
+            color (tuple[int, int, int]): color of the text
+            path (str | None): font file, None for pygame's default font
+
+        Returns:
+            GlyphAtlas: the atlas
+        """
+        key = (path, size, color)
+        atlas = self._atlases.get(key)
+        if atlas is None:
+            atlas = self._atlases[key] = GlyphAtlas(self.font(size, path), color)
+        return atlas
+
+    def stop(self) -> None:
+        """Waits for the preloader to finish, safe to call more than once
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# shared by the whole game so every image and font is loaded once, see game.assets
+ASSETS: AssetManager = AssetManager()
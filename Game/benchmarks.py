@@ -0,0 +1,158 @@
+"""benchmarks.py
+
+The benchmark suite behind python game.py --benchmark. It times what a player waits
+for, on the game's own objects and without a human: loading every level through
+game.level_changer and playing frames of every level through the play scene, update
+and draw, plus the particle pool, the spatial grid queries at sizes bigger than any
+level and HUD text through a TextLine against Font.render. Every result is
+seconds per iteration.
+"""
+
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
+from input_state import InputState
+from scenes import BLACK, HUD_SIZE, WHITE
+from text import TextLine
+from particles import measure
+from spatial_index import benchmark
+
+if TYPE_CHECKING:  # pragma: no cover
+    from game import game
+
+# frames of every level played by default
+BENCHMARK_FRAMES: int = 600
+# loads of every level timed by default
+BENCHMARK_LOADS: int = 20
+
+
+class Result(NamedTuple):
+    """One measurement of the suite
+    """
+    name: str
+    seconds: float  # per iteration
+    iterations: int
+
+
+def levels(host: game) -> list[int]:
+    """Numbers of the levels the game has
+
+    Args:
+        host (game): the game
+
+    Returns:
+        list[int]: 1 up to the last level
+    """
+    found: list[int] = []
+    while host.level_changer(len(found) + 1):
+        found.append(len(found) + 1)
+    host.level = 0
+    return found
+
+
+def time_level_loads(host: game, loads: int = BENCHMARK_LOADS) -> list[Result]:
+    """Times game.level_changer for every level
+
+    Args:
+        host (game): the game
+        loads (int): loads of every level
+
+    Returns:
+        list[Result]: one result per level
+    """
+    results: list[Result] = []
+    for level in levels(host):
+        started = time.perf_counter()
+        for _ in range(loads):
+            host.level_changer(level)
+        results.append(Result(f"level {level} load", (time.perf_counter() - started) / loads,
+                              loads))
+    return results
+
+
+def time_play_frames(host: game, frames: int = BENCHMARK_FRAMES) -> list[Result]:
+    """Times frames of every level through the play scene, standing at the start so
+    the attempt never ends and nothing is saved
+
+    Args:
+        host (game): the game, its screen is drawn on
+        frames (int): frames of every level
+
+    Returns:
+        list[Result]: one result per level
+    """
+    results: list[Result] = []
+    idle = InputState()
+    play = host.play
+    for level in levels(host):
+        host.level_changer(level)
+        play.enter()
+        started = time.perf_counter()
+        for _ in range(frames):
+            play.update(idle)
+            play.draw()
+        results.append(Result(f"level {level} frame", (time.perf_counter() - started) / frames,
+                              frames))
+    return results
+
+
+def time_hud_text(host: game, frames: int = BENCHMARK_FRAMES) -> list[Result]:
+    """Times a HUD line that changes every frame, drawn through a TextLine and
+    rendered with Font.render, both on a white background
+
+    Args:
+        host (game): the game, its screen is drawn on
+        frames (int): lines of each
+
+    Returns:
+        list[Result]: the TextLine and Font.render
+    """
+    line = TextLine(host.assets.atlas(HUD_SIZE, BLACK), background=WHITE)
+    font = host.assets.font(HUD_SIZE)
+    screen = host.screen
+    texts = [f"TIME {frame / 60:.2f}   DEATHS 3   FPS {60 - frame % 3}" for frame in range(frames)]
+    started = time.perf_counter()
+    for text in texts:
+        line.draw(screen, text, 10, 10)
+    line_seconds = (time.perf_counter() - started) / frames
+    started = time.perf_counter()
+    for text in texts:
+        screen.blit(font.render(text, True, BLACK, WHITE), (10, 10))
+    render_seconds = (time.perf_counter() - started) / frames
+    return [Result("hud text TextLine", line_seconds, frames),
+            Result("hud text Font.render", render_seconds, frames)]
+
+
+def run_suite(host: game, frames: int = BENCHMARK_FRAMES,
+              loads: int = BENCHMARK_LOADS) -> list[Result]:
+    """Runs the whole suite
+
+    Args:
+        host (game): the game
+        frames (int): frames of every level, and of the particle pool
+        loads (int): loads of every level
+
+    Returns:
+        list[Result]: every measurement
+    """
+    results = (time_level_loads(host, loads) + time_play_frames(host, frames)
+               + time_hud_text(host, frames))
+    results.append(Result("particles 4096", measure(4096, frames), frames))
+    for name, (grid, _) in benchmark(2000, frames).items():
+        results.append(Result(f"grid {name}", grid, frames))
+    return results
+
+
+def report(results: list[Result]) -> str:
+    """Table of results for the console
+
+    Args:
+        results (list[Result]): results of run_suite
+
+    Returns:
+        str: one line per result
+    """
+    width = max((len(result.name) for result in results), default=0)
+    return "\n".join(f"{result.name:<{width}}  {result.seconds * 1e6:10.1f} us  "
+                     f"x{result.iterations}" for result in results)
@@ -1,8 +1,12 @@
 """
     This module has the button class
 """
+from __future__ import annotations
 import pygame
 
+from assets import ASSETS
+from input_state import InputState
+
 
 class button:
     """
@@ -14,9 +18,13 @@ class button:
                  text: str,
                  text_color: tuple[int, int, int],
                  color: tuple[int, int, int],
-                 size: int) -> None:
-        pygame.font.init()
-        self.font: pygame.font.Font = pygame.font.Font(None, size)
+                 size: int,
+                 font: pygame.font.Font | None = None) -> None:
+        """
+            font defaults to the shared default font of the size, so buttons
+            with the same size never load it twice
+        """
+        self.font: pygame.font.Font = font if font is not None else ASSETS.font(size)
         self.rect: pygame.Rect = rect
         self.text: str = text
         self.text_color: tuple[int, int, int] = text_color
@@ -33,7 +41,14 @@ class button:
         label_rect = label.get_rect(center=self.rect.center)
         surface.blit(label, label_rect)
 
-    def button_clicked(self) -> bool:
+    def button_clicked(self, inputs: InputState | None = None) -> bool:
+        """
+            True on the frame the left mouse button goes down over the button
+            without inputs the mouse is polled and a held button counts
+        """
+        if inputs is not None:
+            return inputs.clicked and self.rect.collidepoint(inputs.mouse_pos)
+
         # If no display surface exists yet, skip mouse logic
         if pygame.display.get_surface() is None:
             return False
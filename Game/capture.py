@@ -0,0 +1,184 @@
+"""capture.py
+
+Recording a session for bug reports without costing the game frames:
+
+    python game.py --capture captures                      # PNG per frame
+    python game.py --capture captures --capture-format raw # one raw RGB video stream
+
+At the end of every frame the main loop copies the screen's pixels into a free buffer of
+a preallocated pool, one contiguous copy of a fraction of a millisecond, and queues it.
+A writer thread turns the buffers into RGB and encodes them, PNG with zlib, which runs
+without the GIL, or appends them to a raw rgb24 stream that ffmpeg can read:
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x800 -r 60 -i capture-800x800.rgb out.mp4
+
+When the writer falls behind the pool runs out of free buffers and frames are dropped
+and counted instead of waiting, so the game never stalls. PNG files are named after the
+frame number, dropped frames show up as gaps.
+"""
+
+from __future__ import annotations
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+from typing import BinaryIO
+import numpy as np
+import numpy.typing as npt
+import pygame
+
+# buffers in the pool, frames the writer can be behind before frames are dropped
+POOL_SIZE: int = 8
+# zlib level of the PNG frames, fast over small for bug reports
+PNG_LEVEL: int = 1
+FORMATS: tuple[str, ...] = ("png", "raw")
+
+_PNG_SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    """One PNG chunk: length, type, data and the CRC of type and data
+    """
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+def encode_png(rows: npt.NDArray[np.uint8], level: int = PNG_LEVEL) -> bytes:
+    """Encodes an 8 bit RGB image whose rows each start with a PNG filter byte
+
+    Args:
+        rows (npt.NDArray[np.uint8]): (height, 1 + 3 * width) C-contiguous array, the
+                                      first column holds the filter type, 0 for none
+        level (int): zlib compression level
+
+    Returns:
+        bytes: the PNG file contents
+    """
+    height, columns = rows.shape
+    header = struct.pack(">IIBBBBB", (columns - 1) // 3, height, 8, 2, 0, 0, 0)
+    return b"".join((_PNG_SIGNATURE, _chunk(b"IHDR", header),
+                     _chunk(b"IDAT", zlib.compress(rows.data, level)), _chunk(b"IEND", b"")))
+
+
+class FrameCapture:
+    """Copies a surface into a buffer pool every frame, a writer thread saves them
+    """
+
+    def __init__(self, surface: pygame.Surface, directory: str, format: str = "png",
+                 pool_size: int = POOL_SIZE) -> None:
+        """Allocates the pool, nothing is captured before start
+
+        Args:
+            surface (pygame.Surface): 32 bit surface to capture, usually the display
+            directory (str): where the frames are written, made if missing
+            format (str): png for a file per frame, raw for one rgb24 stream
+            pool_size (int): buffers, the most frames waiting for the writer
+        """
+        if format not in FORMATS:
+            raise ValueError(f"unknown capture format {format}, pick one of {', '.join(FORMATS)}")
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        if surface.get_bitsize() != 32:
+            raise ValueError("only 32 bit surfaces can be captured")
+        self.surface: pygame.Surface = surface
+        self.directory: str = directory
+        self.format: str = format
+        self.frames: int = 0  # frames the game showed since start
+        self.captured: int = 0
+        self.dropped: int = 0
+        self.written: int = 0
+
+        width, height = surface.get_size()
+        # same layout as the surface's pixels, so the copy is one block
+        self._pool: list[npt.NDArray[np.uint32]] = [
+            np.empty((width, height), dtype=np.uint32, order="F") for _ in range(pool_size)]
+        self._free: queue.SimpleQueue[int] = queue.SimpleQueue()
+        for slot in range(pool_size):
+            self._free.put(slot)
+        # never fuller than the pool, so the game's put never waits
+        self._filled: queue.Queue[tuple[int, int] | None] = queue.Queue(maxsize=pool_size + 1)
+        # the writer's RGB rows, a filter byte of 0 in front of every row for PNG
+        self._rows: npt.NDArray[np.uint8] = np.zeros(
+            (height, 3 * width + (1 if format == "png" else 0)), dtype=np.uint8)
+        little = sys.byteorder == "little"
+        self._channels: list[int] = [shift // 8 if little else 3 - shift // 8
+                                     for shift in surface.get_shifts()[:3]]
+        self._stream: BinaryIO | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def stream_path(self) -> str:
+        """Getter for the file of the raw stream
+
+        Returns:
+            str: path of the rgb24 stream, named after the frame size
+        """
+        width, height = self.surface.get_size()
+        return os.path.join(self.directory, f"capture-{width}x{height}.rgb")
+
+    def start(self) -> None:
+        """Starts the writer thread
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if self.format == "raw":
+            self._stream = open(self.stream_path, "wb")
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+
+    def frame(self) -> None:
+        """Called by the main loop after the frame was displayed, never waits
+        """
+        self.frames += 1
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:  # the writer is behind, this frame is not recorded
+            self.dropped += 1
+            return
+        pixels = pygame.surfarray.pixels2d(self.surface)
+        try:
+            np.copyto(self._pool[slot], pixels)
+        finally:
+            del pixels  # unlocks the surface
+        self._filled.put_nowait((slot, self.frames))
+        self.captured += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._filled.get()
+            if item is None:
+                return
+            slot, number = item
+            try:
+                self._write(self._pool[slot], number)
+            finally:
+                self._free.put(slot)
+
+    def _write(self, pixels: npt.NDArray[np.uint32], number: int) -> None:
+        """Converts one buffer to RGB and writes it, on the writer thread
+        """
+        width, height = pixels.shape
+        channels = pixels.T.view(np.uint8).reshape(height, width, 4)
+        rgb = self._rows[:, -3 * width:].reshape(height, width, 3)
+        for index, channel in enumerate(self._channels):
+            np.copyto(rgb[..., index], channels[..., channel])
+        if self._stream is not None:
+            self._stream.write(self._rows.data)
+        else:
+            path = os.path.join(self.directory, f"frame_{number:06d}.png")
+            with open(path, "wb") as file:
+                file.write(encode_png(self._rows))
+        self.written += 1
+
+    def stop(self) -> None:
+        """Waits for the writer to save the queued frames and stops it, safe to call
+        more than once
+        """
+        if self._thread is not None:
+            self._filled.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
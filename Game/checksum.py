@@ -0,0 +1,202 @@
+"""checksum.py
+
+Per frame checksums of the physics state for lockstep and replay desync detection.
+
+The state written by Player.save_state is quantized (the jump velocity to 1/1024 of a
+pixel, everything else is already whole), packed into 25 bytes and folded into a CRC-32
+chained from the previous frame's checksum. Packing and zlib.crc32 both run in C, so a
+frame's checksum costs a couple of microseconds. Because the checksum is chained, the
+first frame whose checksum differs is the frame the runs diverged.
+"""
+
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+from typing import NamedTuple
+import struct
+import zlib
+
+from player import Player
+
+# names of the floats in Player.save_state, in order
+FIELDS: tuple[str, ...] = (
+    "x",
+    "y",
+    "width",
+    "height",
+    "jump_velocity",
+    "on_ground",
+    "can_wall_jump",
+    "touching_left_wall",
+    "touching_right_wall",
+    "move_velocity",
+)
+VELOCITY_SCALE: int = 1024
+
+# checksum before the first frame
+CHECKSUM_SEED: int = 0
+
+# x, y, width, height, velocity, move velocity, flag bits
+_PACKED = struct.Struct("<6iB")
+# checksum packs into this instead of a new bytes object every frame, the game runs
+# its simulations on one thread
+_SCRATCH: bytearray = bytearray(_PACKED.size)
+
+
+def quantize(state: Sequence[float], offset: int = 0) -> tuple[int, ...]:
+    """Turns a saved player state into ints
+
+    Args:
+        state (Sequence[float]): buffer filled by Player.save_state
+        offset (int): index of the first float
+
+    Returns:
+        tuple[int, ...]: one int per name in FIELDS
+    """
+    return (int(state[offset]), int(state[offset + 1]), int(state[offset + 2]),
+            int(state[offset + 3]), round(state[offset + 4] * VELOCITY_SCALE),
+            int(state[offset + 5]), int(state[offset + 6]), int(state[offset + 7]),
+            int(state[offset + 8]), int(state[offset + 9]))
+
+
+def quantize_into(state: Sequence[float], out: array[int], offset: int = 0) -> None:
+    """Quantizes like quantize into a preallocated array instead of a new tuple
+
+    Args:
+        state (Sequence[float]): buffer filled by Player.save_state
+        out (array[int]): array('q') with one slot per name in FIELDS
+        offset (int): index of the first float in state
+    """
+    out[0] = int(state[offset])
+    out[1] = int(state[offset + 1])
+    out[2] = int(state[offset + 2])
+    out[3] = int(state[offset + 3])
+    out[4] = round(state[offset + 4] * VELOCITY_SCALE)
+    out[5] = int(state[offset + 5])
+    out[6] = int(state[offset + 6])
+    out[7] = int(state[offset + 7])
+    out[8] = int(state[offset + 8])
+    out[9] = int(state[offset + 9])
+
+
+def checksum(previous: int, state: Sequence[float], offset: int = 0) -> int:
+    """Chains one frame's quantized state onto the previous checksum
+
+    Args:
+        previous (int): checksum of the previous frame, CHECKSUM_SEED for the first
+        state (Sequence[float]): buffer filled by Player.save_state
+        offset (int): index of the first float
+
+    Returns:
+        int: 32 bit checksum
+    """
+    _PACKED.pack_into(
+        _SCRATCH, 0, int(state[offset]), int(state[offset + 1]), int(state[offset + 2]),
+        int(state[offset + 3]), round(state[offset + 4] * VELOCITY_SCALE),
+        int(state[offset + 9]), int(state[offset + 5]) | int(state[offset + 6]) << 1
+        | int(state[offset + 7]) << 2 | int(state[offset + 8]) << 3)
+    return zlib.crc32(_SCRATCH, previous)
+
+
+class Desync(NamedTuple):
+    """First place two runs disagree
+    """
+    frame: int
+    field: str  # a name from FIELDS, "checksum" when only checksums were compared,
+    #             "outcome" or "frames" when the runs ended differently
+    expected: int
+    actual: int
+
+
+def first_desync(expected: Sequence[int], actual: Sequence[int]) -> Desync | None:
+    """Compares two checksum sequences
+
+    Returns:
+        Desync | None: the first frame whose checksums differ, None if they match
+    """
+    for frame, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            return Desync(frame, "checksum", want, got)
+    return None
+
+
+def diff_states(frame: int, expected: Sequence[int], actual: Sequence[int]) -> Desync | None:
+    """Compares two quantized states field by field
+
+    Args:
+        frame (int): frame the states belong to
+        expected (Sequence[int]): quantized state, see quantize
+        actual (Sequence[int]): quantized state, see quantize
+
+    Returns:
+        Desync | None: the first differing field, None if the states match
+    """
+    for name, want, got in zip(FIELDS, expected, actual):
+        if want != got:
+            return Desync(frame, name, want, got)
+    return None
+
+
+class DesyncDetector:
+    """Keeps the last frames' checksums and states of the local player so a peer's
+    checksums can be compared when they arrive
+    """
+
+    def __init__(self, history: int = 128) -> None:
+        """Allocates the history
+
+        Args:
+            history (int): frames remembered
+        """
+        self.history: int = history
+        self._frames: array[int] = array("q", [-1]) * history
+        self._checksums: array[int] = array("I", bytes(4 * history))
+        self._states: array[float] = array("d", bytes(8 * history * Player.STATE_SIZE))
+        self.desync: Desync | None = None
+
+    def record(self, frame: int, player: Player, value: int) -> None:
+        """Remembers the local state after a frame
+
+        Args:
+            frame (int): frame number
+            player (Player): local player after the frame's update
+            value (int): checksum after the frame
+        """
+        slot = frame % self.history
+        self._frames[slot] = frame
+        self._checksums[slot] = value
+        player.save_state(self._states, slot * Player.STATE_SIZE)
+
+    def compare(self, frame: int, remote_checksum: int) -> Desync | None:
+        """Checks a peer's checksum against the local one, the first mismatch is kept
+
+        Args:
+            frame (int): frame number
+            remote_checksum (int): the peer's checksum after that frame
+
+        Returns:
+            Desync | None: the mismatch, None if they agree or the frame is unknown
+        """
+        slot = frame % self.history
+        if self._frames[slot] != frame or self._checksums[slot] == remote_checksum:
+            return None
+        desync = Desync(frame, "checksum", self._checksums[slot], remote_checksum)
+        if self.desync is None or frame < self.desync.frame:
+            self.desync = desync
+        return desync
+
+    def explain(self, frame: int, remote_state: Sequence[float]) -> Desync | None:
+        """Finds the field that differs once the peer sends its state for a frame
+
+        Args:
+            frame (int): frame number
+            remote_state (Sequence[float]): the peer's Player.save_state output
+
+        Returns:
+            Desync | None: the first differing field, None if unknown or equal
+        """
+        slot = frame % self.history
+        if self._frames[slot] != frame:
+            return None
+        local = quantize(self._states, slot * Player.STATE_SIZE)
+        return diff_states(frame, local, quantize(remote_state))
@@ -0,0 +1,235 @@
+"""entities.py
+
+Hazards, collectibles and enemies stored as a struct of arrays: one NumPy array per
+field instead of one object per entity, so every system is a handful of array
+operations over the whole level however many entities it has.
+
+Like moving platforms, everything that changes is derived from the simulation frame.
+Enemies patrol back and forth from their home x, so their position is a function of
+the frame, and a collectible remembers the frame it was taken on, so rewinding to an
+earlier frame puts it back. A saved state only needs the frame number.
+"""
+
+from __future__ import annotations
+from collections.abc import Iterable
+from typing import NamedTuple
+import numpy as np
+import numpy.typing as npt
+import pygame
+
+IntArray = npt.NDArray[np.int32]
+BoolArray = npt.NDArray[np.bool_]
+
+# entity kinds
+HAZARD: int = 0  # kills on touch, never moves
+COLLECTIBLE: int = 1  # taken on touch
+ENEMY: int = 2  # kills on touch, patrols
+
+# taken value of a collectible that is still there
+NOT_TAKEN: int = -1
+
+
+class EntitySpec(NamedTuple):
+    """One entity of a level, speed and span are only used by enemies
+    """
+    kind: int
+    rect: pygame.Rect
+    speed: int = 0  # pixels per frame
+    span: int = 0  # pixels to the right of home the patrol turns at
+
+
+class EntityStore:
+    """Entities of one level as parallel arrays, only the first count entries are used
+    """
+
+    __slots__ = ("count", "kind", "x", "y", "w", "h", "vx", "home", "speed", "span", "taken")
+
+    def __init__(self, capacity: int = 64) -> None:
+        """Allocates an empty store, it grows when it runs out of room
+
+        Args:
+            capacity (int): entities that fit before the arrays are reallocated
+        """
+        self.count: int = 0
+        self.kind: npt.NDArray[np.int8] = np.zeros(capacity, dtype=np.int8)
+        self.x: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.y: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.w: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.h: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.vx: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.home: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.speed: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.span: IntArray = np.zeros(capacity, dtype=np.int32)
+        self.taken: IntArray = np.full(capacity, NOT_TAKEN, dtype=np.int32)
+
+    @classmethod
+    def from_specs(cls, specs: Iterable[EntitySpec]) -> EntityStore:
+        """Builds a store from a list of entities, for level data
+
+        Args:
+            specs (Iterable[EntitySpec]): the entities
+
+        Returns:
+            EntityStore: the filled store
+        """
+        specs = list(specs)
+        store = cls(max(len(specs), 1))
+        for spec in specs:
+            store.add(*spec)
+        return store
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        """Getter for the number of entities that fit without growing
+
+        Returns:
+            int: length of the arrays
+        """
+        return len(self.kind)
+
+    def _grow(self, capacity: int) -> None:
+        """Reallocates every array with room for capacity entities
+        """
+        for name in self.__slots__[1:]:
+            old = getattr(self, name)
+            new = np.full(capacity, NOT_TAKEN if name == "taken" else 0, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, kind: int, rect: pygame.Rect, speed: int = 0, span: int = 0) -> int:
+        """Adds an entity
+
+        Args:
+            kind (int): HAZARD, COLLECTIBLE or ENEMY
+            rect (pygame.Rect): where it is, an enemy's x is its home
+            speed (int): enemy patrol speed in pixels per frame
+            span (int): enemy patrol distance to the right of home
+
+        Returns:
+            int: index of the entity
+        """
+        if kind not in (HAZARD, COLLECTIBLE, ENEMY):
+            raise ValueError(f"unknown entity kind {kind}")
+        if speed < 0 or span < 0:
+            raise ValueError("speed and span cannot be negative")
+        if self.count == self.capacity:
+            self._grow(2 * self.capacity)
+        index = self.count
+        self.kind[index] = kind
+        self.x[index] = self.home[index] = rect.x
+        self.y[index] = rect.y
+        self.w[index] = rect.w
+        self.h[index] = rect.h
+        self.vx[index] = speed if kind == ENEMY and span else 0
+        self.speed[index] = speed if kind == ENEMY else 0
+        self.span[index] = span if kind == ENEMY else 0
+        self.taken[index] = NOT_TAKEN
+        self.count += 1
+        return index
+
+    def copy(self) -> EntityStore:
+        """Returns a store with its own arrays, so simulations of the same level do not
+        take each other's collectibles
+
+        Returns:
+            EntityStore: the copy, trimmed to count
+        """
+        store = EntityStore(max(self.count, 1))
+        for name in self.__slots__[1:]:
+            getattr(store, name)[:self.count] = getattr(self, name)[:self.count]
+        store.count = self.count
+        return store
+
+    # ********* Systems **************
+    def patrol(self, frame: int) -> None:
+        """Moves every enemy to where its patrol puts it on a frame, out from home
+        toward home + span and back
+
+        Args:
+            frame (int): simulation frame
+        """
+        count = self.count
+        span = self.span[:count]
+        phase = (frame * self.speed[:count]) % np.maximum(2 * span, 1)
+        outward = phase < span
+        self.x[:count] = self.home[:count] + np.where(outward, phase, 2 * span - phase)
+        # zero for hazards, collectibles and enemies that stand guard
+        speed = self.speed[:count] * (span > 0)
+        self.vx[:count] = np.where(outward, speed, -speed)
+
+    def touching(self, rect: pygame.Rect) -> BoolArray:
+        """Which entities overlap a rect, like pygame.Rect.colliderect
+
+        Args:
+            rect (pygame.Rect): area to test
+
+        Returns:
+            BoolArray: one flag per entity
+        """
+        count = self.count
+        x = self.x[:count]
+        y = self.y[:count]
+        overlap: BoolArray = ((x < rect.right) & (x + self.w[:count] > rect.left)
+                              & (y < rect.bottom) & (y + self.h[:count] > rect.top))
+        return overlap
+
+    def hits(self, rect: pygame.Rect) -> bool:
+        """Checks if a rect touches a hazard or an enemy
+
+        Args:
+            rect (pygame.Rect): the player's rect
+
+        Returns:
+            bool: True if it does
+        """
+        if not self.count:
+            return False
+        return bool(np.any(self.touching(rect) & (self.kind[:self.count] != COLLECTIBLE)))
+
+    def collect(self, rect: pygame.Rect, frame: int) -> int:
+        """Takes every collectible a rect touches
+
+        Args:
+            rect (pygame.Rect): the player's rect
+            frame (int): frame the collectibles are taken on
+
+        Returns:
+            int: number taken this call
+        """
+        if not self.count:
+            return 0
+        count = self.count
+        picked = (self.touching(rect) & (self.kind[:count] == COLLECTIBLE)
+                  & (self.taken[:count] == NOT_TAKEN))
+        self.taken[:count][picked] = frame
+        return int(np.count_nonzero(picked))
+
+    def rewind(self, frame: int) -> None:
+        """Puts everything back the way it was on a frame: collectibles taken later
+        come back and the enemies move to their place
+
+        Args:
+            frame (int): simulation frame
+        """
+        taken = self.taken[:self.count]
+        taken[taken > frame] = NOT_TAKEN
+        self.patrol(frame)
+
+    def collected(self) -> int:
+        """Number of collectibles taken so far
+
+        Returns:
+            int: count of taken collectibles
+        """
+        return int(np.count_nonzero(self.taken[:self.count] != NOT_TAKEN))
+
+    def visible(self) -> npt.NDArray[np.intp]:
+        """Indexes of the entities that are still on the level
+
+        Returns:
+            npt.NDArray[np.intp]: hazards, enemies and collectibles not taken yet
+        """
+        return np.flatnonzero(self.taken[:self.count] == NOT_TAKEN)
@@ -0,0 +1,456 @@
+"""environment.py
+
+Reinforcement learning style environments over the platformer physics.
+
+PlatformerEnv wraps one Simulation, so it runs the real Player.update. VectorPlatformerEnv
+steps many players at once with the same rules written as NumPy array operations: the
+only Python loop is over the level colliders, never over the environments.
+
+Actions are input bitmasks made of INPUT_LEFT, INPUT_RIGHT and INPUT_JUMP. An observation
+holds the player position, the horizontal distance moved in the last frame, the jump
+velocity, the four player flags, the nearest level colliders and the nearest hazards
+and enemies relative to the player. Moving platforms are colliders where they are on the
+current frame, so on levels that have them the observation shows what the next step
+collides with.
+"""
+
+from __future__ import annotations
+from typing import Any
+import numpy as np
+import numpy.typing as npt
+
+from player import Player
+from fixed_point import FixedTuning, SUBPIXEL_BITS, SUBPIXELS
+from movement_strategy import MovementStrategy
+from input_state import MaskKeys, INPUT_JUMP
+from entities import COLLECTIBLE
+from simulation import Simulation
+
+NEARBY_COLLIDERS: int = 4
+NEARBY_HAZARDS: int = 2  # hazards and enemies, after the colliders
+OBSERVATION_SIZE: int = 8 + 4 * NEARBY_COLLIDERS + 4 * NEARBY_HAZARDS
+
+WIN_REWARD: float = 100.0
+FALL_REWARD: float = -100.0
+DISTANCE_REWARD: float = 0.01  # per pixel the player got closer to the goal
+
+IntArray = npt.NDArray[np.int64]
+FloatArray = npt.NDArray[np.float64]
+BoolArray = npt.NDArray[np.bool_]
+
+
+def rect_array(rects: Any) -> IntArray:
+    """Turns pygame.Rect like objects into an (M, 4) array of left, top, width, height
+
+    Args:
+        rects (Iterable[pygame.Rect]): level colliders
+
+    Returns:
+        IntArray: one row per rect
+    """
+    return np.array([(rect.x, rect.y, rect.w, rect.h) for rect in rects],
+                    dtype=np.int64).reshape(-1, 4)
+
+
+def collides(x: IntArray, y: IntArray, w: int, h: int, rect: IntArray) -> BoolArray:
+    """Vectorized pygame.Rect.colliderect of many players against one rect
+
+    Args:
+        x, y (IntArray): players' top left corners
+        w, h (int): players' size
+        rect (IntArray): left, top, width, height of the other rect
+
+    Returns:
+        BoolArray: True where a player overlaps the rect
+    """
+    hit: BoolArray = ((x < rect[0] + rect[2]) & (x + w > rect[0])
+                      & (y < rect[1] + rect[3]) & (y + h > rect[1]))
+    return hit
+
+
+def observe(x: IntArray, y: IntArray, vx: IntArray, vy: FloatArray,
+            flags: tuple[BoolArray, BoolArray, BoolArray, BoolArray],
+            size: tuple[int, int], colliders: IntArray,
+            hazards: IntArray | None = None) -> FloatArray:
+    """Builds observations for many players
+
+    Args:
+        x, y (IntArray): player positions
+        vx (IntArray): horizontal distance moved in the last step
+        vy (FloatArray): jump velocities
+        flags (tuple[BoolArray, ...]): on_ground, can_wall_jump, touching_left_wall and
+                                       touching_right_wall
+        size (tuple[int, int]): player width and height
+        colliders (IntArray): (M, 4) level colliders, moving platforms included
+        hazards (IntArray | None): (H, 4) hazards and enemies, None if there are none
+
+    Returns:
+        FloatArray: (N, OBSERVATION_SIZE) observations
+    """
+    count = x.shape[0]
+    obs = np.zeros((count, OBSERVATION_SIZE), dtype=np.float64)
+    obs[:, 0] = x
+    obs[:, 1] = y
+    obs[:, 2] = vx
+    obs[:, 3] = vy
+    for index, flag in enumerate(flags):
+        obs[:, 4 + index] = flag
+
+    start = 8
+    for rects, nearby in ((colliders, NEARBY_COLLIDERS), (hazards, NEARBY_HAZARDS)):
+        if rects is not None and rects.shape[0]:
+            picked = _nearest(x, y, size, rects, nearby)
+            obs[:, start:start + picked.shape[1]] = picked
+        start += 4 * nearby
+    return obs
+
+
+def _nearest(x: IntArray, y: IntArray, size: tuple[int, int], rects: IntArray,
+             nearby: int) -> IntArray:
+    """The nearby rects closest to every player, relative to the player, flattened
+    """
+    count = x.shape[0]
+    # distance from the player's center to the closest point of every rect
+    center_x = (x + size[0] / 2.0)[:, None]
+    center_y = (y + size[1] / 2.0)[:, None]
+    left, top = rects[:, 0], rects[:, 1]
+    right, bottom = left + rects[:, 2], top + rects[:, 3]
+    dx = np.maximum(np.maximum(left - center_x, center_x - right), 0.0)
+    dy = np.maximum(np.maximum(top - center_y, center_y - bottom), 0.0)
+    nearest = np.argsort(dx * dx + dy * dy, axis=1, kind="stable")[:, :nearby]
+
+    picked = rects[nearest]  # (N, K, 4)
+    picked[:, :, 0] -= x[:, None]
+    picked[:, :, 1] -= y[:, None]
+    flat: IntArray = picked.reshape(count, -1)
+    return flat
+
+
+def _goal_distance(x: IntArray, y: IntArray, size: tuple[int, int],
+                   goal: IntArray) -> FloatArray:
+    """Distance from players' centers to the goal's center
+    """
+    goal_x = goal[0] + goal[2] / 2.0
+    goal_y = goal[1] + goal[3] / 2.0
+    distance: FloatArray = np.hypot(x + size[0] / 2.0 - goal_x, y + size[1] / 2.0 - goal_y)
+    return distance
+
+
+def _reward(before: FloatArray, after: FloatArray,
+            won: BoolArray, fell: BoolArray) -> FloatArray:
+    """Rewards progress toward the goal plus the win or fall outcome
+    """
+    return ((before - after) * DISTANCE_REWARD
+            + np.where(won, WIN_REWARD, 0.0) + np.where(fell, FALL_REWARD, 0.0))
+
+
+class PlatformerEnv:
+    """Single environment that runs the real Player.update through a Simulation
+    """
+
+    def __init__(self, max_steps: int = 1800) -> None:
+        """Initializes the environment, call reset before step
+
+        Args:
+            max_steps (int): steps before an attempt is cut off
+        """
+        self.simulation: Simulation = Simulation()
+        self.max_steps: int = max_steps
+        self.steps: int = 0
+        self._keys: MaskKeys = MaskKeys()
+        self._vx: int = 0
+        self._colliders: IntArray = rect_array([])
+
+    def reset(self, level: int) -> FloatArray:
+        """Starts a new attempt
+
+        Args:
+            level (int): level number to play
+
+        Returns:
+            FloatArray: the first observation
+        """
+        if not self.simulation.level_changer(level):
+            raise ValueError(f"level {level} does not exist")
+        self.simulation.reset()
+        self._colliders = rect_array(self.simulation.objects)
+        self._vx = 0
+        self.steps = 0
+        return self._observe()
+
+    def step(self, action: int) -> tuple[FloatArray, float, bool, dict[str, Any]]:
+        """Plays one frame
+
+        Args:
+            action (int): input bitmask
+
+        Returns:
+            tuple: observation, reward, done and an info dict with "won" set to the
+                   outcome once the attempt ended
+        """
+        player = self.simulation.player
+        size = (player.rect.w, player.rect.h)
+        goal = rect_array([self.simulation.goal])[0]
+        before = _goal_distance(np.array([player.x]), np.array([player.y]), size, goal)
+
+        self._keys.mask = action
+        old_x = player.x
+        self.simulation.step(self._keys)
+        self._vx = player.x - old_x
+        self.steps += 1
+
+        outcome = self.simulation.outcome()
+        after = _goal_distance(np.array([player.x]), np.array([player.y]), size, goal)
+        reward = _reward(before, after, np.array([outcome is True]), np.array([outcome is False]))
+        done = outcome is not None or self.steps >= self.max_steps
+        return self._observe(), float(reward[0]), done, {"won": outcome}
+
+    def _observe(self) -> FloatArray:
+        simulation = self.simulation
+        player = simulation.player
+        flags = (np.array([player.on_ground]), np.array([player.can_wall_jump]),
+                 np.array([player.touching_left_wall]), np.array([player.touching_right_wall]))
+        colliders = self._colliders
+        if simulation.platforms:
+            colliders = np.concatenate(
+                (colliders, rect_array(platform.rect for platform in simulation.platforms)))
+        hazards = None
+        entities = simulation.entities
+        if entities:
+            count = entities.count
+            deadly = entities.kind[:count] != COLLECTIBLE
+            hazards = np.stack((entities.x[:count], entities.y[:count], entities.w[:count],
+                                entities.h[:count]), axis=1)[deadly].astype(np.int64)
+        return observe(np.array([player.x]), np.array([player.y]), np.array([self._vx]),
+                       np.array([player.jump_velocity]), flags,
+                       (player.rect.w, player.rect.h), colliders, hazards).reshape(-1)
+
+
+class VectorPlatformerEnv:
+    """Many environments on one level stepped together with array operations.
+    The physics follow Player.update exactly, including the collider order.
+    Finished environments are reset automatically.
+    """
+
+    def __init__(self, num_envs: int, max_steps: int = 1800,
+                 template: Player | None = None,
+                 strategy: MovementStrategy | None = None,
+                 fixed_point: bool = False) -> None:
+        """Allocates the state arrays, call reset before step
+
+        Args:
+            num_envs (int): number of environments
+            max_steps (int): steps before an attempt is cut off
+            template (Player | None): player whose size and tuning constants are used
+            strategy (MovementStrategy | None): horizontal movement of every
+                                                environment, the template's if None
+            fixed_point (bool): run the vertical motion in sub-pixel ints like
+                                FixedPointPlayer instead of floats like Player
+        """
+        if num_envs < 1:
+            raise ValueError("num_envs must be at least 1")
+        template = template if template is not None else Player()
+        self.num_envs: int = num_envs
+        self.max_steps: int = max_steps
+        self.size: tuple[int, int] = (template.rect.w, template.rect.h)
+        self.strategy: MovementStrategy = (strategy if strategy is not None
+                                           else template.movement_strategy)
+        self.jump_speed: float = template.jump_speed
+        self.fall_speed: float = template.fall_speed
+        self.wall_jump_speed: float = template.wall_jump_speed
+        self.fixed_point: bool = fixed_point
+        self.tuning: FixedTuning = FixedTuning.from_player(template)
+
+        self.x: IntArray = np.zeros(num_envs, dtype=np.int64)
+        self.y: IntArray = np.zeros(num_envs, dtype=np.int64)
+        self.vx: IntArray = np.zeros(num_envs, dtype=np.int64)
+        self.move_speeds: IntArray = np.full(num_envs, template.move_speed, dtype=np.int64)
+        # velocity the strategy asked for last frame, before collisions
+        self.move_velocity: IntArray = np.zeros(num_envs, dtype=np.int64)
+        self.vy: FloatArray = np.zeros(num_envs, dtype=np.float64)
+        # fixed point mode only: y and vy in sub-pixels
+        self.sub_y: IntArray = np.zeros(num_envs, dtype=np.int64)
+        self.vy_fixed: IntArray = np.zeros(num_envs, dtype=np.int64)
+        self.on_ground: BoolArray = np.zeros(num_envs, dtype=np.bool_)
+        self.can_wall_jump: BoolArray = np.ones(num_envs, dtype=np.bool_)
+        self.touching_left_wall: BoolArray = np.zeros(num_envs, dtype=np.bool_)
+        self.touching_right_wall: BoolArray = np.zeros(num_envs, dtype=np.bool_)
+        self.steps: IntArray = np.zeros(num_envs, dtype=np.int64)
+
+        self.level: int = 0
+        self.start: tuple[int, int] = (0, 0)
+        self.colliders: IntArray = rect_array([])
+        self.goal: IntArray = np.zeros(4, dtype=np.int64)
+        self.floor: IntArray = np.zeros(4, dtype=np.int64)
+
+    def reset(self, level: int) -> FloatArray:
+        """Starts every environment on a level
+
+        Args:
+            level (int): level number to play
+
+        Returns:
+            FloatArray: (num_envs, OBSERVATION_SIZE) observations
+        """
+        simulation = Simulation()
+        if not simulation.level_changer(level):
+            raise ValueError(f"level {level} does not exist")
+        if simulation.platforms or simulation.entities:
+            raise ValueError(f"level {level} has moving platforms or entities, "
+                             "use PlatformerEnv")
+        self.level = level
+        self.start = (simulation.start_pos[0], simulation.start_pos[1])
+        self.colliders = rect_array(simulation.objects)
+        self.goal = rect_array([simulation.goal])[0]
+        self.floor = rect_array([simulation.floor])[0]
+        self._reset_where(np.ones(self.num_envs, dtype=np.bool_))
+        return self.observe()
+
+    def _reset_where(self, mask: BoolArray) -> None:
+        """Puts the masked environments back on the start position, like Player.reposition
+        """
+        self.x[mask] = self.start[0]
+        self.y[mask] = self.start[1]
+        self.vx[mask] = 0
+        self.move_velocity[mask] = 0
+        self.vy[mask] = 0.0
+        self.sub_y[mask] = self.start[1] << SUBPIXEL_BITS
+        self.vy_fixed[mask] = 0
+        self.on_ground[mask] = False
+        self.touching_left_wall[mask] = False
+        self.touching_right_wall[mask] = False
+        self.can_wall_jump[mask] = True
+        self.steps[mask] = 0
+
+    def observe(self) -> FloatArray:
+        """Observations of every environment
+
+        Returns:
+            FloatArray: (num_envs, OBSERVATION_SIZE) observations
+        """
+        flags = (self.on_ground, self.can_wall_jump,
+                 self.touching_left_wall, self.touching_right_wall)
+        return observe(self.x, self.y, self.vx, self.vertical_velocity(), flags, self.size,
+                       self.colliders)
+
+    def vertical_velocity(self) -> FloatArray:
+        """Jump velocity of every environment in pixels, whichever mode is running
+
+        Returns:
+            FloatArray: jump velocity per environment
+        """
+        if self.fixed_point:
+            velocity: FloatArray = self.vy_fixed / SUBPIXELS
+            return velocity
+        return self.vy
+
+    def horizontal_velocity(self, actions: IntArray) -> IntArray:
+        """The movement strategy's velocity for every environment in one batch call
+        """
+        velocity = self.strategy.get_horizontal_velocities(actions, self.move_speeds,
+                                                           self.move_velocity)
+        self.move_velocity[:] = velocity
+        return velocity
+
+    def physics_step(self, actions: IntArray) -> None:
+        """Player.update for every environment
+
+        Args:
+            actions (IntArray): input bitmask per environment
+        """
+        w, h = self.size
+        x, y = self.x, self.y
+        vy: npt.NDArray[Any]
+        if self.fixed_point:
+            vy = self.vy_fixed
+            jump_speed: float = self.tuning.jump
+            wall_jump_speed: float = self.tuning.wall_jump
+        else:
+            vy = self.vy
+            jump_speed = self.jump_speed
+            wall_jump_speed = self.wall_jump_speed
+
+        # horizontal movement and collisions
+        old_x = x.copy()
+        velocity = self.horizontal_velocity(actions)
+        x += velocity
+        self.touching_left_wall[:] = False
+        self.touching_right_wall[:] = False
+        for rect in self.colliders:
+            hit = collides(x, y, w, h, rect)
+            right = hit & (velocity > 0)
+            left = hit & (velocity < 0)
+            x[right] = rect[0] - w
+            x[left] = rect[0] + rect[2]
+            self.touching_right_wall |= right
+            self.touching_left_wall |= left
+
+        # jump, the ground jump takes priority over the wall jump
+        jump = (actions & INPUT_JUMP) != 0
+        ground_jump = jump & self.on_ground
+        wall_jump = (jump & ~self.on_ground & self.can_wall_jump
+                     & (self.touching_left_wall | self.touching_right_wall))
+        vy[ground_jump] = -jump_speed
+        vy[wall_jump] = -wall_jump_speed
+        self.on_ground[ground_jump] = False
+        self.can_wall_jump[ground_jump] = True
+        self.can_wall_jump[wall_jump] = False
+
+        if self.fixed_point:
+            # gravity in sub-pixels, the remainder carries over
+            self.vy_fixed += self.tuning.fall
+            self.sub_y += self.vy_fixed
+            np.right_shift(self.sub_y, SUBPIXEL_BITS, out=y)
+        else:
+            # gravity, int() truncates toward zero
+            vy += self.fall_speed
+            y += np.trunc(vy).astype(np.int64)
+
+        # vertical collisions
+        self.on_ground[:] = False
+        snapped = np.zeros(self.num_envs, dtype=np.bool_)
+        for rect in self.colliders:
+            hit = collides(x, y, w, h, rect)
+            down = hit & (vy > 0)
+            up = hit & (vy < 0)
+            y[down] = rect[1] - h
+            y[up] = rect[1] + rect[3]
+            moved = down | up
+            vy[moved] = 0
+            snapped |= moved
+            self.on_ground |= down
+            self.can_wall_jump |= down
+        if self.fixed_point:
+            # a snap to a platform clears the sub-pixel remainder
+            np.copyto(self.sub_y, y << SUBPIXEL_BITS, where=snapped)
+
+        np.subtract(x, old_x, out=self.vx)
+
+    def step(self, actions: IntArray) -> tuple[FloatArray, FloatArray, BoolArray, dict[str, Any]]:
+        """Plays one frame in every environment
+
+        Args:
+            actions (IntArray): input bitmask per environment
+
+        Returns:
+            tuple: observations, rewards, dones and an info dict holding "won" and
+                   "fell" arrays plus "final_x"/"final_y" positions before auto reset
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        before = _goal_distance(self.x, self.y, self.size, self.goal)
+        self.physics_step(actions)
+        self.steps += 1
+
+        w, h = self.size
+        # the floor first, like Simulation.outcome
+        fell = collides(self.x, self.y, w, h, self.floor)
+        won = ~fell & collides(self.x, self.y, w, h, self.goal)
+        after = _goal_distance(self.x, self.y, self.size, self.goal)
+        rewards = _reward(before, after, won, fell)
+        dones = won | fell | (self.steps >= self.max_steps)
+
+        info: dict[str, Any] = {"won": won, "fell": fell,
+                                "final_x": self.x.copy(), "final_y": self.y.copy()}
+        if dones.any():
+            self._reset_where(dones)
+        return self.observe(), rewards, dones, info
@@ -0,0 +1,231 @@
+"""fixed_point.py
+
+Fixed point physics. The float path adds fall_speed to jump_velocity every frame and
+moves the player by int(jump_velocity), so the sub-pixel part of the motion is thrown
+away and the result hangs on float accumulation. In fixed point mode the vertical
+position and velocity are ints in 1/SUBPIXELS of a pixel: the tuning constants are
+converted once, every frame is integer adds and a shift, and the sub-pixel remainder
+carries over to the next frame. Every value the float view exposes is a multiple of
+1/SUBPIXELS, so it is exact and runs are bit for bit the same on every machine.
+
+FixedPointPlayer is a drop in Player, VectorPlatformerEnv(fixed_point=True) is the
+batch version and compare() measures how far the two paths drift apart.
+"""
+
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+from typing import NamedTuple
+import argparse
+import random
+import pygame
+
+from input_state import KeyInput, MaskKeys
+from moving_platform import MovingPlatform
+from player import Player
+from sim_farm import level_table
+from simulation import Simulation
+
+SUBPIXEL_BITS: int = 8
+SUBPIXELS: int = 1 << SUBPIXEL_BITS
+
+
+def to_fixed(value: float) -> int:
+    """Converts pixels to sub-pixels, rounding to the nearest
+
+    Args:
+        value (float): distance or speed in pixels
+
+    Returns:
+        int: the same in 1/SUBPIXELS of a pixel
+    """
+    return round(value * SUBPIXELS)
+
+
+def to_float(value: int) -> float:
+    """Converts sub-pixels back to pixels, exactly
+
+    Args:
+        value (int): distance or speed in 1/SUBPIXELS of a pixel
+
+    Returns:
+        float: the same in pixels
+    """
+    return value / SUBPIXELS
+
+
+class FixedTuning(NamedTuple):
+    """A player's vertical tuning constants in sub-pixels per frame
+    """
+    jump: int
+    fall: int
+    wall_jump: int
+
+    @classmethod
+    def from_player(cls, player: Player) -> FixedTuning:
+        """Converts a player's jump_speed, fall_speed and wall_jump_speed
+
+        Args:
+            player (Player): player whose constants are converted
+
+        Returns:
+            FixedTuning: the converted constants
+        """
+        return cls(to_fixed(player.jump_speed), to_fixed(player.fall_speed),
+                   to_fixed(player.wall_jump_speed))
+
+
+class FixedPointPlayer(Player):
+    """Player whose vertical motion runs in fixed point. jump_velocity stays readable
+    as a float but always holds a multiple of 1/SUBPIXELS, and the saved state keeps
+    the sub-pixel position in the y float, so rollback and checksums keep working
+    """
+
+    __slots__ = ("tuning", "sub_y")
+
+    def __init__(self, x: int = 0, y: int = 0,
+                 chosen_color: tuple[int, int, int] = (0, 128, 255),
+                 rec_size: tuple[int, int] = (40, 40),
+                 movement_speed: int = 5,
+                 jump_speed: float = 15.0,
+                 fall_speed: float = 0.7,
+                 wall_bounce_speed: float = 13.0
+                 ) -> None:
+        """Initializes the player like Player and converts its tuning constants,
+        call retune after changing them
+        """
+        super().__init__(x, y, chosen_color, rec_size, movement_speed,
+                         jump_speed, fall_speed, wall_bounce_speed)
+        self.tuning: FixedTuning = FixedTuning.from_player(self)
+        self.sub_y: int = y << SUBPIXEL_BITS
+
+    def retune(self) -> None:
+        """Converts the tuning constants again after they were changed
+        """
+        self.tuning = FixedTuning.from_player(self)
+
+    def _sync(self) -> None:
+        """Drops the sub-pixel remainder if the rect was moved from outside
+        """
+        if self.sub_y >> SUBPIXEL_BITS != self.y:
+            self.sub_y = self.y << SUBPIXEL_BITS
+
+    def ride(self, platforms: Sequence[MovingPlatform]) -> None:
+        """Rides a moving platform like Player, the sub-pixel remainder moves along
+        """
+        y = self.y
+        super().ride(platforms)
+        self.sub_y += (self.y - y) << SUBPIXEL_BITS
+
+    def jump(self, keys: KeyInput) -> None:
+        """Handles jump logic with the converted speeds
+        """
+        if keys[pygame.K_SPACE]:
+            if self.on_ground:
+                self.jump_velocity = to_float(-self.tuning.jump)
+                self.on_ground = False
+                self.can_wall_jump = True
+            elif self.can_wall_jump and (self.touching_left_wall or self.touching_right_wall):
+                self.jump_velocity = to_float(-self.tuning.wall_jump)
+                self.can_wall_jump = False
+
+    def apply_gravity(self) -> None:
+        """Applies gravity in sub-pixels, the remainder is kept for the next frame
+        """
+        self._sync()
+        velocity = to_fixed(self.jump_velocity) + self.tuning.fall
+        self.jump_velocity = to_float(velocity)
+        self.sub_y += velocity
+        self.y = self.sub_y >> SUBPIXEL_BITS
+
+    def handle_vertical_collision(self, colliders: list[pygame.Rect]) -> None:
+        """Handles vertical collision like Player, a snap to a platform clears the
+        sub-pixel remainder
+        """
+        super().handle_vertical_collision(colliders)
+        self._sync()
+
+    def save_state(self, buffer: array[float], offset: int) -> None:
+        """Saves the state like Player, y includes the sub-pixel remainder
+        """
+        super().save_state(buffer, offset)
+        buffer[offset + 1] = to_float(self.sub_y)
+
+    def load_state(self, buffer: array[float], offset: int) -> None:
+        """Restores a state written by save_state
+        """
+        super().load_state(buffer, offset)
+        self.sub_y = to_fixed(buffer[offset + 1])
+        self.y = self.sub_y >> SUBPIXEL_BITS
+
+
+# ********* Compatibility harness **************
+class Divergence(NamedTuple):
+    """How far the fixed point path drifted from the float path on one run
+    """
+    frames: int  # frames both paths played
+    first_frame: int  # first frame the positions differ, -1 if they never did
+    max_dy: int  # largest vertical gap in pixels
+    max_dx: int  # largest horizontal gap in pixels
+    float_outcome: bool | None
+    fixed_outcome: bool | None
+
+
+def compare(level: int, inputs: Sequence[int]) -> Divergence:
+    """Plays the same inputs through a float Player and a FixedPointPlayer
+
+    Args:
+        level (int): level number to play
+        inputs (Sequence[int]): input bitmask per frame
+
+    Returns:
+        Divergence: the gap between the two runs
+    """
+    floating = Simulation(Player())
+    fixed = Simulation(FixedPointPlayer())
+    for simulation in (floating, fixed):
+        if not simulation.level_changer(level):
+            raise ValueError(f"level {level} does not exist")
+
+    keys = MaskKeys()
+    first_frame = -1
+    max_dx = max_dy = 0
+    frames = 0
+    for mask in inputs:
+        if floating.outcome() is not None or fixed.outcome() is not None:
+            break
+        keys.mask = mask
+        floating.step(keys)
+        fixed.step(keys)
+        dx = abs(floating.player.x - fixed.player.x)
+        dy = abs(floating.player.y - fixed.player.y)
+        if (dx or dy) and first_frame < 0:
+            first_frame = frames
+        max_dx = max(max_dx, dx)
+        max_dy = max(max_dy, dy)
+        frames += 1
+    return Divergence(frames, first_frame, max_dy, max_dx,
+                      floating.outcome(), fixed.outcome())
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description="float vs fixed point physics")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for level in sorted(level_table()):
+        results = [compare(level, bytes(rng.randrange(8) for _ in range(args.frames)))
+                   for _ in range(args.runs)]
+        diverged = [result for result in results if result.first_frame >= 0]
+        same_outcome = sum(result.float_outcome == result.fixed_outcome for result in results)
+        first = min((result.first_frame for result in diverged), default=-1)
+        print(f"level {level}: {len(diverged)}/{len(results)} runs diverge, "
+              f"first at frame {first}, max dy {max(r.max_dy for r in results)} px, "
+              f"same outcome {same_outcome}/{len(results)}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
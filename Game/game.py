@@ -4,12 +4,27 @@
 """
 
 from __future__ import annotations
-from typing import Any
+import argparse
+import os
 import sys
+import time
+import traceback
+from collections.abc import Callable
 import pygame
 from player import Player
-import Level_Objects
-from button import button
+from simulation import Simulation
+from input_state import InputSampler, ScriptedInput
+from ghost import GhostStore
+from entities import HAZARD, COLLECTIBLE, ENEMY
+from particles import PlayerEffects
+from profiling import PROFILE_DIR, PROFILERS, Profiler, make_profiler
+from metrics import EXPORT_INTERVAL, GameMetrics, MetricsExporter
+from replay import Replay
+from benchmarks import BENCHMARK_FRAMES, report, run_suite
+from capture import FORMATS, FrameCapture
+from assets import ASSETS, LEVEL_DRAWINGS, AssetManager
+from scenes import (SceneStack, MainMenuScene, LevelSelectScene, PlayScene, CelebrationScene,
+                    PostGameScene)
 
 WHITE: tuple[int, int, int] = (255, 255, 255)
 BLACK: tuple[int, int, int] = (0, 0, 0)
@@ -19,36 +34,127 @@ RED: tuple[int, int, int] = (255, 0, 0)
 BLUE: tuple[int, int, int] = (0, 0, 255)
 GREEN: tuple[int, int, int] = (0, 255, 0)
 
+ENTITY_COLORS: dict[int, tuple[int, int, int]] = {
+    HAZARD: RED,
+    COLLECTIBLE: GREEN,
+    ENEMY: (160, 32, 240),
+}
+
+# best run of every level, drawn as a ghost on later attempts
+GHOST_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ghosts")
+
 
 class game:
     """
         This class is the manager for all game play asspects
+        the simulation state lives in a Simulation, this class owns the window
     """
-    _instance: game | None = None
-    _initialized: bool = False
 
-    def __new__(cls, *args: Any, **kwargs: Any) -> game:
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    def __init__(self, inputs: InputSampler | None = None, fps: int = 60,
+                 save_attempts: bool = True) -> None:
+        """
+            inputs polls the devices once per frame, pass a ScriptedInput to
+            play without a keyboard or mouse, fps caps the frame rate, 0 for no cap,
+            save_attempts False writes no replays or ghosts, for playing a replay back
+        """
+        self.simulation: Simulation = Simulation(Player(200, 200))
+        self.ghosts: GhostStore = GhostStore(GHOST_DIR)
+        self.inputs: InputSampler = inputs if inputs is not None else InputSampler()
+        self.fps: int = fps
+        self.save_attempts: bool = save_attempts
+        # colliders and goal drawn once per level, see draw_platforms
+        self._static_layer: pygame.Surface | None = None
+        self.effects: PlayerEffects = PlayerEffects()
+
+        # images, fonts and glyph atlases, preloaded so no frame waits for the disk
+        self.assets: AssetManager = ASSETS
+        # every screen is made once, manager moves between them on the stack
+        self.scenes: SceneStack = SceneStack()
+        self.main_menu: MainMenuScene = MainMenuScene(self)
+        self.level_select: LevelSelectScene = LevelSelectScene(self)
+        self.play: PlayScene = PlayScene(self)
+        self.celebration: CelebrationScene = CelebrationScene(self)
+        self.post_game: PostGameScene = PostGameScene(self)
+        # called at the end of every frame of the main loop, for profilers and metrics
+        self.frame_hooks: list[Callable[[], None]] = []
+        # timings for the metrics exporter, written without blocking
+        self.metrics: GameMetrics = GameMetrics()
+
+        self.pygame_init()
+        # started after the window exists so images are converted to its format
+        self.assets.declare_directory(LEVEL_DRAWINGS)
+        self.assets.start()
+
+    @property
+    def player(self) -> Player:
+        """
+            the simulated player
+        """
+        return self.simulation.player
+
+    @player.setter
+    def player(self, new_player: Player) -> None:
+        self.simulation.player = new_player
 
-    def __init__(self) -> None:
-        if game._initialized:
-            return  # <-- PREVENTS double init safely
-        game._initialized = True
+    @property
+    def objects(self) -> list[pygame.Rect]:
+        """
+            colliders of the current level
+        """
+        return self.simulation.objects
 
-        self.player: Player = Player(200, 200)
-        self.objects: list[pygame.Rect]
+    @objects.setter
+    def objects(self, new_objects: list[pygame.Rect]) -> None:
+        self.simulation.objects = new_objects
+        self._static_layer = None
 
-        self.level: int = 0
-        self.start_pos: list[int] = [0, 0]
-        self.goal_pos: list[int] = [0, 0]
-        self.goal: pygame.Rect = pygame.Rect(self.goal_pos[0], self.goal_pos[1], 80, 80)
+    @property
+    def level(self) -> int:
+        """
+            number of the current level, 0 if none is loaded
+        """
+        return self.simulation.level
 
-        # floor object to prevent forever falling
-        self.floor: pygame.Rect = pygame.Rect(-800, 900, 2400, 80)
+    @level.setter
+    def level(self, new_level: int) -> None:
+        self.simulation.level = new_level
 
-        self.pygame_init()
+    @property
+    def start_pos(self) -> list[int]:
+        """
+            player spawn position of the current level
+        """
+        return self.simulation.start_pos
+
+    @property
+    def goal_pos(self) -> list[int]:
+        """
+            goal position of the current level
+        """
+        return self.simulation.goal_pos
+
+    @property
+    def goal(self) -> pygame.Rect:
+        """
+            goal rect of the current level
+        """
+        return self.simulation.goal
+
+    @goal.setter
+    def goal(self, new_goal: pygame.Rect) -> None:
+        self.simulation.goal = new_goal
+        self._static_layer = None
+
+    @property
+    def floor(self) -> pygame.Rect:
+        """
+            floor object to prevent forever falling
+        """
+        return self.simulation.floor
+
+    @floor.setter
+    def floor(self, new_floor: pygame.Rect) -> None:
+        self.simulation.floor = new_floor
 
     def pygame_init(self) -> None:
         """
@@ -81,246 +187,203 @@ class game:
         """
             Sets up the level for play
         """
-        self.objects = new_level_objects
-
-        self.start_pos = new_start_pos
-        self.player.x = self.start_pos[0]
-        self.player.y = self.start_pos[1]
-
-        self.goal_pos = new_goal_pos
-        self.goal.x = self.goal_pos[0]
-        self.goal.y = self.goal_pos[1]
+        self._static_layer = None
+        self.simulation.level_setup(new_level_objects, new_start_pos, new_goal_pos)
 
     def level_changer(self, new_level: int) -> bool:
         """
             This function is called when a new level is selected
             returns a True if level is selected, False if not
         """
-        match new_level:
-            case 1:
-                new_level_objects = Level_Objects.level_1_objects
-                new_start_pos = Level_Objects.level_1_start_pos
-                new_goal_pos = Level_Objects.level_1_goal_pos
-                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
-
-            case 2:
-                new_level_objects = Level_Objects.level_2_objects
-                new_start_pos = Level_Objects.level_2_start_pos
-                new_goal_pos = Level_Objects.level_2_goal_pos
-                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
-
-            case 3:
-                new_level_objects = Level_Objects.level_3_objects
-                new_start_pos = Level_Objects.level_3_start_pos
-                new_goal_pos = Level_Objects.level_3_goal_pos
-                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
-
-            case 4:
-                new_level_objects = Level_Objects.level_4_objects
-                new_start_pos = Level_Objects.level_4_start_pos
-                new_goal_pos = Level_Objects.level_4_goal_pos
-                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
-
-            case 5:
-                new_level_objects = Level_Objects.level_5_objects
-                new_start_pos = Level_Objects.level_5_start_pos
-                new_goal_pos = Level_Objects.level_5_goal_pos
-                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
-
-            case 6:
-                new_level_objects = Level_Objects.level_6_objects
-                new_start_pos = Level_Objects.level_6_start_pos
-                new_goal_pos = Level_Objects.level_6_goal_pos
-                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
-
-            case _:  # should only happen if exiting to main menu
-                return False
-        self.level = new_level
-        self.player.jump_velocity = 0.0  # fixes error if player leaves map
-        return True
-
-    def level_select(self) -> bool:
-        """
-            creates a Level selection menu
-            returns true if level is selected
-            returns false for exit to main menu
-        """
-        first_loop = True
-        self.level = 0
-        buttons = Level_Objects.level_select_buttons
-        mouse_up_at_start = False
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.quit()
-                # makes sure the mouse is released before starting level slect
-                if event.type == pygame.MOUSEBUTTONUP:
-                    if event.type == 1026:
-                        mouse_up_at_start = True
-
-            self.screen.fill(WHITE)
-
-            if not first_loop and mouse_up_at_start:
-                for index, button_object in enumerate(buttons):
-                    button_object.draw_button(self.screen)
-                    if button_object.button_clicked():
-                        if index == 6:  # exit to main menu
-                            return False
-                        return self.level_changer(index + 1)
-            else:
-                first_loop = False
-            pygame.display.flip()
-            self.clock.tick(60)
-
-    def post_game_menu(self, win: bool) -> int:
+        self._static_layer = None
+        started = time.perf_counter()
+        loaded = self.simulation.level_changer(new_level)
+        if loaded:
+            self.metrics.load_time.record(time.perf_counter() - started)
+        return loaded
+
+    def draw_static_layer(self) -> pygame.Surface:
         """
-            displayed after game
-            one display for faild and 1 for win
-            returns 0 = next level, 1 = level select, 2 = main menu, 3 = retry
+            draws the colliders and the goal of the current level onto a see
+            through layer the size of the screen
         """
-        option_1 = pygame.Rect(81, 241, 160, 160)  # option 1
-        option_2 = pygame.Rect(321, 241, 160, 160)  # option 2
-        option_3 = pygame.Rect(561, 241, 160, 160)  # option 3
-
-        if win:  # creates button for next level
-            button_1 = button(option_1, "Next Level", BLACK, GRAY, 36)
-        else:  # creates button for retry level
-            button_1 = button(option_1, "Retry Level", BLACK, GRAY, 36)
-
-        button_2 = button(option_2, "Select Level", BLACK, GRAY, 36)
-        button_3 = button(option_3, "Main Menu", BLACK, GRAY, 36)
-        text_options = [button_1, button_2, button_3]
-        first_loop = True
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.quit()
-            self.screen.fill(WHITE)
-            if not first_loop:
-                for index, buttons in enumerate(text_options):
-                    buttons.draw_button(self.screen)
-                    if buttons.button_clicked():
-                        if not win and index == 0:
-                            return 3  # retuns 3 for retry level
-                        return index
-            pygame.display.flip()
-            self.clock.tick(60)
-            first_loop = False
-
-    def draw_platforms(self) -> None:
+        layer = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+        for platforms in self.objects:
+            pygame.draw.rect(layer, BLACK, platforms)
+        pygame.draw.rect(layer, (255, 246, 0), self.goal)
+        entities = self.simulation.entities
+        for index in (entities.kind[:len(entities)] == HAZARD).nonzero()[0].tolist():
+            self.draw_entity(layer, index)
+        return layer
+
+    def draw_entity(self, surface: pygame.Surface, index: int) -> None:
         """
-            This function draws all objects of the current level
+            draws one entity of the current level in the color of its kind
         """
-        for platforms in self.objects:
-            pygame.draw.rect(self.screen, BLACK, platforms)
-        pygame.draw.rect(self.screen, (255, 246, 0), self.goal)
+        entities = self.simulation.entities
+        pygame.draw.rect(surface, ENTITY_COLORS[int(entities.kind[index])],
+                         (int(entities.x[index]), int(entities.y[index]),
+                          int(entities.w[index]), int(entities.h[index])))
 
-    def Game_play(self) -> int:
+    def draw_platforms(self) -> None:
         """
-            this function is the main game play loop
-            returns 0 = next level, 1 = level select, 2 = main menu, 3 = retry
+            This function draws all objects of the current level
+            the static ones come from a cached layer that is only redrawn when the
+            level changes, moving platforms, enemies and collectibles are drawn on
+            top of it every frame
         """
-        win = False
-        running = True
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-            if self.player.rect.colliderect(self.goal):  # detects a win
-                running = False
-                win = True
-            if self.player.rect.colliderect(self.floor):
-                running = False
-                win = False
-
-            # get player input
-            keys = pygame.key.get_pressed()
-            self.player.update(keys, self.objects)
-
-            self.screen.fill(WHITE)
-
-            # draw rects
-            self.draw_platforms()
-
-            # draw player
-            self.player.draw(self.screen)
-
-            # update screen
-            pygame.display.flip()
-            self.clock.tick(60)
-        return self.post_game_menu(win)
-
-    def main_menu(self) -> int:
+        if self._static_layer is None:
+            self._static_layer = self.draw_static_layer()
+        self.screen.blit(self._static_layer, (0, 0))
+        for platform in self.simulation.platforms:
+            pygame.draw.rect(self.screen, BLUE, platform.rect)
+        entities = self.simulation.entities
+        if not len(entities):
+            return
+        visible = entities.visible()
+        for index in visible[entities.kind[visible] != HAZARD].tolist():
+            self.draw_entity(self.screen, index)
+
+    def manager(self, level: int | None = None, frames: int | None = None) -> None:
         """
-            This Function is the first screen the player sees
-            it has options for level select and quit
-
-            it returns an int value according to the option selected
-            0 = quit , 1 = level selct
+            This function is the main loop of the game, every frame it samples the
+            input once, updates the top scene, applies the scene changes the update
+            asked for and draws the scene on top. Closing the window or leaving the
+            main menu quits. level starts an attempt at a level instead of the main
+            menu, frames quits after that many frames and prints how long they took
         """
-        ls_rect = pygame.Rect(161, 161, 480, 160)  # level select
-        exit_rect = pygame.Rect(161, 401, 480, 160)  # exit
-
-        button_ls = button(ls_rect, "Level Select", BLACK, GRAY, 36)
-        button_exit = button(exit_rect, "Exit", BLACK, RED, 36)
+        scenes = self.scenes
+        scenes.push(self.main_menu)
+        if level is not None:
+            if not self.level_changer(level):
+                raise ValueError(f"level {level} does not exist")
+            scenes.push(self.play)
+        scenes.apply()
+        started = time.perf_counter()
+        played = 0
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.quit()
-
-            self.screen.fill(WHITE)
-
-            button_ls.draw_button(self.screen)
-            button_exit.draw_button(self.screen)
-
-            if button_ls.button_clicked():
-                return 1
-            elif button_exit.button_clicked():
-                return 0
+            inputs = self.inputs.sample()
+            sampled = time.perf_counter()
+            scenes.top.update(inputs)
+            scenes.apply()
+            if inputs.quit or not scenes:
+                self.quit()
+                return
 
+            scenes.top.draw()
             pygame.display.flip()
-            self.clock.tick(60)
-
-    def manager(self) -> None:
-        """
-            This function is the compleat manager for all other functions in this class
-        """
-        option = self.main_menu()
-        while True:  # loops untill player decieds to exit
-            # exit
-            if option == 0:
+            self.metrics.displayed(sampled)
+            self.clock.tick(self.fps)
+            for hook in self.frame_hooks:
+                hook()
+
+            played += 1
+            if played == frames:
+                elapsed = time.perf_counter() - started
+                print(f"{played} frames in {elapsed:.3f} s, "
+                      f"{elapsed / played * 1000:.3f} ms per frame", file=sys.stderr)
                 self.quit()
+                return
 
-            # level select
-            elif option == 1 or option == 3:
-                if self.level_select():
-                    option = self.Game_play() + 2
-                    # 2 = next level, 3 = level select, 4 = main menu, 5 = retry
-                else:
-                    option = self.main_menu()
 
-            # next level
-            elif option == 2:
-                self.level_changer(self.level + 1)
-                option = self.Game_play() + 2
-
-            # main menu
-            elif option == 4:
-                option = self.main_menu()
-
-            # retry
-            elif option == 5:
-                self.level_changer(self.level)
-                option = self.Game_play() + 2
-
-
-def main() -> None:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+        reads the command line, GAME_PROFILE, GAME_PROFILE_DIR, GAME_METRICS_FILE
+        and GAME_METRICS_PORT give the defaults of the flags of the same names
+    """
+    parser = argparse.ArgumentParser(description="2D platformer")
+    parser.add_argument("--level", type=int,
+                        help="start an attempt at this level instead of the main menu")
+    parser.add_argument("--frames", type=int,
+                        help="quit after this many frames and print how long they took")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window, needs --frames or --replay")
+    parser.add_argument("--replay", help="play the inputs of a replay file on its level")
+    parser.add_argument("--fps", type=int, default=60, help="frame rate cap, 0 for none")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="run the benchmark suite without a window and exit, --frames "
+                             "sets the frames per measurement")
+    parser.add_argument("--profile", choices=sorted(PROFILERS),
+                        default=os.environ.get("GAME_PROFILE") or None,
+                        help="profile the session, the results are written on exit")
+    parser.add_argument("--profile-dir", default=os.environ.get("GAME_PROFILE_DIR", PROFILE_DIR),
+                        help="directory the profile files are written to")
+    parser.add_argument("--metrics-file", default=os.environ.get("GAME_METRICS_FILE") or None,
+                        help="file the Prometheus metrics are rewritten to")
+    port = os.environ.get("GAME_METRICS_PORT")
+    parser.add_argument("--metrics-port", type=int, default=int(port) if port else None,
+                        help="serve the Prometheus metrics on localhost:PORT/metrics")
+    parser.add_argument("--metrics-interval", type=float, default=EXPORT_INTERVAL,
+                        help="seconds between metrics exports")
+    parser.add_argument("--capture", metavar="DIR",
+                        help="record every displayed frame into this directory")
+    parser.add_argument("--capture-format", choices=FORMATS, default="png",
+                        help="png for a file per frame, raw for one rgb24 video stream")
+    args = parser.parse_args(argv)
+    if args.headless and args.frames is None and args.replay is None:
+        parser.error("--headless needs --frames or --replay, nothing would end the run")
+    if args.frames is not None and args.frames < 1:
+        parser.error("--frames must be at least 1")
+    if args.fps < 0:
+        parser.error("--fps must not be negative")
+    return args
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+        runs the game, optionally under a profiler, exporting metrics and capturing
+        frames, argv
+        defaults to the command line
+    """
+    args = parse_args(argv)
+    if args.headless or args.benchmark:
+        # SDL reads these when the display starts, the dummy drivers need no screen
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    profiler: Profiler | None = None
+    exporter: MetricsExporter | None = None
+    capture: FrameCapture | None = None
+    if args.profile is not None:
+        profiler = make_profiler(args.profile, args.profile_dir)
+        profiler.start()
     try:
-        game_manager = game()
-        game_manager.manager()
+        inputs: InputSampler | None = None
+        level: int | None = args.level
+        if args.replay is not None:
+            replay = Replay.load(args.replay)
+            inputs = ScriptedInput(replay.inputs)
+            level = replay.level
+        # playing a replay back must not overwrite it with a new recording
+        game_manager = game(inputs, args.fps, save_attempts=args.replay is None)
+        if profiler is not None:
+            game_manager.frame_hooks.append(profiler.frame)
+        if args.metrics_file is not None or args.metrics_port is not None:
+            exporter = MetricsExporter(game_manager.metrics, args.metrics_file,
+                                       args.metrics_port, args.metrics_interval)
+            exporter.start()
+        if args.capture is not None:
+            capture = FrameCapture(game_manager.screen, args.capture, args.capture_format)
+            capture.start()
+            game_manager.frame_hooks.append(capture.frame)
+        if args.benchmark:
+            print(report(run_suite(game_manager, args.frames or BENCHMARK_FRAMES)))
+        else:
+            game_manager.manager(level, args.frames)
     except Exception as e:
         print("CRASH:", e)
+        traceback.print_exc()
+    finally:
+        # quitting raises SystemExit, the profile is written on the way out
+        if exporter is not None:
+            exporter.stop()
+        if capture is not None:
+            capture.stop()
+            print(f"captured {capture.written} frames to {capture.directory}, "
+                  f"dropped {capture.dropped}", file=sys.stderr)
+        if profiler is not None:
+            profiler.stop()
+            for path in profiler.write():
+                print("profile written to", path, file=sys.stderr)
 
 
 if __name__ == "__main__":  # pragma no cover
@@ -0,0 +1,310 @@
+"""ghost.py
+
+Ghost runs: the player's position is recorded every frame of an attempt and the best
+(fewest frames) winning run of each level is saved, then drawn as a translucent ghost
+on later attempts.
+
+A trajectory file is a small header followed by position deltas. Each frame stores
+(dx, dy) as zigzag varints and repeated deltas collapse into one record with a run
+length, so a walk or a rest costs a few bytes no matter how long it lasts. Loading
+reads only the header, playback then reads one record at a time, every frame is O(1)
+and nothing is kept decoded. A record cut off by the end of the data, or records that
+do not end exactly on the header's frame count, mark the ghost corrupt while it plays
+and the play scene drops it along with its file.
+
+    header:  b"GHST", version, level, frames, start x, start y   (varints)
+    record:  zigzag(dx), zigzag(dy) << 1 | has_run, [run length - 2]
+"""
+
+from __future__ import annotations
+import os
+import pygame
+
+MAGIC: bytes = b"GHST"
+VERSION: int = 1
+
+GHOST_COLOR: tuple[int, int, int] = (0, 128, 255)
+GHOST_ALPHA: int = 90
+
+
+# ********* Varint helpers **************
+def zigzag(value: int) -> int:
+    """Maps signed ints onto unsigned ones so small negatives stay small: 0, -1, 1, -2 ...
+    """
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value: int) -> int:
+    """Inverse of zigzag
+    """
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    """Appends an unsigned int using 7 bits per byte
+
+    Args:
+        out (bytearray): buffer to append to
+        value (int): unsigned int to write
+    """
+    if value < 0:
+        raise ValueError("varint must not be negative")
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Reads an unsigned int written by write_varint
+
+    Args:
+        data (bytes): encoded bytes
+        pos (int): index of the first byte
+
+    Returns:
+        tuple[int, int]: the value and the index after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+# ********* Recording **************
+class TrajectoryRecorder:
+    """Delta encodes the player's position frame by frame
+    """
+
+    __slots__ = ("start", "frames", "_last_x", "_last_y", "_body", "_dx", "_dy", "_run")
+
+    def __init__(self, x: int, y: int) -> None:
+        """Starts a recording
+
+        Args:
+            x (int): player's x position before the first frame
+            y (int): player's y position before the first frame
+        """
+        self.start: tuple[int, int] = (x, y)
+        self.frames: int = 0
+        self._last_x: int = x
+        self._last_y: int = y
+        self._body: bytearray = bytearray()
+        # delta of the pending run, plain ints so recording builds no tuples
+        self._dx: int = 0
+        self._dy: int = 0
+        self._run: int = 0
+
+    def record(self, x: int, y: int) -> None:
+        """Adds the player's position after one frame
+
+        Args:
+            x (int): player's x position
+            y (int): player's y position
+        """
+        dx = x - self._last_x
+        dy = y - self._last_y
+        self._last_x = x
+        self._last_y = y
+        self.frames += 1
+        if self._run and dx == self._dx and dy == self._dy:
+            self._run += 1
+            return
+        self._flush()
+        self._dx = dx
+        self._dy = dy
+        self._run = 1
+
+    def _flush(self) -> None:
+        """Writes the pending run of equal deltas
+        """
+        if not self._run:
+            return
+        body = self._body
+        write_varint(body, zigzag(self._dx))
+        has_run = 1 if self._run > 1 else 0
+        write_varint(body, zigzag(self._dy) << 1 | has_run)
+        if has_run:
+            write_varint(body, self._run - 2)
+        self._run = 0
+
+    def to_bytes(self, level: int) -> bytes:
+        """Encodes the whole recording
+
+        Args:
+            level (int): level the recording was made on
+
+        Returns:
+            bytes: the trajectory file contents
+        """
+        self._flush()
+        header = bytearray(MAGIC)
+        for value in (VERSION, level, self.frames, zigzag(self.start[0]), zigzag(self.start[1])):
+            write_varint(header, value)
+        return bytes(header + self._body)
+
+
+# ********* Playback **************
+class GhostPlayback:
+    """Plays a trajectory back one frame at a time
+    """
+
+    __slots__ = ("level", "frames", "frame", "x", "y", "corrupt",
+                 "_data", "_pos", "_dx", "_dy", "_remaining", "_surface")
+
+    def __init__(self, data: bytes) -> None:
+        """Reads the header of a trajectory, the records are decoded while playing
+
+        Args:
+            data (bytes): contents written by TrajectoryRecorder.to_bytes
+
+        Raises:
+            ValueError: if the data is not a trajectory of a known version
+        """
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a ghost trajectory")
+        pos = len(MAGIC)
+        version, pos = read_varint(data, pos)
+        if version != VERSION:
+            raise ValueError(f"unsupported ghost version {version}")
+        self.level: int
+        self.frames: int
+        self.level, pos = read_varint(data, pos)
+        self.frames, pos = read_varint(data, pos)
+        x, pos = read_varint(data, pos)
+        y, pos = read_varint(data, pos)
+        self.x: int = unzigzag(x)
+        self.y: int = unzigzag(y)
+        self.frame: int = 0
+        # set by advance when the records do not match the header, the ghost stops
+        self.corrupt: bool = False
+
+        self._data: bytes = data
+        self._pos: int = pos
+        self._dx: int = 0
+        self._dy: int = 0
+        self._remaining: int = 0
+        self._surface: pygame.Surface | None = None
+
+    @property
+    def finished(self) -> bool:
+        """Getter for finished flag
+
+        Returns:
+            bool: every recorded frame was played or the ghost turned out corrupt
+        """
+        return self.corrupt or self.frame >= self.frames
+
+    def advance(self) -> None:
+        """Moves the ghost forward one frame, it stays put once finished. A record cut
+        off by the end of the data, or data left over after the last frame, marks the
+        ghost corrupt
+        """
+        if self.finished:
+            return
+        if not self._remaining:
+            data = self._data
+            try:
+                dx, self._pos = read_varint(data, self._pos)
+                dy, self._pos = read_varint(data, self._pos)
+                self._remaining = 1
+                if dy & 1:
+                    run, self._pos = read_varint(data, self._pos)
+                    self._remaining = run + 2
+            except ValueError:
+                self.corrupt = True
+                return
+            self._dx = unzigzag(dx)
+            self._dy = unzigzag(dy >> 1)
+        self._remaining -= 1
+        self.x += self._dx
+        self.y += self._dy
+        self.frame += 1
+        if self.frame == self.frames and (self._remaining or self._pos != len(self._data)):
+            self.corrupt = True
+
+    def draw(self, surface: pygame.Surface,
+             size: tuple[int, int] = (40, 40)) -> None:  # pragma: no cover
+        """Draws the ghost as a translucent square
+
+        Args:
+            surface (pygame.Surface): The window/surface to draw the ghost on
+            size (tuple[int, int]): ghost size, the player's size
+        """
+        if self._surface is None or self._surface.get_size() != size:
+            self._surface = pygame.Surface(size)
+            self._surface.fill(GHOST_COLOR)
+            self._surface.set_alpha(GHOST_ALPHA)
+        surface.blit(self._surface, (self.x, self.y))
+
+
+# ********* Storage **************
+class GhostStore:
+    """Keeps the best run of every level as one file per level
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Initializes the store, the directory is made on the first save
+
+        Args:
+            directory (str): folder that holds the ghost files
+        """
+        self.directory: str = directory
+
+    def path(self, level: int) -> str:
+        """Path of a level's ghost file
+        """
+        return os.path.join(self.directory, f"level_{level}.ghost")
+
+    def load(self, level: int) -> GhostPlayback | None:
+        """Loads a level's best run
+
+        Args:
+            level (int): level number
+
+        Returns:
+            GhostPlayback | None: the best run, None if there is none or it is unreadable
+        """
+        try:
+            with open(self.path(level), "rb") as file:
+                return GhostPlayback(file.read())
+        except (OSError, ValueError):
+            return None
+
+    def discard(self, level: int) -> None:
+        """Deletes a level's ghost file, for a ghost that turned out corrupt
+
+        Args:
+            level (int): level number
+        """
+        try:
+            os.remove(self.path(level))
+        except FileNotFoundError:
+            pass
+
+    def save_if_best(self, level: int, recorder: TrajectoryRecorder) -> bool:
+        """Saves a winning run if it beats the stored one
+
+        Args:
+            level (int): level number
+            recorder (TrajectoryRecorder): the winning run
+
+        Returns:
+            bool: True if the run was saved
+        """
+        best = self.load(level)
+        if best is not None and best.frames <= recorder.frames:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.path(level) + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(recorder.to_bytes(level))
+        os.replace(temp_path, self.path(level))
+        return True
@@ -0,0 +1,236 @@
+"""input_state.py
+
+Input sampling. An InputSampler drains the event queue once per frame into an
+immutable InputState, and that one snapshot is handed to the buttons, Player.update and
+the movement strategies. Edges (a key or the mouse going down this frame) are worked
+out once against the previous snapshot, and a ScriptedInput can stand in for the
+devices when running without a window.
+
+Held keys and the mouse are followed through their events instead of being polled, so
+a frame allocates no pygame.key.ScancodeWrapper, and a frame where nothing changed
+reuses the previous snapshot.
+"""
+
+from __future__ import annotations
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Protocol
+import pygame
+
+# bits of an input bitmask, one bitmask describes the input of one frame
+INPUT_LEFT: int = 1
+INPUT_RIGHT: int = 2
+INPUT_JUMP: int = 4
+
+# INPUT_* bit of every key the player reads
+KEY_BITS: dict[int, int] = {
+    pygame.K_LEFT: INPUT_LEFT,
+    pygame.K_a: INPUT_LEFT,
+    pygame.K_RIGHT: INPUT_RIGHT,
+    pygame.K_d: INPUT_RIGHT,
+    pygame.K_SPACE: INPUT_JUMP,
+}
+
+
+class KeyInput(Protocol):
+    """Anything the player can read held keys from: pygame.key.ScancodeWrapper,
+    InputState or MaskKeys
+    """
+
+    def __getitem__(self, key: int) -> bool:
+        ...
+
+
+def mask_has_key(mask: int, key: int) -> bool:
+    """Returns True if the key is held according to an input bitmask, only the keys
+    the player reads are answered
+    """
+    if key == pygame.K_LEFT or key == pygame.K_a:
+        return bool(mask & INPUT_LEFT)
+    if key == pygame.K_RIGHT or key == pygame.K_d:
+        return bool(mask & INPUT_RIGHT)
+    if key == pygame.K_SPACE:
+        return bool(mask & INPUT_JUMP)
+    return False
+
+
+def keys_to_mask(keys: KeyInput) -> int:
+    """Turns held keys into an input bitmask
+
+    Args:
+        keys (KeyInput): Keyboard input for one frame
+
+    Returns:
+        int: INPUT_LEFT, INPUT_RIGHT and INPUT_JUMP bits
+    """
+    mask = 0
+    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        mask |= INPUT_LEFT
+    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        mask |= INPUT_RIGHT
+    if keys[pygame.K_SPACE]:
+        mask |= INPUT_JUMP
+    return mask
+
+
+class MaskKeys:
+    """Mutable stand in for pygame.key.ScancodeWrapper when input comes from a
+    bitmask, reused by the headless loops so they do not allocate per frame
+    """
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask: int = 0) -> None:
+        """Initializes the keys
+
+        Args:
+            mask (int): INPUT_LEFT, INPUT_RIGHT and INPUT_JUMP bits
+        """
+        self.mask: int = mask
+
+    def __getitem__(self, key: int) -> bool:
+        """Returns True if the key is held according to the mask
+        """
+        return mask_has_key(self.mask, key)
+
+
+@dataclass(frozen=True, slots=True)
+class InputState:
+    """Everything the game reads from the devices in one frame
+    """
+
+    mask: int = 0  # held INPUT_* bits
+    pressed: int = 0  # INPUT_* bits that went down this frame
+    released: int = 0  # INPUT_* bits that went up this frame
+    mouse_pos: tuple[int, int] = (0, 0)
+    mouse_down: bool = False  # left button held
+    clicked: bool = False  # left button went down this frame
+    quit: bool = False  # the window was closed
+
+    def __getitem__(self, key: int) -> bool:
+        """Returns True if the key is held, so an InputState can be passed anywhere
+        pygame.key.ScancodeWrapper was
+        """
+        return mask_has_key(self.mask, key)
+
+    def next(self, mask: int = 0, mouse_pos: tuple[int, int] | None = None,
+             mouse_down: bool = False, clicked: bool = False,
+             quit: bool = False) -> InputState:
+        """Builds the following frame's snapshot, with edges against this one
+
+        Args:
+            mask (int): held INPUT_* bits
+            mouse_pos (tuple[int, int] | None): cursor position, unchanged if None
+            mouse_down (bool): left button held
+            clicked (bool): left button went down during the frame
+            quit (bool): the window was closed
+
+        Returns:
+            InputState: the new snapshot, this one if nothing changed
+        """
+        if (mask == self.mask and mouse_down == self.mouse_down and not clicked
+                and quit == self.quit and not (self.pressed or self.released or self.clicked)
+                and (mouse_pos is None or mouse_pos == self.mouse_pos)):
+            return self
+        return InputState(mask, mask & ~self.mask, self.mask & ~mask,
+                          self.mouse_pos if mouse_pos is None else mouse_pos,
+                          mouse_down, clicked or (mouse_down and not self.mouse_down), quit)
+
+
+class InputSampler:
+    """Follows the devices through the event queue, drained once per frame
+    """
+
+    def __init__(self) -> None:
+        """Initializes the sampler, nothing is held before the first frame
+        """
+        self.state: InputState = InputState()
+        self._held: set[int] = set()  # keys from KEY_BITS that are down
+        self._mask: int = 0
+        self._mouse_pos: tuple[int, int] = (0, 0)
+        self._mouse_down: bool = False
+        # True once a scripted sampler ran out, its quit is not the player's
+        self.exhausted: bool = False
+
+    def sample(self) -> InputState:
+        """Drains the event queue
+
+        Returns:
+            InputState: this frame's snapshot, also kept in state
+        """
+        quit = False
+        clicked = False
+        keys_changed = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit = True
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                clicked = True
+            keys_changed = self._follow(event) or keys_changed
+
+        if keys_changed:
+            self._mask = 0
+            for key in self._held:
+                self._mask |= KEY_BITS[key]
+        self.state = self.state.next(self._mask, self._mouse_pos, self._mouse_down,
+                                     clicked, quit)
+        return self.state
+
+    def _follow(self, event: pygame.event.Event) -> bool:
+        """Updates the held keys and the mouse from one event
+
+        Returns:
+            bool: True if the held keys changed
+        """
+        kind = event.type
+        if kind == pygame.KEYDOWN or kind == pygame.KEYUP:
+            if event.key not in KEY_BITS:
+                return False
+            if kind == pygame.KEYDOWN:
+                self._held.add(event.key)
+            else:
+                self._held.discard(event.key)
+            return True
+        if kind == pygame.MOUSEMOTION:
+            self._mouse_pos = event.pos
+        elif kind == pygame.MOUSEBUTTONDOWN or kind == pygame.MOUSEBUTTONUP:
+            self._mouse_pos = event.pos
+            if event.button == 1:
+                self._mouse_down = kind == pygame.MOUSEBUTTONDOWN
+        elif kind == pygame.WINDOWFOCUSLOST:  # releases are not seen without focus
+            self._held.clear()
+            self._mouse_down = False
+            return True
+        return False
+
+
+class ScriptedInput(InputSampler):
+    """Plays back synthetic input instead of reading the devices, for headless runs.
+    The window counts as closed once the script runs out
+    """
+
+    def __init__(self, script: Iterable[int | InputState]) -> None:
+        """Initializes the script
+
+        Args:
+            script (Iterable[int | InputState]): one INPUT_* bitmask or full
+                                                  snapshot per frame
+        """
+        super().__init__()
+        self._script: Iterator[int | InputState] = iter(script)
+
+    def sample(self) -> InputState:
+        """Returns the next scripted frame, edges are filled in for bitmasks
+
+        Returns:
+            InputState: this frame's snapshot, also kept in state
+        """
+        frame = next(self._script, None)
+        if frame is None:
+            self.exhausted = True
+            self.state = self.state.next(self.state.mask, quit=True)
+        elif isinstance(frame, InputState):
+            self.state = frame
+        else:
+            self.state = self.state.next(frame)
+        return self.state
@@ -0,0 +1,222 @@
+"""jump_tables.py
+
+Precomputed jump arcs. With jump_speed, fall_speed and move_speed fixed, a jump is the
+same every time, so the vertical displacement and velocity of every frame after take
+off are simulated once, with the exact float steps Player uses, and cached by the
+physics constants. Bots and solvers then answer questions such as "can a jump from A
+land on platform B" with a binary search over the falling half of the arc and
+interval math over the horizontal offsets the player can reach, instead of stepping
+a Player.
+
+Frame t of an arc is the state after the t-th update, counting the take off update as
+frame 1. Horizontal motion is move_speed per frame held, so after t frames the player
+can be at any multiple of move_speed within t steps of the take off x.
+"""
+
+from __future__ import annotations
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple
+import pygame
+
+from player import Player
+
+# arcs are followed until the player is this far below the take off height
+MAX_DROP: int = 1000
+
+
+class JumpArc(NamedTuple):
+    """Vertical motion of one jump, index 0 is the take off position
+    """
+    dy: tuple[int, ...]  # displacement from the take off y, negative is up
+    velocity: tuple[float, ...]  # jump_velocity after each frame
+    apex_frame: int  # frame of the highest point
+
+    @property
+    def height(self) -> int:
+        """Getter for the jump height
+
+        Returns:
+            int: pixels between the take off y and the highest point
+        """
+        return -self.dy[self.apex_frame]
+
+    @property
+    def frames(self) -> int:
+        """Getter for the number of frames in the table
+
+        Returns:
+            int: last frame index
+        """
+        return len(self.dy) - 1
+
+    def fall_frame(self, drop: int) -> int | None:
+        """First frame after the apex that is at least drop pixels below take off
+
+        Args:
+            drop (int): pixels below the take off y, negative is above
+
+        Returns:
+            int | None: frame number, None if the arc never gets that low
+        """
+        # dy only grows after the apex, so the falling half is sorted
+        index = bisect_right(self.dy, drop - 1, lo=self.apex_frame)
+        return index if index < len(self.dy) else None
+
+
+@lru_cache(maxsize=64)
+def jump_arc(speed: float, fall_speed: float, max_drop: int = MAX_DROP) -> JumpArc:
+    """Simulates one jump with Player's float steps, cached per constants
+
+    Args:
+        speed (float): jump_speed or wall_jump_speed
+        fall_speed (float): gravity added every frame
+        max_drop (int): pixels below take off at which the table stops
+
+    Returns:
+        JumpArc: the tabulated jump
+    """
+    if fall_speed <= 0:
+        raise ValueError("fall_speed must be positive or the jump never comes down")
+    dy = [0]
+    velocities = [0.0]
+    velocity = -speed
+    y = 0
+    while y < max_drop:
+        velocity += fall_speed
+        y += int(velocity)
+        dy.append(y)
+        velocities.append(velocity)
+    apex = min(range(len(dy)), key=lambda frame: (dy[frame], frame))
+    return JumpArc(tuple(dy), tuple(velocities), apex)
+
+
+class Landing(NamedTuple):
+    """A way to land on a platform
+    """
+    frame: int  # frame the player lands on
+    dx: int  # horizontal offset at landing
+    x: int  # player's x after landing
+    y: int  # player's y after landing, on top of the platform
+
+
+class JumpTable:
+    """Normal and wall jump arcs of one set of physics constants
+    """
+
+    __slots__ = ("jump", "wall_jump", "move_speed")
+
+    def __init__(self, jump: JumpArc, wall_jump: JumpArc, move_speed: int) -> None:
+        """Initializes the table, use jump_table to share cached ones
+
+        Args:
+            jump (JumpArc): arc of a jump from the ground
+            wall_jump (JumpArc): arc of a jump off a wall
+            move_speed (int): horizontal pixels per frame
+        """
+        self.jump: JumpArc = jump
+        self.wall_jump: JumpArc = wall_jump
+        self.move_speed: int = move_speed
+
+    def horizontal_steps(self, left: int, right: int, x: int, frames: int) -> range:
+        """Move steps k (|k| <= frames) that leave a player at x + k * move_speed
+        strictly between left and right
+
+        Args:
+            left (int): x must be greater than this
+            right (int): x must be less than this
+            x (int): starting x
+            frames (int): frames available to move
+
+        Returns:
+            range: the usable k, empty if none
+        """
+        speed = self.move_speed
+        if speed == 0:
+            return range(0, 1) if left < x < right else range(0)
+        low = (left - x) // speed + 1
+        high = -((x - right) // speed) - 1  # ceil((right - x) / speed) - 1
+        return range(max(low, -frames), min(high, frames) + 1)
+
+    def can_land(self, start: tuple[int, int], size: tuple[int, int],
+                 platform: pygame.Rect, wall: bool = False) -> Landing | None:
+        """Checks if a jump from start can land on top of a platform. The player holds
+        still and then walks toward the landing spot for the last frames before it,
+        only the platform itself is checked for bumps on the way up
+
+        Args:
+            start (tuple[int, int]): player's top left when jumping
+            size (tuple[int, int]): player's width and height
+            platform (pygame.Rect): platform to land on
+            wall (bool): True for a wall jump, False for a jump from the ground
+
+        Returns:
+            Landing | None: the landing needing the least walking, None if unreachable
+        """
+        arc = self.wall_jump if wall else self.jump
+        x0, y0 = start
+        w, h = size
+        frame = arc.fall_frame(platform.top - y0 - h + 1)
+        if not frame:
+            return None
+        y_before = y0 + arc.dy[frame - 1]
+        y_after = y0 + arc.dy[frame]
+        # the bottom must cross the top this frame without going through the platform
+        if y_before + h > platform.top or y_after >= platform.bottom:
+            return None
+
+        steps = self.horizontal_steps(platform.left - w, platform.right, x0, frame)
+        for k in sorted(steps, key=abs):
+            if not self._bumps(arc, start, size, platform, frame, k):
+                return Landing(frame, k * self.move_speed, x0 + k * self.move_speed,
+                               platform.top - h)
+        return None
+
+    def _bumps(self, arc: JumpArc, start: tuple[int, int], size: tuple[int, int],
+               platform: pygame.Rect, frame: int, k: int) -> bool:
+        """True if walking k steps in the last frames hits the platform before landing
+        """
+        x0, y0 = start
+        w, h = size
+        first_move = frame - abs(k)
+        step = self.move_speed if k > 0 else -self.move_speed
+        for t in range(1, frame):
+            x = x0 + step * max(0, t - first_move)
+            if not (x < platform.right and x + w > platform.left):
+                continue
+            # Player checks walls at the old height and platforms at the new one
+            for y in (y0 + arc.dy[t - 1], y0 + arc.dy[t]):
+                if y < platform.bottom and y + h > platform.top:
+                    return True
+        return False
+
+
+@lru_cache(maxsize=64)
+def jump_table(jump_speed: float, fall_speed: float, wall_jump_speed: float,
+               move_speed: int) -> JumpTable:
+    """Jump table for a set of physics constants, built once per set
+
+    Args:
+        jump_speed (float): Player's jump speed
+        fall_speed (float): Player's fall speed
+        wall_jump_speed (float): Player's wall jump speed
+        move_speed (int): Player's movement speed
+
+    Returns:
+        JumpTable: the cached table
+    """
+    return JumpTable(jump_arc(jump_speed, fall_speed), jump_arc(wall_jump_speed, fall_speed),
+                     move_speed)
+
+
+def table_for(player: Player) -> JumpTable:
+    """Jump table for a player's current constants
+
+    Args:
+        player (Player): player whose constants are used
+
+    Returns:
+        JumpTable: the cached table
+    """
+    return jump_table(player.jump_speed, player.fall_speed, player.wall_jump_speed,
+                      player.move_speed)
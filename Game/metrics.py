@@ -0,0 +1,391 @@
+"""metrics.py
+
+Performance telemetry for long running sessions. The main loop only writes timings into
+preallocated ring buffers, one Series per measurement, which never blocks and never
+allocates. A MetricsExporter thread drains the series every interval into histograms
+and publishes them in the Prometheus text format, as a file rewritten atomically, on
+http://127.0.0.1:<port>/metrics, or both:
+
+    python game.py --metrics-file metrics.prom --metrics-port 9100
+
+or GAME_METRICS_FILE=metrics.prom python game.py.
+
+Histogram buckets are HDR style: every power of two is split into SUB_BUCKETS linear
+steps, so the error of a bucket is the same fraction of its value from 30 microseconds
+to 2 seconds.
+"""
+
+from __future__ import annotations
+import http.server
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+
+# linear steps per power of two
+SUB_BUCKETS: int = 4
+# smallest and largest bucket bound, in seconds, as powers of two
+LOWEST_EXPONENT: int = -15
+HIGHEST_EXPONENT: int = 1
+# samples a series holds before the oldest unread ones are overwritten
+SERIES_CAPACITY: int = 4096
+# seconds between exports
+EXPORT_INTERVAL: float = 5.0
+# weight of the newest frame in the smoothed frame time shown on the HUD
+FPS_SMOOTHING: float = 0.1
+
+
+def hdr_bounds(lowest: int = LOWEST_EXPONENT, highest: int = HIGHEST_EXPONENT,
+               steps: int = SUB_BUCKETS) -> tuple[float, ...]:
+    """Upper bounds of log-linear buckets
+
+    Args:
+        lowest (int): the first bound is 2 ** lowest
+        highest (int): the last bound is 2 ** highest
+        steps (int): linear steps per power of two
+
+    Returns:
+        tuple[float, ...]: increasing bounds
+    """
+    bounds = [math.ldexp(1.0, lowest)]
+    for exponent in range(lowest, highest):
+        base = math.ldexp(1.0, exponent)
+        bounds.extend(base + base * step / steps for step in range(1, steps + 1))
+    return tuple(bounds)
+
+
+BUCKET_BOUNDS: tuple[float, ...] = hdr_bounds()
+
+
+class Series:
+    """Ring buffer of samples with one writer, the main loop, and one reader, the
+    exporter. Writing is two stores, reading never locks the writer out
+    """
+
+    __slots__ = ("_samples", "written")
+
+    def __init__(self, capacity: int = SERIES_CAPACITY) -> None:
+        """Allocates the buffer once
+
+        Args:
+            capacity (int): samples kept before the oldest unread ones are overwritten
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._samples: array[float] = array("d", bytes(8 * capacity))
+        self.written: int = 0  # samples ever recorded
+
+    @property
+    def capacity(self) -> int:
+        """Getter for the size of the buffer
+
+        Returns:
+            int: samples kept
+        """
+        return len(self._samples)
+
+    def record(self, value: float) -> None:
+        """Adds a sample, called on the main loop
+
+        Args:
+            value (float): the sample, seconds for timings
+        """
+        self._samples[self.written % len(self._samples)] = value
+        self.written += 1
+
+    def read(self, since: int) -> tuple[list[float], int]:
+        """Samples recorded after a position, called by the reader
+
+        Args:
+            since (int): value of written at the last read
+
+        Returns:
+            tuple[list[float], int]: the samples still in the buffer, oldest first, and
+                                     how many were overwritten before they were read
+        """
+        end = self.written
+        capacity = len(self._samples)
+        dropped = max(0, end - since - capacity)
+        start = since + dropped
+        return [self._samples[index % capacity] for index in range(start, end)], dropped
+
+
+class Histogram:
+    """Counts of samples per bucket, with their sum, in the Prometheus sense: a sample
+    is in every bucket whose bound it does not exceed
+    """
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Sequence[float] = BUCKET_BOUNDS) -> None:
+        """Initializes an empty histogram
+
+        Args:
+            bounds (Sequence[float]): increasing upper bounds, +Inf is added
+        """
+        self.bounds: tuple[float, ...] = tuple(bounds)
+        self.counts: list[int] = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.total: float = 0.0
+        self.count: int = 0
+
+    def add(self, values: Sequence[float]) -> None:
+        """Counts samples
+
+        Args:
+            values (Sequence[float]): samples to add
+        """
+        bounds, counts = self.bounds, self.counts
+        for value in values:
+            counts[bisect_left(bounds, value)] += 1
+            self.total += value
+        self.count += len(values)
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket a quantile falls in
+
+        Args:
+            fraction (float): 0.5 for the median, 0.99 for the 99th percentile
+
+        Returns:
+            float: the bound, inf if it is above the last bound, 0 with no samples
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else math.inf
+        return math.inf
+
+    def render(self, name: str, help_text: str) -> list[str]:
+        """Lines of the histogram in the Prometheus text format
+
+        Args:
+            name (str): metric name, without _bucket, _sum and _count
+            help_text (str): description for the HELP line
+
+        Returns:
+            list[str]: lines without newlines
+        """
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound:.9g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.total:.9g}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class GameMetrics:
+    """Timings written by the game while it runs, see game.manager
+    """
+
+    # series name: metric name, help text
+    HISTOGRAMS: dict[str, tuple[str, str]] = {
+        "frame_time": ("game_frame_seconds", "Time from one displayed frame to the next"),
+        "step_time": ("game_physics_step_seconds", "Time of one simulation step"),
+        "load_time": ("game_level_load_seconds", "Time to load a level"),
+        "latency": ("game_input_latency_seconds",
+                    "Time from sampling the input to the frame it changed being displayed"),
+    }
+
+    def __init__(self, capacity: int = SERIES_CAPACITY) -> None:
+        """Allocates a series per timing
+
+        Args:
+            capacity (int): samples every series keeps
+        """
+        self.frame_time: Series = Series(capacity)
+        self.step_time: Series = Series(capacity)
+        self.load_time: Series = Series(capacity)
+        self.latency: Series = Series(capacity)
+        self._last_frame: float = 0.0
+        self.frame_seconds: float = 0.0  # smoothed time between frames
+
+    def displayed(self, sampled: float) -> None:
+        """Called right after a frame was flipped to the display
+
+        Args:
+            sampled (float): time.perf_counter() when the frame's input was sampled
+        """
+        now = time.perf_counter()
+        self.latency.record(now - sampled)
+        if self._last_frame:
+            elapsed = now - self._last_frame
+            self.frame_time.record(elapsed)
+            if self.frame_seconds:
+                self.frame_seconds += (elapsed - self.frame_seconds) * FPS_SMOOTHING
+            else:
+                self.frame_seconds = elapsed
+        self._last_frame = now
+
+    @property
+    def fps(self) -> float:
+        """Getter for the smoothed frame rate, for the HUD
+
+        Returns:
+            float: frames per second, 0 before two frames were displayed
+        """
+        return 1.0 / self.frame_seconds if self.frame_seconds > 0 else 0.0
+
+    def series(self, name: str) -> Series:
+        """Getter for a series by the name in HISTOGRAMS
+
+        Returns:
+            Series: the series
+        """
+        series: Series = getattr(self, name)
+        return series
+
+
+class MetricsExporter:
+    """Background thread that turns GameMetrics into Prometheus text every interval,
+    writes it to a file and serves it on localhost
+    """
+
+    def __init__(self, metrics: GameMetrics, path: str | None = None,
+                 port: int | None = None, interval: float = EXPORT_INTERVAL) -> None:
+        """Initializes the exporter, nothing runs before start
+
+        Args:
+            metrics (GameMetrics): the game's metrics
+            path (str | None): file rewritten every interval, none if None
+            port (int | None): localhost port to serve /metrics on, 0 picks a free
+                               one, no server if None
+            interval (float): seconds between exports
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.metrics: GameMetrics = metrics
+        self.path: str | None = path
+        self.interval: float = interval
+        self.histograms: dict[str, Histogram] = {name: Histogram()
+                                                 for name in GameMetrics.HISTOGRAMS}
+        self.frames: int = 0
+        self.dropped: int = 0
+        self.fps: float = 0.0
+        self.text: str = ""  # last export, replaced whole so readers never see half
+        self._read: dict[str, int] = {name: 0 for name in GameMetrics.HISTOGRAMS}
+        self._collected: float = time.perf_counter()
+        self._done: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._serving: threading.Thread | None = None
+        self._server: http.server.ThreadingHTTPServer | None = None
+        if port is not None:
+            self._server = http.server.ThreadingHTTPServer(("127.0.0.1", port),
+                                                           self._handler())
+
+    @property
+    def port(self) -> int | None:
+        """Getter for the port metrics are served on
+
+        Returns:
+            int | None: the bound port, None without a server
+        """
+        return None if self._server is None else self._server.server_address[1]
+
+    def _handler(self) -> type[http.server.BaseHTTPRequestHandler]:
+        """Request handler class that answers with the last export
+        """
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.text.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass  # no request log on the game's console
+
+        return Handler
+
+    def start(self) -> None:
+        """Starts the export thread and the server
+        """
+        self._done.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics", daemon=True)
+        self._thread.start()
+        if self._server is not None:
+            self._serving = threading.Thread(target=self._server.serve_forever,
+                                             name="metrics-server", daemon=True)
+            self._serving.start()
+
+    def _run(self) -> None:
+        while not self._done.wait(self.interval):
+            self.export()
+
+    def collect(self) -> None:
+        """Drains the series into the histograms and works out the frame rate
+        """
+        now = time.perf_counter()
+        for name in GameMetrics.HISTOGRAMS:
+            series = self.metrics.series(name)
+            samples, dropped = series.read(self._read[name])
+            self._read[name] = series.written
+            self.histograms[name].add(samples)
+            self.dropped += dropped
+            if name == "frame_time":
+                self.frames += len(samples) + dropped
+                self.fps = (len(samples) + dropped) / max(now - self._collected, 1e-9)
+        self._collected = now
+
+    def render(self) -> str:
+        """The histograms and counters in the Prometheus text format
+
+        Returns:
+            str: the exposition, ending with a newline
+        """
+        lines = ["# HELP game_fps Frames per second over the last export interval",
+                 "# TYPE game_fps gauge", f"game_fps {self.fps:.3f}",
+                 "# HELP game_frames_total Frames displayed",
+                 "# TYPE game_frames_total counter", f"game_frames_total {self.frames}",
+                 "# HELP game_metric_samples_dropped_total Samples overwritten before export",
+                 "# TYPE game_metric_samples_dropped_total counter",
+                 f"game_metric_samples_dropped_total {self.dropped}"]
+        for name, (metric, help_text) in GameMetrics.HISTOGRAMS.items():
+            lines.extend(self.histograms[name].render(metric, help_text))
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        """Collects, renders and writes the file
+        """
+        self.collect()
+        self.text = self.render()
+        if self.path is not None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as file:
+                file.write(self.text)
+            os.replace(temp_path, self.path)  # scrapers never read half a file
+
+    def stop(self) -> None:
+        """Stops the thread and the server after a last export, safe to call twice
+        """
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.export()
+        if self._server is not None:
+            if self._serving is not None:  # shutdown waits for serve_forever to return
+                self._server.shutdown()
+                self._serving.join()
+                self._serving = None
+            self._server.server_close()
+            self._server = None
@@ -1,37 +1,97 @@
 """movement_strategy.py
 
-Class that uses strategy design pattern to handle player movement. At the moment
-it handles normal movement and no movement, but later on we could add different
-kinds of movement strategies such as faster movement, slower movement, slippery
-movement, etc...
+Class that uses strategy design pattern to handle player movement. It handles normal
+movement, no movement, slow and fast movement and slippery ice movement.
+
+Every strategy answers for one player through get_horizontal_velocity, and for a whole
+batch through get_horizontal_velocities, which takes arrays of input bitmasks and move
+speeds and returns an array of velocities. The built in strategies do the batch as
+NumPy array operations; a strategy that only implements the single player method is
+adapted by calling it once per player.
+
+Strategies keep no state. One with momentum, like IceMovement, is given last frame's
+velocity through next_velocity, or the previous array of a batch, and the caller keeps
+it: Player saves it with the rest of its physics state, so rollback, replays and
+checksums see it and a respawn clears it.
 """
 
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+import numpy as np
+import numpy.typing as npt
 import pygame
 
+from input_state import KeyInput, MaskKeys, INPUT_LEFT, INPUT_RIGHT
+
+IntArray = npt.NDArray[np.int64]
+
+
+def _direction(masks: IntArray) -> IntArray:
+    """-1, 0 or 1 per input bitmask, left wins over right like NormalMovement
+    """
+    direction: IntArray = np.where(masks & INPUT_LEFT, -1,
+                                   np.where(masks & INPUT_RIGHT, 1, 0)).astype(np.int64)
+    return direction
+
 
 class MovementStrategy(ABC):
     """Abstract class that acts as a base for movement strategies
     """
 
     @abstractmethod
-    def get_horizontal_velocity(self, move_speed: int, keys: pygame.key.ScancodeWrapper) -> int:
+    def get_horizontal_velocity(self, move_speed: int, keys: KeyInput) -> int:
         """Returns horizontal velocity
         """
 
+    def next_velocity(self, move_speed: int, keys: KeyInput, previous: int) -> int:
+        """Returns horizontal velocity given last frame's, strategies without
+        momentum ignore it
+
+        Args:
+            move_speed (int): Player's movement speed
+            keys (KeyInput): this frame's input, usually an InputState
+            previous (int): the velocity this returned last frame, 0 at rest
+
+        Returns:
+            int: velocity for this frame
+        """
+        return self.get_horizontal_velocity(move_speed, keys)
+
+    def get_horizontal_velocities(self, masks: IntArray, move_speeds: IntArray,
+                                  previous: IntArray | None = None) -> IntArray:
+        """Returns the horizontal velocity of every player in a batch. This adapter
+        calls get_horizontal_velocity once per player, override it with array
+        operations
+
+        Args:
+            masks (IntArray): input bitmask per player
+            move_speeds (IntArray): movement speed per player
+            previous (IntArray | None): last velocity per player, used by strategies
+                                        with momentum
+
+        Returns:
+            IntArray: velocity per player
+        """
+        keys = MaskKeys()
+        velocities: IntArray = np.empty(len(masks), dtype=np.int64)
+        last = previous.tolist() if previous is not None else [0] * len(masks)
+        for index, (mask, move_speed) in enumerate(zip(masks.tolist(), move_speeds.tolist())):
+            keys.mask = mask
+            velocities[index] = self.next_velocity(move_speed, keys, last[index])
+        return velocities
+
 
 class NormalMovement(MovementStrategy):
     """Movement strategy that does normal movement for the player
     """
 
-    def get_horizontal_velocity(self, move_speed: int, keys: pygame.key.ScancodeWrapper) -> int:
+    def get_horizontal_velocity(self, move_speed: int, keys: KeyInput) -> int:
         """Returns horizontal velocity based on keyboard input
 
         Args
             move_speed (int): Player's movement speed
-            keys (pygame.key.ScancodeWrapper): Input keys from keyboard
+            keys (KeyInput): this frame's input, usually an InputState
         """
         if keys[pygame.K_LEFT] or keys[pygame.K_a]:
             return -move_speed
@@ -39,12 +99,111 @@ class NormalMovement(MovementStrategy):
             return move_speed
         return 0
 
+    def get_horizontal_velocities(self, masks: IntArray, move_speeds: IntArray,
+                                  previous: IntArray | None = None) -> IntArray:
+        """Returns the velocity of every player in a batch, see MovementStrategy
+        """
+        velocities: IntArray = _direction(masks) * move_speeds
+        return velocities
+
 
 class NoMovement(MovementStrategy):
     """Movement strategy that ignores input from keyboard so player doesn't move
     """
 
-    def get_horizontal_velocity(self, move_speed: int, keys: pygame.key.ScancodeWrapper) -> int:
+    def get_horizontal_velocity(self, move_speed: int, keys: KeyInput) -> int:
         """Returns horizontal velocity, which in this case is 0 since this is no movement strategy
         """
         return 0
+
+    def get_horizontal_velocities(self, masks: IntArray, move_speeds: IntArray,
+                                  previous: IntArray | None = None) -> IntArray:
+        """Returns 0 for every player in a batch
+        """
+        return np.zeros(len(masks), dtype=np.int64)
+
+
+class SlowMovement(NormalMovement):
+    """Movement strategy that moves at half speed, for mud or water
+    """
+
+    DIVISOR: int = 2
+
+    def get_horizontal_velocity(self, move_speed: int, keys: KeyInput) -> int:
+        """Returns half the normal velocity, rounded toward zero
+        """
+        return int(super().get_horizontal_velocity(move_speed, keys) / self.DIVISOR)
+
+    def get_horizontal_velocities(self, masks: IntArray, move_speeds: IntArray,
+                                  previous: IntArray | None = None) -> IntArray:
+        """Returns half the normal velocity of every player in a batch
+        """
+        velocities: IntArray = _direction(masks) * (move_speeds // self.DIVISOR)
+        return velocities
+
+
+class FastMovement(NormalMovement):
+    """Movement strategy that moves at double speed, for speed boosts
+    """
+
+    MULTIPLIER: int = 2
+
+    def get_horizontal_velocity(self, move_speed: int, keys: KeyInput) -> int:
+        """Returns double the normal velocity
+        """
+        return super().get_horizontal_velocity(move_speed, keys) * self.MULTIPLIER
+
+    def get_horizontal_velocities(self, masks: IntArray, move_speeds: IntArray,
+                                  previous: IntArray | None = None) -> IntArray:
+        """Returns double the normal velocity of every player in a batch
+        """
+        velocities: IntArray = _direction(masks) * move_speeds * self.MULTIPLIER
+        return velocities
+
+
+class IceMovement(MovementStrategy):
+    """Slippery movement: the velocity only changes by ACCELERATION per frame toward
+    the velocity the input asks for, so the player speeds up and slides to a stop.
+    Last frame's velocity comes from the caller, one IceMovement serves any number of
+    players
+    """
+
+    ACCELERATION: int = 1
+    # what the input asks for, shared because NormalMovement keeps no state
+    TARGET: NormalMovement = NormalMovement()
+
+    def get_horizontal_velocity(self, move_speed: int, keys: KeyInput) -> int:
+        """Returns the velocity of the first frame from rest
+
+        Args
+            move_speed (int): Player's movement speed
+            keys (KeyInput): this frame's input, usually an InputState
+        """
+        return self.next_velocity(move_speed, keys, 0)
+
+    def next_velocity(self, move_speed: int, keys: KeyInput, previous: int) -> int:
+        """Returns the velocity one step from previous toward what the input asks for
+
+        Args:
+            move_speed (int): Player's movement speed
+            keys (KeyInput): this frame's input, usually an InputState
+            previous (int): last frame's velocity
+
+        Returns:
+            int: velocity for this frame
+        """
+        target = self.TARGET.get_horizontal_velocity(move_speed, keys)
+        step = self.ACCELERATION
+        return max(previous - step, min(previous + step, target))
+
+    def get_horizontal_velocities(self, masks: IntArray, move_speeds: IntArray,
+                                  previous: IntArray | None = None) -> IntArray:
+        """Returns the velocity of every player in a batch one step closer to what
+        its input asks for, previous holds last frame's velocities (rest if None)
+        """
+        target = _direction(masks) * move_speeds
+        if previous is None:
+            previous = np.zeros(len(masks), dtype=np.int64)
+        step = self.ACCELERATION
+        velocities: IntArray = np.clip(target, previous - step, previous + step)
+        return velocities
@@ -0,0 +1,164 @@
+"""moving_platform.py
+
+Kinematic platforms that follow a scripted path. A platform's position is a pure
+function of the simulation frame, so a saved state only needs the frame number and
+replays, rollback and checksums stay deterministic. Paths give whole pixel positions:
+LinearPath loops through waypoints at a fixed speed and CirclePath orbits a center.
+
+A player standing on a platform is carried by the platform's last move, see
+Player.ride.
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+import math
+import pygame
+
+
+class PlatformPath(ABC):
+    """Abstract class for the path of a moving platform
+    """
+
+    @abstractmethod
+    def position(self, frame: int) -> tuple[int, int]:
+        """Returns the platform's top left on a frame
+        """
+
+    @property
+    @abstractmethod
+    def max_step(self) -> int:
+        """Largest distance in pixels the platform moves along either axis in one frame
+        """
+
+
+class LinearPath(PlatformPath):
+    """Moves through the waypoints in order at speed pixels per frame and back to the
+    first one, two waypoints give a back and forth platform
+    """
+
+    __slots__ = ("points", "speed", "_lengths", "_total")
+
+    def __init__(self, points: Sequence[tuple[int, int]], speed: float) -> None:
+        """Initializes the path
+
+        Args:
+            points (Sequence[tuple[int, int]]): top left positions to visit
+            speed (float): pixels per frame
+        """
+        if len(points) < 2:
+            raise ValueError("a path needs at least two points")
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.points: tuple[tuple[int, int], ...] = tuple(points)
+        self.speed: float = speed
+        # length of every segment, the last one goes back to the first point
+        self._lengths: tuple[float, ...] = tuple(
+            math.dist(self.points[index], self.points[(index + 1) % len(self.points)])
+            for index in range(len(self.points)))
+        self._total: float = sum(self._lengths)
+
+    def position(self, frame: int) -> tuple[int, int]:
+        """Returns the top left on a frame, rounded to whole pixels
+        """
+        distance = (frame * self.speed) % self._total
+        for index, length in enumerate(self._lengths):
+            if distance < length:
+                break
+            distance -= length
+        x0, y0 = self.points[index]
+        x1, y1 = self.points[(index + 1) % len(self.points)]
+        t = distance / length if length else 0.0
+        return round(x0 + (x1 - x0) * t), round(y0 + (y1 - y0) * t)
+
+    @property
+    def max_step(self) -> int:
+        """Largest move per frame, rounding can add a pixel
+        """
+        return math.ceil(self.speed) + 1
+
+
+class CirclePath(PlatformPath):
+    """Orbits a center once every period frames
+    """
+
+    __slots__ = ("center", "radius", "period")
+
+    def __init__(self, center: tuple[int, int], radius: int, period: int) -> None:
+        """Initializes the path
+
+        Args:
+            center (tuple[int, int]): top left position at the middle of the orbit
+            radius (int): orbit radius in pixels
+            period (int): frames for one full orbit
+        """
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.center: tuple[int, int] = center
+        self.radius: int = radius
+        self.period: int = period
+
+    def position(self, frame: int) -> tuple[int, int]:
+        """Returns the top left on a frame, rounded to whole pixels
+        """
+        angle = 2 * math.pi * (frame % self.period) / self.period
+        return (round(self.center[0] + self.radius * math.cos(angle)),
+                round(self.center[1] + self.radius * math.sin(angle)))
+
+    @property
+    def max_step(self) -> int:
+        """Largest move per frame, rounding can add a pixel
+        """
+        return math.ceil(2 * math.pi * self.radius / self.period) + 1
+
+
+class MovingPlatform:
+    """A platform moved by a path. rect is where it is this frame and previous where it
+    was on the frame before, the difference is what a rider is carried by
+    """
+
+    __slots__ = ("path", "phase", "rect", "previous")
+
+    def __init__(self, size: tuple[int, int], path: PlatformPath, phase: int = 0) -> None:
+        """Initializes the platform on frame 0
+
+        Args:
+            size (tuple[int, int]): width and height
+            path (PlatformPath): path to follow
+            phase (int): frames the platform is ahead on its path
+        """
+        self.path: PlatformPath = path
+        self.phase: int = phase
+        self.rect: pygame.Rect = pygame.Rect((0, 0), size)
+        self.previous: pygame.Rect = pygame.Rect((0, 0), size)
+        self.place(0)
+
+    def copy(self) -> MovingPlatform:
+        """Returns a platform on the same path with its own rects, so simulations of
+        the same level do not move each other's platforms
+
+        Returns:
+            MovingPlatform: the copy, placed on frame 0
+        """
+        return MovingPlatform(self.rect.size, self.path, self.phase)
+
+    def place(self, frame: int) -> None:
+        """Moves the platform to where it is on a frame
+
+        Args:
+            frame (int): simulation frame
+        """
+        self.previous.topleft = self.path.position(frame + self.phase - 1)
+        self.rect.topleft = self.path.position(frame + self.phase)
+
+    @property
+    def dx(self) -> int:
+        """Horizontal move of the last frame
+        """
+        return self.rect.x - self.previous.x
+
+    @property
+    def dy(self) -> int:
+        """Vertical move of the last frame
+        """
+        return self.rect.y - self.previous.y
@@ -0,0 +1,460 @@
+"""multiplayer.py
+
+Multiplayer mode. One asyncio server runs the authoritative simulation of every
+connected Player on one level. Clients send input bitmasks and the server
+broadcasts delta compressed snapshots at a fixed tick rate. Every connection is a
+coroutine on one event loop, no thread per client.
+
+Moving platforms and enemies are shared by every player and placed from the tick the
+way Simulation.step places them from the frame, so clients draw them from the
+snapshot's tick without any extra bytes. Touching an enemy or a hazard sends a player
+back to the start like a fall does. Collectibles stay where they are, in a shared world
+they would be gone for good after the first player took them.
+
+Messages are length prefixed (4 byte little endian) and made of varints from ghost.py.
+
+    client -> server:  raw bytes, each one an input bitmask, the newest byte wins
+    server -> client:  hello     player id, level
+                       snapshot  tick, tick time in microseconds,
+                                 removed player count, removed ids,
+                                 changed player count, (id, zigzag dx, zigzag dy) each
+
+A snapshot's deltas are against the previous snapshot, so the same bytes go to every
+client. A client that just joined first gets a snapshot against an empty world.
+
+    python multiplayer.py server --level 1 --port 5555
+    python multiplayer.py loadtest --bots 200 --seconds 10 --port 5555
+    python multiplayer.py play --port 5555
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import struct
+import time
+import pygame
+
+from player import Player
+from input_state import InputSampler, MaskKeys
+from simulation import Simulation
+from ghost import read_varint, write_varint, zigzag, unzigzag
+
+HELLO: int = 1
+SNAPSHOT: int = 2
+
+# a client that stops reading gets dropped once this much is waiting for it
+MAX_CLIENT_BUFFER: int = 1 << 20
+
+_LENGTH = struct.Struct("<I")
+
+
+def frame_message(kind: int, body: bytes | bytearray) -> bytes:
+    """Adds the length prefix and message kind to a message body
+    """
+    return _LENGTH.pack(len(body) + 1) + bytes((kind,)) + body
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """Reads one message written with frame_message
+
+    Returns:
+        tuple[int, bytes]: message kind and body
+    """
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    data = await reader.readexactly(length)
+    return data[0], data[1:]
+
+
+def encode_snapshot(tick: int, tick_us: int, removed: list[int],
+                    changed: list[tuple[int, int, int]]) -> bytes:
+    """Encodes one snapshot message
+
+    Args:
+        tick (int): tick number
+        tick_us (int): time the server spent on the previous tick
+        removed (list[int]): ids of players that left
+        changed (list[tuple[int, int, int]]): (id, dx, dy) of players that moved
+
+    Returns:
+        bytes: the framed message
+    """
+    body = bytearray()
+    write_varint(body, tick)
+    write_varint(body, tick_us)
+    write_varint(body, len(removed))
+    for player_id in removed:
+        write_varint(body, player_id)
+    write_varint(body, len(changed))
+    for player_id, dx, dy in changed:
+        write_varint(body, player_id)
+        write_varint(body, zigzag(dx))
+        write_varint(body, zigzag(dy))
+    return frame_message(SNAPSHOT, body)
+
+
+class SnapshotDecoder:
+    """Client side copy of the world rebuilt from snapshots
+    """
+
+    def __init__(self) -> None:
+        self.positions: dict[int, tuple[int, int]] = {}
+        self.tick: int = -1
+        self.tick_us: int = 0
+
+    def apply(self, body: bytes) -> None:
+        """Applies one snapshot body
+
+        Args:
+            body (bytes): body of a SNAPSHOT message
+        """
+        positions = self.positions
+        self.tick, pos = read_varint(body, 0)
+        self.tick_us, pos = read_varint(body, pos)
+        count, pos = read_varint(body, pos)
+        for _ in range(count):
+            player_id, pos = read_varint(body, pos)
+            positions.pop(player_id, None)
+        count, pos = read_varint(body, pos)
+        for _ in range(count):
+            player_id, pos = read_varint(body, pos)
+            dx, pos = read_varint(body, pos)
+            dy, pos = read_varint(body, pos)
+            x, y = positions.get(player_id, (0, 0))
+            positions[player_id] = (x + unzigzag(dx), y + unzigzag(dy))
+
+
+class _Client:
+    """Server side state of one connection
+    """
+
+    __slots__ = ("player_id", "writer", "player", "keys", "synced")
+
+    def __init__(self, player_id: int, writer: asyncio.StreamWriter, player: Player) -> None:
+        self.player_id: int = player_id
+        self.writer: asyncio.StreamWriter = writer
+        self.player: Player = player
+        self.keys: MaskKeys = MaskKeys()
+        self.synced: bool = False
+
+
+class MultiplayerServer:
+    """Authoritative server for one level
+    """
+
+    def __init__(self, level: int = 1, tick_rate: int = 60) -> None:
+        """Initializes the server, call start to listen
+
+        Args:
+            level (int): level every player plays
+            tick_rate (int): simulation ticks per second
+        """
+        self.simulation: Simulation = Simulation()
+        if not self.simulation.level_changer(level):
+            raise ValueError(f"level {level} does not exist")
+        self.tick_rate: int = tick_rate
+        self.tick: int = 0
+        self.clients: dict[int, _Client] = {}
+        self.port: int = 0
+
+        # statistics for the load test
+        self.bytes_sent: int = 0
+        self.tick_seconds_total: float = 0.0
+        self.tick_seconds_max: float = 0.0
+        self.last_tick_us: int = 0
+
+        self._next_id: int = 1
+        self._removed: list[int] = []
+        self._last_sent: dict[int, tuple[int, int]] = {}
+        self._server: asyncio.Server | None = None
+        self._handlers: set[asyncio.Task[None]] = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Starts listening, port 0 picks a free port stored in self.port
+        """
+        self._server = await asyncio.start_server(self._handle_client, host, port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Closes the listener and every connection
+        """
+        if self._server is not None:
+            self._server.close()
+        for client in list(self.clients.values()):
+            client.writer.close()
+        # closed connections read EOF, so every handler finishes on its own
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def run(self, seconds: float | None = None) -> None:
+        """Ticks at the fixed rate
+
+        Args:
+            seconds (float | None): how long to run, forever if None
+        """
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.tick_rate
+        next_tick = loop.time()
+        end = None if seconds is None else next_tick + seconds
+        while end is None or next_tick < end:
+            self.step()
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """Coroutine for one connection, it only reads inputs
+        """
+        task = asyncio.current_task()
+        if task is not None:
+            self._handlers.add(task)
+            task.add_done_callback(self._handlers.discard)
+        player_id = self._next_id
+        self._next_id += 1
+        player = Player()
+        start = self.simulation.start_pos
+        player.reposition(start[0], start[1])
+        client = _Client(player_id, writer, player)
+        self.clients[player_id] = client
+
+        hello = bytearray()
+        write_varint(hello, player_id)
+        write_varint(hello, self.simulation.level)
+        writer.write(frame_message(HELLO, hello))
+        try:
+            while True:
+                data = await reader.read(256)
+                if not data:
+                    break
+                client.keys.mask = data[-1]
+        except ConnectionError:
+            pass
+        finally:
+            self._drop(client)
+
+    def _drop(self, client: _Client) -> None:
+        """Forgets a client, the others learn about it in the next snapshot
+        """
+        if self.clients.pop(client.player_id, None) is None:
+            return
+        if client.player_id in self._last_sent:
+            del self._last_sent[client.player_id]
+            self._removed.append(client.player_id)
+        client.writer.close()
+
+    def step(self) -> None:
+        """Runs one tick: simulates every player then broadcasts the snapshot
+        """
+        started = time.perf_counter()
+        simulation = self.simulation
+        # the world is on the frame after the snapshot's tick, clients place it the same way
+        simulation.frame = self.tick + 1
+        simulation.move_world()
+        platforms, entities = simulation.platforms, simulation.entities
+        goal, floor = simulation.goal, simulation.floor
+        start_x, start_y = simulation.start_pos
+
+        changed: list[tuple[int, int, int]] = []
+        last_sent = self._last_sent
+        for player_id, client in self.clients.items():
+            player = client.player
+            rect = player.rect
+            if (rect.colliderect(goal) or rect.colliderect(floor)
+                    or (entities and entities.hits(rect))):
+                player.reposition(start_x, start_y)  # back to the start after a win or loss
+            player.update(client.keys, simulation.colliders(player), platforms)
+
+            x, y = player.x, player.y
+            old = last_sent.get(player_id)
+            if old is None:
+                changed.append((player_id, x, y))
+            elif old[0] != x or old[1] != y:
+                changed.append((player_id, x - old[0], y - old[1]))
+            last_sent[player_id] = (x, y)
+
+        removed, self._removed = self._removed, []
+        delta = encode_snapshot(self.tick, self.last_tick_us, removed, changed)
+        keyframe: bytes | None = None
+        for client in list(self.clients.values()):
+            if client.synced:
+                message = delta
+            else:
+                if keyframe is None:
+                    keyframe = encode_snapshot(self.tick, self.last_tick_us, [],
+                                               [(pid, x, y) for pid, (x, y) in last_sent.items()])
+                message = keyframe
+                client.synced = True
+            transport = client.writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                self._drop(client)
+                continue
+            client.writer.write(message)
+            self.bytes_sent += len(message)
+        self.tick += 1
+
+        seconds = time.perf_counter() - started
+        self.last_tick_us = int(seconds * 1_000_000)
+        self.tick_seconds_total += seconds
+        self.tick_seconds_max = max(self.tick_seconds_max, seconds)
+
+
+# ********* Load test **************
+class LoadTestReport:
+    """What the bots measured
+    """
+
+    def __init__(self, bots: int, seconds: float) -> None:
+        self.bots: int = bots
+        self.seconds: float = seconds
+        self.bytes_received: int = 0
+        self.snapshots: int = 0
+        self.tick_us_total: int = 0
+        self.tick_us_max: int = 0
+        self.failed: int = 0
+
+    @property
+    def mean_tick_ms(self) -> float:
+        """Mean server tick time reported in the snapshots
+        """
+        return self.tick_us_total / max(self.snapshots, 1) / 1000.0
+
+    @property
+    def bandwidth(self) -> float:
+        """Bytes per second received by all bots together
+        """
+        return self.bytes_received / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.bots} bots for {self.seconds:.1f}s: "
+                f"server tick mean {self.mean_tick_ms:.3f} ms, "
+                f"max {self.tick_us_max / 1000.0:.3f} ms, "
+                f"bandwidth {self.bandwidth / 1024:.1f} KiB/s total, "
+                f"{self.bandwidth / max(self.bots, 1):.0f} B/s per bot, "
+                f"{self.failed} bots dropped")
+
+
+async def _bot(host: str, port: int, end: float, report: LoadTestReport,
+               seed: int) -> SnapshotDecoder:
+    """One simulated player that presses random inputs
+    """
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    decoder = SnapshotDecoder()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port),
+                                                end - loop.time())
+    except (asyncio.TimeoutError, OSError):
+        report.failed += 1
+        return decoder
+    try:
+        while loop.time() < end:
+            if rng.random() < 0.1:
+                writer.write(bytes((rng.randrange(8),)))
+            try:
+                kind, body = await asyncio.wait_for(read_message(reader), end - loop.time())
+            except asyncio.TimeoutError:
+                break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                report.failed += 1  # dropped by the server
+                break
+            report.bytes_received += len(body) + _LENGTH.size + 1
+            if kind == SNAPSHOT:
+                decoder.apply(body)
+                report.snapshots += 1
+                report.tick_us_total += decoder.tick_us
+                report.tick_us_max = max(report.tick_us_max, decoder.tick_us)
+    finally:
+        writer.close()
+    return decoder
+
+
+async def load_test(host: str, port: int, bots: int, seconds: float) -> LoadTestReport:
+    """Connects N bots to a running server and measures it
+
+    Args:
+        host (str): server address
+        port (int): server port
+        bots (int): number of simulated players
+        seconds (float): how long the bots play
+
+    Returns:
+        LoadTestReport: server tick time and bandwidth seen by the bots
+    """
+    report = LoadTestReport(bots, seconds)
+    end = asyncio.get_running_loop().time() + seconds
+    await asyncio.gather(*(_bot(host, port, end, report, seed) for seed in range(bots)))
+    return report
+
+
+async def play(host: str, port: int) -> None:  # pragma: no cover
+    """Playable client: sends the keyboard and draws every player
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    _, hello = await read_message(reader)
+    player_id, pos = read_varint(hello, 0)
+    level, _ = read_varint(hello, pos)
+    simulation = Simulation()
+    simulation.level_changer(level)
+
+    pygame.init()
+    screen = pygame.display.set_mode((800, 800))
+    pygame.display.set_caption(f"2D platformer - player {player_id}")
+    decoder = SnapshotDecoder()
+    sampler = InputSampler()
+    running = True
+    while running:
+        inputs = sampler.sample()
+        running = not inputs.quit
+        writer.write(bytes((inputs.mask,)))
+        _, body = await read_message(reader)
+        decoder.apply(body)
+
+        screen.fill((255, 255, 255))
+        for platform in simulation.objects:
+            pygame.draw.rect(screen, (0, 0, 0), platform)
+        simulation.frame = decoder.tick + 1
+        simulation.move_world()
+        for moving in simulation.platforms:
+            pygame.draw.rect(screen, (0, 0, 255), moving.rect)
+        entities = simulation.entities
+        for index in entities.visible().tolist():
+            pygame.draw.rect(screen, (255, 0, 0),
+                             (int(entities.x[index]), int(entities.y[index]),
+                              int(entities.w[index]), int(entities.h[index])))
+        pygame.draw.rect(screen, (255, 246, 0), simulation.goal)
+        for other_id, (x, y) in decoder.positions.items():
+            color = (0, 128, 255) if other_id == player_id else (150, 150, 150)
+            pygame.draw.rect(screen, color, pygame.Rect(x, y, 40, 40))
+        pygame.display.flip()
+    writer.close()
+    pygame.quit()
+
+
+async def _serve(level: int, host: str, port: int) -> None:  # pragma: no cover
+    server = MultiplayerServer(level)
+    await server.start(host, port)
+    print(f"serving level {level} on {host}:{server.port}")
+    await server.run()
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description="2D platformer multiplayer")
+    parser.add_argument("mode", choices=["server", "loadtest", "play"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--bots", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.mode == "server":
+        asyncio.run(_serve(args.level, args.host, args.port))
+    elif args.mode == "loadtest":
+        print(asyncio.run(load_test(args.host, args.port, args.bots, args.seconds)))
+    else:
+        asyncio.run(play(args.host, args.port))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,332 @@
+"""planner.py
+
+Optimal routes for speedrun reference times. A RoutePlanner runs A* over the player's
+exact states: every node is the state Simulation.save_state writes, every edge is one
+Simulation.step with one of the distinct inputs, so the transition model is
+Player.update itself and a route the planner finds plays back frame for frame. The cost
+of a route is its frame count, so the first goal state taken off the queue is the
+fastest way to finish the level from where the search started.
+
+The heuristic never overestimates: the player cannot close the horizontal gap to the
+goal faster than its top speed, nor climb faster than the first frame of a jump, the
+steepest part of the jump arcs in jump_tables.
+
+By default states are not rounded onto a grid, two nodes are the same only if every
+field of the player is, and the frame counts are optimal. Player positions are whole
+pixels and velocities follow the same float sums every jump, so the levels are searched
+in seconds. With a coarser resolution the nodes are grid cells of position and
+velocity: the first state to reach a cell stands for it, the route still plays back
+exactly and is near optimal. Expanded states are kept between queries on the same
+level, later plans from other start states only step the simulation for states no
+earlier plan reached.
+
+Levels with moving platforms or entities are not supported. Platforms and enemies are
+placed from the frame, so the frame would have to be part of every state, a player
+waiting for a platform is a new state every frame and level 7 finds no route within
+any budget that finishes in minutes.
+
+    python planner.py                    # reference times for every static level
+    python planner.py 3 --save out       # level 3, the route saved as a replay
+    python planner.py 4 --resolution 8   # near optimal, cells of 8 pixels
+"""
+
+from __future__ import annotations
+import argparse
+import heapq
+import math
+import os
+import sys
+from array import array
+from collections.abc import Sequence
+from itertools import count
+from typing import NamedTuple
+
+from input_state import INPUT_JUMP, INPUT_LEFT, INPUT_RIGHT, MaskKeys
+from jump_tables import jump_arc
+from player import Player
+from replay import ReplayRecorder
+from simulation import Simulation
+
+# every input that moves the player differently, left wins over right when both are held
+ACTIONS: tuple[int, ...] = (0, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP,
+                            INPUT_LEFT | INPUT_JUMP, INPUT_RIGHT | INPUT_JUMP)
+# states a plan may expand before it gives up
+MAX_EXPANSIONS: int = 500_000
+# frames an input is held to find the top speed of a strategy with momentum
+SPEED_FRAMES: int = 64
+# levels planned when none are given on the command line, the ones without moving
+# platforms or entities
+LEVELS: tuple[int, ...] = tuple(range(1, 7))
+
+# the player's fields
+StateKey = tuple[float, ...]
+
+
+class Route(NamedTuple):
+    """Fastest completion of a level found by a RoutePlanner
+    """
+    level: int
+    inputs: bytes  # one input bitmask per frame
+    frames: int  # the reference time, len(inputs)
+    expanded: int  # states this plan expanded, cached ones included
+
+
+class RoutePlanner:
+    """A* search over the states of one level, exact or in grid cells
+    """
+
+    __slots__ = ("level", "simulation", "weight", "resolution", "_successors",
+                 "_buffer", "_keys", "_speed_x", "_speed_y")
+
+    def __init__(self, level: int, simulation: Simulation | None = None,
+                 weight: float = 1.0, resolution: int = 1) -> None:
+        """Loads the level
+
+        Args:
+            level (int): level number 1-6
+            simulation (Simulation | None): simulation to step, a new one is made if None,
+                                            its player's constants are the ones planned for
+            weight (float): heuristic weight, above 1 plans faster but routes may be up to
+                            that many times the optimal frame count
+            resolution (int): pixels per cell, above 1 states that land in the same
+                              cell are planned as one and routes are near optimal
+
+        Raises:
+            ValueError: if the level does not exist or has moving platforms or
+                        entities, the weight is below 1 or the resolution below 1
+        """
+        if weight < 1:
+            raise ValueError("weight must be at least 1 or the search does more work")
+        if resolution < 1:
+            raise ValueError("resolution must be at least 1")
+        self.simulation: Simulation = simulation if simulation is not None else Simulation()
+        if not self.simulation.level_changer(level):
+            raise ValueError(f"level {level} does not exist")
+        if self.simulation.platforms or self.simulation.entities:
+            raise ValueError(f"level {level} has moving platforms or entities, "
+                             "they cannot be planned")
+        self.level: int = level
+        self.weight: float = weight
+        self.resolution: int = resolution
+        simulation = self.simulation
+        # every expanded state's (input, next state, won) per input that does not lose
+        self._successors: dict[StateKey, tuple[tuple[int, StateKey, bool], ...]] = {}
+        # reused to move states in and out of the simulation
+        self._buffer: array[float] = array("d", bytes(8 * simulation.state_size))
+        self._keys: MaskKeys = MaskKeys()
+
+        player = simulation.player
+        # held long enough for a strategy with momentum to reach its top speed
+        speed = 0
+        for mask in ACTIONS:
+            self._keys.mask = mask
+            player.move_velocity = 0
+            for _ in range(SPEED_FRAMES):
+                speed = max(speed, abs(player.horizontal_movement(self._keys)))
+        simulation.reset()
+        self._speed_x: int = speed
+        steepest = min(jump_arc(player.jump_speed, player.fall_speed).dy[1],
+                       jump_arc(player.wall_jump_speed, player.fall_speed).dy[1])
+        self._speed_y: int = max(-steepest, 0)
+
+    @property
+    def cached(self) -> int:
+        """Getter for the number of states expanded by every plan so far
+
+        Returns:
+            int: states whose successors are kept
+        """
+        return len(self._successors)
+
+    def _key(self) -> StateKey:
+        """Key of the simulation's current state
+        """
+        buffer = self._buffer
+        self.simulation.save_state(buffer, 0)
+        return tuple(buffer[:Player.STATE_SIZE])
+
+    def _load(self, key: StateKey) -> None:
+        """Puts a state back into the simulation, the checksum and frame are not planned
+        """
+        buffer = self._buffer
+        buffer[:Player.STATE_SIZE] = array("d", key)
+        buffer[Player.STATE_SIZE] = 0.0
+        buffer[Player.STATE_SIZE + 1] = 0.0
+        self.simulation.load_state(buffer, 0)
+
+    def _expand(self, key: StateKey) -> tuple[tuple[int, StateKey, bool], ...]:
+        """Steps every input from a state, once per state for the planner's life
+        """
+        successors = self._successors.get(key)
+        if successors is not None:
+            return successors
+        simulation, keys = self.simulation, self._keys
+        found = []
+        for mask in ACTIONS:
+            self._load(key)
+            keys.mask = mask
+            simulation.step(keys)
+            outcome = simulation.outcome()
+            if outcome is not False:
+                found.append((mask, self._key(), outcome is True))
+        successors = self._successors[key] = tuple(found)
+        return successors
+
+    def cell(self, key: StateKey) -> StateKey:
+        """Grid cell of a state, states in one cell are planned as one
+
+        Args:
+            key (StateKey): the state
+
+        Returns:
+            StateKey: the state itself at resolution 1, else its position divided by
+                      the resolution, its velocity in whole pixels and its flags
+        """
+        resolution = self.resolution
+        if resolution == 1:
+            return key
+        return (int(key[0]) // resolution, int(key[1]) // resolution, math.floor(key[4]),
+                *key[5:])
+
+    def heuristic(self, key: StateKey) -> float:
+        """Frames the goal is at least away from a state
+
+        Args:
+            key (StateKey): the state
+
+        Returns:
+            float: lower bound on the frames left, 0 when touching the goal and
+                   infinite when the goal is above a player that cannot climb
+        """
+        x, y, width = (int(value) for value in key[:3])
+        goal = self.simulation.goal
+        # colliderect needs the rects to overlap by a pixel
+        gap_x = max(goal.left - (x + width) + 1, x - goal.right + 1, 0)
+        gap_y = max(y - goal.bottom + 1, 0)  # falling has no speed limit
+        frames_x = math.ceil(gap_x / self._speed_x) if gap_x else 0
+        if not gap_y:
+            return frames_x
+        if not self._speed_y:
+            return math.inf
+        return max(frames_x, math.ceil(gap_y / self._speed_y))
+
+    def plan(self, start: Sequence[float] | None = None,
+             max_expansions: int = MAX_EXPANSIONS) -> Route | None:
+        """Finds the fastest route to the goal
+
+        Args:
+            start (Sequence[float] | None): state written by Simulation.save_state to
+                                            start from, the level's spawn if None
+            max_expansions (int): states expanded before giving up
+
+        Returns:
+            Route | None: the route, None if the goal cannot be reached or the search
+                          gave up
+        """
+        if start is None:
+            self.simulation.reset()
+        else:
+            self.simulation.load_state(array("d", start), 0)
+        root = self._key()
+        self._load(root)
+        if self.simulation.outcome() is True:
+            return Route(self.level, b"", 0, 0)
+
+        weight, heuristic, cell = self.weight, self.heuristic, self.cell
+        parents: dict[StateKey, tuple[StateKey, int]] = {}
+        # cheapest known cost of every cell and the state that reached it
+        best: dict[StateKey, tuple[int, StateKey]] = {cell(root): (0, root)}
+        goals: set[StateKey] = set()
+        order = count()  # ties go to the deeper state, then to the first pushed
+        queue = [(weight * heuristic(root), 0, next(order), root)]
+        expanded = 0
+        while queue and expanded < max_expansions:
+            _, depth, _, key = heapq.heappop(queue)
+            if best[cell(key)] != (-depth, key):
+                continue  # the cell was reached sooner by this or another state
+            if key in goals:
+                inputs = self._route(parents, root, key)
+                return Route(self.level, inputs, len(inputs), expanded)
+            expanded += 1
+            cost = 1 - depth
+            for mask, child, won in self._expand(key):
+                child_cell = cell(child)
+                known = best.get(child_cell)
+                if known is not None and known[0] <= cost:
+                    continue
+                best[child_cell] = (cost, child)
+                parents[child] = (key, mask)
+                if won:
+                    goals.add(child)
+                heapq.heappush(queue, (cost + (0 if won else weight * heuristic(child)),
+                                       -cost, next(order), child))
+        return None
+
+    @staticmethod
+    def _route(parents: dict[StateKey, tuple[StateKey, int]], root: StateKey,
+               goal: StateKey) -> bytes:
+        """Inputs from the root to the goal, walked back through the parents
+        """
+        inputs = bytearray()
+        key = goal
+        while key != root:
+            key, mask = parents[key]
+            inputs.append(mask)
+        inputs.reverse()
+        return bytes(inputs)
+
+
+def save_route(route: Route, path: str) -> None:
+    """Saves a route as a replay, played through a fresh simulation
+
+    Args:
+        route (Route): the route
+        path (str): replay file
+    """
+    simulation = Simulation()
+    simulation.level_changer(route.level)
+    keys = MaskKeys()
+    recorder = ReplayRecorder(route.level)
+    for mask in route.inputs:
+        keys.mask = mask
+        simulation.step(keys)
+        recorder.record(mask, simulation)
+    recorder.save(path, simulation.outcome())
+
+
+def main(argv: Sequence[str] | None = None) -> int:  # pragma: no cover
+    """Prints the reference time of every level asked for
+
+    Args:
+        argv (Sequence[str] | None): command line arguments, sys.argv if None
+
+    Returns:
+        int: exit status, 1 if a level could not be planned
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("levels", nargs="*", type=int, default=LEVELS)
+    parser.add_argument("--weight", type=float, default=1.0,
+                        help="heuristic weight, above 1 is faster but not optimal")
+    parser.add_argument("--resolution", type=int, default=1,
+                        help="pixels per cell, above 1 is faster but near optimal")
+    parser.add_argument("--max-expansions", type=int, default=MAX_EXPANSIONS)
+    parser.add_argument("--save", metavar="DIR", help="save every route as a replay")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for level in args.levels:
+        planner = RoutePlanner(level, weight=args.weight, resolution=args.resolution)
+        route = planner.plan(max_expansions=args.max_expansions)
+        if route is None:
+            print(f"level {level}: no route")
+            status = 1
+            continue
+        print(f"level {level}: {route.frames} frames, {route.expanded} states expanded")
+        if args.save:
+            os.makedirs(args.save, exist_ok=True)
+            save_route(route, os.path.join(args.save, f"route_level_{level}.replay"))
+    return status
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
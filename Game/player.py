@@ -4,10 +4,24 @@ Player class that the user interacts with to move around the level
 """
 
 from __future__ import annotations
+from array import array
+from collections.abc import Sequence
 import pygame
 
+from input_state import KeyInput
+from moving_platform import MovingPlatform
 from movement_strategy import MovementStrategy, NormalMovement
 
+# colors the color setter takes by name
+COLOR_NAMES: dict[str, tuple[int, int, int]] = {
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "yellow": (255, 255, 0),
+}
+
 
 class Player:
     """Player object that handles input, moves, applies gravity, handle collision for player
@@ -20,6 +34,7 @@ class Player:
         "__fall_speed",
         "__wall_jump_speed",
         "__jump_velocity",
+        "__move_velocity",
         "__color",
         "__size",
         "__on_ground",
@@ -30,6 +45,9 @@ class Player:
         "__movement_strategy"
     )
 
+    # number of floats save_state writes: rect (4), jump velocity, 4 flags, move velocity
+    STATE_SIZE: int = 10
+
     def __init__(self, x: int = 0, y: int = 0,
                  chosen_color: tuple[int, int, int] = (0, 128, 255),
                  rec_size: tuple[int, int] = (40, 40),
@@ -63,6 +81,9 @@ class Player:
 
         # Player's velocity (set to 0 initially) rect handles horizontal velocity
         self.jump_velocity: float = 0.0
+        # velocity the movement strategy gave last frame, before collisions, the
+        # momentum of strategies like IceMovement
+        self.move_velocity: int = 0
 
         # Players flags
         self.on_ground: bool = False
@@ -154,7 +175,8 @@ class Player:
         if (
             not isinstance(new_size, tuple)
             or len(new_size) != 2
-            or not all(isinstance(v, int) and v > 0 for v in new_size)
+            or not isinstance(new_size[0], int) or new_size[0] <= 0
+            or not isinstance(new_size[1], int) or new_size[1] <= 0
         ):
             raise TypeError("size must be a tuple of two positive ints (width, height)")
 
@@ -180,19 +202,10 @@ class Player:
                 (str): A color name such as red, green, blue, white, black, or yellow
                 (tuple[int]) A tuple of 3 ints that represent RGB
         """
-        color_dict = {
-            "red": (255, 0, 0),
-            "green": (0, 255, 0),
-            "blue": (0, 0, 255),
-            "white": (255, 255, 255),
-            "black": (0, 0, 0),
-            "yellow": (255, 255, 0),
-        }
-
         if isinstance(chosen_color, str):
-            if chosen_color.lower() not in color_dict:
-                raise ValueError("chosen_color name is NOT in color_dict")
-            self.__color: tuple[int, int, int] | str = color_dict[chosen_color.lower()]
+            if chosen_color.lower() not in COLOR_NAMES:
+                raise ValueError("chosen_color name is NOT in COLOR_NAMES")
+            self.__color: tuple[int, int, int] | str = COLOR_NAMES[chosen_color.lower()]
 
         elif not isinstance(chosen_color, tuple) or len(chosen_color) != 3:
             raise TypeError("chosen_color must be a tuple with three ints that represent RGB")
@@ -302,6 +315,27 @@ class Player:
 
         self.__jump_velocity = velocity
 
+    @property
+    def move_velocity(self) -> int:
+        """Getter for the velocity the movement strategy gave last frame
+
+        Returns
+            int: horizontal velocity before collisions
+        """
+        return self.__move_velocity
+
+    @move_velocity.setter
+    def move_velocity(self, velocity: int) -> None:
+        """Setter for the velocity the movement strategy gave last frame
+
+        Args
+            velocity (int): horizontal velocity before collisions
+        """
+        if not isinstance(velocity, int):
+            raise TypeError("Player's move_velocity must be an int")
+
+        self.__move_velocity = velocity
+
     @property
     def on_ground(self) -> bool:
         """Getter for on ground flag
@@ -405,13 +439,19 @@ class Player:
 
 # *********** Player Movement & Physics ****************************
 
-    def horizontal_movement(self, keys: pygame.key.ScancodeWrapper) -> int:
+    def horizontal_movement(self, keys: KeyInput) -> int:
         """Handles Horizontal (player.x) movement
 
         Args
-            keys (pygame.key.ScancodeWrapper): Keyboard input
+            keys (KeyInput): this frame's input, usually an InputState
         """
-        return self.movement_strategy.get_horizontal_velocity(self.move_speed, keys)
+        strategy = self.__movement_strategy
+        if isinstance(strategy, MovementStrategy):
+            velocity = strategy.next_velocity(self.move_speed, keys, self.__move_velocity)
+        else:  # any object with get_horizontal_velocity, without momentum
+            velocity = strategy.get_horizontal_velocity(self.move_speed, keys)
+        self.__move_velocity = velocity
+        return velocity
 
     def handle_horizontal_collisions(
             self, colliders: list[pygame.Rect], horizontal_velocity: int,) -> None:
@@ -433,7 +473,7 @@ class Player:
                     self.__rect.left = collider.right
                     self.touching_left_wall = True
 
-    def jump(self, keys: pygame.key.ScancodeWrapper) -> None:
+    def jump(self, keys: KeyInput) -> None:
         """Handles jump logic
         """
         if keys[pygame.K_SPACE]:
@@ -473,6 +513,22 @@ class Player:
                     self.__rect.top = collider.bottom
                     self.jump_velocity = 0.0
 
+    def ride(self, platforms: Sequence[MovingPlatform]) -> None:
+        """Carries the player by the last move of the moving platform it stands on.
+        Standing is checked against where the platform was, because on_ground flips
+        while resting
+
+        Args:
+            platforms (Sequence[MovingPlatform]): moving platforms, already moved this frame
+        """
+        rect = self.__rect
+        for platform in platforms:
+            previous = platform.previous
+            if (rect.bottom == previous.top
+                    and rect.right > previous.left and rect.left < previous.right):
+                rect.move_ip(platform.dx, platform.dy)
+                return
+
     def reposition(self, x: int, y: int) -> None:
         """Move the player to a new (x, y) area. Could use for spawning/respawning
         or teleport the player to set location. Resets jump_velocity and flags
@@ -488,19 +544,61 @@ class Player:
         self.__rect.y = y
 
         self.jump_velocity = 0.0
+        self.move_velocity = 0
         self.on_ground = False
         self.touching_left_wall = False
         self.touching_right_wall = False
         self.can_wall_jump = True
 
-    def update(self, keys: pygame.key.ScancodeWrapper, colliders: list[pygame.Rect]) -> None:
+    def save_state(self, buffer: array[float], offset: int) -> None:
+        """Copies the physics state into a preallocated float array, for rollback.
+        Nothing is allocated and the setters' checks are skipped
+
+        Args:
+            buffer (array[float]): array('d') with room for STATE_SIZE floats at offset
+            offset (int): index of the first float
+        """
+        rect = self.__rect
+        buffer[offset] = rect.x
+        buffer[offset + 1] = rect.y
+        buffer[offset + 2] = rect.w
+        buffer[offset + 3] = rect.h
+        buffer[offset + 4] = self.__jump_velocity
+        buffer[offset + 5] = self.__on_ground
+        buffer[offset + 6] = self.__can_wall_jump
+        buffer[offset + 7] = self.__touching_left_wall
+        buffer[offset + 8] = self.__touching_right_wall
+        buffer[offset + 9] = self.__move_velocity
+
+    def load_state(self, buffer: array[float], offset: int) -> None:
+        """Restores the physics state written by save_state
+
+        Args:
+            buffer (array[float]): array('d') holding a saved state at offset
+            offset (int): index of the first float
+        """
+        self.__rect.update(int(buffer[offset]), int(buffer[offset + 1]),
+                           int(buffer[offset + 2]), int(buffer[offset + 3]))
+        self.__jump_velocity = buffer[offset + 4]
+        self.__on_ground = buffer[offset + 5] != 0.0
+        self.__can_wall_jump = buffer[offset + 6] != 0.0
+        self.__touching_left_wall = buffer[offset + 7] != 0.0
+        self.__touching_right_wall = buffer[offset + 8] != 0.0
+        self.__move_velocity = int(buffer[offset + 9])
+
+    def update(self, keys: KeyInput, colliders: list[pygame.Rect],
+               platforms: Sequence[MovingPlatform] = ()) -> None:
         """Updates player's loop in game
 
         Args
-            keys (pygame.key.ScancodeWrapper): Keyboard input
+            keys (KeyInput): this frame's input, usually an InputState
             colliders (list[pygame.Rect]): List of wall, platforms, or anything the player can
-                                           collide with
+                                           collide with, moving platforms included
+            platforms (Sequence[MovingPlatform]): moving platforms that can carry the player
         """
+        if platforms:
+            self.ride(platforms)
+
         horizontal_velocity = self.horizontal_movement(keys)
         self.x += horizontal_velocity
 
@@ -0,0 +1,359 @@
+"""profiling.py
+
+Profilers the game can be started with, see game.main:
+
+    python game.py --profile cprofile       # function hotspots
+    python game.py --profile tracemalloc    # allocation sites, per frame
+    python game.py --profile sample         # stack samples at an interval
+
+or GAME_PROFILE=sample python game.py. A profiler is started before the game, told
+about every frame by the main loop and writes its files into the profile directory when
+the game exits, crash or not. Every file name starts with the mode and the time the
+session started, so sessions do not overwrite each other.
+
+net_allocations is the test mode: it runs a frame function many times and reports what
+is left allocated afterwards, so tests can assert a steady-state frame allocates
+nothing the garbage collector would have to clean up.
+"""
+
+from __future__ import annotations
+import cProfile
+import gc
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import Callable
+from types import FrameType
+from typing import NamedTuple
+
+# default directory the profiles are written to
+PROFILE_DIR: str = "profiles"
+# lines of the text reports
+REPORT_LINES: int = 40
+
+
+class Profiler(ABC):
+    """Abstract class for a profiler of one game session
+    """
+
+    mode: str = ""
+
+    def __init__(self, directory: str = PROFILE_DIR) -> None:
+        """Initializes the profiler, nothing is measured before start
+
+        Args:
+            directory (str): where write puts the files, made if missing
+        """
+        self.directory: str = directory
+        self.frames: int = 0
+        self._stamp: str = time.strftime("%Y%m%d-%H%M%S")
+
+    def path(self, suffix: str) -> str:
+        """Path of one output file
+
+        Args:
+            suffix (str): end of the file name, like ".prof"
+
+        Returns:
+            str: path in the profile directory
+        """
+        return os.path.join(self.directory, f"{self.mode}-{self._stamp}{suffix}")
+
+    @abstractmethod
+    def start(self) -> None:
+        """Starts measuring
+        """
+
+    def frame(self) -> None:
+        """Called by the main loop at the end of every frame
+        """
+        self.frames += 1
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Stops measuring, safe to call more than once
+        """
+
+    @abstractmethod
+    def write(self) -> list[str]:
+        """Writes the results
+
+        Returns:
+            list[str]: paths of the files written
+        """
+
+
+class CProfileProfiler(Profiler):
+    """Deterministic profile of every function call, for hotspots
+    """
+
+    mode = "cprofile"
+
+    def __init__(self, directory: str = PROFILE_DIR) -> None:
+        super().__init__(directory)
+        self._profile: cProfile.Profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def write(self) -> list[str]:
+        """Writes the raw stats for pstats or snakeviz and a text report of the
+        functions with the most cumulative time
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stats_path, report_path = self.path(".prof"), self.path(".txt")
+        self._profile.dump_stats(stats_path)
+        report = io.StringIO()
+        report.write(f"{self.frames} frames\n")
+        stats = pstats.Stats(self._profile, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LINES)
+        with open(report_path, "w") as file:
+            file.write(report.getvalue())
+        return [stats_path, report_path]
+
+
+class AllocationProfiler(Profiler):
+    """tracemalloc snapshots every interval frames. Each snapshot is compared with the
+    one before, so the report shows which lines keep memory growing and by how much
+    per frame, and the last snapshot is kept for tracemalloc tooling
+    """
+
+    mode = "tracemalloc"
+
+    def __init__(self, directory: str = PROFILE_DIR, interval: int = 60,
+                 depth: int = 1) -> None:
+        """Initializes the profiler
+
+        Args:
+            directory (str): where write puts the files
+            interval (int): frames between snapshots
+            depth (int): stack frames kept per allocation
+        """
+        super().__init__(directory)
+        if interval < 1:
+            raise ValueError("interval must be at least 1")
+        self.interval: int = interval
+        self.depth: int = depth
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._growth: Counter[str] = Counter()  # bytes per allocation site
+        self._blocks: Counter[str] = Counter()  # blocks per allocation site
+        self._measured: int = 0  # frames between the first and the last snapshot
+        self._started: bool = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.depth)
+            self._started = True
+        self._snapshot = self._take()
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        """Snapshot without the profiler's own allocations
+        """
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),
+             tracemalloc.Filter(False, __file__)))
+
+    def frame(self) -> None:
+        super().frame()
+        if self.frames % self.interval == 0:
+            self._compare()
+
+    def _compare(self) -> None:
+        """Adds the growth since the last snapshot to the totals
+        """
+        if self._snapshot is None:
+            return
+        snapshot = self._take()
+        for stat in snapshot.compare_to(self._snapshot, "lineno"):
+            site = str(stat.traceback[0])
+            self._growth[site] += stat.size_diff
+            self._blocks[site] += stat.count_diff
+        self._measured = self.frames
+        self._snapshot = snapshot
+
+    def stop(self) -> None:
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def write(self) -> list[str]:
+        """Writes the last snapshot and a report of the allocation sites that grew the
+        most, in bytes and blocks per frame
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        paths = [self.path(".txt")]
+        frames = max(self._measured, 1)
+        with open(paths[0], "w") as file:
+            file.write(f"{self.frames} frames, growth measured over {self._measured}\n")
+            file.write(f"{'bytes/frame':>12} {'blocks/frame':>12}  site\n")
+            for site, size in self._growth.most_common(REPORT_LINES):
+                file.write(f"{size / frames:12.1f} {self._blocks[site] / frames:12.2f}  {site}\n")
+        if self._snapshot is not None:
+            paths.append(self.path(".snapshot"))
+            self._snapshot.dump(paths[1])
+        return paths
+
+
+class SamplingProfiler(Profiler):
+    """A background thread records the main thread's stack every interval seconds.
+    The game is never interrupted, the cost is one stack walk per sample
+    """
+
+    mode = "sample"
+
+    def __init__(self, directory: str = PROFILE_DIR, interval: float = 0.005) -> None:
+        """Initializes the profiler
+
+        Args:
+            directory (str): where write puts the files
+            interval (float): seconds between samples
+        """
+        super().__init__(directory)
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval: float = interval
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self._target: int = threading.get_ident()
+        self._done: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Starts sampling the calling thread
+        """
+        self._target = threading.get_ident()
+        self._done.clear()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self.stacks[self._stack(frame)] += 1
+
+    @staticmethod
+    def _stack(frame: FrameType | None) -> tuple[str, ...]:
+        """Names of the functions on a stack, outermost first
+        """
+        names: list[str] = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                         f":{code.co_firstlineno})")
+            frame = frame.f_back
+        names.reverse()
+        return tuple(names)
+
+    def stop(self) -> None:
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write(self) -> list[str]:
+        """Writes the samples in the folded format flame graph tools read, one stack
+        and its count per line, and a report of the functions most often on top
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        folded_path, report_path = self.path(".folded"), self.path(".txt")
+        with open(folded_path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{';'.join(stack)} {count}\n")
+
+        total = sum(self.stacks.values())
+        own: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            if stack:
+                own[stack[-1]] += count
+        with open(report_path, "w") as file:
+            file.write(f"{total} samples every {self.interval * 1000:g} ms, "
+                       f"{self.frames} frames\n")
+            for name, count in own.most_common(REPORT_LINES):
+                file.write(f"{100 * count / max(total, 1):6.2f}%  {name}\n")
+        return [folded_path, report_path]
+
+
+class Allocations(NamedTuple):
+    """What a run of frames left allocated
+    """
+    blocks: int  # memory blocks, traced by tracemalloc
+    objects: int  # objects the garbage collector tracks, their count triggers its pauses
+
+
+def net_allocations(frame: Callable[[], None], frames: int = 300,
+                    warmup: int = 300) -> Allocations:
+    """Runs frame warmup times, then frames times while measuring. The collector is
+    off while measuring, so its generation 0 count goes up for every container made
+    and down for every one freed. A frame that reuses its objects leaves the count at
+    0 and the blocks at a handful the interpreter's free lists hold on to, buffers that
+    grow in place, like a recording's bytearray, stay one block
+
+    Args:
+        frame (Callable[[], None]): plays one frame
+        frames (int): frames measured
+        warmup (int): frames played first, so caches and buffers are made and frame
+                      counters have left the small ints Python keeps preallocated
+
+    Returns:
+        Allocations: net blocks and net tracked objects over the measured frames
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    enabled = gc.isenabled()
+    try:
+        # a collection empties the free lists, the warmup fills them again
+        gc.collect()
+        gc.disable()
+        # traced from the warmup on, objects made before tracing would be freed unseen
+        for _ in range(warmup):
+            frame()
+        AllocationProfiler._take()  # the filters compile their patterns once
+        # the count stops at 0 instead of going below, frees must have room to count
+        padding: list[list[int]] = [[] for _ in range(1000)]
+        before = AllocationProfiler._take()
+        objects = gc.get_count()[0]
+        for _ in range(frames):
+            frame()
+        objects = gc.get_count()[0] - objects
+        after = AllocationProfiler._take()
+        del padding
+    finally:
+        if enabled:
+            gc.enable()
+        if started:
+            tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return Allocations(blocks, objects)
+
+
+PROFILERS: dict[str, type[Profiler]] = {
+    CProfileProfiler.mode: CProfileProfiler,
+    AllocationProfiler.mode: AllocationProfiler,
+    SamplingProfiler.mode: SamplingProfiler,
+}
+
+
+def make_profiler(mode: str, directory: str = PROFILE_DIR) -> Profiler:
+    """Creates a profiler by mode name
+
+    Args:
+        mode (str): cprofile, tracemalloc or sample
+        directory (str): where the profiler writes its files
+
+    Returns:
+        Profiler: the profiler, not started yet
+    """
+    if mode not in PROFILERS:
+        raise ValueError(f"unknown profile mode {mode}, pick one of {', '.join(PROFILERS)}")
+    return PROFILERS[mode](directory)
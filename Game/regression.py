@@ -0,0 +1,142 @@
+"""regression.py
+
+Replay regression harness. Every replay in a directory is played again, headless and
+without a frame cap, across the simulation farm's worker processes against the current
+Player and Level_Objects code. A replay passes when the attempt ends the same way after
+the same number of frames with the same final state checksum. A replay that fails is
+played again frame by frame to report the first frame and field that changed.
+
+    python regression.py replays                  # check, exit status 1 on failures
+    python regression.py corpus --record 2000     # add 2000 fuzzed replays first
+
+The throughput is printed with the results so the run can be kept fast enough for
+every commit.
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from collections.abc import Iterable, Sequence
+
+from input_state import MaskKeys
+from replay import ReplayRecorder
+from sim_farm import ReplayCheck, SimulationFarm, random_jobs
+from simulation import Simulation
+
+REPLAY_SUFFIX: str = ".replay"
+# frames of every recorded fuzzed replay
+RECORD_FRAMES: int = 600
+
+
+def find_replays(directory: str) -> list[str]:
+    """Replay files under a directory
+
+    Args:
+        directory (str): searched with its subdirectories
+
+    Returns:
+        list[str]: paths in sorted order so runs compare
+    """
+    found: list[str] = []
+    for root, _, files in os.walk(directory):
+        found.extend(os.path.join(root, name) for name in files if name.endswith(REPLAY_SUFFIX))
+    return sorted(found)
+
+
+def record_replays(directory: str, jobs: Iterable[tuple[int, bytes]]) -> list[str]:
+    """Plays scripted attempts the way scenes.PlayScene does and saves their replays,
+    the recordings are the expected results of later checks
+
+    Args:
+        directory (str): where the replays are written
+        jobs (Iterable[tuple[int, bytes]]): (level, input bitmasks) per attempt
+
+    Returns:
+        list[str]: paths written
+    """
+    simulation = Simulation()
+    keys = MaskKeys()
+    paths: list[str] = []
+    for job_id, (level, inputs) in enumerate(jobs):
+        if not simulation.level_changer(level):
+            raise ValueError(f"level {level} does not exist")
+        recorder = ReplayRecorder(level)
+        for mask in inputs:
+            if simulation.outcome() is not None:
+                break
+            keys.mask = mask
+            simulation.step(keys)
+            recorder.record(mask, simulation)
+        path = os.path.join(directory, f"fuzz_{job_id:06d}_level_{level}{REPLAY_SUFFIX}")
+        recorder.save(path, simulation.outcome())
+        paths.append(path)
+    return paths
+
+
+def check_replays(paths: Sequence[str], workers: int | None = None,
+                  batch_size: int = 64) -> tuple[list[ReplayCheck], float]:
+    """Checks replays on a simulation farm
+
+    Args:
+        paths (Sequence[str]): replay files
+        workers (int | None): worker processes, defaults to the core count
+        batch_size (int): replays sent to a worker at a time
+
+    Returns:
+        tuple[list[ReplayCheck], float]: results in path order and the seconds the
+                                         checks took, without starting the workers
+    """
+    with SimulationFarm(workers, batch_size) as farm:
+        checks = farm.check(paths)
+    return checks, farm.last_seconds
+
+
+def report(checks: Sequence[ReplayCheck], seconds: float) -> str:
+    """Failures and throughput for the console
+
+    Args:
+        checks (Sequence[ReplayCheck]): results of check_replays
+        seconds (float): time the checks took
+
+    Returns:
+        str: one line per failure and a summary line
+    """
+    lines = [f"FAIL {check.path}: {check.error}" for check in checks if check.error is not None]
+    failed = len(lines)
+    frames = sum(check.frames for check in checks)
+    seconds = max(seconds, 1e-9)
+    lines.append(f"{len(checks) - failed} of {len(checks)} replays match, {frames} frames "
+                 f"in {seconds:.2f} s, {len(checks) / seconds:.1f} replays/s, "
+                 f"{frames / seconds:.0f} frames/s")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Check recorded replays against the "
+                                                 "current physics and levels")
+    parser.add_argument("directory", help="directory searched for .replay files")
+    parser.add_argument("--workers", type=int, help="worker processes, defaults to every core")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--record", type=int, metavar="RUNS",
+                        help="first record this many fuzzed replays into the directory")
+    parser.add_argument("--frames", type=int, default=RECORD_FRAMES,
+                        help="frames of every recorded replay")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        started = time.perf_counter()
+        record_replays(args.directory, random_jobs(args.record, args.frames))
+        print(f"recorded {args.record} replays in {time.perf_counter() - started:.2f} s")
+    paths = find_replays(args.directory)
+    if not paths:
+        print(f"no replays in {args.directory}", file=sys.stderr)
+        return 1
+    checks, seconds = check_replays(paths, args.workers, args.batch_size)
+    print(report(checks, seconds))
+    return 0 if all(check.error is None for check in checks) else 1
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
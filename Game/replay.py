@@ -0,0 +1,258 @@
+"""replay.py
+
+Replays: the input bitmask, the state checksum and the quantized player state of every
+frame of an attempt. Playing the inputs back through a fresh Simulation must give the
+same checksums; verify reports the first frame and field where it does not.
+
+States are stored as deltas from the previous frame. A varint bit mask says which
+fields changed and only those are written, as zigzag varints, so a frame where only x
+moved costs a few bytes.
+
+    header:  b"RPLY", version, level, frames, outcome (0 none, 1 win, 2 fell)  (varints)
+    frame:   input mask, checksum (4 bytes little endian), changed fields, deltas
+"""
+
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+import os
+
+from checksum import FIELDS, Desync, diff_states, quantize, quantize_into
+from ghost import read_varint, write_varint, zigzag, unzigzag
+from player import Player
+from input_state import MaskKeys
+from simulation import Simulation
+
+MAGIC: bytes = b"RPLY"
+VERSION: int = 2  # 2 added move_velocity to the state
+
+_OUTCOME_CODES: dict[bool | None, int] = {None: 0, True: 1, False: 2}
+_OUTCOMES: tuple[bool | None, ...] = (None, True, False)
+
+
+def _header(level: int, frames: int, outcome: bool | None) -> bytearray:
+    """Encodes the header of a replay
+    """
+    header = bytearray(MAGIC)
+    for value in (VERSION, level, frames, _OUTCOME_CODES[outcome]):
+        write_varint(header, value)
+    return header
+
+
+def _write_frame(out: bytearray, mask: int, checksum: int,
+                 last: Sequence[int], state: Sequence[int]) -> None:
+    """Appends one frame: input, checksum and the fields that changed since last
+    """
+    out.append(mask)
+    out += checksum.to_bytes(4, "little")
+    changed = 0
+    for index, (old, new) in enumerate(zip(last, state)):
+        if old != new:
+            changed |= 1 << index
+    write_varint(out, changed)
+    for index, (old, new) in enumerate(zip(last, state)):
+        if changed >> index & 1:
+            write_varint(out, zigzag(new - old))
+
+
+def _write_file(path: str, data: bytes) -> None:
+    """Writes a file through a temporary so a crash never leaves half a replay
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+class ReplayRecorder:
+    """Collects one attempt frame by frame
+    """
+
+    __slots__ = ("level", "frames", "_body", "_last", "_now", "_state")
+
+    def __init__(self, level: int) -> None:
+        """Starts an empty recording
+
+        Args:
+            level (int): level being played
+        """
+        self.level: int = level
+        self.frames: int = 0
+        self._body: bytearray = bytearray()
+        # quantized states of the last and this frame, swapped after every frame
+        self._last: array[int] = array("q", bytes(8 * len(FIELDS)))
+        self._now: array[int] = array("q", bytes(8 * len(FIELDS)))
+        self._state: array[float] = array("d", bytes(8 * Player.STATE_SIZE))
+
+    def record(self, mask: int, simulation: Simulation) -> None:
+        """Adds a frame after it was simulated
+
+        Args:
+            mask (int): input bitmask used for the frame
+            simulation (Simulation): simulation right after its step
+        """
+        simulation.player.save_state(self._state, 0)
+        quantize_into(self._state, self._now)
+        _write_frame(self._body, mask, simulation.checksum, self._last, self._now)
+        self._last, self._now = self._now, self._last
+        self.frames += 1
+
+    def to_bytes(self, outcome: bool | None) -> bytes:
+        """Encodes the recording
+
+        Args:
+            outcome (bool | None): how the attempt ended, see Simulation.outcome
+
+        Returns:
+            bytes: the replay file contents
+        """
+        return bytes(_header(self.level, self.frames, outcome) + self._body)
+
+    def save(self, path: str, outcome: bool | None) -> None:
+        """Writes the recording to a file, replacing it atomically
+
+        Args:
+            path (str): file to write
+            outcome (bool | None): how the attempt ended, see Simulation.outcome
+        """
+        _write_file(path, self.to_bytes(outcome))
+
+
+class Replay:
+    """A decoded replay
+    """
+
+    def __init__(self, level: int, outcome: bool | None, inputs: bytes,
+                 checksums: Sequence[int], states: Sequence[tuple[int, ...]]) -> None:
+        """Initializes the replay
+
+        Args:
+            level (int): level that was played
+            outcome (bool | None): how the attempt ended
+            inputs (bytes): input bitmask of every frame
+            checksums (Sequence[int]): checksum after every frame
+            states (Sequence[tuple[int, ...]]): quantized state after every frame
+        """
+        self.level: int = level
+        self.outcome: bool | None = outcome
+        self.inputs: bytes = inputs
+        self.checksums: array[int] = array("I", checksums)
+        self.states: list[tuple[int, ...]] = list(states)
+
+    @property
+    def frames(self) -> int:
+        """Getter for the number of frames
+
+        Returns:
+            int: frames recorded
+        """
+        return len(self.inputs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Replay:
+        """Decodes a replay written by ReplayRecorder.to_bytes
+
+        Args:
+            data (bytes): replay file contents
+
+        Returns:
+            Replay: the decoded replay
+        """
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a replay")
+        pos = len(MAGIC)
+        version, pos = read_varint(data, pos)
+        if version != VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        level, pos = read_varint(data, pos)
+        frames, pos = read_varint(data, pos)
+        outcome, pos = read_varint(data, pos)
+        if outcome >= len(_OUTCOMES):
+            raise ValueError(f"unknown replay outcome {outcome}")
+
+        inputs = bytearray(frames)
+        checksums = array("I", bytes(4 * frames))
+        states: list[tuple[int, ...]] = []
+        state = [0] * len(FIELDS)
+        for frame in range(frames):
+            if pos + 5 > len(data):
+                raise ValueError("truncated replay")
+            inputs[frame] = data[pos]
+            checksums[frame] = int.from_bytes(data[pos + 1:pos + 5], "little")
+            changed, pos = read_varint(data, pos + 5)
+            for index in range(len(FIELDS)):
+                if changed >> index & 1:
+                    delta, pos = read_varint(data, pos)
+                    state[index] += unzigzag(delta)
+            states.append(tuple(state))
+        return cls(level, _OUTCOMES[outcome], bytes(inputs), checksums, states)
+
+    def to_bytes(self) -> bytes:
+        """Encodes the replay, the inverse of from_bytes
+
+        Returns:
+            bytes: the replay file contents
+        """
+        out = _header(self.level, self.frames, self.outcome)
+        last: tuple[int, ...] = (0,) * len(FIELDS)
+        for mask, checksum, state in zip(self.inputs, self.checksums, self.states):
+            _write_frame(out, mask, checksum, last, state)
+            last = state
+        return bytes(out)
+
+    def save(self, path: str) -> None:
+        """Writes the replay to a file, replacing it atomically
+
+        Args:
+            path (str): file to write
+        """
+        _write_file(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> Replay:
+        """Reads a replay file
+
+        Args:
+            path (str): file written by save
+
+        Returns:
+            Replay: the decoded replay
+        """
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+
+def verify(replay: Replay, simulation: Simulation | None = None) -> Desync | None:
+    """Plays a replay's inputs again and compares every frame against the recording
+
+    Args:
+        replay (Replay): recording to check
+        simulation (Simulation | None): simulation to play on, a new one if None
+
+    Returns:
+        Desync | None: the first frame and field that differ, None if the run matches
+    """
+    if simulation is None:
+        simulation = Simulation()
+    if not simulation.level_changer(replay.level):
+        raise ValueError(f"replay level {replay.level} does not exist")
+    keys = MaskKeys()
+    state = array("d", bytes(8 * Player.STATE_SIZE))
+    for frame, mask in enumerate(replay.inputs):
+        keys.mask = mask
+        simulation.step(keys)
+        if simulation.checksum != replay.checksums[frame]:
+            simulation.player.save_state(state, 0)
+            desync = diff_states(frame, replay.states[frame], quantize(state))
+            if desync is not None:
+                return desync
+            # states agree, so the recorded checksum chain itself was broken
+            return Desync(frame, "checksum", replay.checksums[frame], simulation.checksum)
+    outcome = simulation.outcome()
+    if outcome != replay.outcome:
+        return Desync(replay.frames, "outcome",
+                      _OUTCOME_CODES[replay.outcome], _OUTCOME_CODES[outcome])
+    return None
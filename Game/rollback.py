@@ -0,0 +1,180 @@
+"""rollback.py
+
+Rollback netcode. Every frame the state of each simulation is copied into a
+preallocated ring of snapshots. Remote inputs that have not arrived yet are predicted
+by repeating the last confirmed input. When a real input arrives that differs from the
+prediction, the session restores the snapshot of that frame and simulates forward
+again, all inside one call to advance.
+
+Inputs are accepted from a ring's length in the past to a ring's length ahead, so they
+are kept in a ring twice as long as the snapshots: an input sent early never shares a
+slot with a past frame that can still be rolled back.
+"""
+
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+
+from input_state import MaskKeys
+from simulation import Simulation
+
+# how far back a late input can still be corrected
+DEFAULT_RING_SIZE: int = 16
+
+
+class SnapshotRing:
+    """Fixed number of saved states, slot = frame % capacity
+    """
+
+    __slots__ = ("capacity", "state_size", "_states", "_frames")
+
+    def __init__(self, capacity: int, state_size: int) -> None:
+        """Allocates every slot up front
+
+        Args:
+            capacity (int): number of frames kept
+            state_size (int): floats per saved frame
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity: int = capacity
+        self.state_size: int = state_size
+        self._states: array[float] = array("d", bytes(8 * capacity * state_size))
+        self._frames: array[int] = array("q", [-1]) * capacity
+
+    def save(self, frame: int, simulations: Sequence[Simulation]) -> None:
+        """Saves every simulation's state for a frame
+
+        Args:
+            frame (int): frame number
+            simulations (Sequence[Simulation]): simulations that share this ring
+        """
+        slot = frame % self.capacity
+        offset = slot * self.state_size
+        for simulation in simulations:
+            simulation.save_state(self._states, offset)
+            offset += simulation.state_size
+        self._frames[slot] = frame
+
+    def load(self, frame: int, simulations: Sequence[Simulation]) -> None:
+        """Restores every simulation to a saved frame
+
+        Args:
+            frame (int): frame number
+            simulations (Sequence[Simulation]): simulations that share this ring
+
+        Raises:
+            KeyError: the frame is no longer (or was never) in the ring
+        """
+        slot = frame % self.capacity
+        if self._frames[slot] != frame:
+            raise KeyError(f"frame {frame} is not in the snapshot ring")
+        offset = slot * self.state_size
+        for simulation in simulations:
+            simulation.load_state(self._states, offset)
+            offset += simulation.state_size
+
+
+class RollbackSession:
+    """Runs several simulations in lockstep with predicted remote inputs
+    """
+
+    def __init__(self, simulations: Sequence[Simulation], local: int,
+                 ring_size: int = DEFAULT_RING_SIZE) -> None:
+        """Initializes the session at frame 0
+
+        Args:
+            simulations (Sequence[Simulation]): one simulation per player
+            local (int): index of the local player
+            ring_size (int): frames of history, the longest rollback possible
+        """
+        self.simulations: list[Simulation] = list(simulations)
+        self.local: int = local
+        self.frame: int = 0
+        self.ring: SnapshotRing = SnapshotRing(
+            ring_size, sum(simulation.state_size for simulation in self.simulations))
+
+        players = len(self.simulations)
+        # inputs of the frames that can be rolled back and of the frames that can
+        # arrive early, and which of them are confirmed, slot = frame % input_size
+        self._input_size: int = 2 * ring_size
+        self._inputs: list[array[int]] = [array("B", bytes(self._input_size))
+                                          for _ in range(players)]
+        self._confirmed: list[array[int]] = [array("q", [-1]) * self._input_size
+                                             for _ in range(players)]
+        self._last_confirmed: list[int] = [0] * players
+        self._last_confirmed_frame: list[int] = [-1] * players
+        self._rollback_to: int | None = None
+        self._keys: MaskKeys = MaskKeys()
+
+        # statistics
+        self.rollbacks: int = 0
+        self.resimulated_frames: int = 0
+
+    def add_remote_input(self, player: int, frame: int, mask: int) -> None:
+        """Confirms a remote player's input for a frame
+
+        Args:
+            player (int): index of the remote player
+            frame (int): frame the input belongs to
+            mask (int): input bitmask
+
+        Raises:
+            ValueError: the frame is outside the ring, too old to roll back to or too
+                        far ahead to store
+        """
+        if frame < self.frame - self.ring.capacity:
+            raise ValueError(f"input for frame {frame} arrived too late to roll back")
+        if frame >= self.frame + self.ring.capacity:
+            raise ValueError(f"input for frame {frame} arrived too early")
+        slot = frame % self._input_size
+        self._confirmed[player][slot] = frame
+        if frame >= self._last_confirmed_frame[player]:
+            self._last_confirmed_frame[player] = frame
+            self._last_confirmed[player] = mask
+        if frame < self.frame:
+            if self._inputs[player][slot] != mask:
+                self._inputs[player][slot] = mask
+                if self._rollback_to is None or frame < self._rollback_to:
+                    self._rollback_to = frame
+        else:
+            self._inputs[player][slot] = mask
+
+    def _input_for(self, player: int, frame: int) -> int:
+        """Confirmed input of a frame, or the prediction if it has not arrived
+        """
+        slot = frame % self._input_size
+        if self._confirmed[player][slot] == frame:
+            return self._inputs[player][slot]
+        mask = self._last_confirmed[player]
+        self._inputs[player][slot] = mask
+        return mask
+
+    def _simulate(self, frame: int) -> None:
+        """Saves the state before a frame then plays the frame
+        """
+        self.ring.save(frame, self.simulations)
+        keys = self._keys
+        for player, simulation in enumerate(self.simulations):
+            keys.mask = self._input_for(player, frame)
+            simulation.step(keys)
+
+    def advance(self, local_mask: int) -> None:
+        """Plays the next frame with the local input, first re-simulating from the
+        oldest frame whose prediction turned out wrong
+
+        Args:
+            local_mask (int): the local player's input bitmask
+        """
+        if self._rollback_to is not None:
+            start = self._rollback_to
+            self._rollback_to = None
+            self.ring.load(start, self.simulations)
+            for frame in range(start, self.frame):
+                self._simulate(frame)
+            self.rollbacks += 1
+            self.resimulated_frames += self.frame - start
+
+        self.add_remote_input(self.local, self.frame, local_mask)
+        self._simulate(self.frame)
+        self.frame += 1
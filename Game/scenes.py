@@ -0,0 +1,355 @@
+"""scenes.py
+
+The screens of the game as scenes on a stack. Every scene is created once with its
+buttons and reused, entering a scene only resets what one visit changes. game.manager
+runs the one main loop: it samples the input, updates the top scene, applies the
+transitions the update asked for and draws whichever scene is on top, so a transition
+takes effect on the frame it was asked for and pacing lives in one place.
+
+The stack always has the main menu at the bottom, the current screen on top of it:
+
+    main menu -> level select -> play -> (celebration on a win) -> post game menu
+"""
+
+from __future__ import annotations
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+import pygame
+
+from input_state import InputState
+from ghost import GhostPlayback, TrajectoryRecorder
+from replay import ReplayRecorder
+from button import button
+from text import TextLine
+import Level_Objects
+
+if TYPE_CHECKING:  # pragma: no cover
+    from game import game
+
+WHITE: tuple[int, int, int] = (255, 255, 255)
+BLACK: tuple[int, int, int] = (0, 0, 0)
+GRAY: tuple[int, int, int] = (112, 112, 112)
+RED: tuple[int, int, int] = (255, 0, 0)
+
+# last attempt of every level, inputs and checksums for desync checks
+REPLAY_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replays")
+# frames the confetti plays after a win before the post game menu
+CELEBRATION_FRAMES: int = 45
+# the simulation steps once per frame, made for this frame rate, the HUD timer uses it
+SIMULATION_RATE: int = 60
+# text size and distance from the top left corner of the HUD
+HUD_SIZE: int = 28
+HUD_MARGIN: int = 10
+
+
+class Scene(ABC):
+    """Abstract class for one screen of the game
+    """
+
+    def __init__(self, host: game) -> None:
+        """Initializes the scene, widgets are made here and nowhere else
+
+        Args:
+            host (game): the game that owns the window and the simulation
+        """
+        self.host: game = host
+
+    def enter(self) -> None:
+        """Called every time the scene comes on top of the stack
+        """
+
+    @abstractmethod
+    def update(self, inputs: InputState) -> None:
+        """Handles one frame of input, transitions go through host.scenes
+        """
+
+    @abstractmethod
+    def draw(self) -> None:
+        """Draws the scene on the host's screen
+        """
+
+
+class SceneStack:
+    """Stack of scenes, the top one is played. Transitions asked for during an update
+    are queued and applied together by apply, so a scene is never swapped out in the
+    middle of its own update
+    """
+
+    __slots__ = ("_scenes", "_pending")
+
+    def __init__(self) -> None:
+        """Initializes an empty stack
+        """
+        self._scenes: list[Scene] = []
+        self._pending: list[tuple[str, Scene | None]] = []
+
+    def __len__(self) -> int:
+        return len(self._scenes)
+
+    @property
+    def top(self) -> Scene:
+        """Getter for the scene being played
+
+        Returns:
+            Scene: the top scene
+        """
+        return self._scenes[-1]
+
+    def push(self, scene: Scene) -> None:
+        """Puts a scene on top, the one below comes back when it is popped
+        """
+        self._pending.append(("push", scene))
+
+    def pop(self) -> None:
+        """Takes the top scene off, popping the last scene ends the game
+        """
+        self._pending.append(("pop", None))
+
+    def replace(self, scene: Scene) -> None:
+        """Swaps the top scene for another one, or for a fresh visit of itself
+        """
+        self._pending.append(("replace", scene))
+
+    def unwind(self, scene: Scene) -> None:
+        """Pops scenes until a scene is on top, like going back to the main menu
+        """
+        self._pending.append(("unwind", scene))
+
+    def apply(self) -> bool:
+        """Applies the queued transitions in order and enters the new top scene
+
+        Returns:
+            bool: True if anything changed
+        """
+        if not self._pending:
+            return False
+        scenes = self._scenes
+        for action, scene in self._pending:
+            if action == "pop" or action == "replace":
+                scenes.pop()
+            elif action == "unwind":
+                while scenes[-1] is not scene:
+                    scenes.pop()
+            if scene is not None and action != "unwind":
+                scenes.append(scene)
+        self._pending.clear()
+        if scenes:
+            scenes[-1].enter()
+        return True
+
+
+class MainMenuScene(Scene):
+    """First screen the player sees, level select or exit
+    """
+
+    def __init__(self, host: game) -> None:
+        super().__init__(host)
+        self.level_select_button: button = button(pygame.Rect(161, 161, 480, 160),
+                                                  "Level Select", BLACK, GRAY, 36)
+        self.exit_button: button = button(pygame.Rect(161, 401, 480, 160), "Exit", BLACK, RED, 36)
+
+    def update(self, inputs: InputState) -> None:
+        if self.level_select_button.button_clicked(inputs):
+            self.host.scenes.push(self.host.level_select)
+        elif self.exit_button.button_clicked(inputs):
+            self.host.scenes.pop()
+
+    def draw(self) -> None:
+        screen = self.host.screen
+        screen.fill(WHITE)
+        self.level_select_button.draw_button(screen)
+        self.exit_button.draw_button(screen)
+
+
+class LevelSelectScene(Scene):
+    """One button per level and one back to the main menu
+    """
+
+    def __init__(self, host: game) -> None:
+        super().__init__(host)
+        self.buttons: list[button] = Level_Objects.level_select_buttons
+
+    def enter(self) -> None:
+        self.host.level = 0
+
+    def update(self, inputs: InputState) -> None:
+        # only a click that starts on this screen counts, so the click that
+        # opened level select does not also pick a level
+        for index, button_object in enumerate(self.buttons):
+            if button_object.button_clicked(inputs):
+                if index == len(self.buttons) - 1:  # exit to main menu
+                    self.host.scenes.pop()
+                elif self.host.level_changer(index + 1):
+                    self.host.scenes.replace(self.host.play)
+                return
+
+    def draw(self) -> None:
+        screen = self.host.screen
+        screen.fill(WHITE)
+        for button_object in self.buttons:
+            button_object.draw_button(screen)
+
+
+class PlayScene(Scene):
+    """One attempt at the loaded level, ends on the goal, a fall, a hazard or a quit
+    """
+
+    def __init__(self, host: game) -> None:
+        super().__init__(host)
+        self.ghost: GhostPlayback | None = None
+        self.recorder: TrajectoryRecorder = TrajectoryRecorder(0, 0)
+        self.replay: ReplayRecorder = ReplayRecorder(0)
+        # attempts on deaths_level that did not reach the goal
+        self.deaths: int = 0
+        self.deaths_level: int = 0
+        self.hud: TextLine = TextLine(host.assets.atlas(HUD_SIZE, BLACK), background=WHITE)
+
+    def enter(self) -> None:
+        host = self.host
+        if host.level != self.deaths_level:
+            self.deaths = 0
+            self.deaths_level = host.level
+        self.ghost = host.ghosts.load(host.level)
+        self.recorder = TrajectoryRecorder(host.player.x, host.player.y)
+        self.replay = ReplayRecorder(host.level)
+        host.effects.reset()
+
+    def update(self, inputs: InputState) -> None:
+        host = self.host
+        if inputs.quit and host.inputs.exhausted:
+            self.finish(None)  # the script ran out, there is no frame to play
+            return
+        simulation = host.simulation
+        started = time.perf_counter()
+        simulation.step(inputs)
+        host.metrics.step_time.record(time.perf_counter() - started)
+        self.recorder.record(host.player.x, host.player.y)
+        self.replay.record(inputs.mask, simulation)
+        host.effects.update(host.player)
+        if self.ghost is not None:
+            self.ghost.advance()
+            if self.ghost.corrupt:  # so the next win is not compared against it
+                host.ghosts.discard(host.level)
+                self.ghost = None
+
+        # the attempt ends on the frame that reaches the goal or a loss, the same frame
+        # Simulation.run stops after, so the replay plays back to the same outcome
+        outcome = simulation.outcome()  # True on a win, False after falling off
+        if outcome is not None or inputs.quit:
+            self.finish(outcome)
+
+    def finish(self, outcome: bool | None) -> None:
+        """Saves the ghost and the replay of the attempt, unless the game saves no
+        attempts, and moves on
+
+        Args:
+            outcome (bool | None): the outcome that ended the attempt, True if the goal
+                                   was reached, None if the player quit
+        """
+        host = self.host
+        win = outcome is True
+        if not win:
+            self.deaths += 1
+        if host.save_attempts:
+            if win:
+                host.ghosts.save_if_best(host.level, self.recorder)
+            self.replay.save(os.path.join(REPLAY_DIR, f"level_{host.level}.replay"), outcome)
+        host.post_game.win = win
+        host.scenes.replace(host.celebration if win else host.post_game)
+
+    def draw(self) -> None:
+        host = self.host
+        host.screen.fill(WHITE)
+        host.draw_platforms()
+        # best run behind the player
+        if self.ghost is not None:
+            self.ghost.draw(host.screen)
+        # dust behind the player
+        host.effects.pool.draw(host.screen)
+        host.player.draw(host.screen)
+        self.draw_hud()
+
+    def draw_hud(self) -> None:
+        """Draws the attempt's time, the deaths on this level and the frame rate, a
+        new string every frame, so through a TextLine instead of Font.render
+        """
+        host = self.host
+        seconds = host.simulation.frame / SIMULATION_RATE
+        self.hud.draw(host.screen, f"TIME {seconds:.2f}   DEATHS {self.deaths}   "
+                      f"FPS {host.metrics.fps:.0f}", HUD_MARGIN, HUD_MARGIN)
+
+
+class CelebrationScene(Scene):
+    """Confetti out of the goal for CELEBRATION_FRAMES frames after a win
+    """
+
+    def __init__(self, host: game) -> None:
+        super().__init__(host)
+        self.frames_left: int = 0
+
+    def enter(self) -> None:
+        self.host.effects.celebrate(self.host.goal)
+        self.frames_left = CELEBRATION_FRAMES
+
+    def update(self, inputs: InputState) -> None:
+        self.host.effects.pool.step()
+        self.frames_left -= 1
+        if self.frames_left <= 0:
+            self.host.scenes.replace(self.host.post_game)
+
+    def draw(self) -> None:
+        host = self.host
+        host.screen.fill(WHITE)
+        host.draw_platforms()
+        host.player.draw(host.screen)
+        host.effects.pool.draw(host.screen)
+
+
+class PostGameScene(Scene):
+    """Shown after an attempt: next level or retry, level select and main menu
+    """
+
+    def __init__(self, host: game) -> None:
+        super().__init__(host)
+        self.win: bool = False
+        option_1 = pygame.Rect(81, 241, 160, 160)
+        self.next_button: button = button(option_1, "Next Level", BLACK, GRAY, 36)
+        self.retry_button: button = button(option_1, "Retry Level", BLACK, GRAY, 36)
+        self.select_button: button = button(pygame.Rect(321, 241, 160, 160), "Select Level",
+                                            BLACK, GRAY, 36)
+        self.menu_button: button = button(pygame.Rect(561, 241, 160, 160), "Main Menu",
+                                          BLACK, GRAY, 36)
+
+    @property
+    def buttons(self) -> tuple[button, button, button]:
+        """Getter for the buttons on screen, the first one depends on the outcome
+
+        Returns:
+            tuple[button, button, button]: next level or retry, select level, main menu
+        """
+        return (self.next_button if self.win else self.retry_button,
+                self.select_button, self.menu_button)
+
+    def update(self, inputs: InputState) -> None:
+        host = self.host
+        first, select, menu = self.buttons
+        if first.button_clicked(inputs):
+            level = host.level + 1 if self.win else host.level
+            if host.level_changer(level):
+                host.scenes.replace(host.play)
+            else:  # no level after the last one
+                host.scenes.unwind(host.main_menu)
+                host.scenes.push(host.level_select)
+        elif select.button_clicked(inputs):
+            host.scenes.unwind(host.main_menu)
+            host.scenes.push(host.level_select)
+        elif menu.button_clicked(inputs):
+            host.scenes.unwind(host.main_menu)
+
+    def draw(self) -> None:
+        screen = self.host.screen
+        screen.fill(WHITE)
+        for button_object in self.buttons:
+            button_object.draw_button(screen)
@@ -0,0 +1,322 @@
+"""sim_farm.py
+
+Simulation farm that plays large batches of scripted attempts (bots, replays,
+fuzzed inputs) across worker processes, and checks recorded replays for regression.py.
+Every worker starts pygame headless once, receives the level data once and keeps one
+Simulation alive for all of its runs.
+Jobs travel in batches so the cost of talking to the workers stays small.
+
+Run it directly to measure throughput:
+    python sim_farm.py --runs 5000 --frames 600
+"""
+
+from __future__ import annotations
+from collections.abc import Iterable, Iterator, Sequence
+from typing import NamedTuple, TypeVar
+import argparse
+import multiprocessing
+import os
+import random
+import time
+import pygame
+
+from simulation import Simulation
+from moving_platform import MovingPlatform
+from entities import EntityStore
+from replay import Replay, verify
+
+# level number -> (collider rects as tuples, start position, goal position,
+#                  moving platforms, entities)
+RectTuple = tuple[int, int, int, int]
+LevelTable = dict[int, tuple[tuple[RectTuple, ...], tuple[int, int], tuple[int, int],
+                             tuple[MovingPlatform, ...], EntityStore]]
+
+
+class RunResult(NamedTuple):
+    """Result of one scripted attempt
+    """
+    job_id: int
+    level: int
+    won: bool | None  # None if the script ran out before the attempt ended
+    frames: int
+    x: int
+    y: int
+
+
+class ReplayCheck(NamedTuple):
+    """Result of playing a recorded replay again
+    """
+    job_id: int
+    path: str
+    level: int
+    frames: int  # frames played before the attempt ended or the inputs ran out
+    error: str | None  # None if outcome, frame count and final checksum match
+
+
+def level_table() -> LevelTable:
+    """Reads every level through Simulation.level_changer into plain tuples that are
+    cheap to send to workers
+
+    Returns:
+        LevelTable: the data of every level
+    """
+    table: LevelTable = {}
+    simulation = Simulation()
+    level = 1
+    while simulation.level_changer(level):
+        table[level] = (
+            tuple((rect.x, rect.y, rect.w, rect.h) for rect in simulation.objects),
+            (simulation.start_pos[0], simulation.start_pos[1]),
+            (simulation.goal_pos[0], simulation.goal_pos[1]),
+            tuple(simulation.platforms),
+            simulation.entities,
+        )
+        level += 1
+    return table
+
+
+# ********* Worker side **************
+# set once per worker process by _init_worker and only read afterwards
+WorkerLevel = tuple[list[pygame.Rect], list[int], list[int], tuple[MovingPlatform, ...],
+                    EntityStore]
+_worker_levels: dict[int, WorkerLevel] = {}
+_worker_simulation: Simulation | None = None
+T = TypeVar("T")
+
+
+def _init_worker(table: LevelTable) -> None:
+    """Runs once in every worker: starts pygame headless and builds the levels
+
+    Args:
+        table (LevelTable): level data from level_table
+    """
+    global _worker_simulation
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    _worker_levels.clear()
+    for level, (objects, start, goal, platforms, entities) in table.items():
+        _worker_levels[level] = ([pygame.Rect(rect) for rect in objects], list(start), list(goal),
+                                 platforms, entities)
+    _worker_simulation = Simulation()
+
+
+def _worker() -> Simulation:
+    """Getter for the worker's simulation
+    """
+    if _worker_simulation is None:
+        raise RuntimeError("worker was not initialized")
+    return _worker_simulation
+
+
+def _start_level(simulation: Simulation, level: int) -> None:
+    """Puts the worker's simulation at the start of a level from the level table
+    """
+    objects, start, goal, platforms, entities = _worker_levels[level]
+    simulation.level_setup(objects, start, goal, platforms, entities)
+    simulation.level = level
+    simulation.reset()
+
+
+def _run_batch(batch: Sequence[tuple[int, int, bytes]]) -> list[RunResult]:
+    """Plays one batch of jobs inside a worker
+
+    Args:
+        batch (Sequence[tuple[int, int, bytes]]): (job id, level, input bitmasks)
+
+    Returns:
+        list[RunResult]: one result per job
+    """
+    simulation = _worker()
+    results: list[RunResult] = []
+    for job_id, level, inputs in batch:
+        _start_level(simulation, level)
+        won, frames = simulation.run(inputs)
+        results.append(RunResult(job_id, level, won, frames,
+                                 simulation.player.x, simulation.player.y))
+    return results
+
+
+def _replay_error(replay: Replay, outcome: bool | None, frames: int,
+                  simulation: Simulation) -> str | None:
+    """Compares a finished run with its recording, plays it again frame by frame to
+    find where it went apart if it does not match
+    """
+    checksum = replay.checksums[frames - 1] if 0 < frames <= replay.frames else None
+    if outcome == replay.outcome and frames == replay.frames and \
+            (frames == 0 or simulation.checksum == checksum):
+        return None
+    desync = verify(replay, simulation)
+    if desync is None:  # every recorded frame matches, the attempt ended earlier
+        return f"ended after {frames} of {replay.frames} frames"
+    return (f"frame {desync.frame}: {desync.field} is {desync.actual}, "
+            f"recorded {desync.expected}")
+
+
+def _check_batch(batch: Sequence[tuple[int, str]]) -> list[ReplayCheck]:
+    """Plays one batch of replay files inside a worker
+
+    Args:
+        batch (Sequence[tuple[int, str]]): (job id, replay path)
+
+    Returns:
+        list[ReplayCheck]: one result per replay
+    """
+    simulation = _worker()
+    results: list[ReplayCheck] = []
+    for job_id, path in batch:
+        try:
+            replay = Replay.load(path)
+        except (OSError, ValueError) as error:
+            results.append(ReplayCheck(job_id, path, 0, 0, f"unreadable: {error}"))
+            continue
+        if replay.level not in _worker_levels:
+            results.append(ReplayCheck(job_id, path, replay.level, 0,
+                                       f"level {replay.level} does not exist"))
+            continue
+        _start_level(simulation, replay.level)
+        outcome, frames = simulation.run(replay.inputs)
+        results.append(ReplayCheck(job_id, path, replay.level, frames,
+                                   _replay_error(replay, outcome, frames, simulation)))
+    return results
+
+
+# ********* Farm **************
+def _chunks(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Groups items into lists of size, the last one may be shorter
+    """
+    chunk: list[T] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _batches(jobs: Iterable[tuple[int, bytes]],
+             batch_size: int) -> Iterator[list[tuple[int, int, bytes]]]:
+    """Numbers the jobs and groups them into batches
+    """
+    return _chunks(((job_id, level, inputs) for job_id, (level, inputs) in enumerate(jobs)),
+                   batch_size)
+
+
+class SimulationFarm:
+    """Pool of headless simulation workers
+    """
+
+    def __init__(self, workers: int | None = None, batch_size: int = 64,
+                 table: LevelTable | None = None) -> None:
+        """Starts the worker processes
+
+        Args:
+            workers (int | None): number of worker processes, defaults to the core count
+            batch_size (int): jobs sent to a worker at a time
+            table (LevelTable | None): level data, defaults to every level in Level_Objects
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.workers: int = workers or os.cpu_count() or 1
+        self.batch_size: int = batch_size
+        self.last_runs: int = 0
+        self.last_seconds: float = 0.0
+        self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                          initargs=(table or level_table(),))
+
+    @property
+    def runs_per_second(self) -> float:
+        """Throughput of the last call to run
+
+        Returns:
+            float: attempts played per second
+        """
+        if self.last_seconds <= 0.0:
+            return 0.0
+        return self.last_runs / self.last_seconds
+
+    def run(self, jobs: Iterable[tuple[int, bytes]]) -> list[RunResult]:
+        """Plays every job on the workers
+
+        Args:
+            jobs (Iterable[tuple[int, bytes]]): (level, input bitmasks) per attempt
+
+        Returns:
+            list[RunResult]: results in the same order as jobs
+        """
+        start = time.perf_counter()
+        results: list[RunResult] = []
+        for batch in self._pool.imap_unordered(_run_batch, _batches(jobs, self.batch_size)):
+            results.extend(batch)
+        results.sort(key=lambda result: result.job_id)
+        self.last_seconds = time.perf_counter() - start
+        self.last_runs = len(results)
+        return results
+
+    def check(self, paths: Iterable[str]) -> list[ReplayCheck]:
+        """Plays recorded replays on the workers and compares each with its recording
+
+        Args:
+            paths (Iterable[str]): replay files
+
+        Returns:
+            list[ReplayCheck]: results in the same order as paths
+        """
+        start = time.perf_counter()
+        results: list[ReplayCheck] = []
+        for batch in self._pool.imap_unordered(_check_batch,
+                                               _chunks(enumerate(paths), self.batch_size)):
+            results.extend(batch)
+        results.sort(key=lambda result: result.job_id)
+        self.last_seconds = time.perf_counter() - start
+        self.last_runs = len(results)
+        return results
+
+    def close(self) -> None:
+        """Stops the worker processes
+        """
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self) -> SimulationFarm:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def random_jobs(runs: int, frames: int, seed: int = 0) -> list[tuple[int, bytes]]:
+    """Makes fuzzed jobs spread over every level
+
+    Args:
+        runs (int): number of jobs
+        frames (int): input bitmasks per job
+        seed (int): random seed so measurements repeat
+
+    Returns:
+        list[tuple[int, bytes]]: (level, input bitmasks) per job
+    """
+    rng = random.Random(seed)
+    levels = sorted(level_table())
+    return [(levels[index % len(levels)], rng.randbytes(frames)) for index in range(runs)]
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Measure simulation farm throughput")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="*",
+                        help="worker counts to compare, defaults to 1 and every core")
+    args = parser.parse_args()
+
+    jobs = random_jobs(args.runs, args.frames)
+    cores = os.cpu_count() or 1
+    for workers in args.workers or sorted({1, cores}):
+        with SimulationFarm(workers, args.batch_size) as farm:
+            farm.run(jobs)
+        print(f"{workers:3d} workers: {farm.runs_per_second:10.1f} runs/s")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
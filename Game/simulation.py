@@ -0,0 +1,320 @@
+"""simulation.py
+
+Window independent game state. A Simulation holds the player, the level colliders,
+the goal and the safety floor, so any number of them can run side by side in one
+process without touching the pygame display.
+
+Every level keeps its colliders in a SpatialGrid, which bots and tools can ask
+geometric questions. In levels with moving platforms the platforms are placed from the
+frame counter every step and only their own grid entries move, the player then
+collides with what the grid finds around it. Hazards, collectibles and
+enemies live in an EntityStore and are also driven by the frame counter.
+"""
+
+from __future__ import annotations
+from array import array
+from collections.abc import Sequence
+import pygame
+
+from player import Player
+from input_state import KeyInput, MaskKeys
+from checksum import CHECKSUM_SEED, checksum
+from moving_platform import MovingPlatform
+from entities import EntityStore
+from spatial_index import SpatialGrid
+from movement_strategy import FastMovement
+import Level_Objects
+
+
+class Simulation:
+    """Simulation state for one player playing one level
+    """
+
+    __slots__ = (
+        "player",
+        "objects",
+        "level",
+        "start_pos",
+        "goal_pos",
+        "goal",
+        "floor",
+        "checksum",
+        "platforms",
+        "frame",
+        "index",
+        "entities",
+        "_mask_keys",
+        "_state",
+    )
+
+    def __init__(self, player: Player | None = None) -> None:
+        """Initializes an empty simulation, call level_changer to load a level
+
+        Args:
+            player (Player | None): Player to simulate, a new one is made if None
+        """
+        self.player: Player = player if player is not None else Player(200, 200)
+        self.objects: list[pygame.Rect] = []
+
+        self.level: int = 0
+        self.start_pos: list[int] = [0, 0]
+        self.goal_pos: list[int] = [0, 0]
+        self.goal: pygame.Rect = pygame.Rect(self.goal_pos[0], self.goal_pos[1], 80, 80)
+
+        # floor object to prevent forever falling
+        self.floor: pygame.Rect = pygame.Rect(-800, 900, 2400, 80)
+
+        # rolling checksum of the player's physics state, updated every step
+        self.checksum: int = CHECKSUM_SEED
+
+        # moving platforms are placed from the frame number, the grid holds them
+        # after the static colliders
+        self.platforms: list[MovingPlatform] = []
+        self.frame: int = 0
+        self.index: SpatialGrid = SpatialGrid()
+        self.entities: EntityStore = EntityStore(1)
+
+        # reused by run so scripted input does not allocate per frame
+        self._mask_keys: MaskKeys = MaskKeys()
+        self._state: array[float] = array("d", bytes(8 * Player.STATE_SIZE))
+
+    def level_setup(self,
+                    new_level_objects: list[pygame.Rect],
+                    new_start_pos: list[int],
+                    new_goal_pos: list[int],
+                    new_platforms: Sequence[MovingPlatform] = (),
+                    new_entities: EntityStore | None = None) -> None:
+        """Sets up the level for play
+
+        Args:
+            new_level_objects (list[pygame.Rect]): colliders of the level
+            new_start_pos (list[int]): player's spawn position
+            new_goal_pos (list[int]): goal's top left position
+            new_platforms (Sequence[MovingPlatform]): moving platforms of the level, the
+                                                      simulation moves its own copies
+            new_entities (EntityStore | None): hazards, collectibles and enemies of the
+                                               level, the simulation changes its own copy
+        """
+        self.objects = new_level_objects
+        self.platforms = [platform.copy() for platform in new_platforms]
+        self.frame = 0
+        self.entities = new_entities.copy() if new_entities is not None else EntityStore(1)
+        # every level gets a grid for spatial queries, the player only collides
+        # through it when there are platforms
+        self.index = SpatialGrid.from_rects(self.objects)
+        if self.platforms:
+            for key, platform in enumerate(self.platforms, len(self.objects)):
+                platform.place(0)
+                self.index.insert(key, platform.rect)
+
+        self.start_pos = new_start_pos
+        self.player.x = self.start_pos[0]
+        self.player.y = self.start_pos[1]
+
+        self.goal_pos = new_goal_pos
+        self.goal.x = self.goal_pos[0]
+        self.goal.y = self.goal_pos[1]
+        self.checksum = CHECKSUM_SEED
+
+    def level_changer(self, new_level: int) -> bool:
+        """Loads a new level
+
+        Args:
+            new_level (int): level number 1-7
+
+        Returns:
+            bool: True if the level exists and was loaded, False if not
+        """
+        match new_level:
+            case 1:
+                new_level_objects = Level_Objects.level_1_objects
+                new_start_pos = Level_Objects.level_1_start_pos
+                new_goal_pos = Level_Objects.level_1_goal_pos
+                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
+
+            case 2:
+                new_level_objects = Level_Objects.level_2_objects
+                new_start_pos = Level_Objects.level_2_start_pos
+                new_goal_pos = Level_Objects.level_2_goal_pos
+                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
+
+            case 3:
+                new_level_objects = Level_Objects.level_3_objects
+                new_start_pos = Level_Objects.level_3_start_pos
+                new_goal_pos = Level_Objects.level_3_goal_pos
+                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
+
+            case 4:
+                new_level_objects = Level_Objects.level_4_objects
+                new_start_pos = Level_Objects.level_4_start_pos
+                new_goal_pos = Level_Objects.level_4_goal_pos
+                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
+
+            case 5:
+                new_level_objects = Level_Objects.level_5_objects
+                new_start_pos = Level_Objects.level_5_start_pos
+                new_goal_pos = Level_Objects.level_5_goal_pos
+                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
+
+            case 6:
+                new_level_objects = Level_Objects.level_6_objects
+                new_start_pos = Level_Objects.level_6_start_pos
+                new_goal_pos = Level_Objects.level_6_goal_pos
+                self.level_setup(new_level_objects, new_start_pos, new_goal_pos)
+
+            case 7:
+                new_level_objects = Level_Objects.level_7_objects
+                new_start_pos = Level_Objects.level_7_start_pos
+                new_goal_pos = Level_Objects.level_7_goal_pos
+                self.level_setup(new_level_objects, new_start_pos, new_goal_pos,
+                                 Level_Objects.level_7_platforms,
+                                 Level_Objects.level_7_entities)
+
+            case _:  # should only happen if exiting to main menu
+                return False
+        self.level = new_level
+        # fresh velocity and flags so every attempt starts from the same state,
+        # also fixes error if player leaves map
+        self.reset()
+        return True
+
+    def outcome(self) -> bool | None:
+        """Checks if the current attempt is over
+
+        Returns:
+            bool | None: True if the goal is touched, False if the player fell onto the
+                         floor or touched a hazard or an enemy, None while the level
+                         is still being played. Like the original game loop, a fall
+                         onto the floor counts even when the goal is touched too
+        """
+        if self.player.rect.colliderect(self.floor):
+            return False
+        if self.player.rect.colliderect(self.goal):  # detects a win
+            return True
+        if self.entities.hits(self.player.rect):
+            return False
+        return None
+
+    def step(self, keys: KeyInput) -> None:
+        """Advances the simulation by one frame
+
+        Args:
+            keys (KeyInput): input for this frame, usually an InputState
+        """
+        self.frame += 1
+        self.move_world()
+        if self.platforms:
+            self.player.update(keys, self.colliders(self.player), self.platforms)
+        else:
+            self.player.update(keys, self.objects)
+        if self.entities:
+            self.entities.collect(self.player.rect, self.frame)
+        self.player.save_state(self._state, 0)
+        self.checksum = checksum(self.checksum, self._state)
+
+    def move_world(self) -> None:
+        """Patrols the enemies and places the moving platforms on the current frame
+        """
+        if self.entities:
+            self.entities.patrol(self.frame)
+        if self.platforms:
+            self._place_platforms()
+
+    def colliders(self, player: Player) -> list[pygame.Rect]:
+        """Colliders a player can touch this frame, call move_world first
+
+        Args:
+            player (Player): the simulation's player or any other one on the level
+
+        Returns:
+            list[pygame.Rect]: the static colliders, or on levels with moving platforms
+                               what the grid finds around the player
+        """
+        if self.platforms:
+            return self.index.query(self._reach(player))
+        return self.objects
+
+    @property
+    def state_size(self) -> int:
+        """Number of floats save_state writes
+
+        Returns:
+            int: size of one saved state, the player's state, the checksum and the frame
+        """
+        return Player.STATE_SIZE + 2
+
+    def save_state(self, buffer: array[float], offset: int) -> None:
+        """Copies everything that changes while playing into a preallocated array
+
+        Args:
+            buffer (array[float]): array('d') with room for state_size floats at offset
+            offset (int): index of the first float
+        """
+        self.player.save_state(buffer, offset)
+        buffer[offset + Player.STATE_SIZE] = self.checksum
+        buffer[offset + Player.STATE_SIZE + 1] = self.frame
+
+    def load_state(self, buffer: array[float], offset: int) -> None:
+        """Restores a state written by save_state
+
+        Args:
+            buffer (array[float]): array('d') holding a saved state at offset
+            offset (int): index of the first float
+        """
+        self.player.load_state(buffer, offset)
+        self.checksum = int(buffer[offset + Player.STATE_SIZE])
+        self.frame = int(buffer[offset + Player.STATE_SIZE + 1])
+        if self.platforms:
+            self._place_platforms()
+        if self.entities:
+            self.entities.rewind(self.frame)
+
+    def reset(self) -> None:
+        """Puts the player back on the start position with fresh velocity and flags
+        """
+        self.player.reposition(self.start_pos[0], self.start_pos[1])
+        self.checksum = CHECKSUM_SEED
+        self.frame = 0
+        if self.platforms:
+            self._place_platforms()
+        if self.entities:
+            self.entities.rewind(0)
+
+    def _place_platforms(self) -> None:
+        """Moves the platforms to the current frame, only their grid entries change
+        """
+        index = self.index
+        for key, platform in enumerate(self.platforms, len(self.objects)):
+            platform.place(self.frame)
+            index.move(key, platform.rect)
+
+    def _reach(self, player: Player) -> pygame.Rect:
+        """Area a player can touch during one update: a ride, the fastest built in
+        movement strategy and a jump or fall in either direction
+        """
+        carry = max(platform.path.max_step for platform in self.platforms)
+        reach_x = carry + abs(player.move_speed) * FastMovement.MULTIPLIER + 1
+        reach_y = int(carry + abs(player.jump_velocity) + player.fall_speed
+                      + max(player.jump_speed, player.wall_jump_speed)) + 1
+        return player.rect.inflate(2 * reach_x, 2 * reach_y)
+
+    def run(self, inputs: Sequence[int]) -> tuple[bool | None, int]:
+        """Plays a scripted attempt, one input bitmask per frame, the same way
+        scenes.PlayScene does: the attempt ends after the update that reaches an outcome,
+        or before the first one if the player starts on the goal or a loss
+
+        Args:
+            inputs (Sequence[int]): input bitmasks, bytes work well
+
+        Returns:
+            tuple[bool | None, int]: outcome (None if the inputs ran out first)
+                                     and the number of frames played
+        """
+        keys = self._mask_keys
+        for frame, mask in enumerate(inputs):
+            outcome = self.outcome()
+            if outcome is not None:
+                return outcome, frame
+            keys.mask = mask
+            self.step(keys)
+        return self.outcome(), len(inputs)
@@ -0,0 +1,518 @@
+"""spatial_index.py
+
+Uniform grid over the colliders of a level. Every collider is stored under an int key
+in every cell its rect touches, so a query only looks at the colliders near an area.
+Moving a collider only touches the cells it leaves and the cells it enters, so moving
+platforms keep the grid current without rebuilding it every frame.
+
+Queries return rects in key order, so a grid filled in the level's collider order
+gives the player the same collision order as the plain list.
+
+On top of the broad phase query the grid answers geometric questions for bots, the
+camera and tools: the colliders overlapping an area, the first collider along a ray or
+a segment, the collider under a point and the nearest collider straight below a point.
+Each one only visits the cells on its way instead of every collider of the level.
+
+Run it directly to compare the queries with checking every collider:
+    python spatial_index.py --colliders 2000 --queries 2000
+"""
+
+from __future__ import annotations
+import argparse
+import math
+import random
+import time
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, NamedTuple
+import numpy as np
+import numpy.typing as npt
+import pygame
+
+# pixels per cell side, about the size of the player and the smaller platforms
+CELL_SIZE: int = 80
+
+Span = tuple[int, int, int, int]  # first column, first row, last column, last row
+Point = tuple[float, float]
+
+
+class RayHit(NamedTuple):
+    """Where a ray first touches a collider
+    """
+    key: int
+    distance: float  # pixels along the ray
+    point: Point
+    normal: tuple[int, int]  # face that was hit, (0, 0) if the ray starts inside
+
+
+Entry = tuple[float, tuple[int, int]]  # distance along a ray and the normal of the face
+
+
+def _ray_box(origin: Point, direction: Point, rect: pygame.Rect) -> Entry | None:
+    """Slab test of a ray against a rect, edges count as solid
+
+    Args:
+        origin (Point): start of the ray
+        direction (Point): unit direction
+        rect (pygame.Rect): box to test
+
+    Returns:
+        Entry | None: distance to the box and the normal of the face entered, None if
+                      the ray misses
+    """
+    near, far = -math.inf, math.inf
+    normal = (0, 0)
+    for start, step, low, high, axis in ((origin[0], direction[0], rect.left, rect.right, 0),
+                                         (origin[1], direction[1], rect.top, rect.bottom, 1)):
+        if step == 0:
+            if start < low or start > high:
+                return None
+            continue
+        enter, leave = (low - start) / step, (high - start) / step
+        face = -1 if step > 0 else 1
+        if enter > leave:
+            enter, leave = leave, enter
+        if enter > near:
+            near = enter
+            normal = (face, 0) if axis == 0 else (0, face)
+        far = min(far, leave)
+        if near > far:
+            return None
+    if far < 0:
+        return None
+    if near < 0:  # starts inside
+        return 0.0, (0, 0)
+    return near, normal
+
+
+class SpatialGrid:
+    """Uniform grid of collider rects
+    """
+
+    __slots__ = ("cell_size", "_cells", "_rects", "_spans", "_bounds")
+
+    def __init__(self, cell_size: int = CELL_SIZE) -> None:
+        """Initializes an empty grid
+
+        Args:
+            cell_size (int): pixels per cell side
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size: int = cell_size
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._rects: dict[int, pygame.Rect] = {}
+        self._spans: dict[int, Span] = {}
+        # every cell ever used is inside, it only grows, rays and downward walks stop
+        # at its edge
+        self._bounds: Span | None = None
+
+    @classmethod
+    def from_rects(cls, rects: Iterable[pygame.Rect] | npt.NDArray[np.integer],
+                   cell_size: int = CELL_SIZE) -> SpatialGrid:
+        """Builds a grid keyed by position in a collider list, either pygame.Rects or an
+        (M, 4) array of left, top, width, height like environment.rect_array makes
+
+        Args:
+            rects (Iterable[pygame.Rect] | npt.NDArray[np.integer]): the colliders
+            cell_size (int): pixels per cell side
+
+        Returns:
+            SpatialGrid: the filled grid
+        """
+        grid = cls(cell_size)
+        if isinstance(rects, np.ndarray):
+            rects = [pygame.Rect(*row) for row in rects.reshape(-1, 4).tolist()]
+        for key, rect in enumerate(rects):
+            grid.insert(key, rect)
+        return grid
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._rects
+
+    def __getitem__(self, key: int) -> pygame.Rect:
+        return self._rects[key]
+
+    def _span(self, rect: pygame.Rect) -> Span:
+        """Cells a rect touches, an empty rect still takes its top left cell
+        """
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size if rect.w else rect.left // size,
+                (rect.bottom - 1) // size if rect.h else rect.top // size)
+
+    def _add(self, key: int, span: Span, skip: Span | None = None) -> None:
+        """Puts a key in the cells of span that are not in skip
+        """
+        bounds = self._bounds
+        self._bounds = span if bounds is None else (
+            min(bounds[0], span[0]), min(bounds[1], span[1]),
+            max(bounds[2], span[2]), max(bounds[3], span[3]))
+        for column in range(span[0], span[2] + 1):
+            for row in range(span[1], span[3] + 1):
+                if skip is not None and skip[0] <= column <= skip[2] and skip[1] <= row <= skip[3]:
+                    continue
+                self._cells.setdefault((column, row), set()).add(key)
+
+    def _discard(self, key: int, span: Span, keep: Span | None = None,
+                 prune: bool = True) -> None:
+        """Takes a key out of the cells of span that are not in keep, cells left empty
+        are deleted unless prune is False
+        """
+        for column in range(span[0], span[2] + 1):
+            for row in range(span[1], span[3] + 1):
+                if keep is not None and keep[0] <= column <= keep[2] and keep[1] <= row <= keep[3]:
+                    continue
+                cell = self._cells[(column, row)]
+                cell.discard(key)
+                if prune and not cell:
+                    del self._cells[(column, row)]
+
+    def insert(self, key: int, rect: pygame.Rect) -> None:
+        """Adds a collider, the grid keeps the rect object so later moves can pass it again
+
+        Args:
+            key (int): unique key, also the collider's place in query results
+            rect (pygame.Rect): the collider
+        """
+        if key in self._rects:
+            raise KeyError(f"key {key} is already in the grid")
+        span = self._span(rect)
+        self._rects[key] = rect
+        self._spans[key] = span
+        self._add(key, span)
+
+    def remove(self, key: int) -> None:
+        """Takes a collider out
+
+        Args:
+            key (int): key given to insert
+        """
+        del self._rects[key]
+        self._discard(key, self._spans.pop(key))
+
+    def move(self, key: int, rect: pygame.Rect) -> None:
+        """Updates a collider after its rect moved, only the cells it left and
+        entered change
+
+        Args:
+            key (int): key given to insert
+            rect (pygame.Rect): the collider's new rect
+        """
+        old = self._spans[key]
+        span = self._span(rect)
+        self._rects[key] = rect
+        if span == old:
+            return
+        # a moving collider comes back to the cells it left, they stay for reuse
+        self._discard(key, old, keep=span, prune=False)
+        self._add(key, span, skip=old)
+        self._spans[key] = span
+
+    def query(self, area: pygame.Rect) -> list[pygame.Rect]:
+        """Colliders in the cells an area touches, in key order. They are candidates,
+        not all of them overlap the area
+
+        Args:
+            area (pygame.Rect): area to look in
+
+        Returns:
+            list[pygame.Rect]: the colliders near the area
+        """
+        rects = self._rects
+        return [rects[key] for key in sorted(self._candidates(area))]
+
+    def _candidates(self, area: pygame.Rect) -> set[int]:
+        """Keys stored in the cells an area touches
+        """
+        span = self._span(area)
+        cells = self._cells
+        keys: set[int] = set()
+        for column in range(span[0], span[2] + 1):
+            for row in range(span[1], span[3] + 1):
+                cell = cells.get((column, row))
+                if cell:
+                    keys |= cell
+        return keys
+
+    def region(self, area: pygame.Rect) -> list[int]:
+        """Colliders that overlap an area, like pygame.Rect.colliderect
+
+        Args:
+            area (pygame.Rect): area to look in
+
+        Returns:
+            list[int]: keys of the overlapping colliders in key order
+        """
+        rects = self._rects
+        return sorted(key for key in self._candidates(area) if rects[key].colliderect(area))
+
+    def solid_at(self, x: float, y: float) -> int | None:
+        """Collider under a point, like pygame.Rect.collidepoint
+
+        Args:
+            x (float): point x
+            y (float): point y
+
+        Returns:
+            int | None: smallest key of a collider holding the point, None if it is free
+        """
+        cell = self._cells.get((math.floor(x) // self.cell_size, math.floor(y) // self.cell_size))
+        if not cell:
+            return None
+        inside = []
+        for key in cell:
+            rect = self._rects[key]
+            if rect.left <= x < rect.right and rect.top <= y < rect.bottom:
+                inside.append(key)
+        return min(inside) if inside else None
+
+    def nearest_below(self, x: float, y: float) -> int | None:
+        """Collider a point would land on falling straight down: the highest top at or
+        below y among the colliders spanning x
+
+        Args:
+            x (float): point x
+            y (float): point y
+
+        Returns:
+            int | None: key of the collider, the smallest key on a tie, None if nothing
+                        is below
+        """
+        if self._bounds is None:
+            return None
+        size = self.cell_size
+        column = math.floor(x) // size
+        if not self._bounds[0] <= column <= self._bounds[2]:
+            return None
+        cells, rects = self._cells, self._rects
+        best: tuple[int, int] | None = None  # top, key
+        for row in range(max(math.floor(y) // size, self._bounds[1]), self._bounds[3] + 1):
+            if best is not None and best[0] < row * size:
+                break  # nothing further down can be higher
+            for key in cells.get((column, row), ()):
+                rect = rects[key]
+                if rect.top >= y and rect.left <= x < rect.right:
+                    if best is None or (rect.top, key) < best:
+                        best = (rect.top, key)
+        return best[1] if best is not None else None
+
+    def raycast(self, origin: Point, direction: Point,
+                max_distance: float = math.inf) -> RayHit | None:
+        """First collider along a ray. Walks the cells the ray crosses in order and
+        stops at the first cell that holds a hit
+
+        Args:
+            origin (Point): start of the ray
+            direction (Point): direction, does not have to be a unit vector
+            max_distance (float): pixels to look along the ray
+
+        Returns:
+            RayHit | None: the nearest hit, the smallest key on a tie, None if the ray
+                           hits nothing within max_distance
+        """
+        length = math.hypot(direction[0], direction[1])
+        if length == 0:
+            raise ValueError("direction cannot be zero")
+        unit = (direction[0] / length, direction[1] / length)
+        cells, rects = self._cells, self._rects
+        tested: set[int] = set()
+        best: tuple[float, int, tuple[int, int]] | None = None
+        for cell, leave_cell in self._walk(origin, unit, max_distance):
+            for key in cells.get(cell, ()):
+                if key in tested:
+                    continue
+                tested.add(key)
+                hit = _ray_box(origin, unit, rects[key])
+                if hit is not None and hit[0] <= max_distance:
+                    if best is None or (hit[0], key) < best[:2]:
+                        best = (hit[0], key, hit[1])
+            if best is not None and best[0] <= leave_cell:
+                break  # later cells are farther along the ray
+        if best is None:
+            return None
+        distance, key, normal = best
+        return RayHit(key, distance,
+                      (origin[0] + unit[0] * distance, origin[1] + unit[1] * distance), normal)
+
+    def _walk(self, origin: Point, unit: Point,
+              max_distance: float) -> Iterator[tuple[tuple[int, int], float]]:
+        """Cells a ray crosses inside the used cells, in order, with the distance where
+        the ray leaves each one
+        """
+        if self._bounds is None:
+            return
+        size = self.cell_size
+        bounds = self._bounds
+        world = pygame.Rect(bounds[0] * size, bounds[1] * size, (bounds[2] - bounds[0] + 1) * size,
+                            (bounds[3] - bounds[1] + 1) * size)
+        entry = _ray_box(origin, unit, world)
+        if entry is None or entry[0] > max_distance:
+            return
+        leave_world = min(max_distance, self._leave(origin, unit, world))
+
+        # start in the cell where the ray enters the used cells
+        dx, dy = unit
+        column = min(max(math.floor(origin[0] + dx * entry[0]) // size, bounds[0]), bounds[2])
+        row = min(max(math.floor(origin[1] + dy * entry[0]) // size, bounds[1]), bounds[3])
+        step_x, step_y = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+        next_x = ((column + (dx > 0)) * size - origin[0]) / dx if dx else math.inf
+        next_y = ((row + (dy > 0)) * size - origin[1]) / dy if dy else math.inf
+        delta_x = size / abs(dx) if dx else math.inf
+        delta_y = size / abs(dy) if dy else math.inf
+        while True:
+            leave_cell = min(next_x, next_y)
+            yield (column, row), leave_cell
+            if leave_cell > leave_world:
+                return
+            if next_x < next_y:
+                column += step_x
+                next_x += delta_x
+            else:
+                row += step_y
+                next_y += delta_y
+
+    @staticmethod
+    def _leave(origin: Point, direction: Point, rect: pygame.Rect) -> float:
+        """Distance along a ray that starts in or before a rect to where it leaves it
+        """
+        far = math.inf
+        for start, step, low, high in ((origin[0], direction[0], rect.left, rect.right),
+                                       (origin[1], direction[1], rect.top, rect.bottom)):
+            if step:
+                far = min(far, max((low - start) / step, (high - start) / step))
+        return far
+
+    def segment_cast(self, start: Point, end: Point) -> RayHit | None:
+        """First collider between two points, for line of sight checks
+
+        Args:
+            start (Point): first point
+            end (Point): last point
+
+        Returns:
+            RayHit | None: the nearest hit from start, None if the segment is clear
+        """
+        direction = (end[0] - start[0], end[1] - start[1])
+        length = math.hypot(direction[0], direction[1])
+        if length == 0:
+            key = self.solid_at(*start)
+            return None if key is None else RayHit(key, 0.0, start, (0, 0))
+        return self.raycast(start, direction, length)
+
+    def cells_of(self, key: int) -> list[tuple[int, int]]:
+        """Cells a collider is stored in
+
+        Args:
+            key (int): key given to insert
+
+        Returns:
+            list[tuple[int, int]]: (column, row) of every cell
+        """
+        span = self._spans[key]
+        return [(column, row) for column in range(span[0], span[2] + 1)
+                for row in range(span[1], span[3] + 1)]
+
+
+# ********* Checking every collider, for tests and the benchmark **************
+def _brute_region(rects: list[pygame.Rect], area: pygame.Rect) -> list[int]:
+    return [key for key, rect in enumerate(rects) if rect.colliderect(area)]
+
+
+def _brute_solid_at(rects: list[pygame.Rect], x: float, y: float) -> int | None:
+    return next((key for key, rect in enumerate(rects)
+                 if rect.left <= x < rect.right and rect.top <= y < rect.bottom), None)
+
+
+def _brute_nearest_below(rects: list[pygame.Rect], x: float, y: float) -> int | None:
+    below = [(rect.top, key) for key, rect in enumerate(rects)
+             if rect.top >= y and rect.left <= x < rect.right]
+    return min(below)[1] if below else None
+
+
+def _brute_raycast(rects: list[pygame.Rect], origin: Point, direction: Point,
+                   max_distance: float = math.inf) -> RayHit | None:
+    length = math.hypot(direction[0], direction[1])
+    unit = (direction[0] / length, direction[1] / length)
+    best: tuple[float, int, tuple[int, int]] | None = None
+    for key, rect in enumerate(rects):
+        hit = _ray_box(origin, unit, rect)
+        if hit is not None and hit[0] <= max_distance:
+            if best is None or (hit[0], key) < best[:2]:
+                best = (hit[0], key, hit[1])
+    if best is None:
+        return None
+    return RayHit(best[1], best[0], (origin[0] + unit[0] * best[0], origin[1] + unit[1] * best[0]),
+                  best[2])
+
+
+def random_level(colliders: int, seed: int = 0) -> list[pygame.Rect]:
+    """Platforms spread over a square world about as dense as the built in levels
+
+    Args:
+        colliders (int): number of platforms
+        seed (int): layout seed
+
+    Returns:
+        list[pygame.Rect]: the platforms
+    """
+    rng = random.Random(seed)
+    side = int(math.sqrt(colliders) * 200)
+    return [pygame.Rect(rng.randrange(side), rng.randrange(side),
+                        rng.randrange(20, 300), rng.randrange(10, 60)) for _ in range(colliders)]
+
+
+def benchmark(colliders: int, queries: int, seed: int = 0) -> dict[str, tuple[float, float]]:
+    """Seconds per query of every query kind, on the grid and checking every collider
+
+    Args:
+        colliders (int): platforms of the random level
+        queries (int): queries of each kind
+        seed (int): seed of the level and the queries
+
+    Returns:
+        dict[str, tuple[float, float]]: grid and brute force seconds per query by name
+    """
+    rects = random_level(colliders, seed)
+    grid = SpatialGrid.from_rects(rects)
+    rng = random.Random(seed + 1)
+    side = int(math.sqrt(colliders) * 200)
+    points = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(queries)]
+    angles = [rng.uniform(0, 2 * math.pi) for _ in range(queries)]
+    rays = [(point, (math.cos(angle), math.sin(angle))) for point, angle in zip(points, angles)]
+    areas = [pygame.Rect(int(x), int(y), 160, 120) for x, y in points]
+
+    def timed(function: Callable[..., object], arguments: list[tuple[Any, ...]]) -> float:
+        started = time.perf_counter()
+        for argument in arguments:
+            function(*argument)
+        return (time.perf_counter() - started) / len(arguments)
+
+    return {
+        "region": (timed(grid.region, [(area,) for area in areas]),
+                   timed(_brute_region, [(rects, area) for area in areas])),
+        "raycast": (timed(grid.raycast, [(origin, direction, 800.0) for origin, direction in rays]),
+                    timed(_brute_raycast, [(rects, origin, direction, 800.0)
+                                           for origin, direction in rays])),
+        "solid_at": (timed(grid.solid_at, list(points)),
+                     timed(_brute_solid_at, [(rects, x, y) for x, y in points])),
+        "nearest_below": (timed(grid.nearest_below, list(points)),
+                          timed(_brute_nearest_below, [(rects, x, y) for x, y in points])),
+    }
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Compare the grid queries with brute force")
+    parser.add_argument("--colliders", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, (grid, brute) in benchmark(args.colliders, args.queries).items():
+        print(f"{name:>14}: grid {grid * 1e6:8.2f} us, brute force {brute * 1e6:9.2f} us, "
+              f"{brute / grid:6.1f}x")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
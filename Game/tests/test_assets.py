@@ -0,0 +1,113 @@
+"""test_assets.py
+
+Tests for assets.py
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pygame
+import assets
+from assets import ASSETS, LEVEL_DRAWINGS, AssetManager, surface_bytes
+from button import button
+
+
+class TestAssetManager(unittest.TestCase):
+    """Tests for AssetManager class
+    """
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.paths: list[str] = []
+        for index, size in enumerate(((8, 8), (16, 8), (4, 4))):
+            path = os.path.join(self._directory.name, f"image_{index}.png")
+            pygame.image.save(pygame.Surface(size, depth=32), path)
+            self.paths.append(path)
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_preload(self) -> None:
+        """Declared images are loaded on the background thread, asking for them later
+        is a hit
+        """
+        manager = AssetManager()
+        declared = manager.declare_directory(LEVEL_DRAWINGS)
+        manager.declare(declared[0])
+        manager.start()
+        self.assertTrue(manager.wait(30))
+        manager.stop()
+
+        self.assertTrue(manager.ready)
+        self.assertEqual(len(declared), 5)
+        self.assertTrue(all(manager.cached(path) for path in declared))
+        with patch("pygame.image.load") as mock_load:
+            self.assertEqual(manager.image(declared[2]).get_size(), (800, 800))
+        mock_load.assert_not_called()
+        self.assertEqual((manager.hits, manager.misses), (1, 0))
+
+    def test_converted_once_the_display_exists(self) -> None:
+        """Images loaded before the window are converted on their first use after
+        """
+        manager = AssetManager()
+        with (patch("assets.convert", side_effect=lambda surface: surface.copy())
+              as mock_convert,
+              patch("pygame.display.get_surface", return_value=None)):
+            first = manager.image(self.paths[0])
+        mock_convert.assert_not_called()
+
+        with (patch("assets.convert", side_effect=lambda surface: surface.copy())
+              as mock_convert,
+              patch("pygame.display.get_surface", return_value=object())):
+            converted = manager.image(self.paths[0])
+            self.assertIs(manager.image(self.paths[0]), converted)
+            manager.image(self.paths[1])
+        self.assertIsNot(converted, first)
+        self.assertEqual(mock_convert.call_count, 2)
+
+    def test_scaled_from_the_cached_original(self) -> None:
+        manager = AssetManager()
+        manager.image(self.paths[1])
+        with patch("pygame.image.load") as mock_load:
+            scaled = manager.image(self.paths[1], (32, 16))
+        mock_load.assert_not_called()
+        self.assertEqual(scaled.get_size(), (32, 16))
+        self.assertTrue(manager.cached(self.paths[1], (32, 16)))
+
+    def test_budget_evicts_least_recently_used(self) -> None:
+        """Over the budget the image asked for longest ago goes first
+        """
+        manager = AssetManager(budget=sum(surface_bytes(pygame.image.load(path))
+                                          for path in self.paths[:2]))
+        manager.image(self.paths[0])
+        manager.image(self.paths[1])
+        manager.image(self.paths[0])
+        manager.image(self.paths[2])
+
+        self.assertTrue(manager.cached(self.paths[0]))
+        self.assertFalse(manager.cached(self.paths[1]))
+        self.assertTrue(manager.cached(self.paths[2]))
+        self.assertEqual(manager.evictions, 1)
+        self.assertLessEqual(manager.used, manager.budget)
+
+    def test_fonts_are_shared(self) -> None:
+        """Buttons of a size share one font
+        """
+        manager = AssetManager()
+        self.assertIs(manager.font(30), manager.font(30))
+        self.assertIsNot(manager.font(30), manager.font(31))
+        first = button(pygame.Rect(0, 0, 10, 10), "a", (0, 0, 0), (0, 0, 0), 29)
+        second = button(pygame.Rect(0, 0, 10, 10), "b", (0, 0, 0), (0, 0, 0), 29)
+        self.assertIs(first.font, second.font)
+        self.assertIs(first.font, ASSETS.font(29))
+        self.assertIs(manager.atlas(30, (0, 0, 0)), manager.atlas(30, (0, 0, 0)))
+        self.assertIsNot(manager.atlas(30, (0, 0, 0)), manager.atlas(30, (1, 0, 0)))
+
+    def test_invalid_budget(self) -> None:
+        with self.assertRaises(ValueError):
+            assets.AssetManager(budget=0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,62 @@
+"""test_benchmarks.py
+
+Tests for benchmarks.py
+"""
+
+import unittest
+from unittest.mock import patch
+from benchmarks import Result, levels, report, run_suite, time_level_loads, time_play_frames
+from tests.test_scenes import make_game
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests for the benchmark suite
+    """
+
+    def setUp(self) -> None:
+        self.game = make_game()
+
+    def test_levels(self) -> None:
+        """Every level is found and none is left loaded
+        """
+        self.assertEqual(levels(self.game), list(range(1, 8)))
+        self.assertEqual(self.game.level, 0)
+
+    def test_level_loads(self) -> None:
+        results = time_level_loads(self.game, 2)
+        self.assertEqual([result.name for result in results],
+                         [f"level {level} load" for level in range(1, 8)])
+        self.assertTrue(all(result.seconds > 0 and result.iterations == 2
+                            for result in results))
+        self.assertEqual(self.game.metrics.load_time.written, 7 + 7 * 2)
+
+    def test_play_frames(self) -> None:
+        """Frames are played through the play scene without moving on or saving
+        """
+        with (patch.object(self.game.ghosts, "save_if_best") as mock_ghost,
+              patch("scenes.ReplayRecorder.save") as mock_replay):
+            results = time_play_frames(self.game, 5)
+
+        self.assertEqual(len(results), 7)
+        self.assertEqual(self.game.play.replay.frames, 5)
+        self.assertEqual(self.game.metrics.step_time.written, 7 * 5)
+        self.assertEqual(len(self.game.scenes), 0)
+        self.assertFalse(self.game.scenes.apply())
+        mock_ghost.assert_not_called()
+        mock_replay.assert_not_called()
+
+    def test_suite_and_report(self) -> None:
+        results = run_suite(self.game, frames=3, loads=1)
+        names = [result.name for result in results]
+        self.assertIn("level 7 frame", names)
+        self.assertIn("particles 4096", names)
+        self.assertIn("grid raycast", names)
+        self.assertIn("hud text TextLine", names)
+        self.assertIn("hud text Font.render", names)
+
+        table = report([Result("a", 1.5e-6, 10), Result("longer", 2e-3, 3)]).splitlines()
+        self.assertEqual(table, ["a              1.5 us  x10", "longer      2000.0 us  x3"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
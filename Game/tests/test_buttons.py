@@ -8,6 +8,7 @@ from unittest.mock import patch
 import pygame
 
 from button import button
+from input_state import InputState
 
 
 class TestButton(unittest.TestCase):
@@ -67,6 +68,21 @@ class TestButton(unittest.TestCase):
         ):
             self.assertFalse(test_button.button_clicked())
 
+    def test_button_clicked_with_input_state(self):
+        """With a snapshot only a click that started this frame over the rect counts
+        """
+        rect = pygame.Rect(0, 0, 100, 100)
+        test_button = button(rect, "Play", (0, 0, 0), (255, 0, 0), 32)
+
+        with patch("pygame.mouse.get_pressed") as mock_pressed:
+            self.assertTrue(test_button.button_clicked(
+                InputState(mouse_pos=(50, 50), mouse_down=True, clicked=True)))
+            self.assertFalse(test_button.button_clicked(
+                InputState(mouse_pos=(50, 50), mouse_down=True)))
+            self.assertFalse(test_button.button_clicked(
+                InputState(mouse_pos=(150, 50), mouse_down=True, clicked=True)))
+        mock_pressed.assert_not_called()
+
     def test_draw_button_draws_rect_and_text(self):
         """draw_button draws the button rectangle and renders text onto the surface
         """
@@ -0,0 +1,106 @@
+"""test_capture.py
+
+Tests for capture.py
+"""
+
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import pygame
+from capture import FrameCapture
+
+
+class TestFrameCapture(unittest.TestCase):
+    """Tests for FrameCapture class
+    """
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self._directory.name, "frames")
+        self.surface = pygame.Surface((5, 3), depth=32)
+        self.surface.fill((10, 20, 30))
+        self.surface.set_at((0, 0), (255, 0, 0))
+        self.surface.set_at((4, 2), (0, 0, 255))
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_png_frames(self) -> None:
+        """Every frame is a PNG pygame reads back with the surface's colors
+        """
+        capture = FrameCapture(self.surface, self.directory)
+        capture.start()
+        capture.frame()
+        self.surface.set_at((2, 1), (0, 255, 0))
+        capture.frame()
+        capture.stop()
+        capture.stop()
+
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["frame_000001.png", "frame_000002.png"])
+        with open(os.path.join(self.directory, "frame_000002.png"), "rb") as file:
+            image = pygame.image.load(io.BytesIO(file.read()))
+        self.assertEqual(image.get_size(), (5, 3))
+        self.assertEqual(image.get_at((0, 0))[:3], (255, 0, 0))
+        self.assertEqual(image.get_at((4, 2))[:3], (0, 0, 255))
+        self.assertEqual(image.get_at((2, 1))[:3], (0, 255, 0))
+        self.assertEqual(image.get_at((1, 2))[:3], (10, 20, 30))
+        self.assertEqual((capture.captured, capture.written, capture.dropped), (2, 2, 0))
+
+    def test_raw_stream(self) -> None:
+        """Raw frames are appended to one rgb24 stream, row by row
+        """
+        capture = FrameCapture(self.surface, self.directory, "raw")
+        capture.start()
+        for _ in range(3):
+            capture.frame()
+        capture.stop()
+
+        with open(capture.stream_path, "rb") as file:
+            data = file.read()
+        self.assertTrue(capture.stream_path.endswith("capture-5x3.rgb"))
+        self.assertEqual(len(data), 3 * 5 * 3 * 3)
+        self.assertEqual(data[:6], bytes((255, 0, 0, 10, 20, 30)))
+        self.assertEqual(data[42:45], bytes((0, 0, 255)))
+
+    def test_frames_dropped_while_the_writer_is_behind(self) -> None:
+        """With every buffer waiting for the writer frames are counted as dropped and
+        the main loop does not wait, the frames that were kept are written
+        """
+        release = threading.Event()
+        write = FrameCapture._write
+
+        def slow_write(capture: FrameCapture, *args: object) -> None:
+            release.wait()
+            write(capture, *args)  # type: ignore[arg-type]
+
+        with patch.object(FrameCapture, "_write", slow_write):
+            capture = FrameCapture(self.surface, self.directory, pool_size=2)
+            capture.start()
+            started = time.perf_counter()
+            for _ in range(10):
+                capture.frame()
+            elapsed = time.perf_counter() - started
+            release.set()
+            capture.stop()
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual((capture.frames, capture.captured, capture.dropped), (10, 2, 8))
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["frame_000001.png", "frame_000002.png"])
+
+    def test_invalid_arguments(self) -> None:
+        with self.assertRaises(ValueError):
+            FrameCapture(self.surface, self.directory, "gif")
+        with self.assertRaises(ValueError):
+            FrameCapture(self.surface, self.directory, pool_size=0)
+        with self.assertRaises(ValueError):
+            FrameCapture(pygame.Surface((5, 3), depth=8), self.directory)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
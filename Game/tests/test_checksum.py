@@ -0,0 +1,191 @@
+"""test_checksum.py
+
+Tests for checksum.py and the checksum kept by Simulation
+"""
+
+import random
+import time
+import unittest
+from array import array
+from checksum import (CHECKSUM_SEED, FIELDS, Desync, DesyncDetector, checksum, diff_states,
+                      first_desync, quantize, quantize_into)
+from player import Player
+from rollback import RollbackSession
+from input_state import MaskKeys
+from simulation import Simulation
+
+
+def make_simulation(level: int = 6) -> Simulation:
+    simulation = Simulation()
+    simulation.level_changer(level)
+    return simulation
+
+
+def random_inputs(frames: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    return bytes(rng.randrange(8) for _ in range(frames))
+
+
+class TestChecksum(unittest.TestCase):
+    """Tests for quantize and checksum
+    """
+
+    def test_quantize(self) -> None:
+        """Velocity keeps 1/1024 of a pixel, flags become 0 or 1
+        """
+        player = Player(10, 20)
+        player.jump_velocity = -2.5
+        player.on_ground = True
+        state = array("d", bytes(8 * Player.STATE_SIZE))
+        player.save_state(state, 0)
+        self.assertEqual(quantize(state), (10, 20, 40, 40, -2560, 1, 1, 0, 0, 0))
+        out = array("q", bytes(8 * len(FIELDS)))
+        quantize_into(state, out)
+        self.assertEqual(tuple(out), quantize(state))
+
+    def test_every_field_changes_the_checksum(self) -> None:
+        """Changing any one field changes the checksum
+        """
+        state = array("d", [1.0, 2.0, 40.0, 40.0, 3.5, 0.0, 1.0, 0.0, 0.0, -2.0])
+        base = checksum(CHECKSUM_SEED, state)
+        for index in range(len(state)):
+            changed = array("d", state)
+            changed[index] = 1.0 - changed[index] if 5 <= index < 9 else changed[index] + 1
+            self.assertNotEqual(checksum(CHECKSUM_SEED, changed), base, index)
+
+    def test_checksum_is_chained(self) -> None:
+        """The same state after different histories gives different checksums
+        """
+        state = array("d", [1.0, 2.0, 40.0, 40.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0])
+        self.assertNotEqual(checksum(CHECKSUM_SEED, state), checksum(CHECKSUM_SEED + 1, state))
+
+    def test_first_desync(self) -> None:
+        """The first differing frame is reported
+        """
+        self.assertIsNone(first_desync([1, 2, 3], [1, 2, 3]))
+        self.assertEqual(first_desync([1, 2, 3, 4], [1, 2, 5, 6]), Desync(2, "checksum", 3, 5))
+
+    def test_diff_states(self) -> None:
+        """The first differing field is named
+        """
+        state = (1, 2, 40, 40, 0, 0, 1, 0, 0, 0)
+        self.assertIsNone(diff_states(7, state, state))
+        self.assertEqual(diff_states(7, state, (1, 2, 40, 40, 5, 1, 1, 0, 0, 3)),
+                         Desync(7, "jump_velocity", 0, 5))
+
+
+class TestSimulationChecksum(unittest.TestCase):
+    """Tests for the rolling checksum of Simulation
+    """
+
+    def test_same_inputs_same_checksum(self) -> None:
+        """Two simulations fed the same inputs agree every frame
+        """
+        first, second = make_simulation(), make_simulation()
+        keys = MaskKeys()
+        for mask in random_inputs(300, 1):
+            keys.mask = mask
+            first.step(keys)
+            second.step(keys)
+            self.assertEqual(first.checksum, second.checksum)
+
+    def test_reset_restarts_the_chain(self) -> None:
+        """Replaying from a reset gives the same checksum as the first time
+        """
+        simulation = make_simulation()
+        inputs = random_inputs(100, 2)
+        simulation.run(inputs)
+        value = simulation.checksum
+        simulation.reset()
+        self.assertEqual(simulation.checksum, CHECKSUM_SEED)
+        simulation.run(inputs)
+        self.assertEqual(simulation.checksum, value)
+
+    def test_rollback_restores_checksum(self) -> None:
+        """A corrected rollback ends on the checksum of the straight run
+        """
+        local, remote = make_simulation(), make_simulation()
+        session = RollbackSession([local, remote], local=0)
+        inputs = random_inputs(40, 3)
+        for frame, mask in enumerate(inputs):
+            if frame >= 5:
+                session.add_remote_input(1, frame - 5, inputs[frame - 5])
+            session.advance(mask)
+
+        reference = make_simulation()
+        keys = MaskKeys()
+        for frame, mask in enumerate(inputs):
+            keys.mask = mask if frame < 35 else inputs[34]  # the prediction
+            reference.step(keys)
+        self.assertEqual(remote.checksum, reference.checksum)
+
+    def test_checksum_is_cheap(self) -> None:
+        """Checksumming a frame costs well under 1% of a 60 fps frame
+        """
+        player = make_simulation().player
+        state = array("d", bytes(8 * Player.STATE_SIZE))
+        frames = 10000
+
+        start = time.perf_counter()
+        value = CHECKSUM_SEED
+        for _ in range(frames):
+            player.save_state(state, 0)
+            value = checksum(value, state)
+        per_frame = (time.perf_counter() - start) / frames
+
+        self.assertLess(per_frame, 0.01 / 60)
+
+
+class TestDesyncDetector(unittest.TestCase):
+    """Tests for DesyncDetector class
+    """
+
+    def test_peers_agree(self) -> None:
+        """Peers playing the same inputs never report a desync
+        """
+        local, remote = make_simulation(), make_simulation()
+        detector = DesyncDetector()
+        keys = MaskKeys()
+        for frame, mask in enumerate(random_inputs(200, 4)):
+            keys.mask = mask
+            local.step(keys)
+            remote.step(keys)
+            detector.record(frame, local.player, local.checksum)
+            self.assertIsNone(detector.compare(frame, remote.checksum))
+        self.assertIsNone(detector.desync)
+
+    def test_reports_first_frame_and_field(self) -> None:
+        """A nudged peer is caught on the frame it diverged, with the field named
+        """
+        local, remote = make_simulation(), make_simulation()
+        detector = DesyncDetector()
+        keys = MaskKeys()
+        state = array("d", bytes(8 * Player.STATE_SIZE))
+        for frame in range(60):
+            if frame == 30:
+                remote.player.jump_velocity += 0.01
+            remote.step(keys)
+            local.step(keys)
+            detector.record(frame, local.player, local.checksum)
+            if detector.compare(frame, remote.checksum) and frame == detector.desync.frame:
+                remote.player.save_state(state, 0)
+                explained = detector.explain(frame, state)
+
+        self.assertEqual(detector.desync.frame, 30)
+        self.assertEqual(explained.frame, 30)
+        self.assertEqual(explained.field, "jump_velocity")
+
+    def test_unknown_frame(self) -> None:
+        """Frames that were never recorded or fell out of the history are skipped
+        """
+        detector = DesyncDetector(history=4)
+        player = Player()
+        detector.record(0, player, 123)
+        detector.record(4, player, 456)
+        self.assertIsNone(detector.compare(0, 999))
+        self.assertIsNone(detector.explain(1, array("d", bytes(8 * Player.STATE_SIZE))))
+        self.assertEqual(detector.compare(4, 999), Desync(4, "checksum", 456, 999))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,179 @@
+"""test_entities.py
+
+Tests for entities.py and the entities of a Simulation
+"""
+
+import random
+import time
+import unittest
+from array import array
+import pygame
+from entities import EntityStore, EntitySpec, HAZARD, COLLECTIBLE, ENEMY, NOT_TAKEN
+from input_state import MaskKeys
+from simulation import Simulation
+
+FRAME_SECONDS: float = 1 / 60
+
+
+def random_store(count: int, seed: int) -> EntityStore:
+    rng = random.Random(seed)
+    store = EntityStore(4)
+    for _ in range(count):
+        store.add(rng.randrange(3),
+                  pygame.Rect(rng.randrange(0, 4000), rng.randrange(0, 800),
+                              rng.randrange(5, 40), rng.randrange(5, 40)),
+                  speed=rng.randrange(0, 4), span=rng.randrange(0, 200))
+    return store
+
+
+class TestEntityStore(unittest.TestCase):
+    """Tests for EntityStore class
+    """
+
+    def test_add_grows(self) -> None:
+        """Adding past the capacity reallocates and keeps every entity
+        """
+        store = EntityStore(2)
+        for index in range(5):
+            self.assertEqual(store.add(COLLECTIBLE, pygame.Rect(index, 2 * index, 3, 4)), index)
+        self.assertEqual(len(store), 5)
+        self.assertGreaterEqual(store.capacity, 5)
+        self.assertEqual(store.x[:5].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(store.y[:5].tolist(), [0, 2, 4, 6, 8])
+        self.assertEqual(store.taken[:5].tolist(), [NOT_TAKEN] * 5)
+
+    def test_invalid(self) -> None:
+        """Unknown kinds and negative patrols are rejected
+        """
+        store = EntityStore()
+        with self.assertRaises(ValueError):
+            store.add(7, pygame.Rect(0, 0, 1, 1))
+        with self.assertRaises(ValueError):
+            store.add(ENEMY, pygame.Rect(0, 0, 1, 1), speed=-1)
+
+    def test_copy_is_independent(self) -> None:
+        """A copy has its own arrays
+        """
+        store = EntityStore.from_specs([EntitySpec(COLLECTIBLE, pygame.Rect(0, 0, 10, 10))])
+        copy = store.copy()
+        copy.collect(pygame.Rect(0, 0, 5, 5), 3)
+        self.assertEqual(copy.collected(), 1)
+        self.assertEqual(store.collected(), 0)
+
+    def test_patrol(self) -> None:
+        """Enemies walk out to home + span and back, the rest stay put
+        """
+        store = EntityStore.from_specs([
+            EntitySpec(ENEMY, pygame.Rect(100, 0, 10, 10), speed=2, span=10),
+            EntitySpec(HAZARD, pygame.Rect(50, 0, 10, 10), speed=2, span=10),
+            EntitySpec(ENEMY, pygame.Rect(0, 0, 10, 10), speed=3, span=0),
+        ])
+        expected = {0: 100, 3: 106, 5: 110, 7: 106, 10: 100}
+        for frame, x in expected.items():
+            store.patrol(frame)
+            self.assertEqual(store.x[:3].tolist(), [x, 50, 0])
+        store.patrol(2)
+        self.assertEqual(store.vx[:3].tolist(), [2, 0, 0])
+        store.patrol(7)
+        self.assertEqual(store.vx[0], -2)
+
+    def test_touching_matches_colliderect(self) -> None:
+        """The batch overlap test agrees with pygame on every entity
+        """
+        store = random_store(500, 1)
+        rng = random.Random(2)
+        for _ in range(50):
+            area = pygame.Rect(rng.randrange(0, 4000), rng.randrange(0, 800), 40, 40)
+            touching = store.touching(area).tolist()
+            for index in range(len(store)):
+                rect = pygame.Rect(int(store.x[index]), int(store.y[index]),
+                                   int(store.w[index]), int(store.h[index]))
+                self.assertEqual(touching[index], rect.colliderect(area))
+
+    def test_hits_collect_and_rewind(self) -> None:
+        """Collectibles do not hurt, are taken once and come back on a rewind
+        """
+        store = EntityStore.from_specs([
+            EntitySpec(COLLECTIBLE, pygame.Rect(0, 0, 10, 10)),
+            EntitySpec(COLLECTIBLE, pygame.Rect(20, 0, 10, 10)),
+            EntitySpec(HAZARD, pygame.Rect(100, 0, 10, 10)),
+        ])
+        player = pygame.Rect(0, 0, 40, 10)
+        self.assertFalse(store.hits(player))
+        self.assertEqual(store.collect(player, 5), 2)
+        self.assertEqual(store.collect(player, 6), 0)
+        self.assertEqual(store.visible().tolist(), [2])
+        self.assertTrue(store.hits(pygame.Rect(95, 0, 10, 10)))
+
+        store.rewind(5)
+        self.assertEqual(store.collected(), 2)
+        store.rewind(4)
+        self.assertEqual(store.collected(), 0)
+
+    def test_empty(self) -> None:
+        """An empty store never hits or collects
+        """
+        store = EntityStore()
+        self.assertFalse(store.hits(pygame.Rect(0, 0, 10, 10)))
+        self.assertEqual(store.collect(pygame.Rect(0, 0, 10, 10), 1), 0)
+
+    def test_scales(self) -> None:
+        """Tens of thousands of entities take a small part of a 60 fps frame
+        """
+        store = random_store(20_000, 3)
+        player = pygame.Rect(400, 400, 40, 40)
+        frames = 200
+        started = time.perf_counter()
+        for frame in range(frames):
+            store.patrol(frame)
+            store.hits(player)
+            store.collect(player, frame)
+        per_frame = (time.perf_counter() - started) / frames
+        self.assertLess(per_frame, FRAME_SECONDS / 4)
+
+
+class TestSimulationEntities(unittest.TestCase):
+    """Tests for the entities of a Simulation
+    """
+
+    def test_hazard_ends_attempt(self) -> None:
+        """Touching the spikes is a loss
+        """
+        simulation = Simulation()
+        simulation.level_changer(7)
+        self.assertIsNone(simulation.outcome())
+        simulation.player.reposition(0, 590)
+        self.assertIs(simulation.outcome(), False)
+
+    def test_collectible_comes_back_after_load(self) -> None:
+        """Loading a state from before a pickup puts the collectible back
+        """
+        simulation = Simulation()
+        simulation.level_changer(7)
+        keys = MaskKeys()
+        simulation.step(keys)
+        saved = array("d", bytes(8 * simulation.state_size))
+        simulation.save_state(saved, 0)
+
+        coin = simulation.entities
+        simulation.player.reposition(int(coin.x[1]), int(coin.y[1]))
+        simulation.step(keys)
+        self.assertEqual(simulation.entities.collected(), 1)
+
+        simulation.load_state(saved, 0)
+        self.assertEqual(simulation.entities.collected(), 0)
+
+    def test_levels_do_not_share_entities(self) -> None:
+        """Every simulation takes collectibles from its own copy
+        """
+        first, second = Simulation(), Simulation()
+        first.level_changer(7)
+        second.level_changer(7)
+        first.entities.collect(pygame.Rect(0, 0, 800, 800), 1)
+        self.assertEqual(second.entities.collected(), 0)
+        first.level_changer(7)
+        self.assertEqual(first.entities.collected(), 0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,240 @@
+"""test_environment.py
+
+Tests for environment.py
+"""
+
+import random
+import unittest
+import numpy as np
+import pygame
+from environment import (PlatformerEnv, VectorPlatformerEnv, NEARBY_COLLIDERS, OBSERVATION_SIZE,
+                         WIN_REWARD, FALL_REWARD, collides, rect_array)
+from input_state import MaskKeys, INPUT_RIGHT
+from simulation import Simulation
+from movement_strategy import FastMovement, IceMovement, SlowMovement
+
+
+class TestHelpers(unittest.TestCase):
+    """Tests for the array helpers
+    """
+
+    def test_collides_matches_colliderect(self) -> None:
+        """collides gives the same answer as pygame.Rect.colliderect
+        """
+        other = pygame.Rect(50, 50, 30, 20)
+        positions = [(x, y) for x in range(0, 100, 7) for y in range(0, 100, 7)]
+        x = np.array([p[0] for p in positions])
+        y = np.array([p[1] for p in positions])
+
+        result = collides(x, y, 40, 40, rect_array([other])[0])
+
+        expected = [pygame.Rect(px, py, 40, 40).colliderect(other) for px, py in positions]
+        self.assertEqual(result.tolist(), expected)
+
+    def test_rect_array_empty(self) -> None:
+        """No rects gives an empty (0, 4) array
+        """
+        self.assertEqual(rect_array([]).shape, (0, 4))
+
+
+class TestPlatformerEnv(unittest.TestCase):
+    """Tests for PlatformerEnv class
+    """
+
+    def test_reset(self) -> None:
+        """Reset puts the player on the start position
+        """
+        env = PlatformerEnv()
+        obs = env.reset(2)
+
+        self.assertEqual(obs.shape, (OBSERVATION_SIZE,))
+        self.assertEqual(tuple(obs[:2]), (200.0, 621.0))
+
+    def test_reset_invalid_level(self) -> None:
+        """Unknown levels are rejected
+        """
+        with self.assertRaises(ValueError):
+            PlatformerEnv().reset(0)
+
+    def test_walk_to_goal(self) -> None:
+        """Walking right on level 1 reaches the goal and gets the win reward
+        """
+        env = PlatformerEnv()
+        env.reset(1)
+        total = 0.0
+        for _ in range(5):
+            env.step(0)
+        for _ in range(200):
+            _, reward, done, info = env.step(INPUT_RIGHT)
+            total += reward
+            if done:
+                break
+
+        self.assertTrue(done)
+        self.assertTrue(info["won"])
+        self.assertGreater(total, WIN_REWARD)
+
+    def test_observes_platforms_and_hazards(self) -> None:
+        """Moving platforms are observed where they are now, hazards get their own slots
+        """
+        env = PlatformerEnv()
+        env.reset(7)
+        for _ in range(10):
+            obs = env.step(0)[0]
+        simulation = env.simulation
+        player, ferry = simulation.player, simulation.platforms[0].rect
+        colliders = obs[8:8 + 4 * NEARBY_COLLIDERS].reshape(-1, 4).tolist()
+        self.assertIn([ferry.x - player.x, ferry.y - player.y, ferry.w, ferry.h], colliders)
+        # the spikes behind the start are the closest hazard
+        spikes = obs[8 + 4 * NEARBY_COLLIDERS:12 + 4 * NEARBY_COLLIDERS].tolist()
+        self.assertEqual(spikes, [0 - player.x, 600 - player.y, 30, 20])
+
+        env.reset(1)
+        self.assertFalse(env._observe()[8 + 4 * NEARBY_COLLIDERS:].any())
+
+    def test_max_steps(self) -> None:
+        """Attempts are cut off after max_steps
+        """
+        env = PlatformerEnv(max_steps=3)
+        env.reset(1)
+        dones = [env.step(0)[2] for _ in range(3)]
+
+        self.assertEqual(dones, [False, False, True])
+
+
+class TestVectorPlatformerEnv(unittest.TestCase):
+    """Tests for VectorPlatformerEnv class
+    """
+
+    def test_invalid_num_envs(self) -> None:
+        """At least one environment is needed
+        """
+        with self.assertRaises(ValueError):
+            VectorPlatformerEnv(0)
+
+    def test_rejects_moving_platforms(self) -> None:
+        """Moving platforms are only simulated by the real Player
+        """
+        with self.assertRaises(ValueError):
+            VectorPlatformerEnv(2).reset(7)
+
+    def test_matches_player_update(self) -> None:
+        """Every environment moves exactly like a real Player on every level
+        """
+        rng = random.Random(5)
+        count = 16
+        for level in range(1, 7):
+            env = VectorPlatformerEnv(count, max_steps=10_000)
+            env.reset(level)
+            simulations = [Simulation() for _ in range(count)]
+            for simulation in simulations:
+                simulation.level_changer(level)
+                simulation.reset()
+            alive = [True] * count
+            keys = MaskKeys()
+
+            for _ in range(200):
+                actions = np.array([rng.randrange(8) for _ in range(count)])
+                _, _, dones, info = env.step(actions)
+                for index, simulation in enumerate(simulations):
+                    if not alive[index]:
+                        continue
+                    keys.mask = int(actions[index])
+                    simulation.step(keys)
+                    player = simulation.player
+                    self.assertEqual((player.x, player.y),
+                                     (info["final_x"][index], info["final_y"][index]))
+                    if dones[index]:
+                        alive[index] = False
+                        continue
+                    self.assertEqual(player.jump_velocity, env.vy[index])
+                    self.assertEqual(player.on_ground, env.on_ground[index])
+                    self.assertEqual(player.can_wall_jump, env.can_wall_jump[index])
+                    self.assertEqual(player.touching_left_wall, env.touching_left_wall[index])
+                    self.assertEqual(player.touching_right_wall, env.touching_right_wall[index])
+
+    def test_strategies_match_player_update(self) -> None:
+        """Slow, fast and ice batches move like players using the same strategy
+        """
+        rng = random.Random(6)
+        count = 8
+        for strategy in (SlowMovement, FastMovement, IceMovement):
+            env = VectorPlatformerEnv(count, max_steps=10_000, strategy=strategy())
+            env.reset(3)
+            simulations = [Simulation() for _ in range(count)]
+            for simulation in simulations:
+                simulation.player.movement_strategy = strategy()
+                simulation.level_changer(3)
+            alive = [True] * count
+            keys = MaskKeys()
+
+            for _ in range(150):
+                actions = np.array([rng.choice((0, 1, 2, 6)) for _ in range(count)])
+                _, _, dones, info = env.step(actions)
+                for index, simulation in enumerate(simulations):
+                    if not alive[index]:
+                        continue
+                    keys.mask = int(actions[index])
+                    simulation.step(keys)
+                    player = simulation.player
+                    self.assertEqual((player.x, player.y),
+                                     (info["final_x"][index], info["final_y"][index]),
+                                     strategy.__name__)
+                    alive[index] = not dones[index]
+
+    def test_observation_matches_single_env(self) -> None:
+        """Vector and single environments observe the same state the same way
+        """
+        env = PlatformerEnv()
+        vector_env = VectorPlatformerEnv(3)
+        single_obs = env.reset(6)
+        vector_obs = vector_env.reset(6)
+        for _ in range(10):
+            single_obs = env.step(INPUT_RIGHT)[0]
+            vector_obs = vector_env.step(np.full(3, INPUT_RIGHT))[0]
+
+        for row in vector_obs:
+            self.assertEqual(row.tolist(), single_obs.tolist())
+
+    def test_floor_wins_over_goal(self) -> None:
+        """A player touching the floor and the goal on the same frame fell, in the
+        vector environment like in the single one
+        """
+        env = PlatformerEnv()
+        vector_env = VectorPlatformerEnv(1)
+        env.reset(1)
+        vector_env.reset(1)
+        goal = pygame.Rect(0, 860, 80, 80)  # reaches into the floor
+        env.simulation.goal = goal
+        vector_env.goal = rect_array([goal])[0]
+        env.simulation.player.reposition(0, 870)
+        vector_env.x[0], vector_env.y[0] = 0, 870
+
+        _, reward, done, info = env.step(0)
+        _, rewards, dones, vector_info = vector_env.step(np.zeros(1, dtype=np.int64))
+
+        self.assertIs(info["won"], False)
+        self.assertEqual((bool(vector_info["won"][0]), bool(vector_info["fell"][0])),
+                         (False, True))
+        self.assertEqual((bool(dones[0]), float(rewards[0])), (done, reward))
+
+    def test_fall_resets_environment(self) -> None:
+        """Falling off gives the fall reward and puts the environment back at the start
+        """
+        env = VectorPlatformerEnv(2)
+        env.reset(3)  # level 3 has a hole between x 300 and 400
+        env.x[0] = 340
+        env.y[0] = 580
+
+        fell = False
+        for _ in range(120):
+            obs, rewards, dones, info = env.step(np.zeros(2, dtype=np.int64))
+            if dones[0]:
+                fell = True
+                break
+
+        self.assertTrue(fell)
+        self.assertTrue(info["fell"][0])
+        self.assertLess(rewards[0], FALL_REWARD / 2)
+        self.assertFalse(dones[1])
+        self.assertEqual(tuple(obs[0, :2]), (200.0, 621.0))
@@ -0,0 +1,160 @@
+"""test_fixed_point.py
+
+Tests for fixed_point.py and the fixed point mode of VectorPlatformerEnv
+"""
+
+import random
+import unittest
+from array import array
+import numpy as np
+from environment import VectorPlatformerEnv
+from fixed_point import (FixedPointPlayer, FixedTuning, SUBPIXELS, compare, to_fixed,
+                         to_float)
+from input_state import MaskKeys, INPUT_JUMP
+from player import Player
+from simulation import Simulation
+
+# a fixed input pattern so the expected checksum does not depend on a random generator
+PATTERN: bytes = bytes((i * 7 // 13 + i // 29) % 8 for i in range(400))
+
+
+def fixed_simulation(level: int) -> Simulation:
+    simulation = Simulation(FixedPointPlayer())
+    simulation.level_changer(level)
+    return simulation
+
+
+class TestConversions(unittest.TestCase):
+    """Tests for to_fixed, to_float and FixedTuning
+    """
+
+    def test_round_trip(self) -> None:
+        """Whole sub-pixel values survive both conversions
+        """
+        for value in (0, 1, -1, 179, -3840, 123456):
+            self.assertEqual(to_fixed(to_float(value)), value)
+        self.assertEqual(to_fixed(0.7), 179)
+
+    def test_tuning(self) -> None:
+        """The player's constants are converted once
+        """
+        player = Player(jump_speed=15.0, fall_speed=0.7, wall_bounce_speed=13.0)
+        self.assertEqual(FixedTuning.from_player(player),
+                         FixedTuning(15 * SUBPIXELS, 179, 13 * SUBPIXELS))
+
+
+class TestFixedPointPlayer(unittest.TestCase):
+    """Tests for FixedPointPlayer class
+    """
+
+    def test_keeps_sub_pixel_motion(self) -> None:
+        """A jump rises by the exact sum of the fixed point velocities
+        """
+        player = FixedPointPlayer(0, 1000)
+        player.on_ground = True
+        keys = MaskKeys(INPUT_JUMP)
+        player.update(keys, [])
+        velocity = -15 * SUBPIXELS + 179
+        self.assertEqual(player.jump_velocity, to_float(velocity))
+        self.assertEqual(player.sub_y, (1000 << 8) + velocity)
+        self.assertEqual(player.y, player.sub_y >> 8)
+
+    def test_reposition_clears_remainder(self) -> None:
+        """Moving the player from outside starts it on a whole pixel
+        """
+        player = FixedPointPlayer(0, 0)
+        player.update(MaskKeys(), [])
+        player.reposition(10, 50)
+        player.update(MaskKeys(), [])
+        self.assertEqual(player.sub_y, (50 << 8) + 179)
+
+    def test_save_and_load(self) -> None:
+        """The sub-pixel position survives a snapshot
+        """
+        player = FixedPointPlayer(0, 0)
+        for _ in range(3):
+            player.update(MaskKeys(), [])
+        buffer = array("d", bytes(8 * Player.STATE_SIZE))
+        player.save_state(buffer, 0)
+
+        other = FixedPointPlayer(0, 0)
+        other.load_state(buffer, 0)
+        self.assertEqual((other.sub_y, other.y, other.jump_velocity),
+                         (player.sub_y, player.y, player.jump_velocity))
+
+    def test_bit_for_bit(self) -> None:
+        """A scripted run ends on the same checksum on every machine
+        """
+        simulation = fixed_simulation(3)
+        self.assertEqual(simulation.run(PATTERN), (False, 234))
+        self.assertEqual(simulation.checksum, 2622549708)
+        self.assertEqual((simulation.player.x, simulation.player.sub_y), (-95, 225487))
+
+
+class TestVectorFixedPoint(unittest.TestCase):
+    """Tests for VectorPlatformerEnv(fixed_point=True)
+    """
+
+    def test_matches_fixed_point_player(self) -> None:
+        """Every environment moves exactly like a FixedPointPlayer
+        """
+        rng = random.Random(8)
+        count = 12
+        for level in (1, 3, 5):
+            env = VectorPlatformerEnv(count, max_steps=10_000, fixed_point=True)
+            env.reset(level)
+            simulations = [fixed_simulation(level) for _ in range(count)]
+            alive = [True] * count
+            keys = MaskKeys()
+            for _ in range(200):
+                actions = np.array([rng.randrange(8) for _ in range(count)])
+                _, _, dones, info = env.step(actions)
+                for index, simulation in enumerate(simulations):
+                    if not alive[index]:
+                        continue
+                    keys.mask = int(actions[index])
+                    simulation.step(keys)
+                    player = simulation.player
+                    self.assertEqual((player.x, player.y),
+                                     (info["final_x"][index], info["final_y"][index]))
+                    if dones[index]:
+                        alive[index] = False
+                        continue
+                    self.assertEqual(player.jump_velocity, env.vertical_velocity()[index])
+                    self.assertEqual(player.sub_y, env.sub_y[index])
+
+
+class TestCompare(unittest.TestCase):
+    """Tests for the float vs fixed point harness
+    """
+
+    def test_idle_never_diverges(self) -> None:
+        """Standing still is the same in both paths
+        """
+        result = compare(1, bytes(120))
+        self.assertEqual(result.first_frame, -1)
+        self.assertEqual((result.max_dx, result.max_dy), (0, 0))
+        self.assertEqual(result.frames, 120)
+
+    def test_jumping_diverges(self) -> None:
+        """A jump keeps the sub-pixels the float path truncates away
+        """
+        result = compare(1, bytes(5) + bytes([INPUT_JUMP]) * 30)
+        self.assertGreaterEqual(result.first_frame, 5)
+        self.assertGreater(result.max_dy, 0)
+        self.assertEqual(result.max_dx, 0)
+
+    def test_falling_diverges_at_once(self) -> None:
+        """Level 6 starts in the air, so the paths split on the first frames
+        """
+        self.assertLessEqual(compare(6, bytes(30)).first_frame, 2)
+
+    def test_invalid_level(self) -> None:
+        """Levels that do not exist are rejected
+        """
+        with self.assertRaises(ValueError):
+            compare(99, bytes(1))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -3,6 +3,8 @@
 Tests for game.py
 """
 
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, Mock
 from hypothesis import given, settings
@@ -10,6 +12,13 @@ from hypothesis import strategies as st
 import pygame
 from game import game
 from game import main as game_main
+from game import parse_args
+from scenes import CELEBRATION_FRAMES
+from simulation import Simulation
+from replay import Replay
+from benchmarks import Result
+from assets import LEVEL_DRAWINGS
+from input_state import InputState, ScriptedInput, INPUT_RIGHT, INPUT_JUMP
 import Level_Objects
 
 
@@ -28,24 +37,23 @@ class TestGameOOP(unittest.TestCase):
         return super().setUp()
 
     def tearDown(self):
-        game._instance = None
-        game._initialized = False
         return super().tearDown()
 
-    def test_singleton(self) -> None:
-        """Creating 2 Game objects twice returns the same instance and checks
-        mock player class is called once
+    def test_instances_are_independent(self) -> None:
+        """Creating 2 Game objects gives 2 separate games, each with its own
+        simulation and player
         """
         with (patch.object(game, "pygame_init", fake_pygame_init),
               patch("game.Player") as mock_player_class):
 
-            mock_player_class.return_value = Mock()
+            mock_player_class.side_effect = [Mock(), Mock()]
             game_one = game()
             game_two = game()
 
-            self.assertIs(game_one, game_two)
-            self.assertTrue(game._initialized)
-            mock_player_class.assert_called_once()
+        self.assertIsNot(game_one, game_two)
+        self.assertIsNot(game_one.simulation, game_two.simulation)
+        self.assertIsNot(game_one.player, game_two.player)
+        self.assertEqual(mock_player_class.call_count, 2)
 
     def test_level_setup(self) -> None:
         """Level setup should update objects, player start, and goal position
@@ -59,7 +67,7 @@ class TestGameOOP(unittest.TestCase):
 
         mock_player.x = 0
         mock_player.y = 0
-        level_objects = ["platform1", "platform2"]
+        level_objects = [pygame.Rect(0, 0, 10, 10), pygame.Rect(20, 0, 10, 10)]
         new_start_pos = [100, 200]
         new_goal_pos = [400, 500]
 
@@ -82,9 +90,6 @@ class TestGameOOP(unittest.TestCase):
             self, start_x: int, start_y: int, goal_x: int, goal_y: int,) -> None:
         """Tests level setup with a wide range of position inputs
         """
-        game._instance = None
-        game._initialized = False
-
         with (patch.object(game, "pygame_init", fake_pygame_init),
               patch("game.Player") as mock_player_class):
 
@@ -105,7 +110,8 @@ class TestGameOOP(unittest.TestCase):
 
     def test_draw_platforms(self) -> None:
         """Draw platforms draws each object plus the goal, so it should be called
-        3 times when drawing 2 objects
+        3 times when drawing 2 objects. They are cached, so the next frame only
+        blits the layer again
         """
         with (patch.object(game, "pygame_init", fake_pygame_init),
               patch("game.Player") as mock_player_class):
@@ -113,122 +119,43 @@ class TestGameOOP(unittest.TestCase):
             mock_player = Mock(name="player")
             mock_player_class.return_value = mock_player
             mock_game = game()
+        mock_game.screen.get_size.return_value = (800, 800)
 
         with patch("pygame.draw.rect") as mock_draw_rect:
             mock_game.objects = [Mock(), Mock()]
             mock_game.goal = Mock()
 
             mock_game.draw_platforms()
+            mock_game.draw_platforms()
+            self.assertEqual(mock_draw_rect.call_count, 3)
+            self.assertEqual(mock_game.screen.blit.call_count, 2)
 
-        self.assertEqual(mock_draw_rect.call_count, 3)
-
-    def test_post_game_menu_win(self) -> None:
-        """When winning triggers post game menu and the first button is clicked, it
-        should return 0
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        with (patch("pygame.Rect") as mock_rect,
-              patch("game.button") as mock_button):
-
-            mock_rect.side_effect = [Mock(), Mock(), Mock()]
-
-            button_next = Mock()
-            button_select = Mock()
-            button_main = Mock()
-            button_next.button_clicked.return_value = True
-            button_select.button_clicked.return_value = False
-            button_main.button_clicked.return_value = False
-
-            mock_button.side_effect = [button_next, button_select, button_main]
-
-            with (patch("pygame.event.get", return_value=[]),
-                  patch("pygame.display.flip"),
-                  patch.object(mock_game.clock, "tick")):
-
-                result = mock_game.post_game_menu(True)
-
-        self.assertEqual(result, 0)
-
-    def test_post_game_menu_lose_retry_level(self) -> None:
-        """When losing triggers post game menu and the first button is clicked, it
-        should return 3
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        with (patch("pygame.Rect") as mock_rect,
-              patch("game.button") as mock_button):
-
-            mock_rect.side_effect = [Mock(), Mock(), Mock()]
-
-            button_retry = Mock()
-            button_select = Mock()
-            button_main = Mock()
-            button_retry.button_clicked.return_value = True
-            button_select.button_clicked.return_value = False
-            button_main.button_clicked.return_value = False
-
-            mock_button.side_effect = [button_retry, button_select, button_main]
-
-            with (patch("pygame.event.get", return_value=[]),
-                  patch("pygame.display.flip"),
-                  patch.object(mock_game.clock, "tick")):
-
-                result = mock_game.post_game_menu(False)
-
-        self.assertEqual(result, 3)
-
-    def test_level_select_quit(self) -> None:
-        """level_select should call quit when a QUIT event is received
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        with (patch.object(Level_Objects, "level_select_buttons", []),
-              patch("pygame.event.get", return_value=[Mock(type=pygame.QUIT)]),
-              patch.object(mock_game, "quit", side_effect=SystemExit) as mock_quit):
-
-            with self.assertRaises(SystemExit):
-                mock_game.level_select()
-
-        mock_quit.assert_called_once()
+            mock_game.objects = [Mock()]
+            mock_game.draw_platforms()
+            self.assertEqual(mock_draw_rect.call_count, 5)
 
-    def test_post_game_menu_quit(self) -> None:
-        """post_game_menu should call quit when a QUIT event is received
+    def test_draw_moving_platforms(self) -> None:
+        """Moving platforms, coins and enemies are drawn every frame on top of the
+        cached layer
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
+        with patch.object(game, "pygame_init", fake_pygame_init):
             mock_game = game()
+        mock_game.screen.get_size.return_value = (800, 800)
+        mock_game.level_changer(7)
 
-        with (patch("pygame.Rect", return_value=Mock()),
-              patch("game.button", return_value=Mock()),
-              patch("pygame.event.get", return_value=[Mock(type=pygame.QUIT)]),
-              patch.object(mock_game, "quit", side_effect=SystemExit) as mock_quit):
-
-            with self.assertRaises(SystemExit):
-                mock_game.post_game_menu(False)
+        with patch("pygame.draw.rect") as mock_draw_rect:
+            mock_game.draw_platforms()
+            mock_draw_rect.reset_mock()
+            mock_game.draw_platforms()
 
-        mock_quit.assert_called_once()
+        platforms = mock_game.simulation.platforms
+        # the hazard is on the cached layer, the coins and the enemy are not
+        self.assertEqual(mock_draw_rect.call_count, len(Level_Objects.level_7_platforms) + 3)
+        for call, platform in zip(mock_draw_rect.call_args_list, platforms):
+            self.assertIs(call.args[2], platform.rect)
 
-    def test_level_changer_level_setup(self) -> None:
-        """Level changer should set up levels 1-6 and call level_setup
+    def test_level_changer_delegates_to_simulation(self) -> None:
+        """Level changer should load the level into the game's simulation
         """
         with (patch.object(game, "pygame_init", fake_pygame_init),
               patch("game.Player") as mock_player_class):
@@ -237,21 +164,11 @@ class TestGameOOP(unittest.TestCase):
             mock_player_class.return_value = mock_player
             game_instance = game()
 
-        for level in range(1, 7):
-            level_objects = f"objects_for_level_{level}"
-            new_start_pos = [level, level + 10]
-            new_goal_pos = [level + 20, level + 30]
-
-            with (patch.object(Level_Objects, f"level_{level}_objects", level_objects),
-                  patch.object(Level_Objects, f"level_{level}_start_pos", new_start_pos),
-                  patch.object(Level_Objects, f"level_{level}_goal_pos", new_goal_pos),
-                  patch.object(game, "level_setup") as mock_level_setup):
+        with patch("game.Simulation.level_changer", return_value=True) as mock_level_changer:
+            result = game_instance.level_changer(3)
 
-                result = game_instance.level_changer(level)
-
-            self.assertTrue(result)
-            self.assertEqual(game_instance.level, level)
-            mock_level_setup.assert_called_once_with(level_objects, new_start_pos, new_goal_pos)
+        self.assertTrue(result)
+        mock_level_changer.assert_called_once_with(3)
 
     def test_level_changer_invalid_level(self) -> None:
         """Invalid level should leave current level unchanged and return False
@@ -269,149 +186,6 @@ class TestGameOOP(unittest.TestCase):
         self.assertEqual(mock_game.level, 99)
         self.assertFalse(result)
 
-    def test_level_select(self) -> None:
-        """level_select should call level_changer and return true
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        level_button = Mock()
-        level_button.button_clicked.return_value = True
-
-        with (patch.object(Level_Objects, "level_select_buttons", [level_button]),
-              patch("pygame.event.get", side_effect=[[Mock(type=pygame.MOUSEBUTTONUP)], [],]),
-              patch("pygame.display.flip"), patch.object(mock_game.clock, "tick"),
-              patch.object(mock_game, "level_changer", return_value=True) as mock_level_changer):
-
-            result = mock_game.level_select()
-
-        self.assertTrue(result)
-        mock_level_changer.assert_called_once_with(1)
-        level_button.draw_button.assert_called_once_with(mock_game.screen)
-        level_button.button_clicked.assert_called_once()
-
-    def test_level_select_exit_button(self) -> None:
-        """Exit button should return false
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        level_buttons: list[Mock] = []
-        for index in range(7):
-            button = Mock()
-            button.draw_button = Mock()
-            button.button_clicked.return_value = (index == 6)
-            level_buttons.append(button)
-
-        with (patch.object(Level_Objects, "level_select_buttons", level_buttons),
-              patch("pygame.event.get", side_effect=[[Mock(type=pygame.MOUSEBUTTONUP)], [],]),
-              patch("pygame.display.flip"), patch.object(mock_game.clock, "tick"),
-              patch.object(mock_game, "level_changer") as mock_level_changer):
-
-            result = mock_game.level_select()
-
-        self.assertFalse(result)
-        mock_level_changer.assert_not_called()
-
-    def test_main_menu_level_select_button(self) -> None:
-        """main_menu should return 1 when level select button is clicked
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        with (patch("pygame.Rect") as mock_rect,
-              patch("game.button") as mock_button):
-
-            mock_rect.side_effect = [Mock(), Mock()]
-
-            level_select_button = Mock()
-            exit_button = Mock()
-            level_select_button.button_clicked.return_value = True
-            exit_button.button_clicked.return_value = False
-            mock_button.side_effect = [level_select_button, exit_button]
-
-            with (patch("pygame.event.get", return_value=[]),
-                  patch("pygame.display.flip"),
-                  patch.object(mock_game.clock, "tick")):
-
-                result = mock_game.main_menu()
-
-        self.assertEqual(result, 1)
-
-    def test_main_menu_exit_button(self) -> None:
-        """main_menu should return 0 when the exit button is clicked
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        with (patch("pygame.Rect") as mock_rect,
-              patch("game.button") as mock_button):
-
-            mock_rect.side_effect = [Mock(), Mock()]
-
-            level_select_button = Mock()
-            exit_button = Mock()
-            level_select_button.button_clicked.return_value = False
-            exit_button.button_clicked.return_value = True
-            mock_button.side_effect = [level_select_button, exit_button]
-
-            with (patch("pygame.event.get", return_value=[]),
-                  patch("pygame.display.flip"),
-                  patch.object(mock_game.clock, "tick")):
-
-                result = mock_game.main_menu()
-
-        self.assertEqual(result, 0)
-
-    def test_main_menu_flip_tick_and_quit_event(self) -> None:
-        """main_menu should flip, tick, and handle QUIT event
-        """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        with (patch("pygame.Rect") as mock_rect,
-              patch("game.button") as mock_button):
-
-            mock_rect.side_effect = [Mock(), Mock()]
-
-            level_select_button = Mock()
-            exit_button = Mock()
-            level_select_button.button_clicked.side_effect = [False, True]
-            exit_button.button_clicked.return_value = False
-            mock_button.side_effect = [level_select_button, exit_button]
-
-            with (patch("pygame.event.get", side_effect=[[], [Mock(type=pygame.QUIT)]]),
-                  patch("pygame.display.flip") as mock_flip,
-                  patch.object(mock_game.clock, "tick") as mock_tick,
-                  patch.object(mock_game, "quit", side_effect=SystemExit) as mock_quit):
-
-                with self.assertRaises(SystemExit):
-                    mock_game.main_menu()
-
-        mock_flip.assert_called_once()
-        mock_tick.assert_called_once()
-        mock_quit.assert_called_once()
-
     def test_quit_calls_pygame_quit_and_sys_exit(self) -> None:
         """Quit should call pygame.quit and sys.exit
         """
@@ -430,131 +204,224 @@ class TestGameOOP(unittest.TestCase):
         mock_pygame_quit.assert_called_once()
         mock_sys_exit.assert_called_once()
 
-    def test_manager_quit(self) -> None:
-        """manager should quit when main_menu returns 0
+    def test_main_exception(self) -> None:
+        """Main should catch exception and print it with its traceback
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
+        with (patch("game.game") as mock_game_class,
+              patch("builtins.print") as mock_print,
+              patch("traceback.print_exc") as mock_print_exc,
+              patch.dict(os.environ, {"GAME_PROFILE": ""})):
 
-        with (patch.object(mock_game, "main_menu", return_value=0) as mock_main,
-              patch.object(mock_game, "quit", side_effect=SystemExit) as mock_quit):
+            instance = Mock()
+            instance.manager.side_effect = RuntimeError("boom")
+            mock_game_class.return_value = instance
 
-            with self.assertRaises(SystemExit):
-                mock_game.manager()
+            game_main([])
 
-        mock_main.assert_called_once()
-        mock_quit.assert_called_once()
+        mock_game_class.assert_called_once()
+        instance.manager.assert_called_once()
+        mock_print.assert_called_once()
+        args, _ = mock_print.call_args
+        self.assertIn("CRASH:", args[0])
+        mock_print_exc.assert_called_once()
 
-    def test_manager_next_level_on_win(self) -> None:
-        """Manager should go level select then next level when game is won
+    def test_main_profile_written_on_quit(self) -> None:
+        """A profiled session writes its files when the game quits, and the profiler
+        is told about every frame
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
+        with tempfile.TemporaryDirectory() as directory:
+            with (patch("game.game") as mock_game_class,
+                  patch("builtins.print")):
+                instance = Mock()
+                instance.frame_hooks = []
+
+                def play(*args: object) -> None:
+                    for hook in instance.frame_hooks:
+                        hook()
+                    raise SystemExit
+                instance.manager.side_effect = play
+                mock_game_class.return_value = instance
 
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
+                with self.assertRaises(SystemExit):
+                    game_main(["--profile", "cprofile", "--profile-dir", directory])
 
-        with (patch.object(mock_game, "main_menu", side_effect=[1]) as mock_main,
-              patch.object(mock_game, "level_select", return_value=True) as mock_level_select,
-              patch.object(mock_game, "level_changer", return_value=True) as mock_level_changer,
-              patch.object(mock_game, "Game_play", side_effect=[0, SystemExit]) as mock_game_play):
+            files = sorted(os.listdir(directory))
+            self.assertEqual([os.path.splitext(name)[1] for name in files], [".prof", ".txt"])
+            with open(os.path.join(directory, files[1])) as report:
+                self.assertTrue(report.readline().startswith("1 frames"))
 
-            with self.assertRaises(SystemExit):
-                mock_game.manager()
+    def test_profile_from_environment(self) -> None:
+        """GAME_PROFILE picks the profiler when there is no flag, the flag wins
+        """
+        with patch.dict(os.environ, {"GAME_PROFILE": "sample", "GAME_PROFILE_DIR": "out"}):
+            args = parse_args([])
+            self.assertEqual((args.profile, args.profile_dir), ("sample", "out"))
+            self.assertEqual(parse_args(["--profile", "tracemalloc"]).profile, "tracemalloc")
+        with patch.dict(os.environ, {"GAME_PROFILE": ""}):
+            self.assertIsNone(parse_args([]).profile)
+
+    def test_metrics_from_environment(self) -> None:
+        """GAME_METRICS_FILE and GAME_METRICS_PORT turn the exporter on, off by default
+        """
+        with patch.dict(os.environ, {"GAME_METRICS_FILE": "m.prom", "GAME_METRICS_PORT": "9100"}):
+            args = parse_args([])
+            self.assertEqual((args.metrics_file, args.metrics_port), ("m.prom", 9100))
+        with patch.dict(os.environ, {"GAME_METRICS_FILE": "", "GAME_METRICS_PORT": ""}):
+            args = parse_args([])
+            self.assertEqual((args.metrics_file, args.metrics_port), (None, None))
+
+    def test_main_metrics_written_on_quit(self) -> None:
+        """The metrics file gets a last export when the game quits
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.prom")
+            with patch.object(game, "pygame_init", fake_pygame_init):
+                instance = game()
+
+            def play(*args: object) -> None:
+                instance.metrics.step_time.record(0.002)
+                raise SystemExit
+            with (patch("game.game", return_value=instance),
+                  patch.object(instance, "manager", side_effect=play)):
+                with self.assertRaises(SystemExit):
+                    game_main(["--metrics-file", path, "--metrics-interval", "60"])
 
-        mock_main.assert_called_once()
-        mock_level_select.assert_called_once()
-        self.assertGreaterEqual(mock_level_changer.call_count, 1)
-        self.assertGreaterEqual(mock_game_play.call_count, 2)
+            with open(path) as file:
+                text = file.read()
+        self.assertIn("game_physics_step_seconds_count 1\n", text)
 
-    def test_manager_main_menu(self) -> None:
-        """Manager should go to main_menu and then quit
+    def test_level_drawings_preloaded(self) -> None:
+        """Starting the game preloads the level drawings in the background
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
+        with patch.object(game, "pygame_init", fake_pygame_init):
             mock_game = game()
+        self.assertTrue(mock_game.assets.wait(30))
+        self.assertTrue(mock_game.assets.cached(os.path.join(LEVEL_DRAWINGS, "Level 1.png")))
 
-        with (patch.object(mock_game, "main_menu", side_effect=[4, 0]) as mock_main,
-              patch.object(mock_game, "quit", side_effect=SystemExit) as mock_quit):
-
-            with self.assertRaises(SystemExit):
-                mock_game.manager()
-
-        self.assertEqual(mock_main.call_count, 2)
-        mock_quit.assert_called_once()
-
-    def test_manager_retry_level(self) -> None:
-        """Manager should retry level
+    def test_manager_records_metrics(self) -> None:
+        """Every displayed frame records its input latency, every frame after the
+        first its frame time, and loading a level its load time
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
+        with patch.object(game, "pygame_init", fake_pygame_init):
             mock_game = game()
-            mock_game.level = 2
+        mock_game.inputs = ScriptedInput([0, 0, 0])
+        mock_game.level_changer(1)
 
-        with (patch.object(mock_game, "main_menu", side_effect=[1]) as mock_main,
-              patch.object(mock_game, "level_select", return_value=True) as mock_level_select,
-              patch.object(mock_game, "level_changer", return_value=True) as mock_level_changer,
-              patch.object(mock_game, "Game_play", side_effect=[3, SystemExit]) as mock_game_play):
-
-            with self.assertRaises(SystemExit):
-                mock_game.manager()
+        with (patch.object(mock_game.main_menu, "draw"),
+              patch("pygame.display.flip"),
+              patch.object(mock_game, "quit")):
+            mock_game.manager()
 
-        mock_main.assert_called_once()
-        mock_level_select.assert_called_once()
-        self.assertEqual(mock_level_changer.call_count, 1)
-        self.assertGreaterEqual(mock_game_play.call_count, 2)
+        metrics = mock_game.metrics
+        self.assertEqual(metrics.load_time.written, 1)
+        self.assertEqual(metrics.latency.written, 3)
+        self.assertEqual(metrics.frame_time.written, 2)
 
-    def test_manager_returns_to_main_menu_from_level_select(self) -> None:
-        """Manager should return to main menu from level select
+    def test_cli_arguments(self) -> None:
+        """The game starts at the main menu with a 60 fps cap unless told otherwise, and
+        a headless run must have an end
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
-            mock_game = game()
-
-        with (patch.object(mock_game, "main_menu", side_effect=[1, 0]) as mock_main,
-              patch.object(mock_game, "level_select", return_value=False) as mock_level_select,
-              patch.object(mock_game, "Game_play") as mock_game_play,
-              patch.object(mock_game, "quit", side_effect=SystemExit) as mock_quit):
-
-            with self.assertRaises(SystemExit):
-                mock_game.manager()
+        args = parse_args([])
+        self.assertEqual((args.level, args.frames, args.headless, args.replay, args.fps,
+                          args.benchmark), (None, None, False, None, 60, False))
+        args = parse_args(["--level", "3", "--frames", "600", "--headless", "--fps", "0"])
+        self.assertEqual((args.level, args.frames, args.headless, args.fps), (3, 600, True, 0))
+        for argv in (["--headless"], ["--frames", "0"], ["--fps", "-1"]):
+            with patch("sys.stderr"), self.assertRaises(SystemExit):
+                parse_args(argv)
+
+    def test_manager_starts_at_level(self) -> None:
+        """A level skips the menus, frames ends the run and reports its time
+        """
+        with patch.object(game, "pygame_init", fake_pygame_init):
+            mock_game = game(ScriptedInput([0] * 10), fps=0)
 
-        self.assertEqual(mock_main.call_count, 2)
-        mock_level_select.assert_called_once()
-        mock_game_play.assert_not_called()
+        with (patch.object(mock_game.play, "draw"),
+              patch("pygame.display.flip"),
+              patch("builtins.print") as mock_print,
+              patch.object(mock_game, "quit") as mock_quit):
+            mock_game.manager(level=2, frames=5)
+
+        self.assertIs(mock_game.scenes.top, mock_game.play)
+        self.assertEqual(mock_game.level, 2)
+        self.assertEqual(mock_game.play.replay.frames, 5)
+        self.assertEqual(mock_game.clock.tick.call_args_list, [((0,),)] * 5)
         mock_quit.assert_called_once()
+        self.assertTrue(mock_print.call_args[0][0].startswith("5 frames in "))
 
-    def test_main_exception(self) -> None:
-        """Main should catch exception and print it
+        with self.assertRaises(ValueError):
+            mock_game.manager(level=99)
+
+    def test_main_headless_replay(self) -> None:
+        """A replay plays its inputs on its level, headless runs use the dummy drivers
         """
-        with (patch("game.game") as mock_game_class,
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "level_4.replay")
+            Replay(4, None, bytes([0, 2, 6]), [0, 0, 0], [(0,) * 9] * 3).save(path)
+            with (patch.dict(os.environ, {}),
+                  patch("game.game") as mock_game_class):
+                game_main(["--headless", "--replay", path, "--fps", "0"])
+                self.assertEqual(os.environ["SDL_VIDEODRIVER"], "dummy")
+
+        inputs, fps = mock_game_class.call_args[0]
+        self.assertIsInstance(inputs, ScriptedInput)
+        self.assertEqual([inputs.sample().mask for _ in range(3)], [0, 2, 6])
+        self.assertEqual(fps, 0)
+        self.assertEqual(mock_game_class.call_args.kwargs, {"save_attempts": False})
+        mock_game_class.return_value.manager.assert_called_once_with(4, None)
+
+    def test_replaying_writes_nothing(self) -> None:
+        """Replaying an attempt that was quit plays its frames and leaves the file as it was
+        """
+        with (tempfile.TemporaryDirectory() as directory,
+              patch("scenes.REPLAY_DIR", directory),
+              patch.object(game, "pygame_init", fake_pygame_init),
+              patch.object(game, "quit"),
+              patch("scenes.PlayScene.draw"),
+              patch("pygame.display.flip"),
               patch("builtins.print") as mock_print):
+            game(ScriptedInput([0] * 5 + [INPUT_RIGHT] * 20), fps=0).manager(level=1)
+            path = os.path.join(directory, "level_1.replay")
+            recorded = Replay.load(path)
+            with open(path, "rb") as file:
+                before = file.read()
+            for _ in range(3):
+                game_main(["--headless", "--replay", path, "--fps", "0"])
+            with open(path, "rb") as file:
+                after = file.read()
+
+        self.assertEqual((recorded.outcome, recorded.frames), (None, 25))
+        mock_print.assert_not_called()  # no crash was caught
+        self.assertEqual(after, before)
+
+    def test_main_benchmark(self) -> None:
+        """The benchmark suite runs instead of the main loop and prints its table
+        """
+        with (patch.dict(os.environ, {}),
+              patch("game.game") as mock_game_class,
+              patch("game.run_suite", return_value=[Result("level 1 load", 1e-5, 20)])
+              as mock_suite,
+              patch("builtins.print") as mock_print):
+            game_main(["--benchmark", "--frames", "30"])
 
-            instance = Mock()
-            instance.manager.side_effect = RuntimeError("boom")
-            mock_game_class.return_value = instance
+        mock_suite.assert_called_once_with(mock_game_class.return_value, 30)
+        mock_game_class.return_value.manager.assert_not_called()
+        self.assertIn("level 1 load", mock_print.call_args[0][0])
 
-            game_main()
+    def test_main_capture(self) -> None:
+        """Frames are captured by a frame hook and the writer is stopped on the way out
+        """
+        with (patch("game.game") as mock_game_class,
+              patch("game.FrameCapture") as mock_capture_class,
+              patch("builtins.print")):
+            game_main(["--capture", "frames", "--capture-format", "raw"])
 
-        mock_game_class.assert_called_once()
-        instance.manager.assert_called_once()
-        mock_print.assert_called_once()
-        args, _ = mock_print.call_args
-        self.assertIn("CRASH:", args[0])
+        mock_game = mock_game_class.return_value
+        mock_capture_class.assert_called_once_with(mock_game.screen, "frames", "raw")
+        capture = mock_capture_class.return_value
+        capture.start.assert_called_once()
+        capture.stop.assert_called_once()
+        mock_game.frame_hooks.append.assert_called_once_with(capture.frame)
 
     def test_pygame_init(self) -> None:
         """Test pygame initializes a window
@@ -587,105 +454,91 @@ class TestGameOOP(unittest.TestCase):
             mock_flip.assert_called_once()
             mock_delay.assert_called_once()
 
-    def test_game_play(self) -> None:
-        """game_play should update, fill, draw, flip, and tick.
-        game_play goes through 2 iterations in it's current state
+    def test_manager_exit_button(self) -> None:
+        """Exit on the main menu empties the scene stack, which quits
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock()
-            mock_player_class.return_value = mock_player
+        with patch.object(game, "pygame_init", fake_pygame_init):
             mock_game = game()
+        exit_rect = mock_game.main_menu.exit_button.rect
+        mock_game.inputs = ScriptedInput([
+            InputState(mouse_pos=exit_rect.center, mouse_down=True, clicked=True)])
 
-        mock_player.rect = Mock()
-        mock_player.rect.colliderect.return_value = False
-        mock_player.update = Mock()
-        mock_player.draw = Mock()
-
-        mock_game.goal = Mock()
-        mock_game.floor = Mock()
-        mock_game.objects = []
-
-        with (patch("pygame.event.get", side_effect=[[], [Mock(type=pygame.QUIT)]]),
-              patch("pygame.key.get_pressed", return_value=Mock()) as mock_keypress,
-              patch.object(mock_game.screen, "fill") as mock_fill,
-              patch.object(mock_game, "draw_platforms") as mock_draw_platforms,
-              patch("pygame.display.flip") as mock_flip,
-              patch.object(mock_game.clock, "tick") as mock_tick,
-              patch.object(mock_game, "post_game_menu", return_value=2)):
-
-            result = mock_game.Game_play()
+        with (patch("pygame.display.flip") as mock_flip,
+              patch.object(mock_game, "quit") as mock_quit):
+            mock_game.manager()
 
-        self.assertEqual(result, 2)
-
-        self.assertEqual(mock_keypress.call_count, 2)
-        self.assertEqual(mock_player.update.call_count, 2)
-        self.assertEqual(mock_fill.call_count, 2)
-        self.assertEqual(mock_draw_platforms.call_count, 2)
-        self.assertEqual(mock_player.draw.call_count, 2)
-        self.assertEqual(mock_flip.call_count, 2)
-        self.assertEqual(mock_tick.call_count, 2)
+        mock_quit.assert_called_once()
+        mock_flip.assert_not_called()
+        self.assertEqual(len(mock_game.scenes), 0)
 
-    def test_game_play_goal(self) -> None:
-        """When player collides with goal win should be true
+    def test_manager_quit_event(self) -> None:
+        """Closing the window quits from any scene, after one frame of it
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
-
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
+        with patch.object(game, "pygame_init", fake_pygame_init):
             mock_game = game()
 
-        mock_player.rect = Mock()
-        mock_player.rect.colliderect.side_effect = [True, False]
-        mock_player.update = Mock()
-        mock_player.draw = Mock()
-
-        mock_game.goal = Mock()
-        mock_game.floor = Mock()
-        mock_game.objects = []
-
-        with (patch("pygame.event.get", return_value=[]),
-              patch("pygame.key.get_pressed", return_value=Mock()),
-              patch.object(mock_game, "draw_platforms"),
-              patch("pygame.display.flip"),
-              patch.object(mock_game.clock, "tick"),
-              patch.object(mock_game, "post_game_menu", return_value=0) as mock_post):
+        with (patch("pygame.event.get", side_effect=[[], [Mock(type=pygame.QUIT)]]),
+              patch.object(mock_game.main_menu, "draw") as mock_draw,
+              patch("pygame.display.flip") as mock_flip,
+              patch.object(mock_game.clock, "tick") as mock_tick,
+              patch.object(mock_game, "quit", side_effect=SystemExit) as mock_quit):
 
-            result = mock_game.Game_play()
+            with self.assertRaises(SystemExit):
+                mock_game.manager()
 
-        self.assertEqual(result, 0)
-        mock_post.assert_called_once_with(True)
+        mock_draw.assert_called_once_with()
+        mock_flip.assert_called_once()
+        mock_tick.assert_called_once_with(60)
+        mock_quit.assert_called_once()
 
-    def test_game_player_fall_off(self) -> None:
-        """When player falls off win should be false
+    def test_manager_plays_through(self) -> None:
+        """One loop runs the whole trip: main menu, level select, a winning attempt,
+        the celebration, the post game menu and back to exit. Every frame is sampled,
+        drawn, flipped and paced once, and a click changes the screen the same frame
         """
-        with (patch.object(game, "pygame_init", fake_pygame_init),
-              patch("game.Player") as mock_player_class):
+        level_1 = Simulation()
+        level_1.level_changer(1)
+        won, frames = level_1.run(bytes([INPUT_RIGHT | INPUT_JUMP]) * 600)
+        self.assertIs(won, True)
 
-            mock_player = Mock(name="player")
-            mock_player_class.return_value = mock_player
+        with patch.object(game, "pygame_init", fake_pygame_init):
             mock_game = game()
+        mock_game.screen = pygame.Surface((800, 800))
+
+        def click(rect: pygame.Rect) -> InputState:
+            return InputState(mouse_pos=rect.center, mouse_down=True, clicked=True)
+
+        # the attempt ends on the frame it touches the goal on, like Simulation.run
+        script = ([click(mock_game.main_menu.level_select_button.rect),
+                   click(Level_Objects.level_select_buttons[0].rect)]
+                  + [INPUT_RIGHT | INPUT_JUMP] * frames + [0] * CELEBRATION_FRAMES
+                  + [click(mock_game.post_game.menu_button.rect),
+                     click(mock_game.main_menu.exit_button.rect)])
+        mock_game.inputs = ScriptedInput(script)
+        drawn: list[str] = []
+
+        def spy(scene: object) -> Mock:
+            return Mock(side_effect=lambda: drawn.append(type(scene).__name__))
+
+        with (patch.object(mock_game.main_menu, "draw", spy(mock_game.main_menu)),
+              patch.object(mock_game.level_select, "draw", spy(mock_game.level_select)),
+              patch.object(mock_game.play, "draw", spy(mock_game.play)),
+              patch.object(mock_game.celebration, "draw", spy(mock_game.celebration)),
+              patch.object(mock_game.post_game, "draw", spy(mock_game.post_game)),
+              patch("scenes.button") as mock_button,
+              patch("pygame.display.flip") as mock_flip,
+              patch.object(mock_game.clock, "tick") as mock_tick,
+              patch.object(mock_game, "ghosts") as mock_ghosts,
+              patch("scenes.ReplayRecorder") as mock_replay_class,
+              patch.object(mock_game, "quit") as mock_quit):
+            mock_game.manager()
 
-        mock_player.rect = Mock()
-        mock_player.rect.colliderect.side_effect = [False, True]
-        mock_player.update = Mock()
-        mock_player.draw = Mock()
-        mock_game.player = mock_player
-
-        mock_game.goal = Mock()
-        mock_game.floor = Mock()
-        mock_game.objects = []
-
-        with (patch("pygame.event.get", return_value=[]),
-              patch("pygame.key.get_pressed", return_value=Mock()),
-              patch.object(mock_game, "draw_platforms"),
-              patch("pygame.display.flip"),
-              patch.object(mock_game.clock, "tick"),
-              patch.object(mock_game, "post_game_menu", return_value=3) as mock_post):
-
-            result = mock_game.Game_play()
-
-        self.assertEqual(result, 3)
-        mock_post.assert_called_once_with(False)
+        mock_quit.assert_called_once()
+        mock_button.assert_not_called()
+        self.assertEqual(drawn, ["LevelSelectScene"] + ["PlayScene"] * frames
+                         + ["CelebrationScene"] * CELEBRATION_FRAMES
+                         + ["PostGameScene", "MainMenuScene"])
+        self.assertEqual(mock_flip.call_count, len(script) - 1)
+        self.assertEqual(mock_tick.call_count, len(script) - 1)
+        mock_ghosts.save_if_best.assert_called_once()
+        mock_replay_class.return_value.save.assert_called_once()
@@ -0,0 +1,199 @@
+"""test_ghost.py
+
+Tests for ghost.py
+"""
+
+import random
+import tempfile
+import unittest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+from ghost import (GhostPlayback, GhostStore, TrajectoryRecorder, read_varint, unzigzag,
+                   write_varint, zigzag)
+from input_state import MaskKeys
+from simulation import Simulation
+
+
+class TestVarint(unittest.TestCase):
+    """Tests for the varint helpers
+    """
+
+    @given(value=st.integers(min_value=-10**12, max_value=10**12))
+    @settings(max_examples=500, derandomize=True)
+    def test_round_trip(self, value: int) -> None:
+        """Any int survives zigzag and varint encoding
+        """
+        out = bytearray()
+        write_varint(out, zigzag(value))
+        decoded, pos = read_varint(bytes(out), 0)
+
+        self.assertEqual(unzigzag(decoded), value)
+        self.assertEqual(pos, len(out))
+
+    def test_small_values_take_one_byte(self) -> None:
+        """Deltas between -64 and 63 fit in one byte
+        """
+        for value in range(-64, 64):
+            out = bytearray()
+            write_varint(out, zigzag(value))
+            self.assertEqual(len(out), 1)
+
+    def test_negative_varint(self) -> None:
+        """Varints are unsigned
+        """
+        with self.assertRaises(ValueError):
+            write_varint(bytearray(), -1)
+
+    def test_truncated_varint(self) -> None:
+        """A varint cut short is an error
+        """
+        with self.assertRaises(ValueError):
+            read_varint(b"\x80", 0)
+
+
+class TestTrajectory(unittest.TestCase):
+    """Tests for recording and playing back trajectories
+    """
+
+    def test_playback_matches_recording(self) -> None:
+        """Playback visits every recorded position in order
+        """
+        rng = random.Random(2)
+        positions = [(rng.randrange(-50, 900), rng.randrange(-50, 900)) for _ in range(300)]
+        positions += [positions[-1]] * 20  # a long rest
+        recorder = TrajectoryRecorder(100, 200)
+        for x, y in positions:
+            recorder.record(x, y)
+
+        playback = GhostPlayback(recorder.to_bytes(4))
+
+        self.assertEqual((playback.level, playback.frames), (4, len(positions)))
+        self.assertEqual((playback.x, playback.y), (100, 200))
+        for x, y in positions:
+            playback.advance()
+            self.assertEqual((playback.x, playback.y), (x, y))
+        self.assertTrue(playback.finished)
+        playback.advance()
+        self.assertEqual((playback.x, playback.y), positions[-1])
+
+    def test_real_run_is_small(self) -> None:
+        """A minute of real play, jumping around at random and retrying after
+        every fall, stays within a few KB
+        """
+        rng = random.Random(7)
+        simulation = Simulation()
+        simulation.level_changer(6)
+        simulation.reset()
+        recorder = TrajectoryRecorder(simulation.player.x, simulation.player.y)
+        keys = MaskKeys()
+        for frame in range(60 * 60):
+            if frame % 20 == 0:
+                keys.mask = rng.randrange(8)
+            if simulation.outcome() is not None:
+                simulation.reset()
+            simulation.step(keys)
+            recorder.record(simulation.player.x, simulation.player.y)
+
+        self.assertLess(len(recorder.to_bytes(6)), 6 * 1024)
+
+    def test_bad_data(self) -> None:
+        """Files that are not ghosts are rejected
+        """
+        with self.assertRaises(ValueError):
+            GhostPlayback(b"nope")
+        with self.assertRaises(ValueError):
+            GhostPlayback(b"GHST\x09")
+
+    def test_bad_body(self) -> None:
+        """A truncated, padded or miscounted body loads, then marks the ghost corrupt
+        while it plays and stops it
+        """
+        def play(data: bytes) -> GhostPlayback:
+            playback = GhostPlayback(data)
+            for _ in range(playback.frames + 1):
+                playback.advance()
+            self.assertTrue(playback.finished)
+            return playback
+
+        recorder = TrajectoryRecorder(0, 0)
+        for frame in range(30):
+            recorder.record(frame // 3, frame % 7)
+        data = recorder.to_bytes(1)
+        self.assertFalse(play(data).corrupt)
+
+        miscounted = TrajectoryRecorder(0, 0)
+        miscounted.record(1, 1)
+        miscounted.record(1, 1)
+        miscounted.frames = 1
+        for bad in (data[:-1], data[:-3], data + b"\x00\x00", data + b"\x80",
+                    miscounted.to_bytes(1)):
+            playback = play(bad)
+            self.assertTrue(playback.corrupt)
+            self.assertLessEqual(playback.frame, playback.frames)
+
+
+class TestGhostStore(unittest.TestCase):
+    """Tests for GhostStore class
+    """
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = GhostStore(self.temp_dir.name + "/ghosts")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def make_run(self, frames: int) -> TrajectoryRecorder:
+        recorder = TrajectoryRecorder(0, 0)
+        for frame in range(frames):
+            recorder.record(frame, 0)
+        return recorder
+
+    def test_load_missing(self) -> None:
+        """A level without a saved run has no ghost
+        """
+        self.assertIsNone(self.store.load(1))
+
+    def test_keeps_best_run(self) -> None:
+        """Only faster runs replace the saved one
+        """
+        self.assertTrue(self.store.save_if_best(2, self.make_run(100)))
+        self.assertFalse(self.store.save_if_best(2, self.make_run(120)))
+        self.assertFalse(self.store.save_if_best(2, self.make_run(100)))
+        self.assertTrue(self.store.save_if_best(2, self.make_run(80)))
+
+        ghost = self.store.load(2)
+        self.assertIsNotNone(ghost)
+        assert ghost is not None
+        self.assertEqual(ghost.frames, 80)
+        self.assertIsNone(self.store.load(3))
+
+    def test_unreadable_file(self) -> None:
+        """A corrupt ghost file is ignored and replaced by the next win
+        """
+        self.store.save_if_best(1, self.make_run(10))
+        with open(self.store.path(1), "wb") as file:
+            file.write(b"garbage")
+
+        self.assertIsNone(self.store.load(1))
+        self.assertTrue(self.store.save_if_best(1, self.make_run(50)))
+
+    def test_truncated_file(self) -> None:
+        """A ghost cut off while being written turns out corrupt while it plays, once
+        discarded the next win replaces it
+        """
+        self.store.save_if_best(1, self.make_run(10))
+        with open(self.store.path(1), "rb") as file:
+            data = file.read()
+        with open(self.store.path(1), "wb") as file:
+            file.write(data[:-2])
+
+        ghost = self.store.load(1)
+        assert ghost is not None
+        while not ghost.finished:
+            ghost.advance()
+        self.assertTrue(ghost.corrupt)
+        self.store.discard(1)
+        self.store.discard(1)
+        self.assertIsNone(self.store.load(1))
+        self.assertTrue(self.store.save_if_best(1, self.make_run(50)))
@@ -0,0 +1,162 @@
+"""test_input_state.py
+
+Tests for input_state.py
+"""
+
+import dataclasses
+import unittest
+from unittest.mock import patch, Mock, MagicMock
+import pygame
+from input_state import (InputSampler, InputState, ScriptedInput, keys_to_mask,
+                         INPUT_JUMP, INPUT_LEFT, INPUT_RIGHT)
+from movement_strategy import NormalMovement
+from player import Player
+
+
+def fake_keys(*held: int) -> MagicMock:
+    keys = MagicMock()
+    keys.__getitem__.side_effect = lambda key: key in held
+    return keys
+
+
+class TestInputState(unittest.TestCase):
+    """Tests for InputState class
+    """
+
+    def test_immutable(self) -> None:
+        """A snapshot cannot be changed after it is taken
+        """
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            InputState().mask = INPUT_LEFT  # type: ignore[misc]
+
+    def test_keys(self) -> None:
+        """Held bits answer for both key bindings of a direction
+        """
+        state = InputState(INPUT_LEFT | INPUT_JUMP)
+        self.assertTrue(state[pygame.K_LEFT])
+        self.assertTrue(state[pygame.K_a])
+        self.assertTrue(state[pygame.K_SPACE])
+        self.assertFalse(state[pygame.K_RIGHT])
+        self.assertFalse(state[pygame.K_d])
+        self.assertFalse(state[pygame.K_ESCAPE])
+
+    def test_edges(self) -> None:
+        """Presses and releases are worked out against the previous frame
+        """
+        first = InputState().next(INPUT_RIGHT, (5, 5), mouse_down=True)
+        self.assertEqual((first.pressed, first.released), (INPUT_RIGHT, 0))
+        self.assertTrue(first.clicked)
+
+        second = first.next(INPUT_RIGHT | INPUT_JUMP, mouse_down=True)
+        self.assertEqual((second.pressed, second.released), (INPUT_JUMP, 0))
+        self.assertEqual(second.mouse_pos, (5, 5))
+        self.assertFalse(second.clicked)
+
+        third = second.next(INPUT_JUMP)
+        self.assertEqual((third.pressed, third.released), (0, INPUT_RIGHT))
+
+    def test_consumers(self) -> None:
+        """The movement strategies and the player read a snapshot like real keys
+        """
+        self.assertEqual(NormalMovement().get_horizontal_velocity(5, InputState(INPUT_LEFT)), -5)
+        player = Player(0, 0)
+        player.update(InputState(INPUT_RIGHT), [])
+        self.assertEqual(player.x, player.move_speed)
+
+    def test_keys_to_mask(self) -> None:
+        """Either binding of a direction sets its bit
+        """
+        self.assertEqual(keys_to_mask(fake_keys(pygame.K_a, pygame.K_SPACE)),
+                         INPUT_LEFT | INPUT_JUMP)
+        self.assertEqual(keys_to_mask(fake_keys(pygame.K_d)), INPUT_RIGHT)
+        self.assertEqual(keys_to_mask(fake_keys()), 0)
+
+
+class TestInputSampler(unittest.TestCase):
+    """Tests for InputSampler and ScriptedInput classes
+    """
+
+    def test_events(self) -> None:
+        """One sample drains the events and never polls the devices
+        """
+        sampler = InputSampler()
+        events = [Mock(type=pygame.KEYDOWN, key=pygame.K_RIGHT),
+                  Mock(type=pygame.MOUSEMOTION, pos=(3, 4)),
+                  Mock(type=pygame.MOUSEBUTTONDOWN, button=1, pos=(3, 4)),
+                  Mock(type=pygame.QUIT)]
+        with (patch("pygame.event.get", return_value=events) as mock_events,
+              patch("pygame.key.get_pressed") as mock_keys,
+              patch("pygame.mouse.get_pos") as mock_pos,
+              patch("pygame.mouse.get_pressed") as mock_pressed):
+
+            state = sampler.sample()
+
+        mock_events.assert_called_once()
+        for mock in (mock_keys, mock_pos, mock_pressed):
+            mock.assert_not_called()
+        self.assertEqual(state, InputState(INPUT_RIGHT, INPUT_RIGHT, 0, (3, 4), True,
+                                           True, True))
+        self.assertIs(sampler.state, state)
+
+    def test_held_between_events(self) -> None:
+        """Keys stay held until their release, two keys for one bit need both released
+        """
+        sampler = InputSampler()
+        frames = [[Mock(type=pygame.KEYDOWN, key=pygame.K_LEFT),
+                   Mock(type=pygame.KEYDOWN, key=pygame.K_a),
+                   Mock(type=pygame.KEYDOWN, key=pygame.K_q)],
+                  [],
+                  [Mock(type=pygame.KEYUP, key=pygame.K_a)],
+                  [Mock(type=pygame.KEYUP, key=pygame.K_LEFT)]]
+        states = []
+        for events in frames:
+            with patch("pygame.event.get", return_value=events):
+                states.append(sampler.sample())
+
+        self.assertEqual([state.mask for state in states], [INPUT_LEFT, INPUT_LEFT,
+                                                            INPUT_LEFT, 0])
+        self.assertEqual(states[3].released, INPUT_LEFT)
+
+    def test_focus_lost(self) -> None:
+        """Losing the window's focus lets go of the keys and the mouse
+        """
+        sampler = InputSampler()
+        with patch("pygame.event.get", return_value=[
+                Mock(type=pygame.KEYDOWN, key=pygame.K_SPACE),
+                Mock(type=pygame.MOUSEBUTTONDOWN, button=1, pos=(1, 1))]):
+            sampler.sample()
+        with patch("pygame.event.get", return_value=[Mock(type=pygame.WINDOWFOCUSLOST)]):
+            state = sampler.sample()
+
+        self.assertEqual((state.mask, state.mouse_down), (0, False))
+
+    def test_unchanged_frame_reused(self) -> None:
+        """A frame without events and without edges is the previous snapshot
+        """
+        sampler = InputSampler()
+        with patch("pygame.event.get", return_value=[
+                Mock(type=pygame.KEYDOWN, key=pygame.K_RIGHT)]):
+            pressed = sampler.sample()
+        with patch("pygame.event.get", return_value=[]):
+            held = sampler.sample()
+            again = sampler.sample()
+
+        self.assertIsNot(held, pressed)  # the press edge is gone
+        self.assertEqual((held.mask, held.pressed), (INPUT_RIGHT, 0))
+        self.assertIs(again, held)
+
+    def test_scripted(self) -> None:
+        """Scripted bitmasks get edges, snapshots pass through, then the window closes
+        """
+        click = InputState(mouse_pos=(1, 2), clicked=True)
+        sampler = ScriptedInput([INPUT_LEFT, INPUT_LEFT | INPUT_JUMP, click])
+
+        self.assertEqual(sampler.sample().pressed, INPUT_LEFT)
+        second = sampler.sample()
+        self.assertEqual((second.mask, second.pressed), (INPUT_LEFT | INPUT_JUMP, INPUT_JUMP))
+        self.assertIs(sampler.sample(), click)
+        self.assertTrue(sampler.sample().quit)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,131 @@
+"""test_jump_tables.py
+
+Tests for jump_tables.py
+"""
+
+import random
+import unittest
+import pygame
+from input_state import MaskKeys, INPUT_JUMP, INPUT_LEFT, INPUT_RIGHT
+from jump_tables import jump_arc, jump_table, table_for, Landing
+from player import Player
+
+START: tuple[int, int] = (400, 500)
+SIZE: tuple[int, int] = (40, 40)
+
+
+def play_landing(platform: pygame.Rect, frame: int, steps: int) -> Player:
+    """Jumps from START and walks steps moves in the last frames, like can_land plans
+    """
+    player = Player(*START)
+    player.on_ground = True
+    keys = MaskKeys()
+    direction = INPUT_RIGHT if steps > 0 else INPUT_LEFT
+    for t in range(1, frame + 1):
+        keys.mask = INPUT_JUMP if t == 1 else 0
+        if t > frame - abs(steps):
+            keys.mask |= direction
+        player.update(keys, [platform])
+    return player
+
+
+class TestJumpArc(unittest.TestCase):
+    """Tests for jump_arc and JumpArc
+    """
+
+    def test_matches_player(self) -> None:
+        """Every frame of the table is where a jumping Player is
+        """
+        player = Player(*START)
+        player.on_ground = True
+        arc = jump_arc(player.jump_speed, player.fall_speed)
+        keys = MaskKeys(INPUT_JUMP)
+        for frame in range(1, arc.frames + 1):
+            player.update(keys, [])
+            keys.mask = 0
+            self.assertEqual(player.y - START[1], arc.dy[frame])
+            self.assertEqual(player.jump_velocity, arc.velocity[frame])
+
+    def test_apex_and_fall(self) -> None:
+        """The apex is the highest frame and the falling half is searched by drop
+        """
+        arc = jump_arc(15.0, 0.7)
+        self.assertEqual(arc.height, -min(arc.dy))
+        self.assertLess(arc.dy[arc.apex_frame], arc.dy[arc.apex_frame - 1])
+        self.assertEqual(sorted(arc.dy[arc.apex_frame:]), list(arc.dy[arc.apex_frame:]))
+        frame = arc.fall_frame(0)
+        assert frame is not None
+        self.assertGreaterEqual(arc.dy[frame], 0)
+        self.assertLess(arc.dy[frame - 1], 0)
+        self.assertIsNone(arc.fall_frame(10_000))
+
+    def test_cached(self) -> None:
+        """Tables are built once per set of constants
+        """
+        self.assertIs(jump_arc(15.0, 0.7), jump_arc(15.0, 0.7))
+        self.assertIs(table_for(Player()), jump_table(15.0, 0.7, 13.0, 5))
+        self.assertIsNot(jump_arc(15.0, 0.7), jump_arc(14.0, 0.7))
+
+    def test_rejects_no_gravity(self) -> None:
+        """A jump without gravity never ends
+        """
+        with self.assertRaises(ValueError):
+            jump_arc(15.0, 0.0)
+
+
+class TestCanLand(unittest.TestCase):
+    """Tests for JumpTable.can_land
+    """
+
+    def test_matches_simulation(self) -> None:
+        """Every landing the table finds is where a simulated jump lands, and a
+        platform it rejects is never landed on with the same kind of walk
+        """
+        table = table_for(Player())
+        rng = random.Random(36)
+        landed = 0
+        for _ in range(150):
+            platform = pygame.Rect(rng.randrange(0, 800), rng.randrange(300, 900),
+                                   rng.randrange(20, 200), rng.randrange(10, 60))
+            if platform.colliderect(pygame.Rect(START, SIZE)):
+                continue
+            landing = table.can_land(START, SIZE, platform)
+            if landing is not None:
+                landed += 1
+                player = play_landing(platform, landing.frame, landing.dx // table.move_speed)
+                self.assertTrue(player.on_ground)
+                self.assertEqual((player.x, player.y), (landing.x, landing.y))
+                continue
+            for frame in range(1, table.jump.frames + 1):
+                for steps in (-frame, 0, frame):
+                    player = play_landing(platform, frame, steps)
+                    self.assertFalse(player.on_ground and player.rect.bottom == platform.top,
+                                     (platform, frame, steps))
+        self.assertGreater(landed, 10)
+
+    def test_out_of_reach(self) -> None:
+        """Too high or too far away
+        """
+        table = table_for(Player())
+        self.assertIsNone(table.can_land(START, SIZE, pygame.Rect(400, 200, 100, 20)))
+        self.assertIsNone(table.can_land(START, SIZE, pygame.Rect(1500, 540, 100, 20)))
+
+    def test_head_bump(self) -> None:
+        """A platform right above the player is hit from below, not landed on
+        """
+        table = table_for(Player())
+        self.assertIsNone(table.can_land(START, SIZE, pygame.Rect(390, 420, 60, 20)))
+        landing = table.can_land(START, SIZE, pygame.Rect(460, 420, 60, 20))
+        self.assertEqual(landing, Landing(31, 25, 425, 380))
+
+    def test_wall_jump(self) -> None:
+        """A wall jump is lower than a jump from the ground
+        """
+        table = table_for(Player())
+        platform = pygame.Rect(500, 420, 100, 20)
+        self.assertIsNotNone(table.can_land(START, SIZE, platform))
+        self.assertIsNone(table.can_land(START, SIZE, platform, wall=True))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,198 @@
+"""test_metrics.py
+
+Tests for metrics.py
+"""
+
+import math
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+from metrics import (BUCKET_BOUNDS, SUB_BUCKETS, GameMetrics, Histogram, MetricsExporter, Series,
+                     hdr_bounds)
+
+
+class TestSeries(unittest.TestCase):
+    """Tests for Series class
+    """
+
+    def test_read_since(self) -> None:
+        """A reader gets what was recorded after its last position, in order
+        """
+        series = Series(8)
+        for value in (1.0, 2.0, 3.0):
+            series.record(value)
+        self.assertEqual(series.read(0), ([1.0, 2.0, 3.0], 0))
+        series.record(4.0)
+        self.assertEqual(series.read(3), ([4.0], 0))
+        self.assertEqual(series.read(4), ([], 0))
+
+    def test_overwritten_samples_are_dropped(self) -> None:
+        """A reader that fell behind a whole buffer gets the newest samples and the
+        number it missed
+        """
+        series = Series(4)
+        for value in range(10):
+            series.record(float(value))
+        self.assertEqual(series.read(0), ([6.0, 7.0, 8.0, 9.0], 6))
+
+    def test_invalid_capacity(self) -> None:
+        with self.assertRaises(ValueError):
+            Series(0)
+
+
+class TestHistogram(unittest.TestCase):
+    """Tests for hdr_bounds and Histogram class
+    """
+
+    def test_hdr_bounds(self) -> None:
+        """Every power of two is split in equal steps, so the relative width of a
+        bucket never exceeds one step
+        """
+        bounds = hdr_bounds(-2, 1, 2)
+        self.assertEqual(bounds, (0.25, 0.375, 0.5, 0.75, 1.0, 1.5, 2.0))
+        for lower, upper in zip(BUCKET_BOUNDS, BUCKET_BOUNDS[1:]):
+            self.assertLessEqual((upper - lower) / lower, 1 / SUB_BUCKETS + 1e-12)
+
+    def test_buckets_include_their_bound(self) -> None:
+        """A sample on a bound counts in that bucket, beyond the last in +Inf
+        """
+        histogram = Histogram((1.0, 2.0))
+        histogram.add([0.5, 1.0, 1.5, 5.0])
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual((histogram.count, histogram.total), (4, 8.0))
+
+    def test_quantile(self) -> None:
+        histogram = Histogram((1.0, 2.0, 4.0))
+        self.assertEqual(histogram.quantile(0.5), 0.0)
+        histogram.add([0.5] * 90 + [3.0] * 9 + [10.0])
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertEqual(histogram.quantile(0.95), 4.0)
+        self.assertEqual(histogram.quantile(1.0), math.inf)
+
+    def test_render(self) -> None:
+        """Buckets are cumulative and end with +Inf, _sum and _count
+        """
+        histogram = Histogram((0.5, 1.0))
+        histogram.add([0.25, 0.75, 3.0])
+        self.assertEqual(histogram.render("x_seconds", "an example"), [
+            "# HELP x_seconds an example",
+            "# TYPE x_seconds histogram",
+            'x_seconds_bucket{le="0.5"} 1',
+            'x_seconds_bucket{le="1"} 2',
+            'x_seconds_bucket{le="+Inf"} 3',
+            "x_seconds_sum 4",
+            "x_seconds_count 3",
+        ])
+
+
+class TestExporter(unittest.TestCase):
+    """Tests for GameMetrics and MetricsExporter classes
+    """
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._directory.name, "out", "metrics.prom")
+        self.metrics = GameMetrics(64)
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_displayed(self) -> None:
+        """Latency is measured from the sample, frame time from the last display
+        """
+        sampled = time.perf_counter()
+        self.metrics.displayed(sampled)
+        self.metrics.displayed(sampled)
+        self.assertEqual(self.metrics.latency.written, 2)
+        self.assertEqual(self.metrics.frame_time.written, 1)
+        latencies, _ = self.metrics.latency.read(0)
+        self.assertGreaterEqual(latencies[1], latencies[0])
+
+    def test_fps(self) -> None:
+        """The frame rate follows the frame times smoothly
+        """
+        self.assertEqual(self.metrics.fps, 0.0)
+        with patch("time.perf_counter", side_effect=[1.0, 1.02, 1.06]):
+            for _ in range(3):
+                self.metrics.displayed(1.0)
+        self.assertAlmostEqual(self.metrics.frame_seconds, 0.022)
+        self.assertAlmostEqual(self.metrics.fps, 1 / 0.022)
+
+    def test_export_file(self) -> None:
+        """An export drains every series and rewrites the whole file
+        """
+        exporter = MetricsExporter(self.metrics, self.path)
+        for _ in range(3):
+            self.metrics.frame_time.record(0.016)
+        self.metrics.load_time.record(0.1)
+        exporter.export()
+        self.metrics.frame_time.record(0.05)
+        exporter.export()
+
+        with open(self.path) as file:
+            text = file.read()
+        self.assertIn("game_frames_total 4\n", text)
+        self.assertIn("game_frame_seconds_count 4\n", text)
+        self.assertIn("game_level_load_seconds_count 1\n", text)
+        self.assertIn("game_input_latency_seconds_count 0\n", text)
+        self.assertEqual(exporter.histograms["frame_time"].quantile(0.5),
+                         BUCKET_BOUNDS[next(index for index, bound in enumerate(BUCKET_BOUNDS)
+                                            if bound >= 0.016)])
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_background_thread_and_server(self) -> None:
+        """The thread exports every interval, the server answers with the last export,
+        and stopping exports once more
+        """
+        exporter = MetricsExporter(self.metrics, self.path, port=0, interval=0.01)
+        exporter.start()
+        try:
+            self.metrics.step_time.record(0.001)
+            deadline = time.perf_counter() + 5
+            while "game_physics_step_seconds_count 1" not in exporter.text:
+                self.assertLess(time.perf_counter(), deadline)
+                time.sleep(0.01)
+            url = f"http://127.0.0.1:{exporter.port}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+            self.assertIn("# TYPE game_physics_step_seconds histogram", body)
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/other", timeout=5)
+        finally:
+            self.metrics.step_time.record(0.001)
+            exporter.stop()
+            exporter.stop()
+
+        self.assertIsNone(exporter.port)
+        self.assertEqual(exporter.histograms["step_time"].count, 2)
+        self.assertEqual([thread.name for thread in threading.enumerate()
+                          if thread.name.startswith("metrics")], [])
+
+    def test_recording_never_waits_for_the_exporter(self) -> None:
+        """The main loop's side is a store into a buffer, even while exports run
+        """
+        exporter = MetricsExporter(self.metrics, interval=0.001)
+        exporter.start()
+        try:
+            started = time.perf_counter()
+            for _ in range(10000):
+                self.metrics.step_time.record(0.001)
+            elapsed = time.perf_counter() - started
+        finally:
+            exporter.stop()
+        self.assertLess(elapsed / 10000, 50e-6)
+        self.assertEqual(exporter.histograms["step_time"].count + exporter.dropped, 10000)
+
+    def test_invalid_interval(self) -> None:
+        with self.assertRaises(ValueError):
+            MetricsExporter(self.metrics, interval=0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -1,9 +1,15 @@
 # test_movement_strategy.py
 
+from array import array
 import pytest
 from unittest.mock import MagicMock
+import numpy as np
 import pygame
-from movement_strategy import MovementStrategy, NormalMovement, NoMovement
+from environment import VectorPlatformerEnv
+from input_state import MaskKeys, INPUT_LEFT, INPUT_RIGHT
+from movement_strategy import (MovementStrategy, NormalMovement, NoMovement, SlowMovement,
+                               FastMovement, IceMovement)
+from player import Player
 
 
 def test_cannot_instantiate_abstract_class():
@@ -54,3 +60,87 @@ def test_no_movement_always_zero():
     assert strategy.get_horizontal_velocity(10, keys) == 0
     keys.__getitem__.return_value = False
     assert strategy.get_horizontal_velocity(5, keys) == 0
+
+
+ALL_MASKS = np.arange(8, dtype=np.int64)
+
+
+@pytest.mark.parametrize("strategy", [NormalMovement(), NoMovement(),
+                                      SlowMovement(), FastMovement()])
+def test_batch_matches_single(strategy):
+    speeds = np.array([0, 1, 5, 7, 10, 3, 4, 9], dtype=np.int64)
+    batch = strategy.get_horizontal_velocities(ALL_MASKS, speeds)
+    single = [strategy.get_horizontal_velocity(int(speed), MaskKeys(int(mask)))
+              for mask, speed in zip(ALL_MASKS, speeds)]
+    assert batch.tolist() == single
+
+
+def test_slow_and_fast_speeds():
+    speeds = np.full(3, 6, dtype=np.int64)
+    masks = np.array([INPUT_LEFT, INPUT_RIGHT, 0], dtype=np.int64)
+    assert SlowMovement().get_horizontal_velocities(masks, speeds).tolist() == [-3, 3, 0]
+    assert FastMovement().get_horizontal_velocities(masks, speeds).tolist() == [-12, 12, 0]
+
+
+def test_ice_speeds_up_and_slides():
+    strategy = IceMovement()
+    right = MaskKeys(INPUT_RIGHT)
+    velocities = [0]
+    for keys in [right] * 5 + [MaskKeys()] * 4:
+        velocities.append(strategy.next_velocity(3, keys, velocities[-1]))
+    assert velocities[1:] == [1, 2, 3, 3, 3, 2, 1, 0, 0]
+    # no state on the strategy, the first frame from rest every time
+    assert [strategy.get_horizontal_velocity(3, right) for _ in range(3)] == [1, 1, 1]
+
+
+def test_player_keeps_ice_momentum():
+    # the momentum is in the player's saved state and a respawn clears it
+    player = Player(0, 0)
+    player.movement_strategy = IceMovement()
+    right = MaskKeys(INPUT_RIGHT)
+    for _ in range(3):
+        player.horizontal_movement(right)
+    state = array("d", bytes(8 * Player.STATE_SIZE))
+    player.save_state(state, 0)
+    assert player.horizontal_movement(right) == 4
+
+    player.load_state(state, 0)
+    assert player.horizontal_movement(right) == 4
+    player.reposition(0, 0)
+    assert player.move_velocity == 0
+    assert player.horizontal_movement(right) == 1
+
+
+def test_ice_batch_matches_single():
+    rng = np.random.default_rng(1)
+    count = 16
+    strategy = IceMovement()
+    batch = IceMovement()
+    speeds = np.full(count, 5, dtype=np.int64)
+    previous = np.zeros(count, dtype=np.int64)
+    for _ in range(50):
+        masks = rng.integers(0, 8, count)
+        singles = [strategy.next_velocity(5, MaskKeys(int(mask)), int(last))
+                   for mask, last in zip(masks, previous)]
+        previous = batch.get_horizontal_velocities(masks, speeds, previous)
+        assert previous.tolist() == singles
+
+
+def test_adapter_for_single_player_strategies():
+    class Backwards(MovementStrategy):
+        def get_horizontal_velocity(self, move_speed, keys):
+            return -NormalMovement().get_horizontal_velocity(move_speed, keys)
+
+    speeds = np.full(3, 4, dtype=np.int64)
+    masks = np.array([INPUT_LEFT, INPUT_RIGHT, 0], dtype=np.int64)
+    assert Backwards().get_horizontal_velocities(masks, speeds).tolist() == [4, -4, 0]
+
+
+def test_vector_env_uses_adapted_strategy():
+    class Backwards(MovementStrategy):
+        def get_horizontal_velocity(self, move_speed, keys):
+            return -NormalMovement().get_horizontal_velocity(move_speed, keys)
+
+    env = VectorPlatformerEnv(2, strategy=Backwards())
+    env.reset(1)
+    assert env.horizontal_velocity(np.array([INPUT_RIGHT, 0])).tolist() == [-env.move_speeds[0], 0]
@@ -0,0 +1,98 @@
+"""test_moving_platform.py
+
+Tests for moving_platform.py and riding platforms with Player
+"""
+
+import unittest
+import pygame
+from input_state import MaskKeys, INPUT_RIGHT
+from moving_platform import MovingPlatform, LinearPath, CirclePath
+from player import Player
+
+
+class TestPaths(unittest.TestCase):
+    """Tests for LinearPath and CirclePath classes
+    """
+
+    def test_linear_loops(self) -> None:
+        """A two point path goes there and back at its speed
+        """
+        path = LinearPath([(0, 0), (100, 0)], 2)
+        self.assertEqual(path.position(0), (0, 0))
+        self.assertEqual(path.position(25), (50, 0))
+        self.assertEqual(path.position(50), (100, 0))
+        self.assertEqual(path.position(75), (50, 0))
+        self.assertEqual(path.position(100), (0, 0))
+
+    def test_linear_max_step(self) -> None:
+        """No frame moves further than max_step
+        """
+        path = LinearPath([(0, 0), (37, 91), (-20, 5)], 1.7)
+        for frame in range(400):
+            x0, y0 = path.position(frame)
+            x1, y1 = path.position(frame + 1)
+            self.assertLessEqual(max(abs(x1 - x0), abs(y1 - y0)), path.max_step)
+
+    def test_circle(self) -> None:
+        """An orbit starts right of the center and comes back after one period
+        """
+        path = CirclePath((100, 100), 50, 40)
+        self.assertEqual(path.position(0), (150, 100))
+        self.assertEqual(path.position(10), (100, 150))
+        self.assertEqual(path.position(40), path.position(0))
+        for frame in range(40):
+            x0, y0 = path.position(frame)
+            x1, y1 = path.position(frame + 1)
+            self.assertLessEqual(max(abs(x1 - x0), abs(y1 - y0)), path.max_step)
+
+    def test_invalid(self) -> None:
+        """Paths need two points, a speed and a period
+        """
+        with self.assertRaises(ValueError):
+            LinearPath([(0, 0)], 1)
+        with self.assertRaises(ValueError):
+            LinearPath([(0, 0), (1, 1)], 0)
+        with self.assertRaises(ValueError):
+            CirclePath((0, 0), 10, 0)
+
+
+class TestMovingPlatform(unittest.TestCase):
+    """Tests for MovingPlatform class and Player.ride
+    """
+
+    def test_place(self) -> None:
+        """A platform knows where it was a frame ago
+        """
+        platform = MovingPlatform((50, 10), LinearPath([(0, 100), (0, 0)], 3), phase=2)
+        platform.place(4)
+        self.assertEqual(platform.rect, pygame.Rect(0, 82, 50, 10))
+        self.assertEqual((platform.dx, platform.dy), (0, -3))
+
+    def test_player_is_carried(self) -> None:
+        """A player standing on a platform moves with it, also while walking
+        """
+        platform = MovingPlatform((100, 20), LinearPath([(0, 200), (300, 100)], 2))
+        player = Player(20, 160)
+        keys = MaskKeys()
+        for frame in range(1, 60):
+            platform.place(frame)
+            player.update(keys, [platform.rect], [platform])
+            self.assertEqual(player.rect.bottom, platform.rect.top)
+        offset = player.x - platform.rect.x
+
+        keys.mask = INPUT_RIGHT
+        platform.place(60)
+        player.update(keys, [platform.rect], [platform])
+        self.assertEqual(player.x - platform.rect.x, offset + player.move_speed)
+
+    def test_player_beside_is_not_carried(self) -> None:
+        """Only a player on top of the platform rides it
+        """
+        platform = MovingPlatform((100, 20), LinearPath([(0, 200), (300, 200)], 2))
+        player = Player(150, 160)
+        player.ride([platform])
+        self.assertEqual(player.rect.topleft, (150, 160))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
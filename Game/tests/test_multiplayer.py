@@ -0,0 +1,143 @@
+"""test_multiplayer.py
+
+Tests for multiplayer.py
+"""
+
+import asyncio
+import unittest
+from multiplayer import (HELLO, SNAPSHOT, MultiplayerServer, SnapshotDecoder, encode_snapshot,
+                         load_test, read_message)
+from ghost import read_varint
+from input_state import INPUT_RIGHT, MaskKeys
+from simulation import Simulation
+
+
+class TestSnapshots(unittest.TestCase):
+    """Tests for snapshot encoding
+    """
+
+    def test_round_trip(self) -> None:
+        """A decoder follows absolute, delta and removal entries
+        """
+        decoder = SnapshotDecoder()
+        decoder.apply(encode_snapshot(0, 5, [], [(1, 200, 621), (2, 80, 620)])[5:])
+        decoder.apply(encode_snapshot(1, 7, [2], [(1, 5, -3)])[5:])
+
+        self.assertEqual(decoder.positions, {1: (205, 618)})
+        self.assertEqual((decoder.tick, decoder.tick_us), (1, 7))
+
+    def test_unchanged_players_cost_nothing(self) -> None:
+        """A snapshot without changes is only a few bytes
+        """
+        self.assertLess(len(encode_snapshot(1000, 150, [], [])), 12)
+
+
+class TestMultiplayerServer(unittest.TestCase):
+    """Tests for MultiplayerServer class
+    """
+
+    def test_invalid_level(self) -> None:
+        """Unknown levels are rejected
+        """
+        with self.assertRaises(ValueError):
+            MultiplayerServer(level=0)
+
+    def test_clients_follow_server_state(self) -> None:
+        """Clients rebuild the authoritative positions from the snapshots
+        """
+        async def scenario() -> None:
+            server = MultiplayerServer(level=1)
+            await server.start()
+            connections = [await asyncio.open_connection("127.0.0.1", server.port)
+                           for _ in range(3)]
+            decoders = [SnapshotDecoder() for _ in connections]
+            for reader, _ in connections:
+                kind, body = await read_message(reader)
+                self.assertEqual(kind, HELLO)
+                self.assertEqual(read_varint(body, read_varint(body, 0)[1])[0], 1)
+
+            for tick in range(30):
+                if tick == 5:  # after landing on the floor
+                    connections[0][1].write(bytes((INPUT_RIGHT,)))
+                if tick == 20:
+                    connections[2][1].close()  # the third player leaves
+                await asyncio.sleep(0.002)
+                server.step()
+                for (reader, _), decoder in zip(connections[:2], decoders):
+                    kind, body = await read_message(reader)
+                    self.assertEqual(kind, SNAPSHOT)
+                    decoder.apply(body)
+
+            expected = {player_id: (client.player.x, client.player.y)
+                        for player_id, client in server.clients.items()}
+            self.assertEqual(len(expected), 2)
+            for decoder in decoders[:2]:
+                self.assertEqual(decoder.positions, expected)
+            self.assertGreater(expected[1][0], expected[2][0])  # only player 1 walked
+
+            for _, writer in connections[:2]:
+                writer.close()
+            await server.stop()
+
+        asyncio.run(scenario())
+
+    def test_moving_world(self) -> None:
+        """On a level with moving platforms and enemies a player moves like the same
+        inputs move it in a Simulation, riding a platform included, and touching an
+        enemy or a hazard sends it back to the start
+        """
+        async def scenario() -> None:
+            server = MultiplayerServer(level=7)
+            await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            await read_message(reader)
+            simulation = Simulation()
+            simulation.level_changer(7)
+            keys = MaskKeys()
+            player = server.clients[1].player
+
+            rode = 0
+            for tick in range(292):
+                mask = INPUT_RIGHT if 200 <= tick < 232 else 0  # onto the first platform
+                if mask != keys.mask:
+                    keys.mask = mask
+                    writer.write(bytes((mask,)))
+                    await asyncio.sleep(0.002)
+                x = player.x
+                server.step()
+                await read_message(reader)
+                simulation.step(keys)
+                self.assertIsNone(simulation.outcome())
+                self.assertEqual((player.x, player.y), (simulation.player.x, simulation.player.y))
+                if not mask and player.x != x:
+                    rode += 1
+            self.assertGreater(rode, 20)
+
+            entities = server.simulation.entities
+            player.reposition(int(entities.x[0]), int(entities.y[0]))
+            server.step()
+            self.assertEqual((player.x, player.y), tuple(server.simulation.start_pos))
+
+            writer.close()
+            await server.stop()
+
+        asyncio.run(scenario())
+
+    def test_load_test(self) -> None:
+        """The load test bots play against a ticking server and report on it
+        """
+        async def scenario() -> None:
+            server = MultiplayerServer(level=2, tick_rate=60)
+            await server.start()
+            ticking = asyncio.create_task(server.run())
+            report = await load_test("127.0.0.1", server.port, bots=8, seconds=0.5)
+            ticking.cancel()
+            await server.stop()
+
+            self.assertEqual(report.failed, 0)
+            self.assertGreater(report.snapshots, 8)
+            self.assertGreater(report.bandwidth, 0.0)
+            self.assertGreaterEqual(report.mean_tick_ms, 0.0)
+            self.assertIn("8 bots", str(report))
+
+        asyncio.run(scenario())
@@ -0,0 +1,161 @@
+"""test_particles.py
+
+Tests for particles.py
+"""
+
+import unittest
+import numpy as np
+import pygame
+from particles import ParticlePool, PlayerEffects, DOT_SIZE, DUST_COLOR, measure
+from player import Player
+from input_state import MaskKeys, INPUT_JUMP
+
+FRAME_SECONDS: float = 1 / 60
+
+
+class TestParticlePool(unittest.TestCase):
+    """Tests for ParticlePool class
+    """
+
+    def test_burst_and_expire(self) -> None:
+        """A burst lives for its frames and then every particle is dead
+        """
+        pool = ParticlePool(64)
+        pool.burst(10, 20, 10, 2.0, 3, DUST_COLOR)
+        self.assertEqual(pool.live, 10)
+        for _ in range(2):
+            pool.step()
+        self.assertEqual(pool.live, 10)
+        pool.step()
+        self.assertEqual(pool.live, 0)
+        pool.step()  # life never goes below zero
+        self.assertEqual(int(pool.life.min()), 0)
+
+    def test_spawning_does_not_allocate(self) -> None:
+        """Bursts past the capacity wrap around onto the oldest slots and keep the arrays
+        """
+        pool = ParticlePool(16)
+        arrays = [pool.x, pool.y, pool.vx, pool.vy, pool.life, pool.color]
+        pool.burst(0, 0, 12, 1.0, 10, (1, 2, 3))
+        pool.burst(0, 0, 8, 1.0, 20, (4, 5, 6))
+        self.assertEqual(pool.live, 16)
+        # slots 12-15 and 0-3 hold the second burst
+        self.assertEqual(pool.life.tolist(), [20] * 4 + [10] * 8 + [20] * 4)
+        self.assertEqual(int(pool.color[0]), 0x040506)
+        pool.burst(0, 0, 100, 1.0, 5, (0, 0, 0))  # more than fit
+        self.assertEqual(pool.life.tolist(), [5] * 16)
+        for old, new in zip(arrays, [pool.x, pool.y, pool.vx, pool.vy, pool.life, pool.color]):
+            self.assertIs(old, new)
+
+    def test_cone(self) -> None:
+        """Particles leave inside the cone at most speed pixels per frame
+        """
+        pool = ParticlePool(500)
+        pool.burst(0, 0, 500, 3.0, 10, DUST_COLOR)
+        speed = np.hypot(pool.vx, pool.vy)
+        self.assertTrue(np.all(speed <= 3.0))
+        self.assertTrue(np.all(pool.vy <= 0))  # straight up with a half circle spread
+
+    def test_step(self) -> None:
+        """Particles move by their velocity and gravity pulls them down
+        """
+        pool = ParticlePool(4, gravity=0.5)
+        pool.burst(100, 100, 1, 0.0, 10, DUST_COLOR)
+        pool.vx[0], pool.vy[0] = 2.0, -1.0
+        pool.step()
+        pool.step()
+        self.assertEqual((pool.x[0], pool.y[0]), (104.0, 98.5))
+        self.assertEqual(pool.vy[0], 0.0)
+
+    def test_idle_pool_does_nothing(self) -> None:
+        """Once every particle is dead stepping and drawing leave the arrays alone
+        """
+        pool = ParticlePool(4)
+        pool.burst(100, 100, 4, 1.0, 2, DUST_COLOR)
+        pool.step()
+        pool.step()
+        self.assertEqual(pool.live, 0)
+        resting = pool.x.copy()
+        pool.step()
+        pool.draw(pygame.Surface((10, 10)))
+        self.assertTrue(np.array_equal(pool.x, resting))
+
+    def test_draw(self) -> None:
+        """Live particles on screen are drawn as dots, dead and off screen ones are not
+        """
+        for depth in (32, 24):
+            surface = pygame.Surface((50, 50), depth=depth)
+            surface.fill((255, 255, 255))
+            pool = ParticlePool(4)
+            pool.burst(10, 10, 1, 0.0, 5, (255, 0, 0))
+            pool.burst(30, 30, 1, 0.0, 0, (0, 255, 0))  # dead
+            pool.burst(-20, 49, 2, 0.0, 5, (0, 0, 255))  # off screen
+            pool.draw(surface)
+            for dx in range(DOT_SIZE):
+                for dy in range(DOT_SIZE):
+                    self.assertEqual(surface.get_at((10 + dx, 10 + dy))[:3], (255, 0, 0))
+            self.assertEqual(surface.get_at((30, 30))[:3], (255, 255, 255))
+            self.assertEqual(surface.get_at((0, 49))[:3], (255, 255, 255))
+            self.assertFalse(surface.get_locked())
+
+    def test_invalid_capacity(self) -> None:
+        """A pool holds at least one particle
+        """
+        with self.assertRaises(ValueError):
+            ParticlePool(0)
+
+    def test_thousands_cost_little(self) -> None:
+        """A full pool of 4096 particles steps and draws in a small part of a frame
+        """
+        self.assertLess(measure(4096, 120), FRAME_SECONDS / 10)
+
+
+class TestPlayerEffects(unittest.TestCase):
+    """Tests for PlayerEffects class
+    """
+
+    def setUp(self) -> None:
+        self.floor = [pygame.Rect(0, 500, 800, 100)]
+        self.player = Player(100, 500 - Player(0, 0).rect.height)
+        self.effects = PlayerEffects(ParticlePool(256))
+        self.keys = MaskKeys()
+
+    def frame(self, mask: int = 0) -> int:
+        """Plays one frame and returns the live particles
+        """
+        self.keys.mask = mask
+        self.player.update(self.keys, self.floor)
+        self.effects.update(self.player)
+        return self.effects.pool.live
+
+    def test_resting_is_quiet(self) -> None:
+        """Standing still spawns nothing
+        """
+        for _ in range(30):
+            self.assertEqual(self.frame(), 0)
+
+    def test_jump_and_landing(self) -> None:
+        """A jump kicks up dust and the landing raises a puff
+        """
+        for _ in range(5):
+            self.frame()
+        # on_ground flips every frame while resting, holding jump for two frames
+        # always gets one off
+        self.assertGreater(max(self.frame(INPUT_JUMP), self.frame(INPUT_JUMP)), 0)
+        self.effects.pool.clear()
+        live = 0
+        for _ in range(120):
+            live = max(live, self.frame())
+        self.assertGreater(live, 0)
+
+    def test_celebrate_and_reset(self) -> None:
+        """Confetti comes out of the goal and reset clears it
+        """
+        self.effects.celebrate(pygame.Rect(0, 0, 80, 80))
+        self.assertEqual(self.effects.pool.live, 256)
+        self.effects.reset()
+        self.assertEqual(self.effects.pool.live, 0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,155 @@
+"""test_planner.py
+
+Tests for planner.py
+"""
+
+import os
+import tempfile
+import unittest
+from array import array
+from input_state import INPUT_RIGHT, MaskKeys
+from movement_strategy import IceMovement
+from planner import ACTIONS, LEVELS, Route, RoutePlanner, save_route
+from player import Player
+from replay import Replay, verify
+from simulation import Simulation
+
+
+def played(level: int, inputs: bytes) -> tuple[bool | None, int]:
+    """Outcome and frames of inputs played through a fresh simulation
+    """
+    simulation = Simulation()
+    simulation.level_changer(level)
+    return simulation.run(inputs)
+
+
+class TestRoutePlanner(unittest.TestCase):
+    """Tests for RoutePlanner class
+    """
+
+    def test_route_plays_back(self) -> None:
+        """The route wins in exactly its frame count, faster than walking to the goal
+        """
+        route = RoutePlanner(1).plan()
+        assert route is not None
+        self.assertEqual(route.level, 1)
+        self.assertEqual(route.frames, len(route.inputs))
+        self.assertEqual(played(1, route.inputs), (True, route.frames))
+        _, walked = played(1, bytes(5) + bytes([INPUT_RIGHT] * 200))
+        self.assertLess(route.frames, walked)
+
+    def test_route_is_optimal(self) -> None:
+        """No input sequence wins sooner, checked by stepping every distinct state
+        frame by frame
+        """
+        route = RoutePlanner(1).plan()
+        assert route is not None
+        simulation = Simulation()
+        simulation.level_changer(1)
+        keys = MaskKeys()
+        buffer = array("d", bytes(8 * simulation.state_size))
+        simulation.save_state(buffer, 0)
+        layer = {buffer.tobytes()}
+        for frame in range(1, route.frames + 1):
+            following = set()
+            for state in layer:
+                for mask in ACTIONS:
+                    simulation.load_state(array("d", state), 0)
+                    keys.mask = mask
+                    simulation.step(keys)
+                    outcome = simulation.outcome()
+                    self.assertFalse(outcome and frame < route.frames)
+                    if outcome is None:
+                        simulation.checksum = 0  # states differing only here are one
+                        simulation.save_state(buffer, 0)
+                        following.add(buffer.tobytes())
+            layer = following
+
+    def test_cache_is_shared_between_plans(self) -> None:
+        """Planning again steps nothing new, and a plan from a state on the route
+        finishes the rest of it
+        """
+        planner = RoutePlanner(2)
+        route = planner.plan()
+        assert route is not None
+        cached = planner.cached
+        self.assertEqual(planner.plan(), route)
+        self.assertEqual(planner.cached, cached)
+
+        simulation = Simulation()
+        simulation.level_changer(2)
+        self.assertIsNone(simulation.run(route.inputs[:20])[0])
+        start = array("d", bytes(8 * simulation.state_size))
+        simulation.save_state(start, 0)
+        rest = planner.plan(start)
+        assert rest is not None
+        self.assertEqual(rest.frames, route.frames - 20)
+
+    def test_start_on_the_goal(self) -> None:
+        planner = RoutePlanner(1)
+        simulation = Simulation()
+        simulation.level_changer(1)
+        simulation.player.reposition(simulation.goal.x, simulation.goal.y)
+        start = array("d", bytes(8 * simulation.state_size))
+        simulation.save_state(start, 0)
+        self.assertEqual(planner.plan(start), Route(1, b"", 0, 0))
+
+    def test_resolution_and_weight(self) -> None:
+        """Coarser cells and a weighted heuristic expand less and still win, in no
+        fewer frames than the optimal route
+        """
+        optimal = RoutePlanner(4).plan()
+        assert optimal is not None
+        for planner in (RoutePlanner(4, resolution=4), RoutePlanner(4, weight=2.0)):
+            route = planner.plan()
+            assert route is not None
+            self.assertEqual(played(4, route.inputs), (True, route.frames))
+            self.assertGreaterEqual(route.frames, optimal.frames)
+            self.assertLess(route.expanded, optimal.expanded)
+
+    def test_momentum_is_planned(self) -> None:
+        """On ice the slide is part of the state, the route plays back on a fresh
+        player with the same strategy
+        """
+        def on_ice() -> Simulation:
+            player = Player()
+            player.movement_strategy = IceMovement()
+            return Simulation(player)
+
+        route = RoutePlanner(3, on_ice()).plan()
+        assert route is not None
+        simulation = on_ice()
+        simulation.level_changer(3)
+        self.assertEqual(simulation.run(route.inputs), (True, route.frames))
+
+    def test_gives_up(self) -> None:
+        self.assertIsNone(RoutePlanner(2).plan(max_expansions=10))
+
+    def test_invalid_arguments(self) -> None:
+        """Unknown levels, levels with moving platforms or entities and settings that
+        break the search are rejected
+        """
+        self.assertNotIn(7, LEVELS)
+        for arguments in ({"level": 99}, {"level": 7}, {"level": 1, "weight": 0.5},
+                          {"level": 1, "resolution": 0}):
+            with self.assertRaises(ValueError):
+                RoutePlanner(**arguments)  # type: ignore[arg-type]
+
+
+class TestSaveRoute(unittest.TestCase):
+    """Tests for save_route
+    """
+
+    def test_saved_route_verifies(self) -> None:
+        route = RoutePlanner(3).plan()
+        assert route is not None
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "route.replay")
+            save_route(route, path)
+            replay = Replay.load(path)
+        self.assertEqual((replay.level, replay.outcome, replay.frames), (3, True, route.frames))
+        self.assertIsNone(verify(replay))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
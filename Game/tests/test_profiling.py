@@ -0,0 +1,156 @@
+"""test_profiling.py
+
+Tests for profiling.py
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+import unittest
+from profiling import (AllocationProfiler, CProfileProfiler, SamplingProfiler, make_profiler,
+                       net_allocations, PROFILERS)
+
+
+def busy(seconds: float) -> None:
+    """Keeps the thread running Python code for a while
+    """
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+class Box:
+    """Object the collector tracks and no free list keeps
+    """
+
+
+class TestProfilers(unittest.TestCase):
+    """Tests for the profilers
+    """
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_make_profiler(self) -> None:
+        """Every mode has a profiler, unknown modes are rejected
+        """
+        for mode, kind in PROFILERS.items():
+            profiler = make_profiler(mode, self.directory)
+            self.assertIsInstance(profiler, kind)
+            self.assertTrue(os.path.basename(profiler.path(".txt")).startswith(mode + "-"))
+        with self.assertRaises(ValueError):
+            make_profiler("perf")
+
+    def test_cprofile(self) -> None:
+        """The report lists the functions that ran
+        """
+        profiler = CProfileProfiler(self.directory)
+        profiler.start()
+        busy(0.01)
+        profiler.frame()
+        profiler.stop()
+        paths = profiler.write()
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        with open(paths[1]) as report:
+            self.assertIn("busy", report.read())
+
+    def test_tracemalloc_growth_per_frame(self) -> None:
+        """A line that keeps allocating every frame shows up with its bytes per frame
+        """
+        kept: list[bytearray] = []
+        profiler = AllocationProfiler(self.directory, interval=5)
+        profiler.start()
+        for _ in range(20):
+            kept.append(bytearray(10_000))
+            profiler.frame()
+        profiler.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+        report_path, snapshot_path = profiler.write()
+        self.assertTrue(os.path.exists(snapshot_path))
+        with open(report_path) as report:
+            lines = report.read().splitlines()
+        self.assertEqual(lines[0], "20 frames, growth measured over 20")
+        top = lines[2].split()
+        self.assertIn("test_profiling.py", lines[2])
+        self.assertGreater(float(top[0]), 9_000)
+
+    def test_tracemalloc_leaves_tracing_it_did_not_start(self) -> None:
+        """Stopping does not end tracing someone else started
+        """
+        tracemalloc.start()
+        try:
+            profiler = AllocationProfiler(self.directory)
+            profiler.start()
+            profiler.stop()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        with self.assertRaises(ValueError):
+            AllocationProfiler(self.directory, interval=0)
+
+    def test_sampling(self) -> None:
+        """Samples of the busy thread land in the folded stacks and the report
+        """
+        profiler = SamplingProfiler(self.directory, interval=0.001)
+        profiler.start()
+        busy(0.2)
+        profiler.stop()
+        self.assertGreater(sum(profiler.stacks.values()), 10)
+        folded_path, report_path = profiler.write()
+        with open(folded_path) as folded:
+            stack, count = folded.readline().rsplit(" ", 1)
+        self.assertIn("test_sampling", stack)
+        self.assertGreater(int(count), 0)
+        with open(report_path) as report:
+            self.assertIn("samples every 1 ms", report.readline())
+        profiler.stop()  # stopping twice is fine
+        with self.assertRaises(ValueError):
+            SamplingProfiler(self.directory, interval=0)
+
+    def test_sampling_overhead(self) -> None:
+        """Sampling every 5 ms barely slows the sampled thread down
+        """
+        def work() -> int:
+            count = 0
+            end = time.perf_counter() + 0.2
+            while time.perf_counter() < end:
+                sum(range(100))
+                count += 1
+            return count
+
+        baseline = work()
+        profiler = SamplingProfiler(self.directory)
+        profiler.start()
+        sampled = work()
+        profiler.stop()
+        self.assertGreater(sampled, baseline * 0.8)
+
+
+class TestNetAllocations(unittest.TestCase):
+    """Tests for net_allocations
+    """
+
+    def test_kept_objects_are_counted(self) -> None:
+        """Every container a frame keeps shows up, in blocks and in tracked objects
+        """
+        kept: list[Box] = []
+        allocations = net_allocations(lambda: kept.append(Box()), frames=50, warmup=5)
+        self.assertEqual(allocations.objects, 50)
+        self.assertGreaterEqual(allocations.blocks, 50)
+
+    def test_temporaries_are_not(self) -> None:
+        """A frame that frees what it makes leaves nothing, and tracing is stopped again
+        """
+        allocations = net_allocations(lambda: [[1], [2]].sort(), frames=50, warmup=5)
+        self.assertEqual(allocations.objects, 0)
+        self.assertLess(allocations.blocks, 10)  # free lists may keep a few blocks
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,71 @@
+"""test_regression.py
+
+Tests for regression.py
+"""
+
+import os
+import tempfile
+import unittest
+from input_state import INPUT_RIGHT
+from regression import check_replays, find_replays, record_replays, report
+from replay import Replay, verify
+from sim_farm import ReplayCheck, random_jobs
+
+
+class TestRegression(unittest.TestCase):
+    """Tests for the replay regression harness
+    """
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_record_replays(self) -> None:
+        """Recordings stop when the attempt ends and verify against the simulation
+        """
+        inputs = bytes(5) + bytes([INPUT_RIGHT] * 400)
+        path, = record_replays(self.directory, [(1, inputs)])
+
+        replay = Replay.load(path)
+        self.assertEqual(replay.level, 1)
+        self.assertTrue(replay.outcome)
+        self.assertLess(replay.frames, len(inputs))
+        self.assertIsNone(verify(replay))
+
+    def test_find_replays(self) -> None:
+        os.makedirs(os.path.join(self.directory, "sub"))
+        for name in ("b.replay", os.path.join("sub", "a.replay"), "notes.txt"):
+            open(os.path.join(self.directory, name), "wb").close()
+
+        self.assertEqual(find_replays(self.directory),
+                         [os.path.join(self.directory, "b.replay"),
+                          os.path.join(self.directory, "sub", "a.replay")])
+
+    def test_check_replays(self) -> None:
+        """Every replay is checked in order on the farm, a changed one fails
+        """
+        paths = record_replays(self.directory, random_jobs(12, 60, seed=5))
+        changed = Replay.load(paths[3])
+        changed.checksums[-1] ^= 1
+        changed.save(paths[3])
+
+        checks, seconds = check_replays(paths, workers=2, batch_size=4)
+
+        self.assertEqual([check.path for check in checks], paths)
+        self.assertEqual([index for index, check in enumerate(checks) if check.error], [3])
+        self.assertGreater(seconds, 0.0)
+
+    def test_report(self) -> None:
+        checks = [ReplayCheck(0, "a.replay", 1, 100, None),
+                  ReplayCheck(1, "b.replay", 2, 50, "frame 3: x is 2, recorded 1")]
+        self.assertEqual(report(checks, 0.5).splitlines(), [
+            "FAIL b.replay: frame 3: x is 2, recorded 1",
+            "1 of 2 replays match, 150 frames in 0.50 s, 4.0 replays/s, 300 frames/s",
+        ])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,110 @@
+"""test_replay.py
+
+Tests for replay.py
+"""
+
+import os
+import random
+import tempfile
+import unittest
+from checksum import FIELDS
+from replay import Replay, ReplayRecorder, verify
+from input_state import MaskKeys
+from simulation import Simulation
+
+
+def record(level: int, frames: int, seed: int) -> tuple[bytes, Simulation]:
+    """Plays random inputs until the attempt ends and returns the replay file
+    """
+    rng = random.Random(seed)
+    simulation = Simulation()
+    simulation.level_changer(level)
+    recorder = ReplayRecorder(level)
+    keys = MaskKeys()
+    for _ in range(frames):
+        if simulation.outcome() is not None:
+            break
+        keys.mask = rng.randrange(8)
+        simulation.step(keys)
+        recorder.record(keys.mask, simulation)
+    return recorder.to_bytes(simulation.outcome()), simulation
+
+
+class TestReplay(unittest.TestCase):
+    """Tests for ReplayRecorder, Replay and verify
+    """
+
+    def test_round_trip(self) -> None:
+        """Decoding then encoding gives the same bytes
+        """
+        data, simulation = record(3, 400, 1)
+        replay = Replay.from_bytes(data)
+        self.assertEqual(replay.level, 3)
+        self.assertEqual(replay.checksums[-1], simulation.checksum)
+        self.assertEqual(replay.states[-1][:2], (simulation.player.x, simulation.player.y))
+        self.assertEqual(replay.outcome, simulation.outcome())
+        self.assertEqual(replay.to_bytes(), data)
+
+    def test_small(self) -> None:
+        """A frame costs well under the 41 bytes of a raw input, checksum and state
+        """
+        data, _ = record(6, 2000, 2)
+        replay = Replay.from_bytes(data)
+        self.assertLess(len(data), replay.frames * 12)
+
+    def test_verify_matches(self) -> None:
+        """Playing a recording again reproduces it on every level
+        """
+        for level in range(1, 7):
+            replay = Replay.from_bytes(record(level, 600, level)[0])
+            self.assertIsNone(verify(replay), level)
+
+    def test_verify_reports_first_frame_and_field(self) -> None:
+        """A changed input is reported on the first frame whose state moved
+        """
+        replay = Replay.from_bytes(record(6, 300, 3)[0])
+        inputs = bytearray(replay.inputs)
+        inputs[50] ^= 1  # toggles left for one frame
+        replay.inputs = bytes(inputs)
+
+        desync = verify(replay)
+        self.assertIsNotNone(desync)
+        self.assertGreaterEqual(desync.frame, 50)
+        self.assertNotEqual(desync.field, "checksum")
+        self.assertEqual(desync.expected,
+                         replay.states[desync.frame][FIELDS.index(desync.field)])
+
+    def test_verify_reports_outcome(self) -> None:
+        """A recording whose ending was changed is reported after the last frame
+        """
+        replay = Replay.from_bytes(record(6, 300, 4)[0])
+        replay.outcome = not replay.outcome
+        desync = verify(replay)
+        self.assertEqual(desync.frame, replay.frames)
+        self.assertEqual(desync.field, "outcome")
+
+    def test_invalid(self) -> None:
+        """Unreadable data is rejected
+        """
+        data, _ = record(6, 50, 5)
+        with self.assertRaises(ValueError):
+            Replay.from_bytes(b"GHST" + data[4:])
+        with self.assertRaises(ValueError):
+            Replay.from_bytes(data[:-3])
+        with self.assertRaises(ValueError):
+            verify(Replay(9, None, b"", [], []))
+
+    def test_save_and_load(self) -> None:
+        """A saved replay loads back unchanged
+        """
+        data, _ = record(2, 200, 6)
+        replay = Replay.from_bytes(data)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replays", "level_2.replay")
+            replay.save(path)
+            self.assertEqual(Replay.load(path).to_bytes(), data)
+            self.assertFalse(os.path.exists(path + ".tmp"))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,189 @@
+"""test_rollback.py
+
+Tests for rollback.py and the player/simulation state snapshots
+"""
+
+import random
+import time
+import unittest
+from array import array
+from player import Player
+from rollback import RollbackSession, SnapshotRing
+from input_state import MaskKeys, INPUT_JUMP, INPUT_LEFT, INPUT_RIGHT
+from simulation import Simulation
+
+
+def make_simulations(count: int, level: int = 6) -> list[Simulation]:
+    simulations = [Simulation() for _ in range(count)]
+    for simulation in simulations:
+        simulation.level_changer(level)
+        simulation.reset()
+    return simulations
+
+
+def state_of(simulation: Simulation) -> tuple:
+    player = simulation.player
+    return (player.rect.topleft, player.jump_velocity, player.on_ground, player.can_wall_jump,
+            player.touching_left_wall, player.touching_right_wall)
+
+
+class TestPlayerState(unittest.TestCase):
+    """Tests for Player.save_state and Player.load_state
+    """
+
+    def test_round_trip(self) -> None:
+        """Restoring a saved state brings back the rect, velocity and flags
+        """
+        player = Player(12, 34)
+        player.jump_velocity = -7.7
+        player.on_ground = True
+        player.can_wall_jump = False
+        player.touching_right_wall = True
+        buffer = array("d", bytes(8 * (Player.STATE_SIZE + 3)))
+        player.save_state(buffer, 3)
+
+        other = Player()
+        other.load_state(buffer, 3)
+
+        self.assertEqual(other.rect, player.rect)
+        self.assertEqual(other.jump_velocity, -7.7)
+        self.assertTrue(other.on_ground)
+        self.assertFalse(other.can_wall_jump)
+        self.assertFalse(other.touching_left_wall)
+        self.assertTrue(other.touching_right_wall)
+
+
+class TestSnapshotRing(unittest.TestCase):
+    """Tests for SnapshotRing class
+    """
+
+    def test_invalid_capacity(self) -> None:
+        """A ring needs at least one slot
+        """
+        with self.assertRaises(ValueError):
+            SnapshotRing(0, 9)
+
+    def test_save_and_load(self) -> None:
+        """A frame can be restored until its slot is reused
+        """
+        simulations = make_simulations(2)
+        ring = SnapshotRing(4, 2 * simulations[0].state_size)
+        ring.save(0, simulations)
+        saved = [state_of(simulation) for simulation in simulations]
+        keys = MaskKeys(INPUT_RIGHT | INPUT_JUMP)
+        for _ in range(10):
+            for simulation in simulations:
+                simulation.step(keys)
+
+        ring.load(0, simulations)
+        self.assertEqual([state_of(simulation) for simulation in simulations], saved)
+
+        ring.save(4, simulations)
+        with self.assertRaises(KeyError):
+            ring.load(0, simulations)
+
+
+class TestRollbackSession(unittest.TestCase):
+    """Tests for RollbackSession class
+    """
+
+    def reference(self, inputs: list[list[int]]) -> list[tuple]:
+        """Plays every frame with the real inputs, no prediction
+        """
+        simulations = make_simulations(len(inputs[0]))
+        keys = MaskKeys()
+        for frame_inputs in inputs:
+            for simulation, mask in zip(simulations, frame_inputs):
+                keys.mask = mask
+                simulation.step(keys)
+        return [state_of(simulation) for simulation in simulations]
+
+    def test_late_inputs_match_reference(self) -> None:
+        """Remote inputs arriving several frames late end in the same state as
+        playing with every input on time
+        """
+        rng = random.Random(4)
+        frames, delay = 200, 6
+        inputs = [[rng.choice([0, INPUT_LEFT, INPUT_RIGHT, INPUT_RIGHT | INPUT_JUMP])
+                   for _ in range(2)] for _ in range(frames)]
+        session = RollbackSession(make_simulations(2), local=0)
+
+        for frame in range(frames + delay):
+            arrived = frame - delay
+            if 0 <= arrived < frames:
+                session.add_remote_input(1, arrived, inputs[arrived][1])
+            if frame < frames:
+                session.advance(inputs[frame][0])
+        session.advance(0)  # applies the last rollback
+        session.ring.load(frames, session.simulations)
+
+        self.assertEqual([state_of(simulation) for simulation in session.simulations],
+                         self.reference(inputs))
+        self.assertGreater(session.rollbacks, 0)
+        self.assertLessEqual(session.resimulated_frames, session.rollbacks * delay)
+
+    def test_correct_prediction_does_not_roll_back(self) -> None:
+        """Inputs equal to the prediction need no re-simulation
+        """
+        session = RollbackSession(make_simulations(2), local=0)
+        for frame in range(10):
+            session.advance(INPUT_RIGHT)
+            session.add_remote_input(1, frame, 0)
+
+        self.assertEqual(session.rollbacks, 0)
+
+    def test_early_input_keeps_rollback_window(self) -> None:
+        """An input sent a whole ring ahead does not overwrite the confirmed input of
+        a past frame a rollback plays again
+        """
+        ring_size = 8
+        inputs = [[INPUT_RIGHT, INPUT_RIGHT | INPUT_JUMP if frame % 5 == 0 else INPUT_RIGHT]
+                  for frame in range(20)]
+        inputs[19][1] = INPUT_LEFT
+        session = RollbackSession(make_simulations(2), local=0, ring_size=ring_size)
+        for frame in range(12):
+            session.add_remote_input(1, frame, inputs[frame][1])
+            session.advance(inputs[frame][0])
+        # frame 19 is as far ahead as allowed and shares a ring slot with frame 11,
+        # which the rollback to frame 4 plays again
+        session.add_remote_input(1, 19, inputs[19][1])
+        session.add_remote_input(1, 4, INPUT_LEFT)
+        session.add_remote_input(1, 4, inputs[4][1])  # corrected again, rolls back to 4
+        for frame in range(12, 20):
+            if frame != 19:
+                session.add_remote_input(1, frame, inputs[frame][1])
+            session.advance(inputs[frame][0])
+        session.advance(0)
+        session.ring.load(20, session.simulations)
+
+        self.assertEqual([state_of(simulation) for simulation in session.simulations],
+                         self.reference(inputs))
+        self.assertGreater(session.rollbacks, 0)
+
+    def test_input_outside_ring(self) -> None:
+        """Inputs too old or too far ahead are rejected
+        """
+        session = RollbackSession(make_simulations(2), local=0, ring_size=4)
+        for _ in range(10):
+            session.advance(0)
+
+        with self.assertRaises(ValueError):
+            session.add_remote_input(1, 2, INPUT_LEFT)
+        with self.assertRaises(ValueError):
+            session.add_remote_input(1, 14, INPUT_LEFT)
+
+    def test_eight_frame_rollback_fits_in_a_frame(self) -> None:
+        """Restoring and re-simulating 8 frames takes well under a 60 Hz frame
+        """
+        session = RollbackSession(make_simulations(2), local=0)
+        for _ in range(16):
+            session.advance(INPUT_RIGHT)
+
+        start = time.perf_counter()
+        for frame in range(16, 116):
+            session.add_remote_input(1, frame - 8, INPUT_JUMP if frame % 2 else INPUT_LEFT)
+            session.advance(INPUT_RIGHT)
+        per_frame = (time.perf_counter() - start) / 100
+
+        self.assertEqual(session.rollbacks, 100)
+        self.assertLess(per_frame, 1.0 / 60)
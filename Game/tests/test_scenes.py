@@ -0,0 +1,516 @@
+"""test_scenes.py
+
+Tests for scenes.py
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+import pygame
+from game import game
+from scenes import (Scene, SceneStack, CELEBRATION_FRAMES, MainMenuScene, LevelSelectScene,
+                    PlayScene, PostGameScene)
+from ghost import GhostPlayback, TrajectoryRecorder
+from input_state import InputSampler, InputState, ScriptedInput, INPUT_LEFT, INPUT_RIGHT
+from profiling import net_allocations
+from regression import check_replays
+from replay import Replay
+import Level_Objects
+
+
+def fake_pygame_init(self) -> None:
+    """Fake pygame init so tests do not open a real window, the screen is a plain
+    surface so scenes can draw on it
+    """
+    self.screen = pygame.Surface((800, 800))
+    self.clock = Mock(name="clock")
+
+
+def make_game(player: Mock | None = None) -> game:
+    """A game without a window, with a mock player if one is given
+    """
+    with patch.object(game, "pygame_init", fake_pygame_init):
+        if player is None:
+            return game()
+        with patch("game.Player", return_value=player):
+            return game()
+
+
+def click(rect: pygame.Rect) -> InputState:
+    """A frame where the left mouse button goes down over a rect
+    """
+    return InputState(mouse_pos=rect.center, mouse_down=True, clicked=True)
+
+
+class Recorder(Scene):
+    """Scene that writes down when it is entered
+    """
+
+    def __init__(self, name: str, log: list[str]) -> None:
+        self.name = name
+        self.log = log
+
+    def enter(self) -> None:
+        self.log.append(self.name)
+
+    def update(self, inputs: InputState) -> None:
+        pass
+
+    def draw(self) -> None:
+        pass
+
+
+class TestSceneStack(unittest.TestCase):
+    """Tests for SceneStack class
+    """
+
+    def test_transitions_wait_for_apply(self) -> None:
+        """Nothing changes until apply, then the new top scene is entered once
+        """
+        log: list[str] = []
+        menu, select, play = (Recorder(name, log) for name in ("menu", "select", "play"))
+        stack = SceneStack()
+        self.assertFalse(stack.apply())
+
+        stack.push(menu)
+        self.assertEqual(len(stack), 0)
+        self.assertTrue(stack.apply())
+        self.assertIs(stack.top, menu)
+
+        stack.push(select)
+        stack.replace(play)
+        stack.apply()
+        self.assertEqual(len(stack), 2)
+        self.assertIs(stack.top, play)
+        self.assertEqual(log, ["menu", "play"])
+
+    def test_replace_with_itself_enters_again(self) -> None:
+        """Retrying is replacing a scene with itself, which starts a fresh visit
+        """
+        log: list[str] = []
+        play = Recorder("play", log)
+        stack = SceneStack()
+        stack.push(play)
+        stack.apply()
+        stack.replace(play)
+        stack.apply()
+        self.assertEqual(log, ["play", "play"])
+        self.assertEqual(len(stack), 1)
+
+    def test_unwind_and_pop(self) -> None:
+        """Unwinding goes back to a scene, popping the last one empties the stack
+        """
+        log: list[str] = []
+        menu, select, play = (Recorder(name, log) for name in ("menu", "select", "play"))
+        stack = SceneStack()
+        for scene in (menu, select, play):
+            stack.push(scene)
+        stack.apply()
+
+        stack.unwind(menu)
+        stack.push(select)
+        stack.apply()
+        self.assertEqual(len(stack), 2)
+        self.assertIs(stack.top, select)
+
+        stack.pop()
+        stack.pop()
+        stack.apply()
+        self.assertEqual(len(stack), 0)
+
+
+class TestMenus(unittest.TestCase):
+    """Tests for the menu scenes
+    """
+
+    def setUp(self) -> None:
+        self.game = make_game()
+        self.scenes = self.game.scenes
+        self.scenes.push(self.game.main_menu)
+        self.scenes.apply()
+
+    def test_main_menu(self) -> None:
+        """Level select opens on top of the main menu, exit empties the stack
+        """
+        menu = self.game.main_menu
+        menu.update(click(menu.level_select_button.rect))
+        self.scenes.apply()
+        self.assertIs(self.scenes.top, self.game.level_select)
+
+        self.scenes.pop()
+        self.scenes.apply()
+        menu.update(click(menu.exit_button.rect))
+        self.scenes.apply()
+        self.assertEqual(len(self.scenes), 0)
+
+    def test_main_menu_ignores_held_mouse(self) -> None:
+        """A mouse held down over a button is not a click
+        """
+        menu = self.game.main_menu
+        menu.update(InputState(mouse_pos=menu.exit_button.rect.center, mouse_down=True))
+        self.assertFalse(self.scenes.apply())
+
+    def test_level_select(self) -> None:
+        """A level button loads the level and starts playing it
+        """
+        self.scenes.push(self.game.level_select)
+        self.scenes.apply()
+        self.assertEqual(self.game.level, 0)
+
+        buttons = Level_Objects.level_select_buttons
+        self.game.level_select.update(click(buttons[2].rect))
+        self.scenes.apply()
+        self.assertEqual(self.game.level, 3)
+        self.assertIs(self.scenes.top, self.game.play)
+        self.assertEqual(len(self.scenes), 2)
+
+        # the last level, the one with moving platforms and entities
+        self.scenes.replace(self.game.level_select)
+        self.scenes.apply()
+        self.game.level_select.update(click(buttons[6].rect))
+        self.scenes.apply()
+        self.assertEqual(self.game.level, 7)
+        self.assertIs(self.scenes.top, self.game.play)
+        self.assertEqual(len(self.game.simulation.platforms), 3)
+
+    def test_level_select_exit_button(self) -> None:
+        """The last button goes back to the main menu without loading a level
+        """
+        self.scenes.push(self.game.level_select)
+        self.scenes.apply()
+        with patch.object(self.game, "level_changer") as mock_level_changer:
+            self.game.level_select.update(click(Level_Objects.level_select_buttons[-1].rect))
+        self.scenes.apply()
+        self.assertIs(self.scenes.top, self.game.main_menu)
+        mock_level_changer.assert_not_called()
+
+    def test_post_game_win(self) -> None:
+        """After a win the first button loads the next level
+        """
+        post_game = self.game.post_game
+        self.game.level_changer(2)
+        post_game.win = True
+        self.assertIs(post_game.buttons[0], post_game.next_button)
+        post_game.update(click(post_game.next_button.rect))
+        self.scenes.apply()
+        self.assertEqual(self.game.level, 3)
+        self.assertIs(self.scenes.top, self.game.play)
+
+    def test_post_game_lose_retry_level(self) -> None:
+        """After a loss the first button retries the same level from the start
+        """
+        post_game = self.game.post_game
+        self.game.level_changer(2)
+        self.game.player.x += 100
+        post_game.win = False
+        self.assertIs(post_game.buttons[0], post_game.retry_button)
+        post_game.update(click(post_game.retry_button.rect))
+        self.scenes.apply()
+        self.assertEqual(self.game.level, 2)
+        self.assertEqual(self.game.player.x, Level_Objects.level_2_start_pos[0])
+        self.assertIs(self.scenes.top, self.game.play)
+
+    def test_post_game_after_last_level(self) -> None:
+        """Winning the last level offers the level select instead
+        """
+        post_game = self.game.post_game
+        self.game.level_changer(7)
+        post_game.win = True
+        post_game.update(click(post_game.next_button.rect))
+        self.scenes.apply()
+        self.assertIs(self.scenes.top, self.game.level_select)
+
+    def test_post_game_select_and_menu(self) -> None:
+        """The other two buttons go back to the level select and the main menu
+        """
+        post_game = self.game.post_game
+        self.scenes.push(post_game)
+        self.scenes.apply()
+        post_game.update(click(post_game.select_button.rect))
+        self.scenes.apply()
+        self.assertIs(self.scenes.top, self.game.level_select)
+        self.assertEqual(len(self.scenes), 2)
+
+        self.scenes.replace(post_game)
+        self.scenes.apply()
+        post_game.update(click(post_game.menu_button.rect))
+        self.scenes.apply()
+        self.assertIs(self.scenes.top, self.game.main_menu)
+        self.assertEqual(len(self.scenes), 1)
+
+    def test_widgets_are_made_once(self) -> None:
+        """Opening and drawing the menus again never builds a button or a font
+        """
+        with (patch("scenes.button") as mock_button,
+              patch("pygame.font.Font") as mock_font):
+            for scene in (self.game.main_menu, self.game.level_select, self.game.post_game):
+                for _ in range(3):
+                    self.scenes.push(scene)
+                    self.scenes.apply()
+                    scene.update(InputState())
+                    scene.draw()
+                    self.scenes.pop()
+                    self.scenes.apply()
+        mock_button.assert_not_called()
+        mock_font.assert_not_called()
+        self.assertIsInstance(self.game.main_menu, MainMenuScene)
+        self.assertIsInstance(self.game.level_select, LevelSelectScene)
+        self.assertIsInstance(self.game.post_game, PostGameScene)
+
+
+class TestPlayScene(unittest.TestCase):
+    """Tests for PlayScene and CelebrationScene classes
+    """
+
+    def mock_player(self, colliderect: list[bool]) -> Mock:
+        player = Mock(name="player")
+        player.rect = Mock()
+        player.rect.colliderect.side_effect = colliderect
+        return player
+
+    def start(self, mock_game: game) -> PlayScene:
+        mock_game.goal = Mock()
+        mock_game.floor = Mock()
+        mock_game.objects = []
+        mock_game.scenes.push(mock_game.main_menu)
+        mock_game.scenes.push(mock_game.play)
+        mock_game.scenes.apply()
+        return mock_game.play
+
+    def test_play_frame(self) -> None:
+        """Every frame steps the simulation, records the attempt and draws it
+        """
+        player = self.mock_player([False, False])
+        mock_game = make_game(player)
+        with (patch.object(mock_game, "effects") as mock_effects,
+              patch.object(mock_game, "ghosts") as mock_ghosts,
+              patch("scenes.TrajectoryRecorder") as mock_recorder_class,
+              patch("scenes.ReplayRecorder") as mock_replay_class,
+              patch.object(mock_game, "draw_platforms") as mock_draw_platforms):
+            mock_ghosts.load.return_value.corrupt = False
+            play = self.start(mock_game)
+            play.update(InputState())
+            play.draw()
+
+        player.update.assert_called_once()
+        player.draw.assert_called_once_with(mock_game.screen)
+        mock_draw_platforms.assert_called_once_with()
+        mock_recorder_class.return_value.record.assert_called_once()
+        mock_replay_class.return_value.record.assert_called_once()
+        mock_replay_class.return_value.save.assert_not_called()
+        mock_ghosts.load.return_value.advance.assert_called_once_with()
+        mock_ghosts.load.return_value.draw.assert_called_once_with(mock_game.screen)
+        mock_effects.reset.assert_called_once_with()
+        mock_effects.update.assert_called_once_with(player)
+        mock_effects.pool.draw.assert_called_once_with(mock_game.screen)
+        self.assertFalse(mock_game.scenes.apply())
+
+    def test_play_goal(self) -> None:
+        """Touching the goal saves the ghost and the replay and starts the celebration
+        """
+        # the floor then the goal, read once, the replay gets the same outcome
+        player = self.mock_player([False, True])
+        mock_game = make_game(player)
+        with (patch.object(mock_game, "effects"),
+              patch.object(mock_game, "ghosts") as mock_ghosts,
+              patch("scenes.TrajectoryRecorder") as mock_recorder_class,
+              patch("scenes.ReplayRecorder") as mock_replay_class):
+            play = self.start(mock_game)
+            play.update(InputState())
+            mock_game.scenes.apply()
+
+        mock_ghosts.save_if_best.assert_called_once_with(
+            mock_game.level, mock_recorder_class.return_value)
+        self.assertIs(mock_replay_class.return_value.save.call_args.args[1], True)
+        self.assertIs(mock_game.scenes.top, mock_game.celebration)
+        self.assertTrue(mock_game.post_game.win)
+
+    def test_replay_keeps_the_ending_outcome(self) -> None:
+        """A win whose last step falls onto the floor is saved as a win, and a quit
+        as no outcome
+        """
+        for colliderect, inputs, expected in (([False, True, True], InputState(), True),
+                                              ([False, False, False], InputState(quit=True),
+                                               None)):
+            player = self.mock_player(colliderect)
+            mock_game = make_game(player)
+            with (patch.object(mock_game, "effects"),
+                  patch.object(mock_game, "ghosts"),
+                  patch("scenes.TrajectoryRecorder"),
+                  patch("scenes.ReplayRecorder") as mock_replay_class):
+                play = self.start(mock_game)
+                play.update(inputs)
+
+            self.assertIs(mock_replay_class.return_value.save.call_args.args[1], expected)
+
+    def test_play_fall_off(self) -> None:
+        """Falling off goes straight to the post game menu
+        """
+        player = self.mock_player([True])
+        mock_game = make_game(player)
+        with (patch.object(mock_game, "effects"),
+              patch.object(mock_game, "ghosts") as mock_ghosts,
+              patch("scenes.TrajectoryRecorder"),
+              patch("scenes.ReplayRecorder") as mock_replay_class):
+            play = self.start(mock_game)
+            play.update(InputState())
+            mock_game.scenes.apply()
+
+        self.assertIs(mock_replay_class.return_value.save.call_args.args[1], False)
+        mock_ghosts.save_if_best.assert_not_called()
+        self.assertIs(mock_game.scenes.top, mock_game.post_game)
+        self.assertFalse(mock_game.post_game.win)
+
+    def test_hud(self) -> None:
+        """The HUD shows the attempt's time, the deaths on this level and the frame
+        rate, deaths start again on another level
+        """
+        mock_game = make_game()
+        mock_game.level_changer(1)
+        play = mock_game.play
+        with (patch.object(mock_game, "ghosts"),
+              patch("scenes.ReplayRecorder")):
+            for _ in range(2):
+                play.enter()
+                play.finish(False)
+            play.enter()
+            play.finish(True)
+            play.enter()
+            for _ in range(30):
+                play.update(InputState())
+            mock_game.metrics.frame_seconds = 0.02
+            play.draw()
+            self.assertEqual(play.hud.text, "TIME 0.50   DEATHS 2   FPS 50")
+
+            mock_game.level_changer(2)
+            play.enter()
+            self.assertEqual(play.deaths, 0)
+
+    def test_play_scripted_input(self) -> None:
+        """An attempt runs headless on synthetic input and ends when the script runs out
+        """
+        inputs = ScriptedInput([0] * 5 + [INPUT_RIGHT] * 20)
+        mock_game = make_game()
+        mock_game.level_changer(1)
+        start_x = mock_game.player.x
+        with (patch.object(mock_game, "ghosts"),
+              patch("scenes.ReplayRecorder") as mock_replay_class):
+            mock_game.scenes.push(mock_game.main_menu)
+            mock_game.scenes.push(mock_game.play)
+            mock_game.scenes.apply()
+            while mock_game.scenes.top is mock_game.play:
+                mock_game.play.update(inputs.sample())
+                mock_game.play.draw()
+                mock_game.scenes.apply()
+
+        self.assertIs(mock_game.scenes.top, mock_game.post_game)
+        self.assertGreater(mock_game.player.x, start_x)
+        # the last mask stays held on the frame the script runs out
+        masks = [call.args[0] for call in mock_replay_class.return_value.record.call_args_list]
+        self.assertEqual(masks, [0] * 5 + [INPUT_RIGHT] * 21)
+
+    def test_corrupt_ghost_is_dropped(self) -> None:
+        """A ghost whose records run out early stops being drawn and its file is deleted
+        """
+        recorder = TrajectoryRecorder(0, 0)
+        for frame in range(20):
+            recorder.record(frame, frame % 3)
+        mock_game = make_game()
+        mock_game.level_changer(1)
+        with (patch.object(mock_game, "ghosts") as mock_ghosts,
+              patch("scenes.ReplayRecorder")):
+            mock_ghosts.load.return_value = GhostPlayback(recorder.to_bytes(1)[:-2])
+            mock_game.scenes.push(mock_game.main_menu)
+            mock_game.scenes.push(mock_game.play)
+            mock_game.scenes.apply()
+            play = mock_game.play
+            while play.ghost is not None:
+                play.update(InputState())
+                play.draw()
+
+        mock_ghosts.discard.assert_called_once_with(1)
+        self.assertIs(mock_game.scenes.top, play)
+
+    def test_recorded_replays_check(self) -> None:
+        """A win and a fall recorded by the scene play back to the same outcome after the
+        same number of frames in the regression harness
+        """
+        for masks, outcome in (([0] * 5 + [INPUT_RIGHT] * 200, True), ([INPUT_LEFT] * 200, False)):
+            mock_game = make_game()
+            mock_game.level_changer(1)
+            inputs = ScriptedInput(masks)
+            with (tempfile.TemporaryDirectory() as directory,
+                  patch("scenes.REPLAY_DIR", directory),
+                  patch.object(mock_game, "ghosts")):
+                mock_game.scenes.push(mock_game.main_menu)
+                mock_game.scenes.push(mock_game.play)
+                mock_game.scenes.apply()
+                while mock_game.scenes.top is mock_game.play:
+                    mock_game.play.update(inputs.sample())
+                    mock_game.scenes.apply()
+                path = os.path.join(directory, "level_1.replay")
+                replay = Replay.load(path)
+                checks, _ = check_replays([path], workers=1)
+
+            self.assertIs(replay.outcome, outcome)
+            self.assertEqual((checks[0].frames, checks[0].error), (replay.frames, None))
+
+    def test_celebration(self) -> None:
+        """Confetti plays for CELEBRATION_FRAMES frames, then the post game menu opens
+        """
+        mock_game = make_game()
+        mock_game.level_changer(1)
+        scenes = mock_game.scenes
+        scenes.push(mock_game.celebration)
+        scenes.apply()
+        self.assertGreater(mock_game.effects.pool.live, 0)
+        for _ in range(CELEBRATION_FRAMES - 1):
+            mock_game.celebration.update(InputState())
+            mock_game.celebration.draw()
+            self.assertFalse(scenes.apply())
+        mock_game.celebration.update(InputState())
+        scenes.apply()
+        self.assertIs(scenes.top, mock_game.post_game)
+
+
+class TestSteadyState(unittest.TestCase):
+    """A frame of play, once warmed up, leaves nothing for the garbage collector
+    """
+
+    def assert_no_allocations(self, level: int) -> None:
+        mock_game = make_game()
+        mock_game.level_changer(level)
+        scenes = mock_game.scenes
+        scenes.push(mock_game.main_menu)
+        scenes.push(mock_game.play)
+        scenes.apply()
+        sampler = InputSampler()
+
+        def frame() -> None:  # game.manager without the window
+            inputs = sampler.sample()
+            scenes.top.update(inputs)
+            scenes.apply()
+            scenes.top.draw()
+
+        with patch("pygame.event.get", new=lambda: []):
+            allocations = net_allocations(frame, frames=200)
+
+        self.assertIs(scenes.top, mock_game.play)  # still playing, standing at the start
+        self.assertEqual(allocations.objects, 0)
+        # under one block per frame, the interpreter's free lists may keep a few
+        self.assertLess(allocations.blocks, 10)
+
+    def test_static_level(self) -> None:
+        """Sampling, stepping, recording and drawing a static level
+        """
+        self.assert_no_allocations(1)
+
+    def test_moving_platforms_and_entities(self) -> None:
+        """Platforms crossing grid cells and patrolling enemies reuse their storage
+        """
+        self.assert_no_allocations(7)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,143 @@
+"""test_sim_farm.py
+
+Tests for sim_farm.py
+"""
+
+import os
+import tempfile
+import unittest
+import sim_farm
+from sim_farm import SimulationFarm, RunResult, level_table, random_jobs
+from input_state import INPUT_RIGHT, INPUT_JUMP
+from simulation import Simulation
+from regression import record_replays
+from replay import Replay
+import Level_Objects
+
+
+class TestSimFarm(unittest.TestCase):
+    """Tests for the simulation farm
+    """
+
+    def test_level_table(self) -> None:
+        """Level table holds every level as plain tuples
+        """
+        table = level_table()
+
+        self.assertEqual(sorted(table), [1, 2, 3, 4, 5, 6, 7])
+        objects, start, goal, platforms, entities = table[2]
+        self.assertEqual(len(objects), len(Level_Objects.level_2_objects))
+        self.assertEqual(objects[0], tuple(Level_Objects.level_2_objects[0]))
+        self.assertEqual(start, tuple(Level_Objects.level_2_start_pos))
+        self.assertEqual(goal, tuple(Level_Objects.level_2_goal_pos))
+        self.assertEqual(platforms, ())
+        self.assertEqual(len(entities), 0)
+        self.assertEqual(len(table[7][3]), len(Level_Objects.level_7_platforms))
+        self.assertEqual(len(table[7][4]), len(Level_Objects.level_7_entities))
+
+    def test_batches(self) -> None:
+        """Jobs are numbered and grouped by batch size
+        """
+        jobs = [(1, b"")] * 5
+        batches = list(sim_farm._batches(jobs, 2))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual([job[0] for batch in batches for job in batch], [0, 1, 2, 3, 4])
+
+    def test_run_batch_matches_simulation(self) -> None:
+        """A worker batch gives the same result as a Simulation in this process
+        """
+        sim_farm._init_worker(level_table())
+        inputs = bytes(5) + bytes([INPUT_RIGHT] * 200)  # settle onto the floor first
+
+        results = sim_farm._run_batch([(7, 1, inputs)])
+
+        simulation = Simulation()
+        simulation.level_changer(1)
+        simulation.reset()
+        won, frames = simulation.run(inputs)
+        self.assertEqual(results, [RunResult(7, 1, won, frames,
+                                             simulation.player.x, simulation.player.y)])
+        self.assertTrue(won)
+
+    def test_worker_reuses_simulation(self) -> None:
+        """A run starts from a clean state even after another run
+        """
+        sim_farm._init_worker(level_table())
+        job = (0, 3, bytes([INPUT_RIGHT | INPUT_JUMP] * 50))
+
+        first = sim_farm._run_batch([job])
+        sim_farm._run_batch([(1, 4, bytes([INPUT_RIGHT] * 30))])
+        second = sim_farm._run_batch([job])
+
+        self.assertEqual(first, second)
+
+    def test_farm_runs_jobs_in_order(self) -> None:
+        """The farm returns one result per job in job order
+        """
+        jobs = random_jobs(40, 120, seed=3)
+
+        with SimulationFarm(workers=2, batch_size=8) as farm:
+            results = farm.run(jobs)
+
+        self.assertEqual([result.job_id for result in results], list(range(40)))
+        self.assertEqual([result.level for result in results], [level for level, _ in jobs])
+        self.assertEqual(farm.last_runs, 40)
+        self.assertGreater(farm.runs_per_second, 0.0)
+
+    def test_invalid_batch_size(self) -> None:
+        """Batch size below 1 is rejected
+        """
+        with self.assertRaises(ValueError):
+            SimulationFarm(workers=1, batch_size=0)
+
+
+class TestReplayChecks(unittest.TestCase):
+    """Tests for checking recorded replays on the farm
+    """
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        sim_farm._init_worker(level_table())
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_matching_replay(self) -> None:
+        """A replay recorded with the current code passes
+        """
+        inputs = bytes(5) + bytes([INPUT_RIGHT] * 200)
+        path, = record_replays(self.directory, [(1, inputs)])
+
+        check, = sim_farm._check_batch([(4, path)])
+
+        self.assertEqual(check.error, None)
+        self.assertEqual((check.job_id, check.path, check.level), (4, path, 1))
+        self.assertEqual(check.frames, Replay.load(path).frames)
+
+    def test_changed_run_is_reported(self) -> None:
+        """A run that plays out differently from its recording names the first frame
+        and field that changed
+        """
+        path, = record_replays(self.directory, [(3, bytes([INPUT_RIGHT] * 40))])
+        replay = Replay.load(path)
+        replay.inputs = bytes(10) + replay.inputs[10:]  # as if the physics had changed
+        replay.save(path)
+
+        check, = sim_farm._check_batch([(0, path)])
+
+        self.assertIsNotNone(check.error)
+        self.assertTrue(str(check.error).startswith("frame 0: "), check.error)
+
+    def test_unreadable_replays(self) -> None:
+        bad = os.path.join(self.directory, "bad.replay")
+        with open(bad, "wb") as file:
+            file.write(b"nope")
+        missing_level = os.path.join(self.directory, "level_9.replay")
+        Replay(9, None, b"", [], []).save(missing_level)
+
+        checks = sim_farm._check_batch([(0, bad), (1, missing_level)])
+
+        self.assertTrue(str(checks[0].error).startswith("unreadable"))
+        self.assertEqual(checks[1].error, "level 9 does not exist")
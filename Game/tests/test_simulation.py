@@ -0,0 +1,272 @@
+"""test_simulation.py
+
+Tests for simulation.py
+"""
+
+import unittest
+from array import array
+from unittest.mock import patch, Mock, MagicMock
+import pygame
+from input_state import MaskKeys, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP
+from simulation import Simulation
+from player import Player
+import Level_Objects
+
+
+class TestSimulation(unittest.TestCase):
+    """Tests for Simulation class
+    """
+
+    def test_default_player(self) -> None:
+        """A simulation without a player makes its own
+        """
+        simulation = Simulation()
+
+        self.assertIsInstance(simulation.player, Player)
+        self.assertEqual(simulation.level, 0)
+        self.assertEqual(simulation.objects, [])
+
+    def test_many_independent_instances(self) -> None:
+        """Simulations do not share state with each other
+        """
+        simulations = [Simulation() for _ in range(50)]
+        simulations[0].level_changer(1)
+        simulations[1].level_changer(2)
+
+        self.assertEqual(simulations[0].level, 1)
+        self.assertEqual(simulations[1].level, 2)
+        self.assertEqual(simulations[2].level, 0)
+        self.assertEqual(len({id(simulation.player) for simulation in simulations}), 50)
+
+    def test_level_setup(self) -> None:
+        """Level setup should update objects, player start, and goal position
+        """
+        simulation = Simulation()
+        level_objects = [pygame.Rect(0, 0, 10, 10)]
+
+        simulation.level_setup(level_objects, [100, 200], [400, 500])
+
+        self.assertIs(simulation.objects, level_objects)
+        self.assertEqual(simulation.player.x, 100)
+        self.assertEqual(simulation.player.y, 200)
+        self.assertEqual(simulation.goal.topleft, (400, 500))
+
+    def test_level_changer_level_setup(self) -> None:
+        """Level changer should set up levels 1-6 and call level_setup
+        """
+        simulation = Simulation(Mock(name="player"))
+
+        for level in range(1, 7):
+            level_objects = f"objects_for_level_{level}"
+            new_start_pos = [level, level + 10]
+            new_goal_pos = [level + 20, level + 30]
+
+            with (patch.object(Level_Objects, f"level_{level}_objects", level_objects),
+                  patch.object(Level_Objects, f"level_{level}_start_pos", new_start_pos),
+                  patch.object(Level_Objects, f"level_{level}_goal_pos", new_goal_pos),
+                  patch.object(Simulation, "level_setup") as mock_level_setup):
+
+                result = simulation.level_changer(level)
+
+            self.assertTrue(result)
+            self.assertEqual(simulation.level, level)
+            mock_level_setup.assert_called_once_with(level_objects, new_start_pos, new_goal_pos)
+
+    def test_level_changer_invalid_level(self) -> None:
+        """Invalid level should leave current level unchanged and return False
+        """
+        simulation = Simulation()
+        simulation.level = 99
+
+        self.assertFalse(simulation.level_changer(0))
+        self.assertEqual(simulation.level, 99)
+
+    def test_outcome(self) -> None:
+        """Outcome is True on the goal, False on the floor and None otherwise
+        """
+        simulation = Simulation()
+        simulation.level_changer(1)
+        self.assertIsNone(simulation.outcome())
+
+        simulation.player.reposition(simulation.goal.x, simulation.goal.y)
+        self.assertTrue(simulation.outcome())
+
+        simulation.player.reposition(simulation.floor.x, simulation.floor.y)
+        self.assertFalse(simulation.outcome())
+
+    def test_floor_wins_over_goal(self) -> None:
+        """Touching the floor and the goal on the same frame is a fall
+        """
+        simulation = Simulation()
+        simulation.level_setup([], [0, 0], [0, 860])
+        simulation.player.reposition(0, 870)
+        self.assertTrue(simulation.player.rect.colliderect(simulation.goal))
+        self.assertFalse(simulation.outcome())
+
+    def test_step_updates_player(self) -> None:
+        """Step passes the input and level colliders to the player
+        """
+        simulation = Simulation(Mock(name="player"))
+        keys = Mock()
+        simulation.objects = [pygame.Rect(0, 0, 1, 1)]
+
+        simulation.step(keys)
+
+        simulation.player.update.assert_called_once_with(keys, simulation.objects)
+
+    def test_step_falls_onto_level_floor(self) -> None:
+        """A real player dropped into level 1 lands on its floor
+        """
+        simulation = Simulation()
+        simulation.level_changer(1)
+        keys = MagicMock()
+        keys.__getitem__.return_value = False
+
+        for _ in range(120):
+            simulation.step(keys)
+
+        self.assertIsNone(simulation.outcome())
+        self.assertEqual(simulation.player.rect.bottom, Level_Objects.level_1_objects[0].top)
+
+    def test_reset(self) -> None:
+        """Reset puts the player back on the start position
+        """
+        simulation = Simulation()
+        simulation.level_changer(2)
+        simulation.player.reposition(10, 10)
+        simulation.player.jump_velocity = 4.0
+
+        simulation.reset()
+
+        self.assertEqual(simulation.player.rect.topleft, tuple(Level_Objects.level_2_start_pos))
+        self.assertEqual(simulation.player.jump_velocity, 0.0)
+
+    def test_run_until_win(self) -> None:
+        """A scripted run stops on the frame the goal is touched
+        """
+        simulation = Simulation()
+        simulation.level_changer(1)
+
+        won, frames = simulation.run(bytes(5) + bytes([INPUT_RIGHT] * 200))
+
+        self.assertTrue(won)
+        self.assertLess(frames, 205)
+
+    def test_run_out_of_inputs(self) -> None:
+        """A run whose inputs end early has no outcome
+        """
+        simulation = Simulation()
+        simulation.level_changer(1)
+
+        self.assertEqual(simulation.run(bytes(10)), (None, 10))
+
+
+class TestMovingPlatforms(unittest.TestCase):
+    """Tests for levels with moving platforms
+    """
+
+    def test_level_index(self) -> None:
+        """The grid holds the static colliders and then the platforms, static levels
+        only their colliders
+        """
+        simulation = Simulation()
+        simulation.level_changer(7)
+        objects = Level_Objects.level_7_objects
+        platforms = Level_Objects.level_7_platforms
+
+        self.assertEqual(len(simulation.index), len(objects) + len(platforms))
+        everything = simulation.index.query(pygame.Rect(-800, -800, 2400, 2400))
+        self.assertEqual(everything, objects + [platform.rect for platform in platforms])
+
+        simulation.level_changer(1)
+        self.assertEqual(simulation.platforms, [])
+        self.assertEqual(len(simulation.index), len(Level_Objects.level_1_objects))
+
+    def test_platforms_not_shared(self) -> None:
+        """Two simulations of the same level move their own platforms
+        """
+        first, second = Simulation(), Simulation()
+        first.level_changer(7)
+        second.level_changer(7)
+        for _ in range(20):
+            first.step(MaskKeys())
+
+        self.assertEqual(second.platforms[0].rect.topleft,
+                         Level_Objects.level_7_platforms[0].rect.topleft)
+        self.assertNotEqual(first.platforms[0].rect, second.platforms[0].rect)
+
+    def test_platforms_follow_the_frame(self) -> None:
+        """Platforms are placed from the frame, so loading a state puts them back
+        """
+        simulation = Simulation()
+        simulation.level_changer(7)
+        keys = MaskKeys()
+        for _ in range(10):
+            simulation.step(keys)
+        saved = array("d", bytes(8 * simulation.state_size))
+        simulation.save_state(saved, 0)
+        positions = [platform.rect.topleft for platform in simulation.platforms]
+
+        for _ in range(25):
+            simulation.step(keys)
+        self.assertNotEqual([platform.rect.topleft for platform in simulation.platforms],
+                            positions)
+
+        simulation.load_state(saved, 0)
+        self.assertEqual(simulation.frame, 10)
+        self.assertEqual([platform.rect.topleft for platform in simulation.platforms], positions)
+        first = len(simulation.objects)
+        for key, platform in enumerate(simulation.platforms, first):
+            self.assertEqual(simulation.index.query(platform.rect).count(platform.rect), 1)
+            self.assertIn(key, simulation.index)
+
+    def test_ride_the_ferry(self) -> None:
+        """A player on the ferry is carried over the gap and back
+        """
+        simulation = Simulation()
+        simulation.level_changer(7)
+        ferry = simulation.platforms[0]
+        player = simulation.player
+        keys = MaskKeys()
+        simulation.step(keys)
+        player.reposition(ferry.rect.x + 40, ferry.rect.top - player.rect.h)
+
+        for _ in range(200):
+            simulation.step(keys)
+            self.assertIsNone(simulation.outcome())
+            self.assertEqual(player.rect.bottom, ferry.rect.top)
+            self.assertEqual(player.x - ferry.rect.x, 40)
+        self.assertGreater(player.x, Level_Objects.level_7_objects[0].right)
+
+    def test_level_7_can_be_won(self) -> None:
+        """A route found by a search over held inputs reaches the goal
+        """
+        route = [0] * 22 + [2, 2, 6, 2, 2, 2, 2, 6, 2, 2, 2, 2, 2, 0, 0, 6, 2, 2,
+                            1, 5, 1, 5, 1, 1, 1, 1, 1, 5, 1, 1, 5, 1]
+        simulation = Simulation()
+        simulation.level_changer(7)
+
+        won, _ = simulation.run(bytes(mask for mask in route for _ in range(8)))
+
+        self.assertTrue(won)
+
+
+class TestMaskKeys(unittest.TestCase):
+    """Tests for MaskKeys class
+    """
+
+    def test_keys(self) -> None:
+        """Mask bits map onto the keys the player reads
+        """
+        keys = MaskKeys(INPUT_LEFT | INPUT_JUMP)
+
+        self.assertTrue(keys[pygame.K_a])
+        self.assertTrue(keys[pygame.K_LEFT])
+        self.assertTrue(keys[pygame.K_SPACE])
+        self.assertFalse(keys[pygame.K_d])
+        self.assertFalse(keys[pygame.K_RIGHT])
+        self.assertFalse(keys[pygame.K_q])
+
+        keys.mask = INPUT_RIGHT
+        self.assertTrue(keys[pygame.K_d])
+        self.assertFalse(keys[pygame.K_SPACE])
@@ -0,0 +1,191 @@
+"""test_spatial_index.py
+
+Tests for spatial_index.py
+"""
+
+import math
+import random
+import unittest
+import pygame
+from environment import rect_array
+from spatial_index import (SpatialGrid, RayHit, benchmark, random_level, _brute_region,
+                           _brute_solid_at, _brute_nearest_below, _brute_raycast)
+
+
+class TestSpatialGrid(unittest.TestCase):
+    """Tests for SpatialGrid class
+    """
+
+    def test_query_finds_overlaps_in_key_order(self) -> None:
+        """Every collider that overlaps the area is returned, in key order
+        """
+        rng = random.Random(37)
+        rects = [pygame.Rect(rng.randrange(-400, 1200), rng.randrange(-400, 1200),
+                             rng.randrange(1, 300), rng.randrange(1, 300)) for _ in range(60)]
+        grid = SpatialGrid(64)
+        for key in reversed(range(len(rects))):
+            grid.insert(key, rects[key])
+
+        for _ in range(200):
+            area = pygame.Rect(rng.randrange(-400, 1200), rng.randrange(-400, 1200),
+                               rng.randrange(1, 200), rng.randrange(1, 200))
+            found = grid.query(area)
+            expected = [rect for rect in rects if rect.colliderect(area)]
+            self.assertEqual([rect for rect in found if rect.colliderect(area)], expected)
+            self.assertEqual(found, sorted(found, key=rects.index))
+
+    def test_move_only_touches_changed_cells(self) -> None:
+        """A move inside the same cells changes nothing, a move across a cell edge
+        leaves the cells both spans share alone and empties the cell it left
+        """
+        grid = SpatialGrid(100)
+        rect = pygame.Rect(10, 10, 150, 20)
+        grid.insert(0, rect)
+        self.assertEqual(grid.cells_of(0), [(0, 0), (1, 0)])
+        shared = grid._cells[(1, 0)]
+
+        rect.x = 20
+        grid.move(0, rect)
+        self.assertEqual(grid.cells_of(0), [(0, 0), (1, 0)])
+
+        rect.x = 120
+        grid.move(0, rect)
+        self.assertEqual(grid.cells_of(0), [(1, 0), (2, 0)])
+        self.assertIs(grid._cells[(1, 0)], shared)
+        self.assertEqual(grid._cells[(0, 0)], set())  # kept for when it comes back
+        self.assertEqual(grid.query(pygame.Rect(250, 0, 10, 10)), [rect])
+        self.assertEqual(grid.query(pygame.Rect(0, 0, 10, 10)), [])
+
+    def test_remove(self) -> None:
+        """Removed colliders leave no empty cells behind
+        """
+        grid = SpatialGrid()
+        grid.insert(3, pygame.Rect(0, 0, 500, 500))
+        self.assertIn(3, grid)
+        self.assertEqual(len(grid), 1)
+
+        grid.remove(3)
+        self.assertNotIn(3, grid)
+        self.assertEqual(grid._cells, {})
+
+    def test_invalid(self) -> None:
+        """Cell sizes must be positive and keys unique
+        """
+        with self.assertRaises(ValueError):
+            SpatialGrid(0)
+        grid = SpatialGrid()
+        grid.insert(0, pygame.Rect(0, 0, 1, 1))
+        with self.assertRaises(KeyError):
+            grid.insert(0, pygame.Rect(0, 0, 1, 1))
+
+
+class TestSpatialQueries(unittest.TestCase):
+    """Tests for the geometric queries of SpatialGrid, checked against every collider
+    """
+
+    def setUp(self) -> None:
+        self.rects = random_level(300, 5)
+        self.grid = SpatialGrid.from_rects(self.rects, 64)
+        self.rng = random.Random(6)
+        self.side = int(math.sqrt(300) * 200)
+
+    def point(self) -> tuple[float, float]:
+        return (self.rng.uniform(-200, self.side + 200), self.rng.uniform(-200, self.side + 200))
+
+    def test_from_array(self) -> None:
+        """An (M, 4) collider array gives the same grid as the rects
+        """
+        grid = SpatialGrid.from_rects(rect_array(self.rects), 64)
+        self.assertEqual(len(grid), len(self.rects))
+        self.assertEqual([grid[key] for key in range(len(grid))], self.rects)
+        self.assertEqual(len(SpatialGrid.from_rects(rect_array([]))), 0)
+
+    def test_region(self) -> None:
+        """Exactly the overlapping colliders, in key order
+        """
+        for _ in range(200):
+            x, y = self.point()
+            area = pygame.Rect(int(x), int(y),
+                               self.rng.randrange(1, 400), self.rng.randrange(1, 400))
+            self.assertEqual(self.grid.region(area), _brute_region(self.rects, area))
+
+    def test_solid_at(self) -> None:
+        """Points inside a collider find the first one holding them
+        """
+        for _ in range(500):
+            x, y = self.point()
+            self.assertEqual(self.grid.solid_at(x, y), _brute_solid_at(self.rects, x, y))
+        rect = self.rects[0]
+        self.assertIsNotNone(self.grid.solid_at(rect.left, rect.top))
+
+    def test_nearest_below(self) -> None:
+        """The collider a point would land on
+        """
+        for _ in range(500):
+            x, y = self.point()
+            self.assertEqual(self.grid.nearest_below(x, y),
+                             _brute_nearest_below(self.rects, x, y))
+        self.assertIsNone(SpatialGrid().nearest_below(0, 0))
+
+    def test_raycast(self) -> None:
+        """The first hit along a ray matches testing every collider
+        """
+        for _ in range(500):
+            origin = self.point()
+            angle = self.rng.uniform(0, 2 * math.pi)
+            direction = (math.cos(angle), math.sin(angle))
+            limit = self.rng.choice([math.inf, 300.0])
+            hit = self.grid.raycast(origin, direction, limit)
+            expected = _brute_raycast(self.rects, origin, direction, limit)
+            if expected is None:
+                self.assertIsNone(hit)
+            else:
+                assert hit is not None
+                self.assertEqual(hit.key, expected.key)
+                self.assertAlmostEqual(hit.distance, expected.distance)
+                self.assertEqual(hit.normal, expected.normal)
+
+    def test_axis_rays(self) -> None:
+        """Straight rays report the face they hit, a ray from inside hits at once
+        """
+        grid = SpatialGrid.from_rects([pygame.Rect(100, 200, 50, 20)])
+        self.assertEqual(grid.raycast((120, 0), (0, 5)), RayHit(0, 200.0, (120.0, 200.0), (0, -1)))
+        self.assertEqual(grid.raycast((0, 210), (1, 0)), RayHit(0, 100.0, (100.0, 210.0), (-1, 0)))
+        self.assertEqual(grid.raycast((500, 210), (-1, 0)).normal, (1, 0))
+        self.assertEqual(grid.raycast((120, 210), (0, 1)), RayHit(0, 0.0, (120.0, 210.0), (0, 0)))
+        self.assertIsNone(grid.raycast((120, 0), (0, 1), 199))
+        self.assertIsNone(grid.raycast((120, 0), (0, -1)))
+        self.assertIsNone(SpatialGrid().raycast((0, 0), (1, 0)))
+        with self.assertRaises(ValueError):
+            grid.raycast((0, 0), (0, 0))
+
+    def test_segment_cast(self) -> None:
+        """Segments see what lies between their ends
+        """
+        grid = SpatialGrid.from_rects([pygame.Rect(100, 0, 20, 100)])
+        self.assertIsNone(grid.segment_cast((0, 50), (99, 50)))
+        self.assertEqual(grid.segment_cast((0, 50), (300, 50)).key, 0)
+        self.assertIsNone(grid.segment_cast((0, 50), (0, 50)))
+        self.assertEqual(grid.segment_cast((110, 50), (110, 50)).distance, 0.0)
+
+    def test_queries_after_move(self) -> None:
+        """Queries follow a collider that moved
+        """
+        rect = pygame.Rect(0, 0, 40, 10)
+        grid = SpatialGrid.from_rects([rect])
+        rect.topleft = (1000, 1000)
+        grid.move(0, rect)
+        self.assertIsNone(grid.solid_at(5, 5))
+        self.assertEqual(grid.solid_at(1005, 1005), 0)
+        self.assertEqual(grid.nearest_below(1010, 0), 0)
+        self.assertEqual(grid.raycast((0, 0), (1, 1)).key, 0)
+
+    def test_faster_than_brute_force(self) -> None:
+        """On a large level every query beats checking every collider by a wide margin
+        """
+        for name, (grid, brute) in benchmark(3000, 200).items():
+            self.assertLess(grid * 5, brute, name)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,91 @@
+"""test_text.py
+
+Tests for text.py
+"""
+
+import unittest
+from unittest.mock import Mock
+from hypothesis import given, settings
+from hypothesis import strategies as st
+import pygame
+from text import FALLBACK, GlyphAtlas, TextLine
+
+BLACK: tuple[int, int, int] = (0, 0, 0)
+WHITE: tuple[int, int, int] = (255, 255, 255)
+
+
+def pixels(surface: pygame.Surface) -> bytes:
+    return pygame.image.tobytes(surface, "RGBA")
+
+
+class TestGlyphAtlas(unittest.TestCase):
+    """Tests for GlyphAtlas class
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        pygame.font.init()
+        cls.font = pygame.font.Font(None, 28)
+        cls.atlas = GlyphAtlas(cls.font, (200, 40, 10))
+
+    def test_glyphs_are_copied_exactly(self) -> None:
+        """Every glyph on the atlas has the pixels Font.render gives it
+        """
+        for char in "0A.g":
+            rendered = self.font.render(char, True, (200, 40, 10))
+            area = self.atlas.glyph(char)
+            self.assertEqual(area.size, rendered.get_size())
+            self.assertEqual(pixels(self.atlas.surface.subsurface(area)), pixels(rendered))
+
+    def test_width_and_fallback(self) -> None:
+        self.assertIs(self.atlas.glyph("é"), self.atlas.glyph(FALLBACK))
+        self.assertEqual(self.atlas.width("10"), self.font.size("1")[0] + self.font.size("0")[0])
+        self.assertEqual(self.atlas.advance, max(area.width for area in self.atlas.glyphs.values()))
+
+
+class TestTextLine(unittest.TestCase):
+    """Tests for TextLine class
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        pygame.font.init()
+        cls.atlas = GlyphAtlas(pygame.font.Font(None, 28), BLACK)
+
+    @given(texts=st.lists(st.text(alphabet="iW1. ?é", max_size=12), min_size=1, max_size=6))
+    @settings(max_examples=200, derandomize=True, deadline=None)
+    def test_updates_match_a_fresh_line(self, texts: list[str]) -> None:
+        """Whatever was shown before, a line looks like one that only ever showed
+        the last text
+        """
+        for background in (None, WHITE):
+            line = TextLine(self.atlas, 8, background)
+            for text in texts:
+                line.update(text)
+            fresh = TextLine(self.atlas, 8, background)
+            fresh.update(texts[-1])
+            self.assertEqual(pixels(line.surface), pixels(fresh.surface))
+            self.assertEqual(line.right, self.atlas.width(texts[-1][:8]))
+
+    def test_only_changed_characters_are_copied(self) -> None:
+        """A digit of the same width changes one cell, the line is one blit
+        """
+        line = TextLine(self.atlas, background=WHITE)
+        line.update("TIME 1.00 FPS 60")
+        line.surface = Mock(wraps=line.surface)
+        line.update("TIME 1.02 FPS 60")
+        self.assertEqual(line.surface.fill.call_count, 1)
+        self.assertEqual(line.surface.blit.call_count, 1)
+
+        screen = Mock()
+        line.draw(screen, "TIME 1.02 FPS 60", 5, 6)
+        surface, dest, area = screen.blit.call_args.args
+        self.assertEqual((dest.x, dest.y, area.width), (5, 6, line.right))
+
+    def test_invalid_capacity(self) -> None:
+        with self.assertRaises(ValueError):
+            TextLine(self.atlas, 0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,187 @@
+"""text.py
+
+Text that changes every frame, the HUD's timer, deaths and frame rate. Font.render
+rasterizes a new surface for every string; a GlyphAtlas rasterizes every character of
+its charset once into one surface, and a TextLine composes a line from sub-rects of it.
+
+A blit costs about as much as Font.render spends on a short glyph, so a whole line
+blitted glyph by glyph every frame would be slower than rendering it. A TextLine keeps
+its pixels between frames instead: only the characters that changed since the last
+frame are copied from the atlas, then the line is one blit. A running timer copies a
+digit or two a frame and never makes a surface. Given a background color the line is
+opaque and that blit is a copy instead of blending every pixel onto the screen.
+
+Atlases are made and shared by assets.AssetManager.atlas, one per font, size and color.
+"""
+
+from __future__ import annotations
+from array import array
+from itertools import compress
+from operator import ne
+import pygame
+
+# characters rasterized into an atlas, printable ASCII
+CHARSET: str = "".join(chr(code) for code in range(32, 127))
+# drawn for characters missing from the charset
+FALLBACK: str = "?"
+# characters a TextLine holds by default
+LINE_CAPACITY: int = 64
+
+
+class GlyphAtlas:
+    """Every glyph of a font at one size and color, side by side on one surface
+    """
+
+    __slots__ = ("surface", "glyphs", "height", "advance", "_fallback")
+
+    def __init__(self, font: pygame.font.Font, color: tuple[int, int, int],
+                 charset: str = CHARSET) -> None:
+        """Rasterizes the charset once
+
+        Args:
+            font (pygame.font.Font): font at the size to draw
+            color (tuple[int, int, int]): color of the text
+            charset (str): characters that can be drawn, FALLBACK is added
+        """
+        characters = dict.fromkeys(charset + FALLBACK)  # ordered without repeats
+        rendered = [font.render(char, True, color) for char in characters]
+        self.height: int = max(font.get_height(), *(glyph.get_height() for glyph in rendered))
+        width = sum(glyph.get_width() for glyph in rendered)
+        self.surface: pygame.Surface = pygame.Surface((max(width, 1), self.height),
+                                                      pygame.SRCALPHA, 32)
+        # area of every character on the atlas, its width is how far the pen moves
+        self.glyphs: dict[str, pygame.Rect] = {}
+        x = 0
+        for char, glyph in zip(characters, rendered):
+            # the atlas is transparent black, MAX copies the glyph's color and alpha
+            # where a normal blit would blend them
+            self.surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.glyphs[char] = pygame.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            x += glyph.get_width()
+        self.advance: int = max(glyph.width for glyph in self.glyphs.values())  # widest
+        self._fallback: pygame.Rect = self.glyphs[FALLBACK]
+
+    def glyph(self, char: str) -> pygame.Rect:
+        """Getter for the area of a character on the atlas
+
+        Args:
+            char (str): one character
+
+        Returns:
+            pygame.Rect: its area, FALLBACK's for characters outside the charset
+        """
+        return self.glyphs.get(char, self._fallback)
+
+    def width(self, text: str) -> int:
+        """Width a string is drawn at
+
+        Args:
+            text (str): the string
+
+        Returns:
+            int: pixels
+        """
+        glyphs, fallback = self.glyphs, self._fallback
+        return sum(glyphs.get(char, fallback).width for char in text)
+
+
+class TextLine:
+    """One line of text drawn through an atlas, kept between frames so only the
+    characters that changed are copied again
+    """
+
+    __slots__ = ("atlas", "surface", "capacity", "text", "right", "_starts", "_clear", "_flags",
+                 "_cell", "_area", "_dest")
+
+    def __init__(self, atlas: GlyphAtlas, capacity: int = LINE_CAPACITY,
+                 background: tuple[int, int, int] | None = None) -> None:
+        """Allocates the line once
+
+        Args:
+            atlas (GlyphAtlas): glyphs to draw with
+            capacity (int): characters the line holds, longer text is cut off
+            background (tuple[int, int, int] | None): color behind the text, None to
+                                                      draw only the glyphs
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.atlas: GlyphAtlas = atlas
+        self.capacity: int = capacity
+        size = (capacity * atlas.advance, atlas.height)
+        if background is None:
+            self.surface: pygame.Surface = pygame.Surface(size, pygame.SRCALPHA, 32)
+            # the cleared cell is transparent, MAX copies color and alpha as they are
+            self._clear: tuple[int, ...] = (0, 0, 0, 0)
+            self._flags: int = pygame.BLEND_RGBA_MAX
+        else:
+            self.surface = pygame.Surface(size)
+            if pygame.display.get_surface() is not None:
+                self.surface = self.surface.convert()
+            self.surface.fill(background)
+            self._clear = background
+            self._flags = 0  # glyphs blend onto the background
+        self.text: str = ""  # what the surface shows
+        self.right: int = 0  # x after the last character shown, clear after it
+        self._starts: array[int] = array("i", bytes(4 * capacity))  # x of every character
+        # reused so updating and drawing make no objects
+        self._cell: pygame.Rect = pygame.Rect(0, 0, 0, atlas.height)
+        self._area: pygame.Rect = pygame.Rect(0, 0, 0, atlas.height)
+        self._dest: pygame.Rect = pygame.Rect(0, 0, 0, 0)
+
+    def update(self, text: str) -> None:
+        """Changes the line to text, copying only characters that are new or moved
+
+        Args:
+            text (str): the new line
+        """
+        last = self.text
+        if text == last:
+            return
+        atlas, surface, starts, cell = self.atlas.surface, self.surface, self._starts, self._cell
+        clear, flags = self._clear, self._flags
+        glyph = self.atlas.glyphs.get
+        fallback = self.atlas.glyph(FALLBACK)
+        count = min(len(text), self.capacity)
+        drawn = min(len(last), self.capacity)
+        shared = min(count, drawn)
+        # everything from tail on is drawn again, before it only changed characters
+        tail = shared
+        # the positions that differ, found without a Python loop over the whole line
+        for index in compress(range(shared), map(ne, text, last)):
+            area = glyph(text[index], fallback)
+            if glyph(last[index], fallback).width != area.width:
+                tail = index  # the characters after it move
+                break
+            cell.x = starts[index]
+            cell.width = area.width
+            surface.fill(clear, cell)
+            surface.blit(atlas, cell, area, flags)
+        x = starts[tail] if tail < drawn else self.right
+        if x < self.right:
+            cell.x = x
+            cell.width = self.right - x
+            surface.fill(clear, cell)
+        for index in range(tail, count):
+            area = glyph(text[index], fallback)
+            starts[index] = cell.x = x
+            cell.width = area.width
+            surface.blit(atlas, cell, area, flags)
+            x += area.width
+        self.text = text
+        self.right = x
+
+    def draw(self, surface: pygame.Surface, text: str, x: int, y: int) -> None:
+        """Updates the line and draws it with its top left corner at x, y
+
+        Args:
+            surface (pygame.Surface): surface to draw on
+            text (str): the line
+            x (int): left edge
+            y (int): top edge
+        """
+        self.update(text)
+        area, dest = self._area, self._dest
+        area.width = self.right
+        dest.x = x
+        dest.y = y
+        surface.blit(self.surface, dest, area)